@@ -3,10 +3,10 @@ import uuid
 import logging
 import requests
 import io
-import contextlib
 import random
 import time
 import re
+import asyncio
 import concurrent.futures
 import threading
 import hmac
@@ -33,7 +33,29 @@ from production_rollover_system import ProductionRolloverSystem
 from scheduler_service import rollover_scheduler, add_scheduler_routes
 from terminal_utils import TerminalUtils, clean_terminal_path, take_screenshot, fix_terminal, suppress_extra_output
 from error_handlers import setup_error_handlers
-import anthropic
+from solution_cache import create_solution_cache
+from singleflight import create_singleflight
+from similarity_index import create_similarity_index
+from solution_corpus import create_solution_corpus, looks_successful, prewarm
+from llm_clients import ProviderClientRegistry, iter_chat_completion_deltas
+from code_stream import CodeStreamAccumulator, is_complete_code, stream_stats
+from continuation import (TRUNCATION_STOP_REASONS, continuation_prompt, continuation_stats, estimate_max_tokens,
+                          is_truncated, merge_continuation, partial_code)
+from batch_prompting import PromptBatcher, batch_format_instructions, parse_batch_response
+from hedging import RequestHedger
+from dual_language import dual_format_instructions, dual_stats, is_consistent, outputs_match, parse_dual_response
+from provider_router import ProviderRouter
+from circuit_breaker import (CircuitOpenError, RetryBudget, classify_error, classify_status, retry_after_seconds,
+                             RATE_LIMITED, UNAUTHORIZED, BAD_REQUEST, TIMEOUT)
+from solve_engine import SolveEngine
+from sandbox_pool import create_sandbox_pool, run_isolated
+from csharp_runner import create_csharp_runner, prepare_csharp_source
+from exec_backends import create_exec_backends
+from execution_cache import create_execution_cache
+from code_preflight import RepairBudget, describe_issues, execution_error, preflight, repair_prompt, repair_stats
+from key_scheduler import KeyScheduler
+from key_state import create_key_state_backend
+import httpx
 
 # Load environment variables once at the beginning
 load_dotenv()
@@ -81,7 +103,7 @@ API_KEY = os.getenv('API_KEY')
 if not API_KEY:
     logging.error("API_KEY not found in environment. Please set the API_KEY environment variable.")
 
-BASE_URL = "https://api.deepseek.com/v1/chat/completions"
+BASE_URL = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com/v1/chat/completions")
 
 
 # Initialize Flask session with persistent configuration
@@ -97,62 +119,20 @@ DEEPSEEK_KEYS = [
 DEEPSEEK_KEYS = [key for key in DEEPSEEK_KEYS if key]
 
 # Enhanced API key management with load balancing
-class APIKeyManager:
+DEEPSEEK_CONCURRENCY_PER_KEY = 5
+
+# Rate-limit state for provider keys; KEY_STATE_BACKEND=redis shares it across all workers and nodes
+key_state_backend = create_key_state_backend()
+
+class APIKeyManager(KeyScheduler):
+    """DeepSeek keys: per-key concurrency and cooldowns; callers queue fairly for capacity"""
     def __init__(self, keys):
-        self.keys = keys
-        self.key_stats = {i: {'requests': 0, 'failures': 0, 'last_used': 0, 'rate_limited_until': 0} for i in range(len(keys))}
-        self.current_index = 0
-        self.lock = threading.Lock()
-    
-    def get_best_key(self):
-        """Get the best available API key based on load balancing"""
-        with self.lock:
-            current_time = time.time()
-            
-            # Filter out rate-limited keys
-            available_keys = [
-                i for i in range(len(self.keys)) 
-                if self.key_stats[i]['rate_limited_until'] < current_time
-            ]
-            
-            if not available_keys:
-                # All keys are rate limited, wait for the soonest one
-                next_available = min(self.key_stats.values(), key=lambda x: x['rate_limited_until'])
-                wait_time = max(0, next_available['rate_limited_until'] - current_time)
-                if wait_time > 0:
-                    logging.warning(f"All API keys rate limited. Waiting {wait_time:.2f} seconds...")
-                    time.sleep(wait_time)
-                available_keys = list(range(len(self.keys)))
-            
-            # Choose key with least recent usage for better load distribution
-            best_key_index = min(available_keys, key=lambda i: (
-                self.key_stats[i]['requests'], 
-                self.key_stats[i]['last_used']
-            ))
-            
-            # Update stats
-            self.key_stats[best_key_index]['requests'] += 1
-            self.key_stats[best_key_index]['last_used'] = current_time
-            
-            return best_key_index, self.keys[best_key_index]
-    
-    def mark_rate_limited(self, key_index, duration=60):
-        """Mark a key as rate limited for specified duration (seconds)"""
-        with self.lock:
-            self.key_stats[key_index]['rate_limited_until'] = time.time() + duration
-            self.key_stats[key_index]['failures'] += 1
-            logging.warning(f"API key {key_index + 1} marked as rate limited for {duration} seconds")
-    
-    def mark_success(self, key_index):
-        """Mark successful API call"""
-        with self.lock:
-            # Reset rate limit if it was set
-            self.key_stats[key_index]['rate_limited_until'] = 0
-    
-    def get_stats(self):
-        """Get current statistics for all keys"""
-        with self.lock:
-            return dict(self.key_stats)
+        super().__init__(
+            'DeepSeek', keys,
+            max_concurrent_per_key=DEEPSEEK_CONCURRENCY_PER_KEY,
+            default_timeout=float(os.getenv('DEEPSEEK_KEY_WAIT_SECONDS', '30')),
+            backend=key_state_backend
+        )
 
 # Initialize enhanced API key managers
 deepseek_manager = APIKeyManager(DEEPSEEK_KEYS)
@@ -184,6 +164,12 @@ from firebase_otp import firebase_otp_service
 session = requests.Session()
 session.headers.update({"Content-Type": "application/json", "Authorization": f"Bearer {API_KEY}"})
 
+# One long-lived, connection-pooled client per LLM provider key (LLM_POOL_SIZE, LLM_*_TIMEOUT)
+llm_clients = ProviderClientRegistry.from_env()
+
+# Stream provider responses and hand code to execution as soon as it is complete
+LLM_STREAMING = os.getenv('LLM_STREAMING', 'true').lower() == 'true'
+
 # Enhanced thread pool configuration for high traffic
 # Increase workers for better multitasking support
 max_workers = min(50, (os.cpu_count() or 4) * 12)  # Cap at 50 workers
@@ -200,6 +186,17 @@ api_executor = concurrent.futures.ThreadPoolExecutor(
 
 logging.info(f"Initialized thread pools: Main={max_workers} workers, API={min(20, len(DEEPSEEK_KEYS) * 5)} workers")
 
+# Generated Python runs in sandbox worker processes (time/CPU/memory limits), batched per round-trip
+sandbox_pool = create_sandbox_pool()
+
+# C# compiles in a warm compile host (built once, prepared per process on first use) and runs as its own dotnet process
+csharp_runner = create_csharp_runner()
+# C# documents: compile every question's program in one pass instead of one build per question
+CSHARP_DOCUMENT_BATCH = os.getenv('CSHARP_DOCUMENT_BATCH', 'true').lower() == 'true'
+
+# C/C++/Java/JavaScript run on local toolchains (gcc, g++, javac/java, node) under the sandbox limits
+exec_backends = create_exec_backends(sandbox_pool.limits if sandbox_pool else None)
+
 # Progress tracking for real-time updates
 active_tasks = {}
 task_progress = {}
@@ -214,9 +211,18 @@ logging.basicConfig(
     handlers=[logging.StreamHandler(), logging.FileHandler('app.log')]
 )
 
-# --- In-memory cache to avoid duplicate API calls ---
-solution_cache = {}
-cache_lock = threading.Lock()
+# --- Shared solution cache to avoid duplicate API calls ---
+# Bump PROMPT_VERSION whenever the solve prompt changes so stale answers are not reused
+PROMPT_VERSION = "2025.10.1"
+solution_cache = create_solution_cache(PROMPT_VERSION)
+# Outputs of programs already run (language + code hash + fixture version); random/clock programs always run
+execution_cache = create_execution_cache()
+# Identical questions solved concurrently share one LLM call (SINGLEFLIGHT_BACKEND=redis: across processes)
+singleflight = create_singleflight()
+# Near-duplicate index so re-uploaded assignments with different numbering/noise skip the LLM
+similarity_index = create_similarity_index(PROMPT_VERSION)
+# Every solved question, with its captured output, kept across semesters for nightly pre-warming
+solution_corpus = create_solution_corpus(PROMPT_VERSION)
 
 # Claude API keys with intelligent management - Load from environment
 CLAUDE_KEYS = [
@@ -232,166 +238,63 @@ if not CLAUDE_KEYS:
     raise ValueError("No API keys found. Please set ANTHROPIC_API_KEY or DEEPSEEK_KEY_* environment variables")
 
 # Enhanced Claude API Manager with concurrent connection control
-class ClaudeAPIManager:
+class ClaudeAPIManager(KeyScheduler):
+    """Claude keys: per-minute/hour token buckets, connection limits and error cooldowns"""
     def __init__(self, keys):
-        self.keys = keys
-        self.key_stats = {
-            i: {
-                'requests': 0,
-                'failures': 0,
-                'last_used': 0,
-                'rate_limited_until': 0,
-                'requests_this_minute': 0,
-                'requests_this_hour': 0,
-                'minute_window_start': 0,
-                'hour_window_start': 0,
-                'consecutive_errors': 0,
-                'last_error_type': None,
-                'concurrent_connections': 0
-            } for i in range(len(keys))
-        }
-        self.current_index = 0
-        self.lock = threading.Lock()
         # Claude API rate limits (based on official documentation)
         self.max_requests_per_minute = 60  # Actual limit for most tiers
         self.max_requests_per_hour = 1000  # Hourly limit
-        self.rate_limit_cooldown = 60  # 1 minute cooldown for rate limits
-        self.error_cooldown = 120  # 2 minute cooldown for other errors
-        self.max_consecutive_errors = 3  # Max errors before longer cooldown
-        # NEW: Concurrent connection limits
+        # Concurrent connection limits
         self.max_concurrent_connections_per_key = 2  # Max 2 concurrent connections per key
-        self.global_concurrent_limit = 4  # Global limit across all keys
-        self.connection_semaphore = threading.Semaphore(self.global_concurrent_limit)
-    
-    def reset_minute_window(self, key_index):
-        """Reset the minute window for request counting"""
-        current_time = time.time()
-        stats = self.key_stats[key_index]
-        
-        # If more than a minute has passed, reset the counter
-        if current_time - stats['minute_window_start'] >= 60:
-            stats['requests_this_minute'] = 0
-            stats['minute_window_start'] = current_time
-    
-    def reset_hour_window(self, key_index):
-        """Reset the hour window for request counting"""
-        current_time = time.time()
-        stats = self.key_stats[key_index]
-        
-        # If more than an hour has passed, reset the counter
-        if current_time - stats['hour_window_start'] >= 3600:
-            stats['requests_this_hour'] = 0
-            stats['hour_window_start'] = current_time
-    
-    def is_key_available(self, key_index):
-        """Check if a Claude key is available for use with concurrent connection control"""
-        current_time = time.time()
-        stats = self.key_stats[key_index]
-        
-        # Check if rate limited
-        if stats['rate_limited_until'] > current_time:
-            return False
-        
-        # Check consecutive errors - if too many errors, apply longer cooldown
-        if stats['consecutive_errors'] >= self.max_consecutive_errors:
-            if current_time - stats['last_used'] < self.error_cooldown:
-                logging.warning(f"Claude API key {key_index + 1} in error cooldown ({stats['consecutive_errors']} consecutive errors)")
-                return False
-            else:
-                # Reset consecutive errors after cooldown period
-                stats['consecutive_errors'] = 0
-        
-        # NEW: Check concurrent connections per key
-        if stats['concurrent_connections'] >= self.max_concurrent_connections_per_key:
-            logging.warning(f"Claude API key {key_index + 1} at max concurrent connections ({stats['concurrent_connections']}/{self.max_concurrent_connections_per_key})")
-            return False
-        
-        # Reset minute and hour windows if needed
-        self.reset_minute_window(key_index)
-        self.reset_hour_window(key_index)
-        
-        # Check minute rate limit (primary limit)
-        if stats['requests_this_minute'] >= self.max_requests_per_minute:
-            # Mark as rate limited for remainder of minute
-            remaining_seconds = 60 - (current_time - stats['minute_window_start'])
-            stats['rate_limited_until'] = current_time + max(remaining_seconds, 10)
-            logging.warning(f"Claude API key {key_index + 1} hit per-minute rate limit ({stats['requests_this_minute']}/{self.max_requests_per_minute} requests)")
-            return False
-        
-        # Check hourly rate limit (secondary limit)
-        if stats['requests_this_hour'] >= self.max_requests_per_hour:
-            # Mark as rate limited for remainder of hour
-            remaining_seconds = 3600 - (current_time - stats['hour_window_start'])
-            stats['rate_limited_until'] = current_time + max(remaining_seconds, 60)
-            logging.warning(f"Claude API key {key_index + 1} hit per-hour rate limit ({stats['requests_this_hour']}/{self.max_requests_per_hour} requests)")
-            return False
-        
-        return True
-    
-    def get_best_available_key(self):
-        """Get the best available Claude key with load balancing"""
-        with self.lock:
-            current_time = time.time()
-            
-            # Find available keys
-            available_keys = []
-            for i in range(len(self.keys)):
-                if self.is_key_available(i):
-                    available_keys.append(i)
-            
-            if not available_keys:
-                return None, None  # No keys available
-            
-            # Choose key with least usage in current minute
-            best_key_index = min(available_keys, key=lambda i: (
-                self.key_stats[i]['requests_this_minute'],
-                self.key_stats[i]['last_used']
-            ))
-            
-            # Update usage stats
-            stats = self.key_stats[best_key_index]
-            stats['requests'] += 1
-            stats['requests_this_minute'] += 1
-            stats['last_used'] = current_time
-            
-            # Reset minute window if needed
-            self.reset_minute_window(best_key_index)
-            
-            return best_key_index, self.keys[best_key_index]
-    
-    def mark_rate_limited(self, key_index, duration=60):
-        """Mark Claude key as rate limited"""
-        with self.lock:
-            current_time = time.time()
-            self.key_stats[key_index]['rate_limited_until'] = current_time + duration
-            self.key_stats[key_index]['failures'] += 1
-            logging.warning(f"Claude API key {key_index + 1} marked as rate limited for {duration} seconds")
-    
-    def mark_success(self, key_index):
-        """Mark successful Claude API call"""
-        with self.lock:
-            # Don't reset rate limit immediately, let minute window handle it
-            pass
-    
-    def get_available_keys_count(self):
-        """Get count of currently available Claude keys"""
-        available_count = 0
-        current_time = time.time()
-        
-        for i in range(len(self.keys)):
-            if self.is_key_available(i):
-                available_count += 1
-        
-        return available_count
-    
-    def get_stats(self):
-        """Get current statistics for all Claude keys"""
-        with self.lock:
-            return dict(self.key_stats)
+        super().__init__(
+            'Claude', keys,
+            requests_per_minute=self.max_requests_per_minute,
+            requests_per_hour=self.max_requests_per_hour,
+            max_concurrent_per_key=self.max_concurrent_connections_per_key,
+            global_concurrent_limit=4,  # Global limit across all keys
+            max_consecutive_errors=3,  # Max errors before longer cooldown
+            error_cooldown=120,  # 2 minute cooldown after repeated errors
+            default_timeout=float(os.getenv('CLAUDE_KEY_WAIT_SECONDS', '10')),
+            backend=key_state_backend
+        )
 
 # Initialize Claude API manager
 claude_manager = ClaudeAPIManager(CLAUDE_KEYS)
 
+# asyncio engine for provider I/O: in-flight LLM calls share one event loop instead of
+# holding a worker thread each. Default in-flight cap matches the provider connection limits.
+solve_engine = SolveEngine(max_inflight=int(os.getenv(
+    'SOLVE_ENGINE_MAX_INFLIGHT',
+    str(max(1, claude_manager.global_concurrent_limit + len(DEEPSEEK_KEYS) * DEEPSEEK_CONCURRENCY_PER_KEY))
+)))
+
+# Optional batching of short questions into one request (PROMPT_BATCHING_*; off by default)
+BATCH_MAX_TOKENS_PER_QUESTION = 700
+BATCH_MAX_TOKENS = 4000
+prompt_batcher = PromptBatcher.from_env(lambda questions, language: solve_coding_batch_async(questions, language))
+
+# Race DeepSeek when Claude is slower than its observed tail latency (HEDGE_*)
+request_hedger = RequestHedger.from_env()
+
+# Java/C/C++/JavaScript without a local toolchain: request the display code and its Python twin in one call
+DUAL_LANGUAGE_ENABLED = os.getenv('DUAL_LANGUAGE_ENABLED', 'true').lower() == 'true'
+
+# Continuation requests allowed to finish code that hit the token limit
+CONTINUATION_MAX_ROUNDS = int(os.getenv('CONTINUATION_MAX_ROUNDS', '2'))
+
+# Targeted repair requests per question for Python that fails pre-flight or its run (REPAIR_*)
+REPAIR_MAX_ATTEMPTS = int(os.getenv('REPAIR_MAX_ATTEMPTS', '1'))
+REPAIR_BUDGET_SECONDS = float(os.getenv('REPAIR_BUDGET_SECONDS', '30'))
+
+# Shared cap on provider retries, with exponential backoff and jitter (RETRY_*)
+retry_budget = RetryBudget.from_env()
+
+# Rank providers and keys by observed latency and error rate (ROUTER_*)
+provider_router = ProviderRouter.from_env()
+PROVIDER_SCHEDULERS = {'claude': claude_manager, 'deepseek': deepseek_manager}
+claude_manager.key_cost = lambda index: provider_router.key_cost('claude', index)
+deepseek_manager.key_cost = lambda index: provider_router.key_cost('deepseek', index)
+
 # Global terminal paths for cycling in screenshots
 TERMINAL_PATHS = [
     "C:\\Users\\THARAN\\Desktop\\AIProjects\\ChatBot",
@@ -1481,16 +1384,79 @@ def send_otp_console(phone_number, otp_code):
 
 
 
-def get_cached_solution(question, language="python"):
-    key = (question, language)
-    with cache_lock:
-        if key in solution_cache:
-            logging.debug("Cache hit for question.")
-            return solution_cache[key]
-    sol = solve_coding_problem(question, language)
-    with cache_lock:
-        solution_cache[key] = sol
-    return sol
+def get_cached_solution(question, language="python", on_token=None):
+    """Return a cached solution or solve and cache it (blocking wrapper)"""
+    return solve_engine.run(get_cached_solution_async(question, language, on_token))
+
+async def get_cached_solution_async(question, language="python", on_token=None):
+    """Return a cached solution or solve and cache it.
+
+    The cache key is taken from the question as uploaded, before
+    solve_coding_problem appends its random "Assume the user input" suffix.
+    on_token(chars_received) reports streaming progress of a fresh solve.
+    Concurrent misses for the same key are coalesced into one solve.
+    The cache, corpus and similarity index are SQLite/Redis stores: they are
+    read and written on the loop's executor, never on the solve-engine loop.
+    """
+    loop = asyncio.get_running_loop()
+    sol = await loop.run_in_executor(None, find_stored_solution, question, language)
+    if sol is not None:
+        return sol
+
+    async def solve_and_cache():
+        sol = await solve_coding_problem_async(question, language, on_token)
+        # Shielded: the answer is still stored if the caller is cancelled during the write
+        await asyncio.shield(loop.run_in_executor(None, cache_solution, question, language, sol))
+        return sol
+    
+    # Concurrent callers for the same question wait for the first caller's answer
+    return await singleflight.run(solution_cache.key_for(question, language), solve_and_cache,
+                                  lookup=lambda: solution_cache.get(question, language))
+
+def find_stored_solution(question, language):
+    """Solution from the solution cache, the corpus or a near-duplicate question, or None (blocking)"""
+    sol = solution_cache.get(question, language)
+    if sol is not None:
+        logging.info(f"♻️ Solution cache hit ({language}): {question[:50]}...")
+        return sol
+    sol = corpus_solution(question, language)
+    if sol is not None:
+        return sol
+    if similarity_index:
+        try:
+            match = similarity_index.lookup(question, language)
+        except Exception as e:
+            logging.warning(f"Similarity index lookup failed: {e}")
+            match = None
+        if match:
+            # Not stored under this question's key: a wrong near-duplicate must not become an exact hit
+            logging.info(f"♻️ Near-duplicate hit ({match['similarity']:.2f}) for: {question[:50]}...")
+            return match['solution']
+    return None
+
+def corpus_solution(question, language):
+    """Validated solution from the corpus, copied into the solution cache, or None"""
+    if not solution_corpus:
+        return None
+    try:
+        entry = solution_corpus.get(question, language)
+    except Exception as e:
+        logging.warning(f"Solution corpus lookup failed: {e}")
+        return None
+    if entry is None:
+        return None
+    logging.info(f"♻️ Corpus hit ({language}): {question[:50]}...")
+    solution_cache.set(question, language, entry['code'], from_corpus=True)
+    return entry['code']
+
+def cache_solution(question, language, sol):
+    """Store a fresh solution in the solution cache and the similarity index"""
+    solution_cache.set(question, language, sol)
+    if similarity_index:
+        try:
+            similarity_index.add(question, language, sol)
+        except Exception as e:
+            logging.warning(f"Similarity index update failed: {e}")
 
 # ----- Utility Functions -----
 def extract_text_from_pdf(pdf_path):
@@ -1508,84 +1474,125 @@ def extract_text_from_pdf(pdf_path):
         return f"Error extracting text from PDF: {e}"
     
     
-def try_claude_api(prompt, api_key, key_index):
-    """Enhanced Claude API with concurrent connection control"""
-    # Acquire global connection semaphore first
-    if not claude_manager.connection_semaphore.acquire(blocking=False):
-        raise Exception("Global Claude API connection limit reached. Please try again shortly.")
+def try_claude_api(prompt, language="python", on_token=None, max_tokens=None, wait=None):
+    """Blocking wrapper around try_claude_api_async for sync callers"""
+    return solve_engine.run(try_claude_api_async(prompt, language, on_token, max_tokens, wait))
+
+async def try_claude_api_async(prompt, language="python", on_token=None, max_tokens=None, wait=None, completion=None):
+    """Enhanced Claude API with scheduled key selection and concurrent connection control
+
+    Waits up to `wait` seconds (CLAUDE_KEY_WAIT_SECONDS by default) for a key
+    with capacity before giving up. With LLM_STREAMING the response is
+    streamed and reading stops as soon as the code block is complete;
+    on_token(chars_received) reports progress. language=None returns the raw
+    response text instead of extracted code. completion, if given, receives
+    the raw text and stop_reason (used to detect truncation).
+    """
+    retry_budget.record_request()
+    lease = await claude_manager.acquire_async(wait)
+    if lease is None:
+        if not claude_manager.breaker.available():
+            raise CircuitOpenError("Claude", claude_manager.breaker.remaining())
+        raise Exception("No Claude API key capacity available. Please try again shortly.")
+    key_index = lease.index
+    started = time.monotonic()
     
     try:
-        # Track concurrent connection for this specific key
-        with claude_manager.lock:
-            claude_manager.key_stats[key_index]['concurrent_connections'] += 1
-            concurrent_count = claude_manager.key_stats[key_index]['concurrent_connections']
-            logging.debug(f"Claude API key {key_index + 1} concurrent connections: {concurrent_count}")
-        
-        client = anthropic.Anthropic(api_key=api_key)
-        response = client.messages.create(
-            model="claude-3-5-sonnet-20241022",
-            max_tokens=800,
-            messages=[
+        logging.info(f"Using Claude API key {key_index + 1}/{len(CLAUDE_KEYS)} (waited {lease.waited:.2f}s for capacity)")
+        
+        client = llm_clients.anthropic(lease.key)
+        request_params = {
+            "model": "claude-3-5-sonnet-20241022",
+            "max_tokens": max_tokens or 800,
+            "messages": [
                 {
                     "role": "user",
                     "content": prompt
                 }
             ]
-        )
+        }
+        accumulator = CodeStreamAccumulator(language, on_progress=on_token,
+                                            stats=stream_stats if LLM_STREAMING else None)
+        
+        stop_reason = None
+        if LLM_STREAMING:
+            async with client.messages.stream(**request_params) as stream:
+                async for text in stream.text_stream:
+                    if accumulator.feed(text):
+                        break  # Code is complete; leaving the stream cancels the rest of the generation
+                else:
+                    stop_reason = (await stream.get_final_message()).stop_reason
+        else:
+            response = await client.messages.create(**request_params)
+            accumulator.feed(response.content[0].text)
+            stop_reason = response.stop_reason
         
-        content = response.content[0].text
+        content = accumulator.finish()
+        if completion is not None:
+            completion.update(provider='claude', text=accumulator.text, stop_reason=stop_reason)
         claude_manager.mark_success(key_index)
-        return re.sub(r"```[\w]*", "", content).replace("```", "").strip()
+        provider_router.record('claude', key_index, time.monotonic() - started)
+        return content
         
     except Exception as e:
-        error_str = str(e).lower()
-        
-        # Enhanced error detection for concurrent connections
-        if "concurrent" in error_str or "connection" in error_str:
-            claude_manager.mark_rate_limited(key_index, duration=90)
-            logging.warning(f"Claude API key {key_index + 1} concurrent connection limit: {str(e)}")
-        # Detect other rate limit errors
-        elif "rate" in error_str or "limit" in error_str or "429" in error_str:
-            claude_manager.mark_rate_limited(key_index, duration=60)
+        # Classify by exception type and HTTP status, never by message text
+        kind = classify_error(e)
+        if kind == RATE_LIMITED:
+            claude_manager.mark_rate_limited(key_index, duration=retry_after_seconds(e) or 60)
             logging.warning(f"Claude API key {key_index + 1} rate limited: {str(e)}")
-        # Detect auth errors
-        elif "401" in error_str or "unauthorized" in error_str:
+        elif kind == UNAUTHORIZED:
             claude_manager.mark_rate_limited(key_index, duration=300)  # 5 minute cooldown for auth issues
             logging.error(f"Claude API key {key_index + 1} unauthorized: {str(e)}")
         else:
-            # General error handling
-            with claude_manager.lock:
-                claude_manager.key_stats[key_index]['failures'] += 1
-                claude_manager.key_stats[key_index]['consecutive_errors'] += 1
-            logging.warning(f"Claude API key {key_index + 1} failed: {str(e)}")
+            # Repeated failures open the key's circuit; outages (5xx, overload, timeouts) open the provider's
+            claude_manager.mark_failure(key_index, kind)
+            logging.warning(f"Claude API key {key_index + 1} failed ({kind}): {str(e)}")
         
+        provider_router.record('claude', key_index, None, ok=False, error_type=kind)
         raise e
     
     finally:
-        # Always decrement concurrent connection count and release semaphore
-        try:
-            with claude_manager.lock:
-                claude_manager.key_stats[key_index]['concurrent_connections'] = max(0, 
-                    claude_manager.key_stats[key_index]['concurrent_connections'] - 1)
-            claude_manager.connection_semaphore.release()
-        except Exception as cleanup_error:
-            logging.error(f"Error cleaning up Claude API connection: {cleanup_error}")
-
-def try_deepseek_api(prompt, timeout=45):
-    """Enhanced DeepSeek API with intelligent load balancing and retry logic"""
-    max_retries = len(DEEPSEEK_KEYS) * 2  # Allow multiple attempts per key
+        # Always hand the key's capacity back to the scheduler
+        lease.release()
+
+def try_deepseek_api(prompt, timeout=45, language="python", on_token=None, max_tokens=None):
+    """Blocking wrapper around try_deepseek_api_async for sync callers"""
+    return solve_engine.run(try_deepseek_api_async(prompt, timeout, language, on_token, max_tokens))
+
+async def try_deepseek_api_async(prompt, timeout=45, language="python", on_token=None, max_tokens=None, completion=None):
+    """Enhanced DeepSeek API with intelligent load balancing and retry logic
+
+    With LLM_STREAMING the response is streamed and reading stops as soon as
+    the code block is complete; on_token(chars_received) reports progress.
+    language=None returns the raw response text instead of extracted code.
+    completion, if given, receives the raw text and finish_reason as stop_reason.
+    """
+    max_attempts = len(DEEPSEEK_KEYS) * 2  # Upper bound; retries also need the shared retry budget
+    retry_budget.record_request()
+    attempts = 0
+    rejected = None
     
-    for attempt in range(max_retries):
+    for attempt in range(max_attempts):
+        if attempt:
+            # Retry only within the process-wide budget, after exponential backoff with jitter
+            if not retry_budget.try_spend():
+                logging.warning("🚫 DeepSeek retry budget exhausted; not retrying")
+                break
+            await asyncio.sleep(retry_budget.backoff(attempt))
+        
+        # Queue for a key with capacity (fair, bounded by DEEPSEEK_KEY_WAIT_SECONDS)
+        lease = await deepseek_manager.acquire_async()
+        if lease is None:
+            if not deepseek_manager.breaker.available():
+                raise CircuitOpenError("DeepSeek", deepseek_manager.breaker.remaining())
+            logging.warning("⏳ No DeepSeek API key capacity within the wait deadline")
+            break
+        key_index, current_key = lease.index, lease.key
+        started = time.monotonic()
+        attempts += 1
+        
         try:
-            # Get the best available API key
-            key_index, current_key = deepseek_manager.get_best_key()
-            
-            logging.info(f"Using DeepSeek API key {key_index + 1}/{len(DEEPSEEK_KEYS)} (attempt {attempt + 1}/{max_retries})")
-            
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {current_key}"
-            }
+            logging.info(f"Using DeepSeek API key {key_index + 1}/{len(DEEPSEEK_KEYS)} (attempt {attempt + 1}/{max_attempts}, waited {lease.waited:.2f}s)")
             
             # Enhanced request data with better parameters for high traffic
             data = {
@@ -1593,85 +1600,104 @@ def try_deepseek_api(prompt, timeout=45):
                 "messages": [{"role": "user", "content": prompt}],
                 "temperature": 0.2,
                 "top_p": 0.9,
-                "max_tokens": 1000,  # Increased for better responses
-                "stream": False
+                "max_tokens": max_tokens or 1000,  # Increased for better responses
+                "stream": LLM_STREAMING
             }
             
-            # Make request with increased timeout for high traffic
-            response = requests.post(
-                BASE_URL, 
-                json=data, 
-                headers=headers, 
-                timeout=timeout
-            )
+            # Make request over the key's pooled keep-alive session
+            client = llm_clients.deepseek(current_key)
+            request_timeout = httpx.Timeout(timeout, connect=llm_clients.connect_timeout)
+            accumulator = CodeStreamAccumulator(language, on_progress=on_token,
+                                                stats=stream_stats if LLM_STREAMING else None)
+            
+            stream_meta = {}
+            if LLM_STREAMING:
+                async with client.stream("POST", BASE_URL, json=data, timeout=request_timeout) as response:
+                    if response.status_code == 200:
+                        async for delta in iter_chat_completion_deltas(response, stream_meta):
+                            if accumulator.feed(delta):
+                                break  # Code is complete; closing the response cancels the rest of the generation
+                    else:
+                        await response.aread()
+            else:
+                response = await client.post(BASE_URL, json=data, timeout=request_timeout)
+                if response.status_code == 200:
+                    choice = response.json().get("choices", [{}])[0]
+                    accumulator.feed(choice.get("message", {}).get("content", ""))
+                    stream_meta['finish_reason'] = choice.get("finish_reason")
             
             if response.status_code == 200:
-                content = response.json().get("choices", [{}])[0].get("message", {}).get("content", "")
+                content = accumulator.finish()
+                if completion is not None:
+                    completion.update(provider='deepseek', text=accumulator.text, stop_reason=stream_meta.get('finish_reason'))
                 deepseek_manager.mark_success(key_index)
+                provider_router.record('deepseek', key_index, time.monotonic() - started)
                 logging.info(f"✅ DeepSeek API key {key_index + 1} succeeded")
-                return re.sub(r"```[\w]*", "", content).replace("```", "").strip()
+                return content
             
-            elif response.status_code == 429:  # Rate limit
-                deepseek_manager.mark_rate_limited(key_index, duration=90)  # 90 second cooldown
+            kind = classify_status(response.status_code)
+            provider_router.record('deepseek', key_index, None, ok=False, error_type=kind)
+            if kind == RATE_LIMITED:
+                deepseek_manager.mark_rate_limited(key_index, duration=retry_after_seconds(response) or 90)
                 logging.warning(f"🚫 API key {key_index + 1} rate limited (429)")
-                continue
                 
-            elif response.status_code == 401:  # Unauthorized - invalid key
+            elif kind == UNAUTHORIZED:  # Invalid key
                 deepseek_manager.mark_rate_limited(key_index, duration=300)  # 5 minute cooldown for invalid keys
-                logging.error(f"🔑 API key {key_index + 1} unauthorized (401)")
-                continue
-                
-            else:
-                error_msg = f"HTTP {response.status_code}: {response.text[:200]}"
-                logging.error(f"❌ DeepSeek API key {key_index + 1} error: {error_msg}")
+                logging.error(f"🔑 API key {key_index + 1} unauthorized ({response.status_code})")
                 
-                # For 5xx errors, mark as temporarily unavailable
-                if 500 <= response.status_code < 600:
-                    deepseek_manager.mark_rate_limited(key_index, duration=30)
+            elif kind == BAD_REQUEST:
+                # The request itself is rejected; another key or attempt would get the same answer
+                rejected = f"HTTP {response.status_code}: {response.text[:200]}"
+                logging.error(f"❌ DeepSeek rejected the request: {rejected}")
+                break
                 
-                continue
+            else:
+                # 5xx/overload: repeated failures open the key's and the provider's circuit
+                deepseek_manager.mark_failure(key_index, kind)
+                logging.error(f"❌ DeepSeek API key {key_index + 1} error: HTTP {response.status_code}: {response.text[:200]}")
                 
-        except requests.exceptions.Timeout:
-            logging.warning(f"⏰ DeepSeek API key {key_index + 1} timeout after {timeout}s")
-            continue
-            
-        except requests.exceptions.ConnectionError:
-            logging.warning(f"🔌 DeepSeek API key {key_index + 1} connection error")
-            time.sleep(1)  # Brief pause before retry
-            continue
+        except httpx.HTTPError as e:
+            kind = classify_error(e)
+            deepseek_manager.mark_failure(key_index, kind)
+            provider_router.record('deepseek', key_index, None, ok=False, error_type=kind)
+            if kind == TIMEOUT:
+                logging.warning(f"⏰ DeepSeek API key {key_index + 1} timeout after {timeout}s")
+            else:
+                logging.warning(f"🔌 DeepSeek API key {key_index + 1} connection error ({kind})")
             
         except Exception as e:
-            error_str = str(e).lower()
-            if "rate" in error_str or "429" in error_str:
-                deepseek_manager.mark_rate_limited(key_index, duration=60)
-                logging.warning(f"🚫 DeepSeek API key {key_index + 1} rate limited: {str(e)}")
-            else:
-                logging.error(f"❌ DeepSeek API key {key_index + 1} unexpected error: {str(e)}")
-            continue
+            kind = classify_error(e)
+            deepseek_manager.mark_failure(key_index, kind)
+            provider_router.record('deepseek', key_index, None, ok=False, error_type=kind)
+            logging.error(f"❌ DeepSeek API key {key_index + 1} unexpected error ({kind}): {str(e)}")
+            
+        finally:
+            lease.release()
+    
+    if rejected:
+        raise Exception(f"DeepSeek rejected the request: {rejected}")
     
     # If all attempts failed, provide detailed error info
     stats = deepseek_manager.get_stats()
-    error_details = f"All {len(DEEPSEEK_KEYS)} DeepSeek API keys failed after {max_retries} attempts. Key stats: {stats}"
+    error_details = f"All {len(DEEPSEEK_KEYS)} DeepSeek API keys failed after {attempts} attempts. Key stats: {stats}"
     logging.error(error_details)
     raise Exception("All DeepSeek API keys exhausted. Please try again in a few minutes.")
 
-def solve_coding_problem(question, language="python"):
-    """Intelligent API selection with load balancing between Claude and DeepSeek"""
+LANGUAGE_NAMES = {
+    "python": "Python", "c++": "C++", "cpp": "C++",
+    "c#": "C#", "csharp": "C#", "c": "C",
+    "java": "Java", "javascript": "JavaScript"
+}
+
+def with_input_assumption(question):
+    """Pin a random input value for questions that mention user input"""
     if "input" in question.lower() or "user" in question.lower():
         question += f" Assume the user input is {random.randint(1, 9)}. The code should NOT prompt for input."
+    return question
 
-    lang_str = {
-        "python": "Python", "c++": "C++", "cpp": "C++",
-        "c#": "C#", "csharp": "C#", "c": "C",
-        "java": "Java", "javascript": "JavaScript"
-    }.get(language.lower(), language)
-
-    prompt = f"""
-Write only the {lang_str} code to solve the following problem:
-start
-{question}
-end
-there should not be any comments in the code only raw code should be provided.
+def solution_prompt_rules(lang_str):
+    """Instructions shared by single-question and batched prompts"""
+    rules = """there should not be any comments in the code only raw code should be provided.
 The code must NOT contain any 'input()' function or prompt the user for input.
 Instead, assume predefined values for any required inputs.
 Ensure the code includes at least one print statement to display the final result or output.
@@ -1684,222 +1710,209 @@ Return only the raw code. Do not include any explanations, comments, markdown fo
 
     # C#-specific guard rails to improve compilability and visible output
     if lang_str == "C#":
-        prompt += """
+        rules += """
 For C#: Always include 'using System;'. Include 'using System.Collections;' when using ArrayList/Hashtable, and 'using System.Collections.Generic;' when using List<>/Dictionary<>. Include 'using System.IO;' when using FileInfo/Directory/Path.
 Define 'class Program' with 'static void Main()' as the entrypoint.
 Do not request interactive input; use fixed sample values.
 For filesystem/search tasks, simulate with a small predefined array of filenames and use a simple collection (e.g., List<string> or Dictionary<string, FileInfo-like struct>) to store valid entries. Print details for a requested filename. Avoid real system I/O beyond safe relative files.
 Ensure several 'Console.WriteLine(...)' statements print the results clearly.
 """
+    return rules
+
+def build_solution_prompt(question, language="python"):
+    lang_str = LANGUAGE_NAMES.get(language.lower(), language)
+    return f"""
+Write only the {lang_str} code to solve the following problem:
+start
+{with_input_assumption(question)}
+end
+""" + solution_prompt_rules(lang_str)
+
+def build_batch_solution_prompt(questions, language="python"):
+    lang_str = LANGUAGE_NAMES.get(language.lower(), language)
+    problems = "".join(f"start {number}\n{with_input_assumption(question)}\nend {number}\n"
+                       for number, question in enumerate(questions, 1))
+    return (f"\nWrite only the {lang_str} code to solve each of the following problems:\n{problems}"
+            + solution_prompt_rules(lang_str) + batch_format_instructions(len(questions)))
+
+def build_dual_solution_prompt(question, language):
+    lang_str = LANGUAGE_NAMES.get(language.lower(), language)
+    return f"""
+Write the {lang_str} code to solve the following problem:
+start
+{with_input_assumption(question)}
+end
+""" + solution_prompt_rules(lang_str) + dual_format_instructions(lang_str)
 
+async def solve_dual_language_async(question, language, on_token=None):
+    """Display code and its Python twin from one request, or None to solve them separately
+
+    Both programs come from the same response (and the same assumed input),
+    so the twin's output matches the displayed program far more often than
+    with two independent requests.
+    """
+    dual_stats.count('requests')
+    max_tokens = estimate_max_tokens(question, language, cap=3000) + estimate_max_tokens(question, "python", cap=3000)
+    response = await complete_prompt_async(build_dual_solution_prompt(question, language), None, on_token, max_tokens)
+    solution = None if response.startswith("Error") else parse_dual_response(response, language)
+    if solution is None:
+        dual_stats.count('unparseable')
+        logging.info(f"Dual-language answer unusable, solving each language separately: {question[:50]}...")
+        return None
+    if not is_consistent(solution):
+        dual_stats.count('inconsistent')
+        logging.info(f"Dual-language programs print different text, solving separately: {question[:50]}...")
+        return None
+    dual_stats.count('used')
+    
+    def cache_both():
+        cache_solution(question, language, solution.code)
+        cache_solution(question, "python", solution.python)
+    
+    await asyncio.shield(asyncio.get_running_loop().run_in_executor(None, cache_both))
+    return {'display': solution.code, 'python': solution.python, 'expected_output': solution.expected_output}
+
+def solve_coding_problem(question, language="python", on_token=None):
+    """Blocking wrapper around solve_coding_problem_async for sync callers"""
+    return solve_engine.run(solve_coding_problem_async(question, language, on_token))
+
+async def solve_coding_problem_async(question, language="python", on_token=None):
+    """Solve one question, sharing a batched request with other short questions when batching is on"""
+    if prompt_batcher and prompt_batcher.eligible(question):
+        solution = await prompt_batcher.solve(question, language)
+        if solution:
+            return solution
+        logging.info(f"Batched answer unusable, solving individually: {question[:50]}...")
+
+    # Size the token budget to the question so long programs are not cut off mid-code
+    return await complete_prompt_async(build_solution_prompt(question, language), language, on_token,
+                                       max_tokens=estimate_max_tokens(question, language))
+
+async def solve_coding_batch_async(questions, language="python"):
+    """Solve several short questions with one request; None entries need a per-question retry"""
+    prompt = build_batch_solution_prompt(questions, language)
+    max_tokens = min(BATCH_MAX_TOKENS_PER_QUESTION * len(questions), BATCH_MAX_TOKENS)
+    response = await complete_prompt_async(prompt, None, max_tokens=max_tokens)
+    if response.startswith("Error"):
+        return [None] * len(questions)
+    return parse_batch_response(response, len(questions), language)
+
+async def complete_prompt_async(prompt, language="python", on_token=None, max_tokens=None):
+    """Intelligent API selection with load balancing between Claude and DeepSeek
+
+    The provider with the best expected completion time (provider_router)
+    goes first and the other one hedges and backs it up. Code that was cut
+    off is completed with continuation requests instead of a full re-solve.
+    language=None returns the raw response text instead of extracted code.
+    """
+    content, completion = await complete_prompt_once_async(prompt, language, on_token, max_tokens)
+    if completion and is_truncated(completion['text'], language, completion['stop_reason']):
+        return await continue_truncated_async(prompt, completion, language, on_token, max_tokens)
+    return content
+
+async def continue_truncated_async(prompt, completion, language, on_token=None, max_tokens=None):
+    """Resume truncated code from where it stopped (up to CONTINUATION_MAX_ROUNDS requests)"""
+    continuation_stats.count('truncated')
+    partial = partial_code(completion['text'])
+    logging.info(f"✂️ {completion['provider']} response truncated ({completion['stop_reason'] or 'unbalanced code'}) "
+                 f"after {len(partial)} chars; requesting a continuation")
+    
+    for round_number in range(CONTINUATION_MAX_ROUNDS):
+        continuation_stats.count('continuations')
+        _, completion = await complete_prompt_once_async(
+            continuation_prompt(prompt, partial, language), None, on_token, max_tokens
+        )
+        if not completion:
+            break  # Both providers failed; return the best code we have
+        partial = merge_continuation(partial, completion['text'])
+        if is_complete_code(partial, language):
+            continuation_stats.count('completed')
+            logging.info(f"✅ Truncated code completed after {round_number + 1} continuation(s)")
+            return partial.strip()
+        if completion['stop_reason'] not in TRUNCATION_STOP_REASONS:
+            break  # The model finished; more rounds will not balance the code
+    
+    continuation_stats.count('incomplete')
+    logging.warning("Continuation did not complete the code; using the partial code")
+    return partial.strip()
+
+async def complete_prompt_once_async(prompt, language="python", on_token=None, max_tokens=None):
+    """One answer from the best provider: (content, completion details or None on failure)"""
     # INTELLIGENT API SELECTION LOGIC
-    claude_available_keys = claude_manager.get_available_keys_count()
-    deepseek_available_keys = len([i for i in range(len(DEEPSEEK_KEYS)) 
-                                  if deepseek_manager.key_stats[i]['rate_limited_until'] < time.time()])
+    def select_providers():
+        counts = {name: manager.get_available_keys_count() for name, manager in PROVIDER_SCHEDULERS.items()}
+        return counts, provider_router.rank(PROVIDER_SCHEDULERS)
     
-    # Decision logic: Use Claude if available, otherwise use DeepSeek
-    use_claude_first = claude_available_keys > 0
+    if key_state_backend.shared:
+        # Cooldowns are read from Redis: keep the round-trips off the solve-engine loop
+        available_keys, (primary, secondary) = await asyncio.get_running_loop().run_in_executor(None, select_providers)
+    else:
+        available_keys, (primary, secondary) = select_providers()
     
-    logging.info(f"API Selection: Claude available keys: {claude_available_keys}, DeepSeek available keys: {deepseek_available_keys}")
+    logging.info(f"API Selection: {primary} first (available keys: {available_keys}, "
+                 f"expected: {provider_router.expected_seconds(primary):.1f}s vs {provider_router.expected_seconds(secondary):.1f}s)")
     
-    if use_claude_first:
-        # Try Claude API with smart key selection
-        try:
-            key_index, claude_key = claude_manager.get_best_available_key()
-            if claude_key:
-                logging.info(f"Using Claude API key {key_index + 1}/{len(CLAUDE_KEYS)} (Smart selection)")
-                result = try_claude_api(prompt, claude_key, key_index)
-                logging.info(f"✅ Claude API key {key_index + 1} succeeded")
-                return result
-        except Exception as e:
-            logging.warning(f"Claude API attempt failed: {str(e)}")
-            # Fall through to DeepSeek
+    async def call(provider, last_resort=False):
+        completion = {}
+        if provider == 'claude':
+            # As a last resort only take a Claude key that is free right now
+            content = await try_claude_api_async(prompt, language, on_token, max_tokens,
+                                                 wait=0 if last_resort else None, completion=completion)
+        else:
+            content = await try_deepseek_api_async(prompt, language=language, on_token=on_token,
+                                                   max_tokens=max_tokens, completion=completion)
+        return content, completion
+    
+    secondary_hedged = False
     
-    # Try DeepSeek as primary or fallback
-    logging.info("Using DeepSeek API (primary choice or Claude fallback)")
+    async def hedge_with_secondary():
+        nonlocal secondary_hedged
+        secondary_hedged = True
+        return await call(secondary)
+    
+    # Try the primary provider, racing the secondary if the primary is slower than its recent p90
     try:
-        result = try_deepseek_api(prompt)
-        logging.info("✅ DeepSeek API succeeded")
+        if request_hedger:
+            result = await request_hedger.run(
+                primary, lambda: call(primary),
+                secondary, hedge_with_secondary if available_keys[secondary] else None
+            )
+        else:
+            result = await call(primary)
+        logging.info(f"✅ {'Hedged request' if secondary_hedged else primary + ' API'} succeeded")
         return result
     except Exception as e:
-        logging.error(f"DeepSeek API failed: {str(e)}")
-        
-        # Last resort: Try any remaining Claude keys if DeepSeek failed
-        if not use_claude_first:
-            logging.info("Attempting Claude as last resort after DeepSeek failure")
-            try:
-                key_index, claude_key = claude_manager.get_best_available_key()
-                if claude_key:
-                    logging.info(f"Last resort: Using Claude API key {key_index + 1}")
-                    result = try_claude_api(prompt, claude_key, key_index)
-                    logging.info(f"✅ Claude API (last resort) succeeded")
-                    return result
-            except Exception as claude_e:
-                logging.error(f"Claude last resort also failed: {str(claude_e)}")
-        
-        return f"Error: All API attempts failed. Both Claude and DeepSeek are currently unavailable."
+        logging.warning(f"{primary} API attempt failed: {str(e)}")
+        if secondary_hedged:
+            # The secondary already ran (and failed) as the hedge; don't repeat it
+            return f"Error: All API attempts failed. Both Claude and DeepSeek are currently unavailable.", None
+    
+    # Fall back to the other provider
+    logging.info(f"Falling back to {secondary} API")
+    try:
+        result = await call(secondary, last_resort=not available_keys[secondary])
+        logging.info(f"✅ {secondary} API (fallback) succeeded")
+        return result
+    except Exception as e:
+        logging.error(f"{secondary} API fallback also failed: {str(e)}")
+        return f"Error: All API attempts failed. Both Claude and DeepSeek are currently unavailable.", None
 
 
 def execute_code(code):
+    """Run generated Python code and return its output, or an "Error executing code: ..." string
+
+    Runs in the sandbox pool (separate processes with time, CPU and memory
+    limits, cwd in a per-run directory with mock files); falls back to one
+    fresh interpreter per run where the pool is unavailable.
+    """
+    if sandbox_pool is None:
+        return run_isolated(code)
     try:
-        if code.startswith("Error") or not code:
-            return f"Invalid code returned: {code}"
-        logging.debug(f"Executing code:\n{code}")
-        output = io.StringIO()
-        context = {'__name__': '__main__', '__file__': 'task.py'}
-        
-        # Check if code involves file operations and set up mock environment
-        file_operations = ['open(', 'os.listdir', 'os.walk', 'glob.glob', 'pathlib', 'os.path.exists', 'os.path.isfile', 'os.path.isdir', 'with open']
-        has_file_ops = any(op in code for op in file_operations)
-        
-        if has_file_ops:
-            # Set up mock file system context
-            context.update({
-                'os': __import__('os'),
-                'glob': __import__('glob'),
-                'pathlib': __import__('pathlib'),
-                'tempfile': __import__('tempfile'),
-            })
-            
-            # Create temporary directory with mock files for testing
-            import tempfile, os
-            temp_dir = tempfile.mkdtemp()
-            
-            # Create some mock files with different extensions and content
-            mock_files = [
-                ('document1.txt', 'This is a sample text document with some content.'),
-                ('data.csv', 'name,age,city\nJohn,25,New York\nJane,30,London\nBob,35,Paris'),
-                ('config.json', '{"database": "localhost", "port": 5432, "debug": true}'),
-                ('script.py', 'print("Hello from Python script")\nresult = 42\nprint(f"Result: {result}")'),
-                ('readme.md', '# Project Title\nThis is a sample markdown file.\n## Features\n- Feature 1\n- Feature 2'),
-                ('log.txt', 'INFO: Application started\nWARNING: Connection timeout\nERROR: Database connection failed'),
-                ('numbers.txt', '1\n2\n3\n4\n5\n6\n7\n8\n9\n10'),
-                ('words.txt', 'apple\nbanana\ncherry\ndate\nelderberry\nfig\ngrape'),
-            ]
-            
-            # Create subdirectories
-            os.makedirs(os.path.join(temp_dir, 'subfolder'), exist_ok=True)
-            os.makedirs(os.path.join(temp_dir, 'data'), exist_ok=True)
-            
-            for filename, content in mock_files:
-                filepath = os.path.join(temp_dir, filename)
-                with open(filepath, 'w', encoding='utf-8') as f:
-                    f.write(content)
-            
-            # Create files in subdirectories too
-            with open(os.path.join(temp_dir, 'subfolder', 'nested.txt'), 'w') as f:
-                f.write('This is a nested file in subfolder.')
-            with open(os.path.join(temp_dir, 'data', 'dataset.csv'), 'w') as f:
-                f.write('id,value\n1,100\n2,200\n3,300')
-            
-            # Modify code to work with the temporary directory
-            # Replace common directory references with our temp directory
-            temp_dir_escaped = temp_dir.replace('\\', '\\\\')
-            modified_code = code.replace('"/"', f'"{temp_dir_escaped}"')
-            modified_code = modified_code.replace("'/'", f"'{temp_dir_escaped}'")
-            modified_code = modified_code.replace('"./"', f'"{temp_dir_escaped}"')
-            modified_code = modified_code.replace("'./'", f"'{temp_dir_escaped}'")
-            
-            # Fix the glob pattern replacements
-            temp_glob_double = os.path.join(temp_dir, "*.").replace('\\', '\\\\')
-            temp_glob_single = os.path.join(temp_dir, '*.').replace('\\', '\\\\')
-            modified_code = modified_code.replace('"*.', f'"{temp_glob_double}')
-            modified_code = modified_code.replace("'*.", f"'{temp_glob_single}")
-            
-            # Add cleanup at the end
-            cleanup_code = f"""
-# Cleanup temporary files
-import shutil
-try:
-    shutil.rmtree(r"{temp_dir}")
-except:
-    pass
-"""
-            modified_code = modified_code + cleanup_code
-            
-        else:
-            # Modified code to ensure output is generated
-            modified_code = code
-        
-        # If code doesn't have print statements, try to add them for common patterns
-        if 'print(' not in code.lower():
-            lines = code.strip().split('\n')
-            last_line = lines[-1].strip() if lines else ''
-            
-            # Check if last line is an expression that could be printed
-            if last_line and not any(keyword in last_line.lower() for keyword in ['if ', 'for ', 'while ', 'def ', 'class ', 'import ', '#', 'try:', 'except:', 'finally:']):
-                # If last line looks like a variable or expression, add print
-                if '=' not in last_line or last_line.count('=') == 1 and not any(op in last_line for op in ['==', '!=', '<=', '>=']):
-                    # This might be an assignment or expression - let's try to print it
-                    if '=' in last_line:
-                        # It's an assignment, print the variable
-                        var_name = last_line.split('=')[0].strip()
-                        modified_code += f"\nprint({var_name})"
-                    else:
-                        # It's an expression, print it directly
-                        modified_code += f"\nprint({last_line})"
-        
-        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
-            try:
-                exec(modified_code, context, context)
-            except NameError as e:
-                missing_var = str(e).split("'")[1] if "'" in str(e) else "variable"
-                if missing_var == "__name__":
-                    modified_code = f'__name__ = "__main__"\n' + modified_code
-                else:
-                    modified_code = f"{missing_var} = 0\n" + modified_code
-                try:
-                    exec(modified_code, context, context)
-                except Exception as e_inner:
-                    # If modified code fails, try original code
-                    try:
-                        exec(code, context, context)
-                    except:
-                        raise e_inner
-            except Exception as e_inner:
-                # If modified code fails, try original code
-                try:
-                    exec(code, context, context)
-                except:
-                    raise e_inner
-        
-        result = output.getvalue().strip()
-        
-        # If still no output, try to find and print meaningful variables
-        if not result:
-            # Look for variables that might contain results
-            meaningful_vars = []
-            for var_name, var_value in context.items():
-                if not var_name.startswith('__') and var_name not in ['io', 'contextlib', 'sys']:
-                    # Skip functions and modules
-                    if not callable(var_value) and not str(type(var_value)).startswith('<class \'module'):
-                        meaningful_vars.append(f"{var_name} = {var_value}")
-            
-            if meaningful_vars:
-                result = "\n".join(meaningful_vars[:5])  # Limit to first 5 variables
-            else:
-                # Last resort: try to execute and capture any return value
-                try:
-                    # Check if the code is a single expression that returns a value
-                    if '\n' not in code.strip() and not any(keyword in code.lower() for keyword in ['def ', 'class ', 'import ', 'for ', 'while ', 'if ']):
-                        try:
-                            result_value = eval(code, context)
-                            if result_value is not None:
-                                result = str(result_value)
-                        except:
-                            pass
-                except:
-                    pass
-        
-        return result if result else "Code executed successfully but produced no visible output. This is normal for some programs that don't print results."
+        return sandbox_pool.execute(code)
     except Exception as e:
         logging.exception(f"Error executing code: {e}")
         return f"Error executing code: {e}"
-    
-import os
-import io
-import logging
-from PIL import Image, ImageDraw, ImageFont
+
 
 def create_screenshot(output_text, user_name='Developer', document_terminal_path=None, style='vscode', language='python'):
     """Create a VS Code Windows terminal-style screenshot of code output"""
@@ -2823,40 +2836,13 @@ def execute_csharp_code(code):
     import subprocess
     import shutil
     import uuid
-    import re
 
-    # Normalize C# source to compile cleanly and produce visible output when needed
-    def _massage_csharp(src: str) -> str:
+    # Warm compile host / pre-restored template: compile and run in well under a second
+    if csharp_runner is not None:
         try:
-            s = src or ""
-            # Ensure essential using directives
-            if "using System;" not in s:
-                s = "using System;\n" + s
-            if ("ArrayList" in s or "Hashtable" in s) and "using System.Collections;" not in s:
-                s = "using System.Collections;\n" + s
-            if (("List<" in s) or ("Dictionary<" in s)) and "using System.Collections.Generic;" not in s:
-                s = "using System.Collections.Generic;\n" + s
-            # Add System.IO when file-related APIs are detected
-            file_tokens = ["FileInfo", "Directory", "DirectoryInfo", "File.", "Path."]
-            if any(tok in s for tok in file_tokens) and "using System.IO;" not in s:
-                s = "using System.IO;\n" + s
-            # Ensure a Main entrypoint
-            if "static void Main" not in s:
-                s = "class Program {\n    static void Main() {\n" + s + "\n    }\n}\n"
-            # Ensure at least one print inside Main
-            if "Console.WriteLine" not in s:
-                try:
-                    s = re.sub(
-                        r'(static\s+void\s+Main\s*\([^\)]*\)\s*\{)',
-                        r'\1\n        Console.WriteLine("Program started...");',
-                        s,
-                        count=1
-                    )
-                except Exception:
-                    pass
-            return s
-        except Exception:
-            return src
+            return csharp_runner.run(code)
+        except Exception as e:
+            logging.warning(f"⚠️ C# runner failed ({e}); falling back to dotnet new/build/run")
 
     # Use the app's temp folder
     try:
@@ -2892,7 +2878,7 @@ def execute_csharp_code(code):
         # Write Program.cs with the generated solution code
         cs_file = os.path.join(cs_project_dir, "Program.cs")
         try:
-            code_to_write = _massage_csharp(code)
+            code_to_write = prepare_csharp_source(code)
             with open(cs_file, "w", encoding="utf-8") as f:
                 f.write(code_to_write)
         except Exception as e:
@@ -2948,7 +2934,7 @@ def execute_csharp_code(code):
     # Compile via csc
     cs_file = os.path.join(temp_dir, "Solution.cs")
     try:
-        code_to_write = _massage_csharp(code)
+        code_to_write = prepare_csharp_source(code)
         with open(cs_file, "w", encoding="utf-8") as f:
             f.write(code_to_write)
     except Exception as e:
@@ -3000,43 +2986,346 @@ def execute_csharp_code(code):
     return combined_output
 
 
-def process_question(q, language, user_name='Developer', document_terminal_path=None, screenshot_style='vscode'):
-    """Process a coding question and generate solution with screenshot
+async def solve_question_async(q, language, on_token=None):
+    """Generate every solution a question needs (provider I/O only)
+
+    Returns a dict with the display solution and, for languages whose output is
+    produced by a Python twin, the Python solution (or the exception raised).
+    on_token(chars_received) reports streaming progress of the display solution.
+    """
+    lang_key = (language or "").strip().lower()
+    if language == "python" or lang_key in ("c#", "csharp"):
+        solve_language = "python" if language == "python" else "c#"
+        return {'display': await get_cached_solution_async(q, solve_language, on_token)}
+
+    # A local toolchain runs the display code itself: no Python twin needed
+    if exec_backends is not None and exec_backends.get(language) is not None:
+        return {'display': await get_cached_solution_async(q, language, on_token)}
+
+    # Other non-Python languages: display code plus a Python twin for the output, from one request if possible
+    def stored_pair():
+        return (solution_cache.get(q, language) or corpus_solution(q, language),
+                solution_cache.get(q, "python") or corpus_solution(q, "python"))
     
-    Args:
-        q: The coding question
-        language: Programming language
-        user_name: User name for terminal display
-        document_terminal_path: Terminal path for display
-        screenshot_style: Screenshot style ('vscode', 'mac', 'simple')
+    cached_display, cached_python = await asyncio.get_running_loop().run_in_executor(None, stored_pair)
+    if DUAL_LANGUAGE_ENABLED and cached_display is None and cached_python is None:
+        def cached_pair():
+            display, python_twin = solution_cache.get(q, language), solution_cache.get(q, "python")
+            return {'display': display, 'python': python_twin} if display and python_twin else None
+        
+        solutions = await singleflight.run("dual:" + solution_cache.key_for(q, language),
+                                           lambda: solve_dual_language_async(q, language, on_token),
+                                           lookup=cached_pair)
+        if solutions:
+            return solutions
+    
+    display, python_twin = await asyncio.gather(
+        get_cached_solution_async(q, language, on_token),
+        get_cached_solution_async(q, "python"),
+        return_exceptions=True
+    )
+    if isinstance(display, Exception):
+        raise display
+    return {'display': display, 'python': python_twin}
+
+
+def finish_question(q, language, solutions, user_name='Developer', document_terminal_path=None, screenshot_style='vscode', output=None):
+    """Execute the generated code and render the screenshot (blocking)"""
+    sol_display, output = run_solutions(q, language, solutions, output)
+    return sol_display, create_screenshot(output, user_name, document_terminal_path, screenshot_style, language)
+
+
+def record_corpus_solution(q, language, code, output, validated=None):
+    """Keep a solution and the output it printed in the corpus (validated if it ran cleanly)
+
+    validated=False records code that did not itself produce output (it is kept, never served).
+    """
+    if not solution_corpus:
+        return
+    if validated is None:
+        validated = looks_successful(code, output)
+    try:
+        solution_corpus.record_solution(q, language, code, output, validated=validated)
+    except Exception as e:
+        logging.warning(f"Solution corpus update failed: {e}")
+
+
+def record_corpus_questions(questions, language):
+    """Count uploaded questions towards the corpus' frequency and coverage figures"""
+    if not solution_corpus:
+        return
+    try:
+        solution_corpus.record_questions(questions, language)
+    except Exception as e:
+        logging.warning(f"Solution corpus update failed: {e}")
+
+
+def run_cached(language, code, execute):
+    """Output of code from the execution cache, else execute(code) (and cache the result)"""
+    if execution_cache is None:
+        return execute(code)
+    return execution_cache.run(language, code, execute)
+
+
+async def repair_solution_async(question, code, error):
+    """Ask for a fix of one specific problem in generated Python; None if no usable answer came back"""
+    repair_stats.count('repair_requests')
+    repaired = await complete_prompt_async(repair_prompt(question, code, error), "python",
+                                           max_tokens=estimate_max_tokens(question, "python"))
+    if not repaired or repaired.startswith("Error") or repaired.strip() == code.strip():
+        return None
+    return repaired
+
+
+def run_python_solution(q, code):
+    """Pre-flight and run generated Python, repairing unusable code within the question's budget
+
+    Returns (code, output); the code is the repaired program when a repair
+    was used, and is cached in place of the broken one once it runs cleanly.
+    Code still failing when the budget is spent runs as it is.
+    """
+    repair_stats.count('checked')
+    budget = RepairBudget(REPAIR_MAX_ATTEMPTS, REPAIR_BUDGET_SECONDS)
+    while True:
+        issues = preflight(code)
+        if issues:
+            repair_stats.count_issues(issues)
+            output, error = None, describe_issues(issues)
+        else:
+            output = run_cached("python", code, execute_code)
+            error = execution_error(output)
+            if error is not None:
+                repair_stats.count('runtime_failures')
+        if error is None or not budget.allows_repair():
+            break
+        budget.spend()
+        logging.info(f"🔧 Requesting a repair ({error.splitlines()[0][:80]}): {q[:50]}...")
+        repaired = solve_engine.run(repair_solution_async(q, code, error))
+        if repaired is None:
+            break
+        code = repaired
+
+    if output is None:
+        output = run_cached("python", code, execute_code)
+        error = execution_error(output)
+    if budget.attempts:
+        repair_stats.count('repaired' if error is None else 'unrepaired')
+        if error is None:
+            cache_solution(q, "python", code)
+    return code, output
+
+
+def runs_display_code(language):
+    """Whether the display program itself is executed (otherwise its output comes from the Python twin)"""
+    lang_key = (language or "").strip().lower()
+    if lang_key in ("python", "c#", "csharp"):
+        return True
+    return exec_backends is not None and exec_backends.get(language) is not None
+
+
+def run_solutions(q, language, solutions, output=None):
+    """Execute the generated code, returning (display solution, output) (blocking)
+
+    output is the already-captured output of a C# display program (document batch runs).
     """
     if language == "python":
-        sol = solve_coding_problem(q, "python")
-        output = execute_code(sol)
-        return sol, create_screenshot(output, user_name, document_terminal_path, screenshot_style, language)
+        sol, output = run_python_solution(q, solutions['display'])
+        record_corpus_solution(q, language, sol, output)
+        return sol, output
     else:
         # Handle C# specially: execute the generated C# code for real dynamic output
         lang_key = (language or "").strip().lower()
         if lang_key in ("c#", "csharp"):
-            sol_display = solve_coding_problem(q, "c#")
+            sol_display = solutions['display']
             try:
-                output = execute_csharp_code(sol_display)
+                if output is None:
+                    output = run_cached("c#", sol_display, execute_csharp_code)
+                record_corpus_solution(q, language, sol_display, output)
                 if not output:
                     output = "Program executed successfully but produced no visible output."
             except Exception:
                 output = "Program executed successfully but produced no visible output."
-            return sol_display, create_screenshot(output, user_name, document_terminal_path, screenshot_style, language)
+            return sol_display, output
         
-        # Default behavior for other non-Python languages:
-        sol_display = solve_coding_problem(q, language)
+        # C/C++/Java/JavaScript with a local toolchain: run the displayed program itself
+        backend = exec_backends.get(language) if exec_backends is not None else None
+        if backend is not None:
+            sol_display = solutions['display']
+            try:
+                output = run_cached(language, sol_display, backend.run)
+            except Exception as e:
+                logging.exception(f"{backend.display_name} backend failed")
+                output = f"Error executing code: {e}"
+            record_corpus_solution(q, language, sol_display, output)
+            return sol_display, output
+
+        # Other non-Python languages: the output comes from the Python twin
+        sol_display = solutions['display']
+        # Output the model expects from a dual-language answer, used if the twin cannot run
+        expected_output = solutions.get('expected_output')
+        fallback_output = expected_output or "Program executed successfully.\nOutput displayed here."
         try:
-            sol_python = solve_coding_problem(q, "python")
-            output = execute_code(sol_python)
+            sol_python = solutions.get('python')
+            if isinstance(sol_python, Exception) or not sol_python:
+                raise RuntimeError("Python twin unavailable")
+            sol_python, output = run_python_solution(q, sol_python)
+            # The twin ran, the display program did not: only the twin can be validated by this output
+            record_corpus_solution(q, "python", sol_python, output)
+            record_corpus_solution(q, language, sol_display, output, validated=False)
             if "Error executing code" in output or not output:
-                output = "Program executed successfully.\nOutput displayed here."
+                output = fallback_output
+            elif expected_output is not None:
+                # Consistency check: the twin's real output should match what the model expects
+                matched = outputs_match(expected_output, output)
+                dual_stats.count('output_matched' if matched else 'output_mismatched')
+                if not matched:
+                    logging.info(f"Python twin output differs from the expected output for: {q[:50]}...")
         except Exception:
-            output = "Program executed successfully.\nOutput displayed here."
-        return sol_display, create_screenshot(output, user_name, document_terminal_path, screenshot_style, language)
+            output = fallback_output
+        return sol_display, output
+
+
+def prepare_executor(language):
+    """Warm the language's compiler in this process while its questions are being solved
+
+    Never done at import: gunicorn --preload forks workers from the importing
+    process, which must not be in the middle of a build or daemon start then.
+    """
+    if (language or "").strip().lower() in ("c#", "csharp"):
+        if csharp_runner is not None:
+            csharp_runner.start_background_prepare()
+    elif exec_backends is not None:
+        exec_backends.start_background_prepare(language)
+
+
+def process_question(q, language, user_name='Developer', document_terminal_path=None, screenshot_style='vscode'):
+    """Process a coding question and generate solution with screenshot
+    
+    Args:
+        q: The coding question
+        language: Programming language
+        user_name: User name for terminal display
+        document_terminal_path: Terminal path for display
+        screenshot_style: Screenshot style ('vscode', 'mac', 'simple')
+    """
+    record_corpus_questions([q], language)
+    prepare_executor(language)
+    solutions = solve_engine.run(solve_question_async(q, language))
+    return finish_question(q, language, solutions, user_name, document_terminal_path, screenshot_style)
+
+
+def prewarm_solution_corpus(limit=50, min_count=2):
+    """Solve, execute and cache the most frequent questions the corpus has no validated answer for
+
+    Run nightly (Celery beat: tasks.prewarm_solution_corpus) or from
+    POST /admin/corpus/prewarm so the first upload of a semester hits the cache.
+    """
+    if not solution_corpus:
+        return {'enabled': False}
+
+    def solve(question, language):
+        # get_cached_solution_async (inside solve_question_async) fills the solution cache
+        solutions = solve_engine.run(solve_question_async(question, language))
+        code, output = run_solutions(question, language, solutions)
+        # The Python twin's output does not validate a display program that never ran
+        return (code, output) if runs_display_code(language) else (code, None)
+
+    return prewarm(solution_corpus, solve, limit=limit, min_count=min_count)
+
+
+def process_questions(questions, language, user_name='Developer', document_terminal_path=None, screenshot_style='vscode', on_progress=None, on_stream=None):
+    """Process all questions of a document concurrently, returning (solution, screenshot) pairs in order
+
+    Provider calls for every question are issued together on the solve engine's
+    event loop (capped by SOLVE_ENGINE_MAX_INFLIGHT); execution and screenshots
+    run on global_executor. on_progress(completed_count, question_index, solution)
+    is called after each question finishes and on_stream(question_index, chars_received)
+    while its solution is streaming. A failed question yields an error
+    solution and an empty screenshot instead of failing the document.
+    """
+    record_corpus_questions(questions, language)
+    prepare_executor(language)
+
+    def token_progress(index):
+        if on_stream is None:
+            return None
+        # Token callbacks fire on the engine loop; socket emits belong on the worker pool
+        return lambda chars: global_executor.submit(on_stream, index, chars)
+
+    def solve(item):
+        index, q = item
+        return solve_question_async(q, language, token_progress(index))
+
+    def finish(item, solutions):
+        return finish_question(item[1], language, solutions, user_name, document_terminal_path, screenshot_style)
+
+    def on_error(item, e):
+        return f"Error: Failed to generate solution - {str(e)}", b""
+
+    def on_result(completed, index, result):
+        logging.debug(f"Completed question {index + 1}/{len(questions)}: {questions[index][:50]}...")
+        if on_progress:
+            on_progress(completed, index, result[0])
+
+    if csharp_runner is not None and CSHARP_DOCUMENT_BATCH and len(questions) > 1 \
+            and (language or "").strip().lower() in ("c#", "csharp"):
+        return process_csharp_document(questions, language, solve, on_error, on_result,
+                                       user_name, document_terminal_path, screenshot_style)
+
+    return solve_engine.solve_all(
+        list(enumerate(questions)),
+        solve,
+        finish,
+        global_executor,
+        on_result=on_result,
+        on_error=on_error
+    )
+
+
+def process_csharp_document(questions, language, solve, on_error, on_result, user_name='Developer',
+                            document_terminal_path=None, screenshot_style='vscode'):
+    """C# documents: solve every question, compile all the programs in one pass, then run and screenshot
+
+    Execution waits for the last solution, but each program is one process start
+    (~0.1s) instead of its own build. A program that does not compile is run (and
+    reported) on its own.
+    """
+    items = list(enumerate(questions))
+    solved = solve_engine.solve_all(items, solve, lambda item, solutions: solutions, global_executor,
+                                    on_error=lambda item, e: e)
+    batched = [index for index, solutions in enumerate(solved) if not isinstance(solutions, Exception)]
+    try:
+        codes = [solved[index]['display'] for index in batched]
+        if execution_cache is not None:
+            outputs = dict(zip(batched, execution_cache.run_many("c#", codes, csharp_runner.run_many)))
+        else:
+            outputs = dict(zip(batched, csharp_runner.run_many(codes)))
+        logging.info(f"⚡ Ran {len(batched)} C# programs (cached outputs, the rest from one batch compile)")
+    except Exception as e:
+        logging.warning(f"⚠️ C# batch run failed ({e}); running programs one by one")
+        outputs = {}
+
+    def finish_one(index):
+        item = items[index]
+        if isinstance(solved[index], Exception):
+            return on_error(item, solved[index])
+        try:
+            return finish_question(item[1], language, solved[index], user_name, document_terminal_path,
+                                   screenshot_style, outputs.get(index))
+        except Exception as e:
+            logging.error(f"Error processing question {index + 1}: {e}")
+            return on_error(item, e)
+
+    results = [None] * len(items)
+    futures = {global_executor.submit(finish_one, index): index for index in range(len(items))}
+    for completed, future in enumerate(concurrent.futures.as_completed(futures), start=1):
+        index = futures[future]
+        results[index] = future.result()
+        try:
+            on_result(completed, index, results[index])
+        except Exception as e:
+            logging.warning(f"Progress callback failed: {e}")
+    return results
 
 
 # ----- Routes -----
@@ -3346,84 +3635,31 @@ def upload_pdf():
 
         logging.info(f"Assigned terminal path for document {task_id}: {document_terminal_path}")
         
-        # FIXED: Sequential processing to prevent Claude API concurrent connection issues
-        # Check if we should use sequential processing for Claude API calls
-        claude_available = claude_manager.get_available_keys_count() > 0
-        completed_questions = 0
+        # Fan all questions out on the solve engine; results come back in question order
+        def on_question_done(completed_questions, question_index, solution):
+            question_progress = 30 + (completed_questions / len(questions)) * 50  # 30% to 80%
+            progress_data.update({
+                'stage': 'ai_processing',
+                'stage_name': f'Processing questions ({completed_questions}/{len(questions)})...',
+                'progress': int(question_progress),
+                'elapsed_time': time.time() - start_time,
+                'questions_completed': completed_questions
+            })
+            emit_progress_update(task_id, progress_data)
+        
+        def on_question_stream(question_index, chars_received):
+            progress_data.update({
+                'streaming': {'question': question_index + 1, 'chars_received': chars_received},
+                'elapsed_time': time.time() - start_time
+            })
+            emit_progress_update(task_id, progress_data)
         
-        if claude_available and len(questions) > 3:
-            # Sequential processing for better Claude API compliance
-            logging.info(f"Using sequential processing for {len(questions)} questions to prevent Claude API concurrent connection issues")
-            
-            for question_index, q in enumerate(questions):
-                try:
-                    # Process question sequentially
-                    sol, scr = process_question(q, language, user_name, document_terminal_path, screenshot_style)
-                    
-                    # Store solution and screenshot at the correct index to maintain order
-                    solutions_display[question_index] = sol
-                    screenshots[question_index] = scr
-                    completed_questions += 1
-                    
-                    # Update progress for each completed question
-                    question_progress = 30 + (completed_questions / len(questions)) * 50  # 30% to 80%
-                    progress_data.update({
-                        'stage': 'ai_processing',
-                        'stage_name': f'Processing questions ({completed_questions}/{len(questions)})...',
-                        'progress': int(question_progress),
-                        'elapsed_time': time.time() - start_time,
-                        'questions_completed': completed_questions
-                    })
-                    emit_progress_update(task_id, progress_data)
-                    
-                    logging.debug(f"Completed question {question_index + 1}/{len(questions)}: {q[:50]}...")
-                    
-                except Exception as e:
-                    logging.error(f"Error processing question {question_index + 1}: {e}")
-                    # Store error message while maintaining order
-                    solutions_display[question_index] = f"Error: Failed to generate solution - {str(e)}"
-                    screenshots[question_index] = b""  # Empty screenshot for failed questions
-                    completed_questions += 1
-        else:
-            # Concurrent processing for DeepSeek or small question sets
-            logging.info(f"Using concurrent processing for {len(questions)} questions")
-            
-            # Create futures with their corresponding question indices to prevent shuffling
-            futures_with_indices = [
-                (i, global_executor.submit(process_question, q, language, user_name, document_terminal_path, screenshot_style))
-                for i, q in enumerate(questions)
-            ]
-            
-            # Process completed futures while maintaining original question order
-            for question_index, future in futures_with_indices:
-                try:
-                    # Wait for this specific future to complete
-                    sol, scr = future.result()
-                    
-                    # Store solution and screenshot at the correct index to maintain order
-                    solutions_display[question_index] = sol
-                    screenshots[question_index] = scr
-                    completed_questions += 1
-                    
-                    # Update progress for each completed question
-                    question_progress = 30 + (completed_questions / len(questions)) * 50  # 30% to 80%
-                    progress_data.update({
-                        'stage': 'ai_processing',
-                        'stage_name': f'Processing questions ({completed_questions}/{len(questions)})...',
-                        'progress': int(question_progress),
-                        'elapsed_time': time.time() - start_time,
-                        'questions_completed': completed_questions
-                    })
-                    emit_progress_update(task_id, progress_data)
-                    
-                    logging.debug(f"Completed question {question_index + 1}/{len(questions)}: {questions[question_index][:50]}...")
-                    
-                except Exception as e:
-                    logging.error(f"Error processing question {question_index + 1}: {e}")
-                    # Store error message while maintaining order
-                    solutions_display[question_index] = f"Error: Failed to generate solution - {str(e)}"
-                    screenshots[question_index] = b""  # Empty screenshot for failed questions
-                    completed_questions += 1
+        logging.info(f"Solving {len(questions)} questions concurrently via solve engine")
+        results = process_questions(questions, language, user_name, document_terminal_path, screenshot_style,
+                                    on_progress=on_question_done, on_stream=on_question_stream)
+        for question_index, (sol, scr) in enumerate(results):
+            solutions_display[question_index] = sol
+            screenshots[question_index] = scr
         
         # Update progress: Document generation
         progress_data.update({
@@ -4287,17 +4523,8 @@ def manual_solve():
             screenshot_style = 'vscode'
         logging.info(f"Using screenshot style: {screenshot_style} for manual solve")
 
-        # Process each question with progress updates
-        futures = [global_executor.submit(process_question, q, language, user_name, document_terminal_path, screenshot_style) for q in questions]
-        completed_questions = 0
-
-        for future in concurrent.futures.as_completed(futures):
-            sol, scr = future.result()
-            solutions_display.append(sol)
-            screenshots.append(scr)
-            completed_questions += 1
-
-            # Update progress for each completed question
+        # Process each question with progress updates (results are returned in question order)
+        def on_question_done(completed_questions, question_index, solution):
             question_progress = 25 + (completed_questions / len(questions)) * 60  # 25% to 85%
             progress_data.update({
                 'stage': 'ai_processing',
@@ -4307,6 +4534,18 @@ def manual_solve():
                 'questions_completed': completed_questions
             })
             emit_progress_update(task_id, progress_data)
+
+        def on_question_stream(question_index, chars_received):
+            progress_data.update({
+                'streaming': {'question': question_index + 1, 'chars_received': chars_received},
+                'elapsed_time': time.time() - start_time
+            })
+            emit_progress_update(task_id, progress_data)
+
+        for sol, scr in process_questions(questions, language, user_name, document_terminal_path, screenshot_style,
+                                          on_progress=on_question_done, on_stream=on_question_stream):
+            solutions_display.append(sol)
+            screenshots.append(scr)
         
         # Update progress: Document generation
         progress_data.update({
@@ -5267,6 +5506,72 @@ def admin_get_eligible_users():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# =================== ADMIN CACHE ENDPOINTS ===================
+
+@app.route('/admin/cache/stats', methods=['GET'])
+def admin_cache_stats():
+    """Get solution cache and near-duplicate index hit rates"""
+    try:
+        # Simple admin check - in production, implement proper admin authentication
+        user = flask_session.get('user')
+        if not user:
+            return jsonify({'error': 'Admin access required'}), 401
+
+        return jsonify({
+            'success': True,
+            'solution_cache': solution_cache.stats(),
+            'similarity_index': similarity_index.stats() if similarity_index else {'enabled': False}
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/admin/corpus/stats', methods=['GET'])
+def admin_corpus_stats():
+    """Get solution corpus size and how much of recent uploads it covers"""
+    try:
+        # Simple admin check - in production, implement proper admin authentication
+        user = flask_session.get('user')
+        if not user:
+            return jsonify({'error': 'Admin access required'}), 401
+        if not solution_corpus:
+            return jsonify({'success': True, 'solution_corpus': {'enabled': False}})
+
+        days = float(request.args.get('days', 30))
+        return jsonify({
+            'success': True,
+            'solution_corpus': solution_corpus.stats(recent_days=days),
+            'next_prewarm_candidates': [
+                {'question': question[:120], 'language': language, 'ask_count': ask_count}
+                for question, language, ask_count in solution_corpus.frequent_unsolved(limit=10)
+            ]
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/admin/corpus/prewarm', methods=['POST'])
+def admin_prewarm_corpus():
+    """Manual corpus pre-warm trigger for admin"""
+    try:
+        # Simple admin check - in production, implement proper admin authentication
+        user = flask_session.get('user')
+        if not user:
+            return jsonify({'error': 'Admin access required'}), 401
+
+        data = request.get_json() or {}
+        limit = int(data.get('limit', 50))
+        min_count = int(data.get('min_count', 2))
+
+        # Run in a separate thread to avoid blocking the request
+        prewarm_thread = threading.Thread(target=prewarm_solution_corpus, args=(limit, min_count), daemon=True)
+        prewarm_thread.start()
+
+        return jsonify({
+            'message': f'Corpus pre-warm started (limit: {limit}, min_count: {min_count})',
+            'status': 'running'
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # ============= TERMINAL UTILITIES API ENDPOINTS =============
 
 @app.route('/api/terminal/clean_path', methods=['GET'])
@@ -5490,10 +5795,31 @@ def get_api_key_stats():
                 "load_distribution": "Intelligent API selection with rate limit management"
             },
             "key_details": formatted_stats,
+            "connection_pools": llm_clients.stats(),
+            "key_scheduler": {
+                "claude": claude_manager.scheduler_stats(),
+                "deepseek": deepseek_manager.scheduler_stats()
+            },
+            "solve_engine": solve_engine.stats(),
+            "streaming": dict(stream_stats.snapshot(), enabled=LLM_STREAMING),
+            "prompt_batching": prompt_batcher.stats() if prompt_batcher else {"enabled": False},
+            "hedging": request_hedger.stats() if request_hedger else {"enabled": False},
+            "routing": provider_router.stats(PROVIDER_SCHEDULERS),
+            "circuit_breakers": {name: manager.breaker.stats() for name, manager in PROVIDER_SCHEDULERS.items()},
+            "retry_budget": retry_budget.stats(),
+            "singleflight": singleflight.stats(),
+            "dual_language": dict(dual_stats.snapshot(), enabled=DUAL_LANGUAGE_ENABLED),
+            "continuations": dict(continuation_stats.snapshot(), max_rounds=CONTINUATION_MAX_ROUNDS),
+            "repairs": dict(repair_stats.snapshot(), max_attempts=REPAIR_MAX_ATTEMPTS,
+                            budget_seconds=REPAIR_BUDGET_SECONDS),
+            "sandbox": sandbox_pool.stats() if sandbox_pool else {"enabled": False},
+            "csharp_runner": csharp_runner.stats() if csharp_runner else {"enabled": False},
+            "exec_backends": exec_backends.stats() if exec_backends else {"enabled": False},
+            "execution_cache": execution_cache.stats() if execution_cache else {"enabled": False},
             "recommendations": {
                 "optimal_performance": (claude_available_keys + deepseek_available_keys) >= 4,
                 "message": f"🟢 Healthy ({claude_available_keys} Claude + {deepseek_available_keys} DeepSeek available)" if (claude_available_keys + deepseek_available_keys) >= 4 else f"🟡 Limited availability ({claude_available_keys} Claude + {deepseek_available_keys} DeepSeek available)",
-                "strategy": "Claude preferred for quality, DeepSeek for volume. Smart fallback active."
+                "strategy": "Fastest expected provider first (latency, error rate, cost weight). Smart fallback active."
             }
         })
         
@@ -5510,26 +5836,9 @@ def reset_api_key_stats():
         if not user:
             return jsonify({"error": "Admin access required."}), 401
         
-        # Reset all key statistics for both providers
-        with deepseek_manager.lock:
-            for key_index in deepseek_manager.key_stats:
-                deepseek_manager.key_stats[key_index] = {
-                    'requests': 0, 
-                    'failures': 0, 
-                    'last_used': 0, 
-                    'rate_limited_until': 0
-                }
-        
-        with claude_manager.lock:
-            for key_index in claude_manager.key_stats:
-                claude_manager.key_stats[key_index] = {
-                    'requests': 0, 
-                    'failures': 0, 
-                    'last_used': 0, 
-                    'rate_limited_until': 0,
-                    'requests_this_minute': 0,
-                    'minute_window_start': 0
-                }
+        # Reset all key statistics for both providers (in-flight requests keep their capacity)
+        deepseek_manager.reset_stats()
+        claude_manager.reset_stats()
         
         logging.info(f"API key statistics reset by user {user.get('phone_number')}")
         
@@ -0,0 +1,165 @@
+"""
+Batch Prompting - Pack several short questions into one LLM request
+Short questions ("reverse a string", "print a multiplication table") that
+arrive together are collected for a few milliseconds and solved with a
+single request, which counts once against the per-key request budget. The
+response is split back per question; anything missing or malformed is
+returned as None so the caller falls back to a normal per-question request.
+"""
+
+import os
+import re
+import asyncio
+import logging
+import threading
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, Any
+
+from solution_cache import normalize_language
+from code_stream import extract_code, is_complete_code
+
+logger = logging.getLogger(__name__)
+
+_SOLUTION_MARKER = re.compile(r'^[ \t]*===\s*SOLUTION\s+(\d+)\s*===[ \t]*$', re.MULTILINE | re.IGNORECASE)
+_END_MARKER = re.compile(r'^[ \t]*===\s*END\s*===[ \t]*$', re.MULTILINE | re.IGNORECASE)
+
+
+def batch_format_instructions(count: int) -> str:
+    """Output format the batch prompt asks for"""
+    return f"""
+Solve each of the {count} problems independently; every solution must be a complete, standalone program.
+Format the answer exactly like this, with nothing before the first marker or after the end marker:
+===SOLUTION 1===
+<code for problem 1>
+===SOLUTION 2===
+<code for problem 2>
+...
+===END===
+"""
+
+
+def parse_batch_response(text: str, count: int, language: str = 'python') -> List[Optional[str]]:
+    """
+    Split a batched response into per-question solutions
+
+    Returns a list of length count; an entry is None when that solution is
+    missing, duplicated, empty or not syntactically complete.
+    """
+    solutions: List[Optional[str]] = [None] * count
+    end = _END_MARKER.search(text or '')
+    body = text[:end.start()] if end else (text or '')
+    markers = list(_SOLUTION_MARKER.finditer(body))
+    seen = set()
+
+    for position, marker in enumerate(markers):
+        number = int(marker.group(1))
+        section_end = markers[position + 1].start() if position + 1 < len(markers) else len(body)
+        if not 1 <= number <= count:
+            continue
+        if number in seen:
+            solutions[number - 1] = None  # Answered twice: ambiguous
+            continue
+        seen.add(number)
+        # Without an end marker the last section may have been cut off mid-program
+        if end is None and position == len(markers) - 1:
+            continue
+        code = extract_code(body[marker.end():section_end], language)
+        if is_complete_code(code, language):
+            solutions[number - 1] = code
+
+    return solutions
+
+
+class PromptBatcher:
+    """
+    Micro-batcher for short questions, living on the solve engine's event loop.
+
+    solve() queues a question per language and returns its solution, or None
+    when the question should be solved with its own request instead. A batch
+    is sent when max_batch questions are queued or window seconds after the
+    first one arrived; a lone question is never sent as a batch.
+    """
+
+    def __init__(self, send_batch: Callable[[List[str], str], Awaitable[List[Optional[str]]]],
+                 max_batch: int = 4, max_chars: int = 160, window: float = 0.05):
+        self.send_batch = send_batch
+        self.max_batch = max_batch
+        self.max_chars = max_chars
+        self.window = window
+        self.pending: Dict[str, List[Tuple[str, asyncio.Future]]] = {}
+        self.timers: Dict[str, asyncio.TimerHandle] = {}
+        self.stats_lock = threading.Lock()
+        self.counters = {'batches': 0, 'batched_questions': 0, 'answered': 0, 'fallbacks': 0, 'failed_batches': 0}
+
+    @classmethod
+    def from_env(cls, send_batch) -> Optional['PromptBatcher']:
+        """Batcher configured by PROMPT_BATCHING_* variables, or None when batching is off"""
+        if os.getenv('PROMPT_BATCHING_ENABLED', 'false').lower() != 'true':
+            return None
+        return cls(
+            send_batch,
+            max_batch=int(os.getenv('PROMPT_BATCH_SIZE', '4')),
+            max_chars=int(os.getenv('PROMPT_BATCH_MAX_CHARS', '160')),
+            window=int(os.getenv('PROMPT_BATCH_WINDOW_MS', '50')) / 1000
+        )
+
+    def eligible(self, question: str) -> bool:
+        return self.max_batch > 1 and len(question.strip()) <= self.max_chars
+
+    async def solve(self, question: str, language: str) -> Optional[str]:
+        """Solution from a batched request, or None to fall back to a per-question request"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        key = normalize_language(language)
+        queue = self.pending.setdefault(key, [])
+        queue.append((question, future))
+        if len(queue) >= self.max_batch:
+            self._flush(key)
+        elif len(queue) == 1:
+            self.timers[key] = loop.call_later(self.window, self._flush, key)
+        return await future
+
+    def _flush(self, key: str):
+        timer = self.timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self.pending.pop(key, [])
+        if len(batch) == 1:
+            _, future = batch[0]
+            if not future.done():
+                future.set_result(None)
+        elif batch:
+            asyncio.ensure_future(self._send(key, batch))
+
+    async def _send(self, language: str, batch: List[Tuple[str, asyncio.Future]]):
+        questions = [question for question, _ in batch]
+        try:
+            solutions = await self.send_batch(questions, language)
+        except Exception as e:
+            logger.warning(f"Batched request for {len(batch)} {language} questions failed: {e}")
+            solutions = None
+
+        answered = 0
+        for index, (_, future) in enumerate(batch):
+            solution = solutions[index] if solutions and index < len(solutions) else None
+            answered += solution is not None
+            if not future.done():
+                future.set_result(solution)
+
+        with self.stats_lock:
+            self.counters['batches'] += 1
+            self.counters['batched_questions'] += len(batch)
+            self.counters['answered'] += answered
+            self.counters['fallbacks'] += len(batch) - answered
+            self.counters['failed_batches'] += solutions is None
+        logger.info(f"Batched request answered {answered}/{len(batch)} {language} questions")
+
+    def stats(self) -> Dict[str, Any]:
+        with self.stats_lock:
+            counters = dict(self.counters)
+        return dict(
+            counters,
+            requests_saved=max(counters['answered'] - counters['batches'], 0),
+            max_batch=self.max_batch,
+            max_chars=self.max_chars,
+            window_ms=int(self.window * 1000)
+        )
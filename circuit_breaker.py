@@ -0,0 +1,276 @@
+"""
+Circuit Breaker - Fail fast when an LLM provider or API key is unhealthy
+Errors are classified from typed exceptions and HTTP status codes (never from
+message text). Repeated provider failures open a breaker so later requests
+are rejected in microseconds; after a recovery timeout a limited number of
+probe requests are let through (half-open) and the breaker closes again only
+when a probe succeeds. Each re-open doubles the recovery timeout.
+
+RetryBudget caps retries to a fraction of recent requests and spaces them
+with exponential backoff and full jitter, so an outage cannot multiply load.
+"""
+
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+import httpx
+
+try:
+    import anthropic
+except ImportError:  # Only needed to recognise Anthropic SDK exception types
+    anthropic = None
+
+logger = logging.getLogger(__name__)
+
+# Breaker states
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Error kinds
+RATE_LIMITED = 'rate_limited'
+UNAUTHORIZED = 'unauthorized'
+OVERLOADED = 'overloaded'
+SERVER_ERROR = 'server_error'
+TIMEOUT = 'timeout'
+CONNECTION = 'connection'
+BAD_REQUEST = 'bad_request'
+CIRCUIT_OPEN = 'circuit_open'
+UNKNOWN = 'unknown'
+
+# Kinds that say the provider itself is unhealthy (as opposed to one key or one request)
+PROVIDER_FAILURES = frozenset({OVERLOADED, SERVER_ERROR, TIMEOUT, CONNECTION})
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose breaker is open"""
+
+    def __init__(self, name: str, retry_after: float = 0.0):
+        super().__init__(f"{name} circuit open; retry in {retry_after:.1f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+def classify_status(status_code: int) -> Optional[str]:
+    """Error kind for an HTTP status code (None for success)"""
+    if status_code < 400:
+        return None
+    if status_code == 429:
+        return RATE_LIMITED
+    if status_code in (401, 403):
+        return UNAUTHORIZED
+    if status_code in (503, 529):
+        return OVERLOADED
+    if status_code in (408, 504):
+        return TIMEOUT
+    if status_code >= 500:
+        return SERVER_ERROR
+    return BAD_REQUEST
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+    return status if isinstance(status, int) else None
+
+
+def classify_error(error: BaseException) -> str:
+    """Error kind for an exception raised by a provider call"""
+    if isinstance(error, CircuitOpenError):
+        return CIRCUIT_OPEN
+    status = _status_code(error)
+    if status is not None:
+        return classify_status(status) or UNKNOWN
+    if isinstance(error, (httpx.TimeoutException, asyncio.TimeoutError, TimeoutError)):
+        return TIMEOUT
+    if anthropic is not None and isinstance(error, anthropic.APITimeoutError):
+        return TIMEOUT
+    if isinstance(error, (httpx.TransportError, ConnectionError)):
+        return CONNECTION
+    if anthropic is not None and isinstance(error, anthropic.APIConnectionError):
+        return CONNECTION
+    return UNKNOWN
+
+
+def retry_after_seconds(error_or_response: Any) -> Optional[float]:
+    """Seconds from a Retry-After header on an exception's response or a response"""
+    response = getattr(error_or_response, 'response', error_or_response)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+    try:
+        return max(0.0, float(headers.get('retry-after')))
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open breaker for one provider or one API key
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30.0,
+                 max_recovery_timeout: float = 300.0, half_open_probes: int = 1):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_timeout = recovery_timeout
+        self.max_recovery_timeout = max(recovery_timeout, max_recovery_timeout)
+        self.half_open_probes = max(1, half_open_probes)
+        self.state = CLOSED
+        self.failures = 0
+        self.open_until = 0.0
+        self.current_timeout = recovery_timeout
+        self.probes = 0
+        self.probe_started = 0.0
+        self.lock = threading.Lock()
+        self.counters = {'opened': 0, 'rejected': 0, 'probes': 0}
+
+    def _refresh(self, now: float):
+        if self.state == OPEN and now >= self.open_until:
+            self.state = HALF_OPEN
+            self.probes = 0
+
+    def _probe_slot_free(self, now: float) -> bool:
+        # A probe whose outcome never arrived (e.g. a cancelled request) stops blocking after a timeout
+        return self.probes < self.half_open_probes or now - self.probe_started > self.current_timeout
+
+    def _open(self, now: float):
+        self.state = OPEN
+        self.probes = 0
+        self.counters['opened'] += 1
+        # Jitter keeps processes that opened together from probing in lockstep
+        self.open_until = now + self.current_timeout * random.uniform(0.9, 1.1)
+        logger.warning(f"Circuit {self.name} opened for {self.current_timeout:.0f}s")
+
+    def remaining(self) -> float:
+        """Seconds until the breaker lets a request through (0 if it does now)"""
+        with self.lock:
+            now = time.monotonic()
+            self._refresh(now)
+            return max(0.0, self.open_until - now) if self.state == OPEN else 0.0
+
+    def available(self) -> bool:
+        """Whether allow() would currently admit a request"""
+        with self.lock:
+            now = time.monotonic()
+            self._refresh(now)
+            return self.state == CLOSED or (self.state == HALF_OPEN and self._probe_slot_free(now))
+
+    def allow(self) -> bool:
+        """Admit a request (reserving a probe slot when half-open) or count a rejection"""
+        with self.lock:
+            now = time.monotonic()
+            self._refresh(now)
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and self._probe_slot_free(now):
+                self.probes = min(self.probes + 1, self.half_open_probes)
+                self.probe_started = now
+                self.counters['probes'] += 1
+                return True
+            self.counters['rejected'] += 1
+            return False
+
+    def record_success(self):
+        with self.lock:
+            if self.state == HALF_OPEN:
+                logger.info(f"Circuit {self.name} closed after a successful probe")
+                self.current_timeout = self.recovery_timeout
+            self.state = CLOSED
+            self.failures = 0
+            self.probes = 0
+
+    def record_failure(self):
+        with self.lock:
+            now = time.monotonic()
+            self._refresh(now)
+            if self.state == HALF_OPEN:
+                self.current_timeout = min(self.max_recovery_timeout, self.current_timeout * 2)
+                self._open(now)
+            elif self.state == CLOSED:
+                self.failures += 1
+                if self.failures >= self.failure_threshold:
+                    self._open(now)
+
+    def cancel_probe(self):
+        """Give back a probe slot whose request ended without an outcome"""
+        with self.lock:
+            if self.state == HALF_OPEN and self.probes > 0:
+                self.probes -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        remaining = self.remaining()
+        with self.lock:
+            return dict(self.counters, state=self.state, consecutive_failures=self.failures,
+                        open_for_seconds=round(remaining, 1),
+                        recovery_timeout=round(self.current_timeout, 1))
+
+
+class RetryBudget:
+    """
+    Process-wide cap on retries: at most `ratio` retries per recent request
+    (plus a small floor), each delayed by exponential backoff with full jitter
+    """
+
+    def __init__(self, ratio: float = 0.2, min_per_second: float = 0.5, window: float = 10.0,
+                 backoff_base: float = 0.25, backoff_cap: float = 4.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.window = window
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.requests = deque()
+        self.retries = deque()
+        self.lock = threading.Lock()
+        self.counters = {'requests': 0, 'retries': 0, 'denied': 0}
+
+    @classmethod
+    def from_env(cls) -> 'RetryBudget':
+        return cls(
+            ratio=float(os.getenv('RETRY_BUDGET_RATIO', '0.2')),
+            min_per_second=float(os.getenv('RETRY_BUDGET_MIN_PER_SECOND', '0.5')),
+            backoff_base=float(os.getenv('RETRY_BACKOFF_BASE', '0.25')),
+            backoff_cap=float(os.getenv('RETRY_BACKOFF_CAP', '4'))
+        )
+
+    def _prune(self, now: float):
+        for events in (self.requests, self.retries):
+            while events and now - events[0] > self.window:
+                events.popleft()
+
+    def record_request(self):
+        with self.lock:
+            now = time.monotonic()
+            self._prune(now)
+            self.requests.append(now)
+            self.counters['requests'] += 1
+
+    def try_spend(self) -> bool:
+        """Take one retry from the budget; False means fail instead of retrying"""
+        with self.lock:
+            now = time.monotonic()
+            self._prune(now)
+            allowed = self.min_per_second * self.window + self.ratio * len(self.requests)
+            if len(self.retries) + 1 > allowed:
+                self.counters['denied'] += 1
+                return False
+            self.retries.append(now)
+            self.counters['retries'] += 1
+            return True
+
+    def backoff(self, attempt: int) -> float:
+        """Delay before retry number `attempt` (1-based): uniform in [0, min(cap, base * 2^attempt)]"""
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            self._prune(time.monotonic())
+            return dict(self.counters, window_requests=len(self.requests), window_retries=len(self.retries),
+                        ratio=self.ratio)
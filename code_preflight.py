@@ -0,0 +1,243 @@
+"""
+Code Preflight - Static checks and targeted repair of generated Python
+Generated Python used to be exec'd blindly: a NameError was retried with
+"<name> = 0" prepended, other failures ran the original code a second time,
+and whatever came out (often "Error executing code: ...") went into the
+screenshot. The code is now parsed with ast first, which in microseconds
+finds syntax errors, input()/stdin reads (there is no user to type
+anything), names that are never defined, and programs that never print.
+Unusable code, or code whose run failed, goes back to the model with the
+error attached and a request to fix only that, within a per-question budget
+of repair attempts and seconds; a repair is far cheaper than a re-solve.
+"""
+
+import ast
+import time
+import builtins
+import threading
+from typing import Any, Dict, List, Optional
+
+from solution_corpus import is_failed_output
+
+# Names every module has without defining them
+_MODULE_NAMES = frozenset(dir(builtins)) | {'__name__', '__file__', '__doc__', '__builtins__', '__spec__',
+                                            '__loader__', '__package__', '__annotations__'}
+# Calls after which any name may exist (undefined-name checking is skipped)
+_DYNAMIC_NAMESPACE_CALLS = frozenset({'exec', 'eval', 'globals', 'locals', 'vars', '__import__'})
+_OUTPUT_FUNCTIONS = frozenset({'print', 'pprint', 'pp'})
+_OUTPUT_METHODS = frozenset({'write', 'writelines', 'print', 'pprint', 'display', 'show', 'to_string'})
+_DEFINITIONS = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Import, ast.ImportFrom, ast.Pass)
+_NO_OUTPUT = 'produced no visible output'
+
+
+class PreflightIssue:
+    """Something that makes a program unusable as it is, with the line it was found on"""
+
+    def __init__(self, kind: str, message: str, line: Optional[int] = None):
+        self.kind = kind
+        self.message = message
+        self.line = line
+
+    def __str__(self) -> str:
+        return f"line {self.line}: {self.message}" if self.line else self.message
+
+    def __repr__(self) -> str:
+        return f"PreflightIssue({self.kind!r}, {str(self)!r})"
+
+
+def preflight(code: str) -> List[PreflightIssue]:
+    """Issues found in generated Python without running it; an empty list means it may run"""
+    if not code or not code.strip():
+        return [PreflightIssue('empty', "the answer contains no code")]
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        text = (e.text or '').strip()
+        return [PreflightIssue('syntax', f"SyntaxError: {e.msg}" + (f" in `{text}`" if text else ''), e.lineno)]
+    except ValueError as e:  # Null bytes in the source
+        return [PreflightIssue('syntax', f"the code cannot be parsed: {e}")]
+
+    issues = _input_reads(tree)
+    issues.extend(_undefined_names(tree))
+    if not _prints_output(tree):
+        issues.append(PreflightIssue('no_output', "the program never prints anything: print the results, "
+                                                  "and call the functions it defines"))
+    return issues
+
+
+def describe_issues(issues: List[PreflightIssue]) -> str:
+    return "\n".join(str(issue) for issue in issues)
+
+
+def _is_stdin(node: ast.AST) -> bool:
+    return (isinstance(node, ast.Attribute) and node.attr == 'stdin'
+            and isinstance(node.value, ast.Name) and node.value.id == 'sys')
+
+
+def _input_reads(tree: ast.AST) -> List[PreflightIssue]:
+    issues = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == 'input':
+            issues.append(PreflightIssue('input', "input() call: there is no user to type input, "
+                                                  "use fixed sample values instead", node.lineno))
+        elif _is_stdin(node):
+            issues.append(PreflightIssue('input', "reads sys.stdin: there is no user to type input, "
+                                                  "use fixed sample values instead", node.lineno))
+    return issues
+
+
+def _undefined_names(tree: ast.AST) -> List[PreflightIssue]:
+    """Names read somewhere but bound nowhere in the program
+
+    Scopes are not told apart: a name bound anywhere counts as defined, so
+    use-before-assignment is left to the run.
+    """
+    bound, loaded = set(), {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            if isinstance(node.ctx, ast.Load):
+                loaded.setdefault(node.id, node.lineno)
+            else:
+                bound.add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            bound.add(node.name)
+        elif isinstance(node, ast.arg):
+            bound.add(node.arg)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                if alias.name == '*':
+                    return []  # Star imports define names we cannot see
+                bound.add(alias.asname or alias.name.split('.')[0])
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            bound.update(node.names)
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            bound.add(node.name)
+        elif type(node).__name__ in ('MatchAs', 'MatchStar', 'MatchMapping'):  # Python 3.10+ patterns
+            bound.update(name for name in (getattr(node, 'name', None), getattr(node, 'rest', None)) if name)
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in _DYNAMIC_NAMESPACE_CALLS:
+            return []
+    missing = sorted((line, name) for name, line in loaded.items() if name not in bound and name not in _MODULE_NAMES)
+    return [PreflightIssue('undefined_name', f"NameError: name '{name}' is not defined", line) for line, name in missing]
+
+
+def _is_output_call(node: ast.AST) -> bool:
+    if not isinstance(node, ast.Call):
+        return False
+    if isinstance(node.func, ast.Name):
+        return node.func.id in _OUTPUT_FUNCTIONS
+    return isinstance(node.func, ast.Attribute) and node.func.attr in _OUTPUT_METHODS
+
+
+def _runs_code(statement: ast.stmt) -> bool:
+    """Whether a top-level statement does something when the module runs (beyond defining names)"""
+    if isinstance(statement, _DEFINITIONS):
+        return False
+    if isinstance(statement, (ast.Assign, ast.AnnAssign)):
+        return any(isinstance(node, ast.Call) for node in ast.walk(statement))
+    return not (isinstance(statement, ast.Expr) and isinstance(statement.value, ast.Constant))
+
+
+def _prints_output(tree: ast.Module) -> bool:
+    """Whether the program can print: it has an output call and runs something at module level
+
+    A program without print() that ends on a value counts, since
+    add_final_print() prints that value.
+    """
+    if final_print_target(tree) is not None:
+        return True
+    # print() inside functions that are never called prints nothing
+    return any(_is_output_call(node) for node in ast.walk(tree)) and any(_runs_code(s) for s in tree.body)
+
+
+def final_print_target(tree: ast.Module) -> Optional[ast.AST]:
+    """Node holding the value a program without print() ends on (last expression or assigned name), or None"""
+    if not tree.body or any(_is_output_call(node) for node in ast.walk(tree)):
+        return None
+    last = tree.body[-1]
+    if isinstance(last, ast.Expr) and not isinstance(last.value, ast.Constant):
+        return last.value
+    if isinstance(last, (ast.Assign, ast.AnnAssign, ast.AugAssign)) and getattr(last, 'value', None) is not None:
+        targets = last.targets if isinstance(last, ast.Assign) else [last.target]
+        if len(targets) == 1 and isinstance(targets[0], ast.Name):
+            return targets[0]
+    return None
+
+
+def add_final_print(code: str) -> str:
+    """Print the value a program without any print() ends on, so it shows a result"""
+    try:
+        target = final_print_target(ast.parse(code))
+    except (SyntaxError, ValueError):
+        return code
+    source = ast.get_source_segment(code, target) if target is not None else None
+    if isinstance(target, ast.Name):
+        source = target.id
+    return f"{code.rstrip()}\nprint({source})" if source else code
+
+
+def execution_error(output: Optional[str]) -> Optional[str]:
+    """The failure an executor reported instead of program output, or None if the program ran"""
+    if not output or not output.strip():
+        return "the program printed nothing"
+    text = output.strip()
+    if is_failed_output(text):
+        return text[:1500]
+    if _NO_OUTPUT in text:
+        return "the program ran but printed nothing: print the results"
+    return None
+
+
+def repair_prompt(question: str, code: str, error: str, language: str = 'python') -> str:
+    """Prompt asking the model to fix one specific problem in its own code"""
+    return (
+        f"This {language} program was written to solve the following problem:\n"
+        f"start\n{question}\nend\n\n"
+        f"```{language}\n{code.rstrip()}\n```\n\n"
+        f"It cannot be used as it is:\n{error}\n\n"
+        f"Fix that problem and change nothing else. The program must not call input() or read from the "
+        f"user; use fixed sample values. It must print its results when run as a script. Return only the "
+        f"complete corrected code in one ```{language} code block, with no comments or explanation."
+    )
+
+
+class RepairBudget:
+    """Repair attempts and seconds one question may spend (REPAIR_MAX_ATTEMPTS, REPAIR_BUDGET_SECONDS)"""
+
+    def __init__(self, max_attempts: int = 1, seconds: float = 30.0, clock=None):
+        self.clock = clock or time.monotonic
+        self.max_attempts = max_attempts
+        self.deadline = self.clock() + seconds
+        self.attempts = 0
+
+    def allows_repair(self) -> bool:
+        return self.attempts < self.max_attempts and self.clock() < self.deadline
+
+    def spend(self):
+        self.attempts += 1
+
+
+class RepairStats:
+    """Counters for pre-flight findings and how repairs resolved them"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {'checked': 0, 'preflight_failures': 0, 'runtime_failures': 0, 'repair_requests': 0,
+                         'repaired': 0, 'unrepaired': 0}
+        self.issue_kinds: Dict[str, int] = {}
+
+    def count(self, key: str, amount: int = 1):
+        with self.lock:
+            self.counters[key] += amount
+
+    def count_issues(self, issues: List[PreflightIssue]):
+        with self.lock:
+            self.counters['preflight_failures'] += 1
+            for kind in {issue.kind for issue in issues}:
+                self.issue_kinds[kind] = self.issue_kinds.get(kind, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            return dict(self.counters, issue_kinds=dict(self.issue_kinds))
+
+
+repair_stats = RepairStats()
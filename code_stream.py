@@ -0,0 +1,215 @@
+"""
+Code Stream - Early code extraction from streamed LLM responses
+Accumulates streamed text deltas and recognises the moment the code is
+complete (closing markdown fence, and a syntax check) so the pipeline can stop
+reading and start executing while the provider is still generating the
+trailing explanation.
+"""
+
+import ast
+import re
+import time
+import logging
+import threading
+from typing import Callable, Dict, Any, Optional
+
+from solution_cache import normalize_language
+
+logger = logging.getLogger(__name__)
+
+_OPEN_FENCE = re.compile(r'^[ \t]*```[\w+#.-]*[ \t]*\n', re.MULTILINE)
+_CLOSE_FENCE = re.compile(r'^[ \t]*```', re.MULTILINE)
+_BRACKETS = {'(': ')', '[': ']', '{': '}'}
+
+
+def strip_code_fences(text: str) -> str:
+    """Drop markdown fences from a whole response (the original cleanup)"""
+    return re.sub(r"```[\w]*", "", text).replace("```", "").strip()
+
+
+def find_code_block(text: str, strip: bool = True) -> Optional[str]:
+    """Body of the first fenced code block once its closing fence has arrived, else None"""
+    opening = _OPEN_FENCE.search(text)
+    if not opening:
+        return None
+    closing = _CLOSE_FENCE.search(text, opening.end())
+    if not closing:
+        return None
+    body = text[opening.end():closing.start()]
+    return body.strip() if strip else body
+
+
+def find_open_code_block(text: str) -> Optional[str]:
+    """Code after an opening fence that never closed (None if there is no open block)"""
+    opening = _OPEN_FENCE.search(text or '')
+    if not opening or _CLOSE_FENCE.search(text, opening.end()):
+        return None
+    return text[opening.end():]
+
+
+def brackets_balanced(code: str) -> bool:
+    """Bracket balance for C-family code, ignoring string/char literals and comments"""
+    stack = []
+    i, n = 0, len(code)
+    while i < n:
+        ch = code[i]
+        if ch in '"\'':
+            i += 1
+            while i < n and code[i] != ch:
+                i += 2 if code[i] == '\\' else 1
+            if i >= n:
+                return False
+        elif code.startswith('//', i):
+            end = code.find('\n', i)
+            i = n if end == -1 else end
+        elif code.startswith('/*', i):
+            end = code.find('*/', i + 2)
+            if end == -1:
+                return False
+            i = end + 1
+        elif ch in _BRACKETS:
+            stack.append(_BRACKETS[ch])
+        elif ch in ')]}':
+            if not stack or stack.pop() != ch:
+                return False
+        i += 1
+    return not stack
+
+
+def is_complete_code(code: str, language: str = 'python') -> bool:
+    """Whether code is syntactically complete enough to hand to execution"""
+    if not code or not code.strip():
+        return False
+    if normalize_language(language) == 'python':
+        try:
+            ast.parse(code)
+        except (SyntaxError, ValueError):
+            return False
+        return True
+    return brackets_balanced(code)
+
+
+def extract_code(text: str, language: str = 'python') -> str:
+    """
+    Code from a full response: the first fenced block when it is complete,
+    otherwise the whole response with fences stripped
+    """
+    block = find_code_block(text)
+    if block is not None and is_complete_code(block, language):
+        return block
+    return strip_code_fences(text)
+
+
+class StreamStats:
+    """Process-wide streaming counters (exposed on /api/keys/stats)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {'responses': 0, 'early_completions': 0, 'chars': 0,
+                         'first_token_seconds': 0.0, 'code_ready_seconds': 0.0}
+
+    def record(self, accumulator: 'CodeStreamAccumulator'):
+        with self.lock:
+            self.counters['responses'] += 1
+            self.counters['chars'] += accumulator.chars
+            if accumulator.first_token_at is not None:
+                self.counters['first_token_seconds'] += accumulator.first_token_at - accumulator.started
+            self.counters['code_ready_seconds'] += (accumulator.completed_at or time.monotonic()) - accumulator.started
+            if accumulator.code is not None:
+                self.counters['early_completions'] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            counters = dict(self.counters)
+        responses = max(counters['responses'], 1)
+        return {
+            'responses': counters['responses'],
+            'early_completions': counters['early_completions'],
+            'early_completion_rate': f"{(counters['early_completions'] / responses * 100):.1f}%",
+            'average_chars': round(counters['chars'] / responses),
+            'average_first_token_ms': round(counters['first_token_seconds'] / responses * 1000),
+            'average_code_ready_ms': round(counters['code_ready_seconds'] / responses * 1000)
+        }
+
+
+stream_stats = StreamStats()
+
+
+class CodeStreamAccumulator:
+    """
+    Collects streamed deltas for one response.
+
+    feed() returns True as soon as a fenced code block has closed and the code
+    inside is syntactically complete; the caller should then stop reading the
+    stream. Unfenced responses are only complete when the stream ends. With
+    language=None the response is collected verbatim (no code extraction).
+    on_progress(chars_received) is called at most every progress_interval seconds.
+    """
+
+    def __init__(self, language: Optional[str] = 'python',
+                 on_progress: Optional[Callable[[int], None]] = None,
+                 progress_interval: float = 0.5,
+                 stats: Optional[StreamStats] = None):
+        self.language = language
+        self.on_progress = on_progress
+        self.progress_interval = progress_interval
+        self.stats = stats
+        self.parts = []
+        self.chars = 0
+        self.code: Optional[str] = None
+        self.started = time.monotonic()
+        self.first_token_at: Optional[float] = None
+        self.completed_at: Optional[float] = None
+        self.last_progress = 0.0
+
+    @property
+    def text(self) -> str:
+        return ''.join(self.parts)
+
+    def feed(self, delta: str) -> bool:
+        """Add a streamed text delta; returns True once the code is complete"""
+        if self.code is not None:
+            return True
+        if not delta:
+            return False
+        if self.first_token_at is None:
+            self.first_token_at = time.monotonic()
+        self.parts.append(delta)
+        self.chars += len(delta)
+
+        # A closing fence can only arrive in a delta that contains a backtick
+        if '`' in delta and self.language is not None:
+            block = find_code_block(self.text)
+            if block is not None and is_complete_code(block, self.language):
+                self.code = block
+                self.completed_at = time.monotonic()
+                self._report(final=True)
+                return True
+
+        self._report()
+        return False
+
+    def _report(self, final: bool = False):
+        if self.on_progress is None:
+            return
+        now = time.monotonic()
+        if not final and now - self.last_progress < self.progress_interval:
+            return
+        self.last_progress = now
+        try:
+            self.on_progress(self.chars)
+        except Exception as e:
+            logger.warning(f"Stream progress callback failed: {e}")
+
+    def finish(self) -> str:
+        """Final code for the response (call after the stream ends or feed() returned True)"""
+        if self.code is None:
+            self.completed_at = time.monotonic()
+            self._report(final=True)
+        if self.stats is not None:
+            self.stats.record(self)
+        if self.code is not None:
+            return self.code
+        if self.language is None:
+            return self.text.strip()
+        return extract_code(self.text, self.language)
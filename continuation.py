@@ -0,0 +1,120 @@
+"""
+Continuation - Resume truncated LLM code instead of re-solving
+A response is truncated when the provider stopped on its token limit
+(Claude stop_reason "max_tokens", OpenAI-compatible finish_reason "length")
+or when the code block is still open and syntactically unfinished. The
+partial code is then sent back with a request to continue exactly where it
+stopped, and the continuation is stitched onto the partial code. Token
+budgets are sized from the question so long programs rarely hit the limit.
+"""
+
+import re
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+from code_stream import find_code_block, find_open_code_block, is_complete_code, strip_code_fences
+from solution_cache import normalize_language
+
+logger = logging.getLogger(__name__)
+
+TRUNCATION_STOP_REASONS = frozenset({'max_tokens', 'length'})
+
+# Rough output size (tokens) of a typical answer per language (normalize_language() names),
+# and words that signal long programs
+_BASE_TOKENS = {'python': 600, 'c': 800, 'c++': 900, 'java': 1000, 'c#': 1000, 'javascript': 700}
+_LONG_PROGRAM = re.compile(
+    r'\b(menu|menu-driven|system|management|banking|bank|inventory|library|student records?|'
+    r'employee|crud|options?|classes|inheritance|interface|polymorphism|operations|simulat\w*)\b',
+    re.IGNORECASE
+)
+# Overlap searched when the continuation repeats the end of the partial code; shorter matches are coincidence
+_MAX_OVERLAP = 400
+_MIN_OVERLAP = 8
+
+
+def estimate_max_tokens(question: str, language: str = 'python', floor: int = 800, cap: int = 4000) -> int:
+    """Token budget for one solution, scaled by language verbosity and question size"""
+    language = normalize_language(language or 'python')
+    tokens = _BASE_TOKENS.get(language, 800)
+    tokens += min(len(question or ''), 2000) // 2  # Longer specs describe more behaviour to implement
+    tokens += 250 * min(len(set(m.lower() for m in _LONG_PROGRAM.findall(question or ''))), 6)
+    return int(min(cap, max(floor, tokens)))
+
+
+def is_truncated(text: str, language: Optional[str], stop_reason: Optional[str] = None) -> bool:
+    """Whether a code response was cut off before the code was finished"""
+    if language is None or not text:
+        return False
+    block = find_code_block(text)
+    if block is not None and is_complete_code(block, language):
+        return False  # The code finished even if the explanation after it was cut
+    if stop_reason in TRUNCATION_STOP_REASONS:
+        return True
+    partial = find_open_code_block(text)
+    return partial is not None and not is_complete_code(partial, language)
+
+
+def partial_code(text: str) -> str:
+    """Code written so far in a truncated response"""
+    partial = find_open_code_block(text)
+    if partial is None:
+        partial = find_code_block(text)
+    return partial if partial is not None else strip_code_fences(text)
+
+
+def continuation_prompt(original_prompt: str, partial: str, language: str) -> str:
+    """Prompt asking the model to continue partial code exactly where it stopped"""
+    return (
+        f"{original_prompt}\n\n"
+        f"Your previous answer was cut off. This is the {language} code written so far:\n"
+        f"```{language}\n{partial.rstrip()}\n```\n\n"
+        f"Continue the code exactly from the last character above. Do not repeat any of it, "
+        f"do not restart and add no explanation. Output only the remaining code in one "
+        f"```{language} code block."
+    )
+
+
+def merge_continuation(partial: str, continuation: str) -> str:
+    """Stitch a continuation onto partial code, dropping any repeated overlap"""
+    block = find_code_block(continuation, strip=False)  # Keep the first line's indentation
+    if block is None:
+        block = find_open_code_block(continuation)
+    if block is None:
+        block = strip_code_fences(continuation)
+    block = block.strip('\n')
+    if not block:
+        return partial
+
+    # Models often repeat the end of the partial code; drop the longest overlap
+    tail = partial[-_MAX_OVERLAP:]
+    for size in range(min(len(tail), len(block)), _MIN_OVERLAP - 1, -1):
+        if tail.endswith(block[:size]):
+            return partial + block[size:]
+
+    last_line = partial.rsplit('\n', 1)[-1]
+    if last_line.strip() and block.lstrip().startswith(last_line.strip()):
+        # The continuation restarted the line that was cut off
+        return partial[:len(partial) - len(last_line)] + block
+    if last_line.strip() and block.startswith(('  ', '\t')):
+        return f"{partial}\n{block}"  # An indented new line, not the rest of the cut-off one
+    return partial + block
+
+
+class ContinuationStats:
+    """Counters for truncated responses and how continuations resolved them"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {'truncated': 0, 'continuations': 0, 'completed': 0, 'incomplete': 0}
+
+    def count(self, key: str, amount: int = 1):
+        with self.lock:
+            self.counters[key] += amount
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            return dict(self.counters)
+
+
+continuation_stats = ContinuationStats()
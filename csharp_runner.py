@@ -0,0 +1,637 @@
+"""
+C# Runner - Sub-second compile-and-run for C# questions
+Scaffolding, restoring and building a fresh `dotnet new console` project took
+several seconds per question. A long-running compile host (a small C#
+program built once against the SDK's own Roslyn) now keeps the compiler and
+the framework references warm and compiles each program in memory to a dll,
+which runs as its own `dotnet prog.dll` process with a timeout, a managed
+heap limit and a private working directory. When the host cannot be built,
+programs are built from a pre-restored project template with --no-restore
+(the SDK's compiler server stays warm between builds).
+
+A document's C# programs can also be compiled together (run_many): each
+program goes into its own namespace, one compilation builds them all with a
+small launcher as the entry point, and every program then runs as its own
+process (`dotnet batch.dll <namespace>`) with its own timeout and output.
+Programs whose code does not compile are dropped from the batch and run on
+their own, so one broken answer never costs the others.
+"""
+
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+import logging
+import threading
+import subprocess
+import concurrent.futures
+from typing import Any, Dict, List, Optional, Tuple
+
+from output_capture import OutputLimits, capture_process
+from sandbox_fs import FixtureArea, tmpfs_root
+
+logger = logging.getLogger(__name__)
+
+NO_OUTPUT_MESSAGE = "Program executed successfully but produced no visible output."
+CSHARP_FILE_OPERATIONS = ('File.', 'FileInfo', 'Directory', 'StreamReader', 'StreamWriter', 'Path.', 'FileStream')
+# The console template's implicit usings, so programs that relied on them still compile
+GLOBAL_USINGS = ("global using global::System; global using global::System.Collections.Generic; "
+                 "global using global::System.IO; global using global::System.Linq; global using global::System.Net.Http; "
+                 "global using global::System.Threading; global using global::System.Threading.Tasks;")
+_MAIN_METHOD = re.compile(r'\bstatic\s+(async\s+)?(void|int|Task|Task<int>)\s+Main\s*\(')
+_USING_DIRECTIVE = re.compile(r'^\s*using\s+(static\s+)?[\w.]+(\s*=\s*[\w.<>, ]+)?\s*;\s*$')
+
+BATCH_NAMESPACE = 'CodeDebHai'
+# Entry point of batch assemblies: runs the Main of the program in the namespace given as args[0]
+BATCH_LAUNCHER = """
+namespace CodeDebHai
+{
+    static class Launcher
+    {
+        static int Main(string[] args)
+        {
+            var prefix = args[0];
+            var main = typeof(Launcher).Assembly.GetTypes()
+                .Where(type => type.Namespace == prefix || (type.Namespace ?? "").StartsWith(prefix + "."))
+                .SelectMany(type => type.GetMethods(System.Reflection.BindingFlags.Static | System.Reflection.BindingFlags.Public | System.Reflection.BindingFlags.NonPublic))
+                .First(method => method.Name == "Main");
+            object result;
+            try
+            {
+                result = main.Invoke(null, main.GetParameters().Length == 0 ? null : new object[] { args.Skip(1).ToArray() });
+                if (result is Task task)
+                {
+                    task.GetAwaiter().GetResult();
+                    result = task is Task<int> withCode ? withCode.Result : 0;
+                }
+            }
+            catch (System.Reflection.TargetInvocationException e) when (e.InnerException != null)
+            {
+                System.Runtime.ExceptionServices.ExceptionDispatchInfo.Capture(e.InnerException).Throw();
+                throw;
+            }
+            return result is int code ? code : 0;
+        }
+    }
+}
+"""
+
+HOST_PROJECT = """<Project Sdk="Microsoft.NET.Sdk">
+  <PropertyGroup>
+    <OutputType>Exe</OutputType>
+    <TargetFramework>{tfm}</TargetFramework>
+    <Nullable>disable</Nullable>
+    <ImplicitUsings>disable</ImplicitUsings>
+    <InvariantGlobalization>true</InvariantGlobalization>
+  </PropertyGroup>
+  <ItemGroup>
+    <Reference Include="Microsoft.CodeAnalysis"><HintPath>{roslyn}/Microsoft.CodeAnalysis.dll</HintPath></Reference>
+    <Reference Include="Microsoft.CodeAnalysis.CSharp"><HintPath>{roslyn}/Microsoft.CodeAnalysis.CSharp.dll</HintPath></Reference>
+  </ItemGroup>
+</Project>
+"""
+
+# One JSON request per stdin line: {"sources": {name: code}, "output": dll path, "kind": "exe"|"library", "main": type}
+# One JSON response per stdout line: {"ok": bool, "errors": [{"file", "line", "message"}], "ms": compile time}
+HOST_SOURCE = r"""
+using System;
+using System.Collections.Generic;
+using System.Diagnostics;
+using System.IO;
+using System.Linq;
+using System.Text.Json;
+using Microsoft.CodeAnalysis;
+using Microsoft.CodeAnalysis.CSharp;
+
+static class CompileHost
+{
+    class Request
+    {
+        public Dictionary<string, string> sources { get; set; }
+        public string output { get; set; }
+        public string kind { get; set; }
+        public string main { get; set; }
+        public string usings { get; set; }
+    }
+
+    static readonly CSharpParseOptions ParseOptions = new CSharpParseOptions(LanguageVersion.Latest);
+    static List<MetadataReference> references;
+
+    static int Main()
+    {
+        references = ((string)AppContext.GetData("TRUSTED_PLATFORM_ASSEMBLIES")).Split(Path.PathSeparator)
+            .Where(path => !Path.GetFileName(path).StartsWith("Microsoft.CodeAnalysis"))
+            .Select(path => (MetadataReference)MetadataReference.CreateFromFile(path)).ToList();
+        // Warm the compiler (JIT, reference metadata) before the first real request
+        Compile(new Request { sources = new Dictionary<string, string> {
+            ["Warmup.cs"] = "class Program { static void Main() { System.Console.WriteLine(1); } }" } });
+        Respond(new Dictionary<string, object> { ["ready"] = true });
+
+        string line;
+        while ((line = Console.In.ReadLine()) != null)
+        {
+            try
+            {
+                Respond(Compile(JsonSerializer.Deserialize<Request>(line)));
+            }
+            catch (Exception e)
+            {
+                Respond(new Dictionary<string, object> {
+                    ["ok"] = false,
+                    ["errors"] = new[] { new Dictionary<string, object> { ["file"] = "", ["line"] = 0, ["message"] = "compile host: " + e.Message } }
+                });
+            }
+        }
+        return 0;
+    }
+
+    static Dictionary<string, object> Compile(Request request)
+    {
+        var watch = Stopwatch.StartNew();
+        var trees = request.sources.Select(source => CSharpSyntaxTree.ParseText(source.Value, ParseOptions, source.Key)).ToList();
+        if (!string.IsNullOrEmpty(request.usings))
+            trees.Add(CSharpSyntaxTree.ParseText(request.usings, ParseOptions, "GlobalUsings.g.cs"));
+        var options = new CSharpCompilationOptions(
+            request.kind == "library" ? OutputKind.DynamicallyLinkedLibrary : OutputKind.ConsoleApplication,
+            mainTypeName: string.IsNullOrEmpty(request.main) ? null : request.main,
+            nullableContextOptions: NullableContextOptions.Disable);
+        var name = request.output == null ? "Warmup" : Path.GetFileNameWithoutExtension(request.output);
+        var compilation = CSharpCompilation.Create(name, trees, references, options);
+
+        IEnumerable<Diagnostic> diagnostics;
+        bool ok;
+        if (request.output == null)
+        {
+            diagnostics = compilation.GetDiagnostics();
+            ok = !diagnostics.Any(d => d.Severity == DiagnosticSeverity.Error);
+        }
+        else
+        {
+            var result = compilation.Emit(request.output);
+            diagnostics = result.Diagnostics;
+            ok = result.Success;
+        }
+        var errors = diagnostics.Where(d => d.Severity == DiagnosticSeverity.Error).Take(50).Select(d => new Dictionary<string, object> {
+            ["file"] = d.Location.SourceTree?.FilePath ?? "",
+            ["line"] = d.Location.IsInSource ? d.Location.GetLineSpan().StartLinePosition.Line + 1 : 0,
+            ["message"] = d.Id + ": " + d.GetMessage()
+        }).ToList();
+        return new Dictionary<string, object> { ["ok"] = ok, ["errors"] = errors, ["ms"] = watch.ElapsedMilliseconds };
+    }
+
+    static void Respond(Dictionary<string, object> response)
+    {
+        Console.Out.WriteLine(JsonSerializer.Serialize(response));
+        Console.Out.Flush();
+    }
+}
+"""
+
+
+def prepare_csharp_source(src: str) -> str:
+    """Normalize C# source to compile cleanly and produce visible output when needed"""
+    try:
+        s = src or ""
+        # Ensure essential using directives
+        if "using System;" not in s:
+            s = "using System;\n" + s
+        if ("ArrayList" in s or "Hashtable" in s) and "using System.Collections;" not in s:
+            s = "using System.Collections;\n" + s
+        if (("List<" in s) or ("Dictionary<" in s)) and "using System.Collections.Generic;" not in s:
+            s = "using System.Collections.Generic;\n" + s
+        # Add System.IO when file-related APIs are detected
+        file_tokens = ["FileInfo", "Directory", "DirectoryInfo", "File.", "Path."]
+        if any(tok in s for tok in file_tokens) and "using System.IO;" not in s:
+            s = "using System.IO;\n" + s
+        # Ensure a Main entrypoint; using directives stay at the top of the file
+        if not _MAIN_METHOD.search(s):
+            lines = s.splitlines()
+            usings = [line for line in lines if _USING_DIRECTIVE.match(line)]
+            body = [line for line in lines if not _USING_DIRECTIVE.match(line)]
+            s = "\n".join(usings) + "\nclass Program {\n    static void Main() {\n" + "\n".join(body) + "\n    }\n}\n"
+        # Ensure at least one print inside Main
+        if "Console.WriteLine" not in s:
+            try:
+                s = re.sub(
+                    r'(static\s+void\s+Main\s*\([^\)]*\)\s*\{)',
+                    r'\1\n        Console.WriteLine("Program started...");',
+                    s,
+                    count=1
+                )
+            except Exception:
+                pass
+        return s
+    except Exception:
+        return src
+
+
+def format_compile_errors(errors: List[Dict[str, Any]]) -> str:
+    lines = [f"{e['file']}({e['line']}): error {e['message']}" if e.get('line') else f"error {e['message']}"
+             for e in errors]
+    return "Error compiling C# code:\n" + "\n".join(lines or ["compilation failed"])
+
+
+def wrap_in_namespace(source: str, namespace: str) -> str:
+    """Put a program (after its leading using directives) inside a namespace block"""
+    lines = source.splitlines()
+    head = 0
+    while head < len(lines) and (not lines[head].strip() or lines[head].lstrip().startswith('//')
+                                 or _USING_DIRECTIVE.match(lines[head])):
+        head += 1
+    return "\n".join(lines[:head] + [f"namespace {namespace} {{"] + lines[head:] + ["}"]) + "\n"
+
+
+def _strip_launcher(output: str, namespace: str) -> str:
+    """Output of a batched program as it would read when compiled alone (no namespace, no launcher frames)"""
+    if BATCH_NAMESPACE + '.Launcher' in output:
+        output = "\n".join(line for line in output.splitlines()
+                           if BATCH_NAMESPACE + '.Launcher' not in line
+                           and 'End of stack trace from previous location' not in line
+                           and not line.strip().startswith(('at System.RuntimeMethodHandle', 'at System.Reflection.')))
+    return output.replace(namespace + '.', '')
+
+
+def _sdk_info(dotnet: str) -> Tuple[str, str, str]:
+    """(SDK version, Roslyn directory, target framework) of the active .NET SDK"""
+    version = subprocess.run([dotnet, '--version'], capture_output=True, text=True, timeout=60).stdout.strip()
+    root = os.path.dirname(os.path.realpath(dotnet))
+    roslyn = os.path.join(root, 'sdk', version, 'Roslyn', 'bincore')
+    return version, roslyn, f"net{'.'.join(version.split('.')[:2])}"
+
+
+class CSharpCompileHost:
+    """
+    The compile host process; compile() requests are serialized over its stdin/stdout
+    """
+
+    def __init__(self, dotnet: str, host_dll: str, start_timeout: float = 60.0):
+        self.dotnet = dotnet
+        self.host_dll = host_dll
+        self.start_timeout = start_timeout
+        self.process: Optional[subprocess.Popen] = None
+        self.lock = threading.Lock()
+
+    def _start(self):
+        self.process = subprocess.Popen(
+            [self.dotnet, self.host_dll], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL, text=True, encoding='utf-8', bufsize=1, env=_dotnet_env()
+        )
+        ready = self._read_line(self.start_timeout)
+        if not ready or not ready.get('ready'):
+            self.stop()
+            raise RuntimeError("C# compile host did not start")
+
+    def _read_line(self, timeout: float) -> Optional[Dict[str, Any]]:
+        result: List[str] = []
+        reader = threading.Thread(target=lambda: result.append(self.process.stdout.readline()), daemon=True)
+        reader.start()
+        reader.join(timeout)
+        if not result or not result[0]:
+            return None
+        return json.loads(result[0])
+
+    def compile(self, sources: Dict[str, str], output: str, kind: str = 'exe', main: Optional[str] = None,
+                timeout: float = 60.0) -> Dict[str, Any]:
+        request = json.dumps({'sources': sources, 'output': output, 'kind': kind, 'main': main or '',
+                              'usings': GLOBAL_USINGS})
+        with self.lock:
+            for attempt in range(2):
+                try:
+                    if self.process is None or self.process.poll() is not None:
+                        self._start()
+                    self.process.stdin.write(request + '\n')
+                    self.process.stdin.flush()
+                    response = self._read_line(timeout)
+                    if response is None:
+                        raise RuntimeError("C# compile host did not answer")
+                    return response
+                except (OSError, ValueError, RuntimeError) as e:
+                    logger.warning(f"C# compile host failed ({e}); restarting it")
+                    self.stop()
+                    if attempt:
+                        raise
+
+    def stop(self):
+        if self.process is not None:
+            try:
+                self.process.kill()
+                self.process.wait(5)
+            except Exception:
+                pass
+            self.process = None
+
+
+def _staging_dir(final_dir: str) -> str:
+    """Private directory to build into: other processes may be building the same host or template"""
+    staging = f"{final_dir}.tmp-{os.getpid()}-{threading.get_ident()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    return staging
+
+
+def _publish(staging: str, final_dir: str, marker: str):
+    """Move a finished build into place; if another process got there first, keep its build"""
+    if os.path.isdir(final_dir) and not os.path.isfile(os.path.join(final_dir, marker)):
+        shutil.rmtree(final_dir, ignore_errors=True)  # An unfinished build from an older version
+    try:
+        os.rename(staging, final_dir)
+    except OSError:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def _dotnet_env(**extra: str) -> Dict[str, str]:
+    return dict(os.environ, DOTNET_CLI_TELEMETRY_OPTOUT='1', DOTNET_NOLOGO='1', DOTNET_SKIP_FIRST_TIME_EXPERIENCE='1',
+                **extra)
+
+
+class CSharpRunner:
+    """
+    Compile-and-run backend for C# programs (compile host, or the pre-restored template)
+    """
+
+    def __init__(self, dotnet: str, cache_dir: str, timeout: float = 10.0, memory_mb: int = 256,
+                 use_host: bool = True, max_parallel: int = 4):
+        self.dotnet = dotnet
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        self.use_host = use_host
+        self.max_parallel = max_parallel
+        self.output_limits = OutputLimits.for_language('c#')
+        self.locks: Dict[int, threading.Lock] = {}
+        self.pid: Optional[int] = None  # Process the runner is prepared in
+        self.preparing_pid: Optional[int] = None
+        self.host: Optional[CSharpCompileHost] = None
+        self.runtimeconfig: Optional[str] = None
+        self.template_dir: Optional[str] = None
+        self.area: Optional[FixtureArea] = None
+        self.stats_lock = threading.Lock()
+        self.counters = {'runs': 0, 'compile_errors': 0, 'timeouts': 0, 'compile_seconds': 0.0, 'run_seconds': 0.0,
+                         'host_failures': 0, 'output_limit_stops': 0, 'batches': 0, 'batched_programs': 0, 'batch_rejects': 0}
+
+    @classmethod
+    def from_env(cls, dotnet: str) -> 'CSharpRunner':
+        return cls(
+            dotnet,
+            os.getenv('CSHARP_CACHE_DIR', os.path.join('cache', 'csharp')),
+            timeout=float(os.getenv('SANDBOX_TIMEOUT_SECONDS', '10')),
+            memory_mb=int(os.getenv('SANDBOX_MEMORY_MB', '256')),
+            use_host=os.getenv('CSHARP_COMPILE_HOST', 'true').lower() == 'true',
+            max_parallel=int(os.getenv('CSHARP_MAX_PARALLEL', '4'))
+        )
+
+    def _count(self, key: str, amount=1):
+        with self.stats_lock:
+            self.counters[key] += amount
+
+    # ----- one-time preparation -----
+
+    def _lock(self) -> threading.Lock:
+        # One lock per process: a lock held by a thread when the process forked (gunicorn --preload)
+        # stays held in the child, where nothing would ever release it
+        pid = os.getpid()
+        lock = self.locks.get(pid)
+        return lock if lock is not None else self.locks.setdefault(pid, threading.Lock())
+
+    @property
+    def prepared(self) -> bool:
+        return self.pid == os.getpid()
+
+    def prepare(self):
+        """Build the compile host (or the template) and start it in this process; later calls return immediately
+
+        Per process, like SandboxPool: a forked child never uses the parent's
+        host pipes and prepares its own (the build on disk is reused).
+        """
+        if self.prepared:
+            return
+        with self._lock():
+            if self.prepared:
+                return
+            version, roslyn, tfm = _sdk_info(self.dotnet)
+            # Anything here was inherited from the parent process and belongs to it
+            self.host, self.template_dir, self.runtimeconfig = None, None, None
+            self.area = FixtureArea(tmpfs_root())
+            if self.use_host and os.path.isfile(os.path.join(roslyn, 'Microsoft.CodeAnalysis.CSharp.dll')):
+                try:
+                    host_dll = self._build_host(version, roslyn, tfm)
+                    self.host = CSharpCompileHost(self.dotnet, host_dll)
+                    self.runtimeconfig = host_dll[:-len('.dll')] + '.runtimeconfig.json'
+                    self.host.compile({'Probe.cs': 'class Program { static void Main() {} }'},
+                                      os.path.join(self.area.path, 'probe.dll'))
+                except Exception as e:
+                    logger.warning(f"C# compile host unavailable ({e}); using the project template")
+                    self.host = None
+            if self.host is None:
+                self.template_dir = self._build_template(version)
+            self.pid = os.getpid()
+            logger.info(f"C# runner ready ({'compile host' if self.host else 'template build'}, SDK {version})")
+
+    def _build_host(self, version: str, roslyn: str, tfm: str) -> str:
+        project = HOST_PROJECT.format(tfm=tfm, roslyn=roslyn)
+        digest = hashlib.sha256((project + HOST_SOURCE).encode('utf-8')).hexdigest()[:12]
+        host_dir = os.path.join(self.cache_dir, f'host-{version}-{digest}')
+        host_dll = os.path.join(host_dir, 'out', 'CompileHost.dll')
+        if os.path.isfile(host_dll):
+            return host_dll
+        staging = _staging_dir(host_dir)
+        with open(os.path.join(staging, 'CompileHost.csproj'), 'w', encoding='utf-8') as f:
+            f.write(project)
+        with open(os.path.join(staging, 'CompileHost.cs'), 'w', encoding='utf-8') as f:
+            f.write(HOST_SOURCE)
+        build = subprocess.run([self.dotnet, 'build', '-c', 'Release', '-o', 'out', '-v:q', '-nologo'], cwd=staging,
+                               capture_output=True, text=True, timeout=600, env=_dotnet_env())
+        if build.returncode != 0 or not os.path.isfile(os.path.join(staging, 'out', 'CompileHost.dll')):
+            shutil.rmtree(staging, ignore_errors=True)
+            raise RuntimeError((build.stdout or build.stderr or 'build failed').strip()[-500:])
+        _publish(staging, host_dir, os.path.join('out', 'CompileHost.dll'))
+        return host_dll
+
+    def _build_template(self, version: str) -> str:
+        """Console project restored once; copies build with --no-restore"""
+        template_dir = os.path.join(self.cache_dir, f'template-{version}')
+        marker = os.path.join('obj', 'project.assets.json')
+        if os.path.isfile(os.path.join(template_dir, marker)):
+            return template_dir
+        staging = _staging_dir(template_dir)
+        for command in (['new', 'console', '--force', '-n', 'Program', '-o', '.'], ['restore']):
+            step = subprocess.run([self.dotnet] + command, cwd=staging, capture_output=True, text=True,
+                                  timeout=600, env=_dotnet_env())
+            if step.returncode != 0:
+                shutil.rmtree(staging, ignore_errors=True)
+                raise RuntimeError(f"dotnet {command[0]} failed: {(step.stderr or step.stdout).strip()[-500:]}")
+        _publish(staging, template_dir, marker)
+        return template_dir
+
+    # ----- compile and run -----
+
+    def _compile(self, source: str, build_dir: str) -> Tuple[Optional[str], Optional[str]]:
+        """(dll path, None) or (None, error text)"""
+        started = time.monotonic()
+        try:
+            if self.host is not None:
+                dll = os.path.join(build_dir, 'Program.dll')
+                try:
+                    response = self.host.compile({'Program.cs': source}, dll)
+                except Exception as e:
+                    self._count('host_failures')
+                    return None, f"Error compiling C# code: {e}"
+                if not response.get('ok'):
+                    return None, format_compile_errors(response.get('errors', []))
+                shutil.copyfile(self.runtimeconfig, os.path.join(build_dir, 'Program.runtimeconfig.json'))
+                return dll, None
+
+            shutil.copytree(self.template_dir, build_dir, dirs_exist_ok=True,
+                            ignore=shutil.ignore_patterns('bin', 'out'))
+            with open(os.path.join(build_dir, 'Program.cs'), 'w', encoding='utf-8') as f:
+                f.write(source)
+            build = subprocess.run([self.dotnet, 'build', '--no-restore', '-v:q', '-nologo', '-o', 'out'],
+                                   cwd=build_dir, capture_output=True, text=True, timeout=300, env=_dotnet_env())
+            if build.returncode != 0:
+                errors = [re.sub(r'\s*\[[^\]]*\.csproj\]$', '', line.strip()).replace(build_dir + os.sep, '')
+                          for line in build.stdout.splitlines() if ': error ' in line]
+                return None, "Error compiling C# code:\n" + "\n".join(dict.fromkeys(errors) or ['dotnet build failed'])
+            return os.path.join(build_dir, 'out', 'Program.dll'), None
+        finally:
+            self._count('compile_seconds', time.monotonic() - started)
+
+    def execute(self, dll: str, uses_files: bool = False, args: Tuple[str, ...] = ()) -> str:
+        """Run a compiled program in its own directory with the timeout and heap limit"""
+        run_dir = self.area.new_run_dir()
+        self.area.materialize(run_dir, uses_files)
+        started = time.monotonic()
+        env = _dotnet_env(TMPDIR=run_dir, DOTNET_GCHeapHardLimit=hex(self.memory_mb * 1024 * 1024),
+                          DOTNET_TieredPGO='0')
+        process = subprocess.Popen([self.dotnet, dll, *args], cwd=run_dir, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE, env=env, start_new_session=True)
+        try:
+            captured = capture_process(process, self.output_limits, self.timeout)
+        finally:
+            self._count('run_seconds', time.monotonic() - started)
+            self.area.discard(run_dir)
+        if captured.timed_out:
+            self._count('timeouts')
+            return f"Error executing code: Execution timed out after {self.timeout:g}s"
+        if captured.limit_exceeded:
+            self._count('output_limit_stops')
+        return captured.output() or NO_OUTPUT_MESSAGE
+
+    def run(self, code: str) -> str:
+        """Compile and run one program; the output the legacy dotnet-run path produced"""
+        self.prepare()
+        source = prepare_csharp_source(code)
+        build_dir = self.area.new_run_dir() + '-build'
+        os.makedirs(build_dir)
+        try:
+            dll, error = self._compile(source, build_dir)
+            self._count('runs')
+            if error:
+                self._count('compile_errors')
+                return error
+            return self.execute(dll, any(token in source for token in CSHARP_FILE_OPERATIONS))
+        finally:
+            self.area.discard(build_dir)
+
+    def run_many(self, codes: List[str]) -> List[str]:
+        """Outputs of several programs (a document's answers), compiled together in one pass"""
+        self.prepare()
+        if self.host is None or len(codes) < 2:
+            return self._map(lambda index, code: self.run(code), range(len(codes)), codes)
+        sources = [prepare_csharp_source(code) for code in codes]
+        namespaces = [f'{BATCH_NAMESPACE}.Q{index + 1}' for index in range(len(codes))]
+        trees = {f'Q{index + 1}.cs': wrap_in_namespace(source, namespace)
+                 for index, (source, namespace) in enumerate(zip(sources, namespaces))}
+        build_dir = self.area.new_run_dir() + '-batch'
+        os.makedirs(build_dir)
+        dll = os.path.join(build_dir, 'Batch.dll')
+        started = time.monotonic()
+        try:
+            try:
+                while trees:
+                    response = self.host.compile(dict(trees, **{'Launcher.g.cs': BATCH_LAUNCHER}), dll,
+                                                 main=f'{BATCH_NAMESPACE}.Launcher')
+                    if response.get('ok'):
+                        break
+                    # Drop the programs with errors and compile the rest again
+                    failing = {error['file'] for error in response.get('errors', [])} & set(trees)
+                    self._count('batch_rejects', len(failing or trees))
+                    for name in failing or list(trees):
+                        del trees[name]
+            except Exception as e:
+                logger.warning(f"C# batch compile failed ({e}); compiling programs one by one")
+                trees = {}
+            finally:
+                self._count('compile_seconds', time.monotonic() - started)
+            self._count('batches')
+            self._count('batched_programs', len(trees))
+            if trees:
+                shutil.copyfile(self.runtimeconfig, os.path.join(build_dir, 'Batch.runtimeconfig.json'))
+
+            def one(index, code):
+                if f'Q{index + 1}.cs' not in trees:
+                    # On its own: reports its compile errors, or runs if only the batch broke it
+                    return self.run(code)
+                self._count('runs')
+                uses_files = any(token in sources[index] for token in CSHARP_FILE_OPERATIONS)
+                return _strip_launcher(self.execute(dll, uses_files, (namespaces[index],)), namespaces[index])
+
+            return self._map(one, range(len(codes)), codes)
+        finally:
+            self.area.discard(build_dir)
+
+    def _map(self, func, *iterables) -> List[str]:
+        with concurrent.futures.ThreadPoolExecutor(self.max_parallel, thread_name_prefix='csharp-run') as executor:
+            return list(executor.map(func, *iterables))
+
+    def start_background_prepare(self):
+        """Prepare this process's runner off the request path (e.g. while a C# document is being solved)
+
+        Called lazily, never at import: a master process that forks workers
+        (gunicorn --preload) must not be mid-build when it forks.
+        """
+        pid = os.getpid()
+        if self.prepared or self.preparing_pid == pid:
+            return
+        self.preparing_pid = pid
+
+        def prepare():
+            try:
+                self.prepare()
+            except Exception as e:
+                logger.warning(f"C# runner preparation failed: {e}")
+
+        threading.Thread(target=prepare, name='csharp-prepare', daemon=True).start()
+
+    def shutdown(self):
+        if not self.prepared:
+            return  # The host and run area belong to the process that prepared them
+        if self.host is not None:
+            self.host.stop()
+        if self.area is not None:
+            self.area.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.stats_lock:
+            counters = dict(self.counters)
+        runs = max(counters['runs'], 1)
+        return dict(
+            counters,
+            compile_seconds=round(counters['compile_seconds'], 2),
+            run_seconds=round(counters['run_seconds'], 2),
+            avg_compile_ms=round(counters['compile_seconds'] * 1000 / runs, 1),
+            avg_run_ms=round(counters['run_seconds'] * 1000 / runs, 1),
+            mode=('compile host' if self.host else 'template build') if self.prepared else 'not prepared',
+            timeout=self.timeout
+        )
+
+
+def create_csharp_runner() -> Optional[CSharpRunner]:
+    """C# runner configured by CSHARP_* variables, or None (no dotnet on PATH, or disabled)"""
+    if os.getenv('CSHARP_RUNNER_ENABLED', 'true').lower() != 'true':
+        return None
+    dotnet = shutil.which('dotnet')
+    if not dotnet:
+        return None
+    return CSharpRunner.from_env(dotnet)
@@ -0,0 +1,121 @@
+"""
+Dual Language - A target-language program and its Python twin from one request
+For languages whose screenshot output comes from running a Python version of
+the program (Java, C, C++, JavaScript), one request asks for the target code,
+the equivalent Python program and the expected output, separated by markers.
+A static consistency check (both programs complete, same printed text) guards
+against the two programs drifting apart; anything unusable returns None so
+the caller falls back to solving each language with its own request.
+"""
+
+import re
+import logging
+import threading
+from typing import Any, Dict, Optional, Set
+
+from code_stream import extract_code, is_complete_code
+
+logger = logging.getLogger(__name__)
+
+_SECTION = re.compile(r'^[ \t]*===\s*(CODE|PYTHON|OUTPUT|END)\s*===[ \t]*$', re.MULTILINE | re.IGNORECASE)
+_STRING_LITERAL = re.compile(r'"((?:[^"\\\n]|\\.)*)"|\'((?:[^\'\\\n]|\\.)*)\'')
+_WORD = re.compile(r'[A-Za-z]{3,}')
+# Share of the Python twin's literal words that must also appear in the target program
+MIN_LITERAL_OVERLAP = 0.5
+
+
+def dual_format_instructions(lang_str: str) -> str:
+    """Output format the dual-language prompt asks for"""
+    return f"""
+Also write the same program in Python: identical logic, fixed input values and printed output, so both print exactly the same text.
+Format the answer exactly like this, with nothing before the first marker or after the end marker:
+===CODE===
+<the {lang_str} code>
+===PYTHON===
+<the equivalent Python code>
+===OUTPUT===
+<the exact text both programs print>
+===END===
+"""
+
+
+class DualSolution:
+    """Target-language code, its Python twin and the output the model expects"""
+
+    def __init__(self, code: str, python: str, expected_output: Optional[str]):
+        self.code = code
+        self.python = python
+        self.expected_output = expected_output
+
+
+def parse_dual_response(text: str, language: str) -> Optional[DualSolution]:
+    """Split a dual-language response; None if a section is missing, truncated or incomplete"""
+    sections: Dict[str, str] = {}
+    markers = list(_SECTION.finditer(text or ''))
+    for position, marker in enumerate(markers):
+        name = marker.group(1).upper()
+        if name == 'END' or name in sections:
+            continue
+        section_end = markers[position + 1].start() if position + 1 < len(markers) else None
+        if section_end is None:
+            return None  # No end marker after this section: the response was cut off
+        sections[name] = text[marker.end():section_end]
+
+    if 'CODE' not in sections or 'PYTHON' not in sections:
+        return None
+    code = extract_code(sections['CODE'], language)
+    python = extract_code(sections['PYTHON'], 'python')
+    if not is_complete_code(code, language) or not is_complete_code(python, 'python'):
+        return None
+    output = sections.get('OUTPUT')
+    output = output.strip('\n') if output is not None and output.strip() else None
+    return DualSolution(code, python, output)
+
+
+def literal_words(code: str) -> Set[str]:
+    """Lower-cased words inside the string literals of a program"""
+    words = set()
+    for match in _STRING_LITERAL.finditer(code or ''):
+        words.update(word.lower() for word in _WORD.findall(match.group(1) or match.group(2) or ''))
+    return words
+
+
+def is_consistent(solution: DualSolution) -> bool:
+    """Whether the Python twin prints the same text as the target program (static check)"""
+    python_words = literal_words(solution.python)
+    if not python_words:
+        return True  # Nothing to compare (e.g. numbers only)
+    shared = python_words & literal_words(solution.code)
+    return len(shared) / len(python_words) >= MIN_LITERAL_OVERLAP
+
+
+def normalize_output(output: str) -> str:
+    """Output with trailing whitespace and blank lines ignored"""
+    lines = [line.rstrip() for line in (output or '').strip().splitlines()]
+    return '\n'.join(line for line in lines if line)
+
+
+def outputs_match(expected: Optional[str], actual: Optional[str]) -> bool:
+    return expected is not None and actual is not None and normalize_output(expected) == normalize_output(actual)
+
+
+class DualStats:
+    """Counters for dual-language requests and their consistency checks"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {'requests': 0, 'used': 0, 'unparseable': 0, 'inconsistent': 0,
+                         'output_matched': 0, 'output_mismatched': 0}
+
+    def count(self, key: str):
+        with self.lock:
+            self.counters[key] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            counters = dict(self.counters)
+        checked = counters['output_matched'] + counters['output_mismatched']
+        return dict(counters, output_match_rate=f"{(counters['output_matched'] / max(checked, 1) * 100):.1f}%")
+
+
+dual_stats = DualStats()
@@ -0,0 +1,578 @@
+"""
+Exec Backends - Run C, C++, Java and JavaScript answers with local toolchains
+These languages used to be "executed" by asking the model for a Python twin
+of the program and screenshotting the twin's output (or a canned line when
+the twin failed). With a local toolchain the displayed program itself runs:
+gcc/g++ build a binary, javac compiles classes for `java`, and node runs
+JavaScript directly. Build results (including compile errors) are cached on
+disk by a hash of the toolchain, flags and source, so a question asked again
+never compiles twice. javac runs inside a long-lived JVM (a small compile
+daemon using javax.tools), which keeps the compiler warm instead of paying
+JVM start-up and JIT warm-up for every program. Every run gets the sandbox
+limits (wall clock, CPU seconds, memory, file size) and its own tmpfs
+working directory with the mock files (sandbox_fs).
+"""
+
+import os
+import re
+import time
+import base64
+import shutil
+import signal
+import hashlib
+import logging
+import tempfile
+import threading
+import subprocess
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from output_capture import OutputLimits, capture_process
+from sandbox_fs import FixtureArea, tmpfs_root
+
+try:
+    import resource
+except ImportError:  # Windows - runs get the timeout but no rlimits
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+NO_OUTPUT_MESSAGE = "Program executed successfully but produced no visible output."
+COMPILE_ERROR_FILE = 'compile-error.txt'
+_SIGNAL_MESSAGES = {
+    signal.SIGXCPU: 'CPU time limit exceeded',
+    signal.SIGKILL: 'the program was killed (CPU or memory limit)',
+    signal.SIGSEGV: 'the program crashed (segmentation fault)',
+    signal.SIGABRT: 'the program aborted',
+    signal.SIGFPE: 'the program crashed (arithmetic error)',
+    signal.SIGXFSZ: 'file size limit exceeded',
+}
+
+
+def limits_from_env() -> Dict[str, Any]:
+    """The sandbox limits (SANDBOX_*), for when the Python sandbox pool is not running"""
+    return {
+        'timeout': float(os.getenv('SANDBOX_TIMEOUT_SECONDS', '10')),
+        'cpu_seconds': int(os.getenv('SANDBOX_CPU_SECONDS', '5')),
+        'memory_mb': int(os.getenv('SANDBOX_MEMORY_MB', '256')),
+        'file_size_mb': 16,
+    }
+
+
+def _child_limits(cpu_seconds: int, memory_mb: Optional[int], file_size_mb: int):
+    """rlimits applied between fork and exec (memory_mb=None: the runtime caps its own heap)"""
+    if cpu_seconds:
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+    if memory_mb:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_mb * 1024 * 1024,) * 2)
+    if file_size_mb:
+        resource.setrlimit(resource.RLIMIT_FSIZE, (file_size_mb * 1024 * 1024,) * 2)
+
+
+def run_limited(argv: Sequence[str], cwd: str, limits: Dict[str, Any], address_space: bool = True,
+                env: Optional[Dict[str, str]] = None, output_limits: Optional[OutputLimits] = None) -> Tuple[str, bool]:
+    """
+    Run a program with the sandbox limits; returns (output, timed_out)
+
+    address_space=False leaves memory to the runtime's own heap flag (the JVM
+    and V8 reserve far more virtual memory than they use, so RLIMIT_AS breaks them).
+    Output is read through bounded buffers; past output_limits.max_bytes the run is stopped.
+    """
+    timeout = limits['timeout']
+    preexec = None
+    if resource is not None:
+        memory = limits.get('memory_mb') if address_space else None
+        preexec = lambda: _child_limits(limits.get('cpu_seconds'), memory, limits.get('file_size_mb'))  # noqa: E731
+    process = subprocess.Popen(list(argv), cwd=cwd, env=dict(env or os.environ, TMPDIR=cwd),
+                               stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               start_new_session=True, preexec_fn=preexec)
+    captured = capture_process(process, output_limits or OutputLimits(), timeout)
+    if captured.timed_out:
+        return f"Error executing code: Execution timed out after {timeout:g}s", True
+    output = captured.output()
+    if captured.returncode < 0 and not captured.limit_exceeded:
+        reason = _SIGNAL_MESSAGES.get(-captured.returncode, f'the program was terminated (signal {-captured.returncode})')
+        return "\n".join(s for s in (output, f"Error executing code: {reason}") if s), False
+    return output or NO_OUTPUT_MESSAGE, False
+
+
+class ExecBackend:
+    """
+    One language's toolchain: build(source, directory) once per source, then command(directory) per run
+
+    Subclasses set languages, display_name, source_name and file_tokens, and
+    implement available(), toolchain() (identifies compiler and flags for the
+    cache key), build() and command().
+    """
+
+    languages: Tuple[str, ...] = ()
+    display_name = ''
+    source_name = 'main.txt'
+    file_tokens: Tuple[str, ...] = ()
+    address_space = True  # RLIMIT_AS for native binaries
+
+    def __init__(self, cache_dir: str, limits: Dict[str, Any], area: FixtureArea, max_entries: int = 2000):
+        self.cache_dir = os.path.abspath(os.path.join(cache_dir, self.languages[0]))
+        self.limits = limits
+        self.area = area
+        self.max_entries = max_entries
+        self.key_locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+        self.lock = threading.Lock()
+        self.fingerprint: Optional[str] = None
+        self.output_limits = OutputLimits.for_language(self.languages[0])
+        self.counters = {'runs': 0, 'builds': 0, 'cache_hits': 0, 'compile_errors': 0, 'timeouts': 0,
+                         'build_seconds': 0.0, 'run_seconds': 0.0}
+
+    def available(self) -> bool:
+        raise NotImplementedError
+
+    def toolchain(self) -> str:
+        raise NotImplementedError
+
+    def build(self, source_path: str, directory: str) -> Optional[str]:
+        """Build into directory; None on success, else the compiler's messages"""
+        return None
+
+    def command(self, directory: str) -> List[str]:
+        raise NotImplementedError
+
+    def prepare(self):
+        """Start toolchain daemons (no-op for most backends)"""
+
+    def shutdown(self):
+        pass
+
+    def _count(self, key: str, amount=1):
+        with self.lock:
+            self.counters[key] += amount
+
+    def artifact(self, source: str) -> Tuple[str, Optional[str]]:
+        """(cache directory, compile errors or None) for source, built at most once"""
+        if self.fingerprint is None:
+            self.fingerprint = self.toolchain()
+        key = hashlib.sha256(f"{self.fingerprint}\0{source}".encode('utf-8')).hexdigest()[:32]
+        target = os.path.join(self.cache_dir, key)
+        with self.lock:
+            key_lock = self.key_locks[key]
+        with key_lock:
+            if not os.path.isdir(target):
+                self._build_into(source, target)
+            else:
+                self._count('cache_hits')
+                os.utime(target)
+        with self.lock:
+            self.key_locks.pop(key, None)
+        error_path = os.path.join(target, COMPILE_ERROR_FILE)
+        if os.path.exists(error_path):
+            with open(error_path, encoding='utf-8') as f:
+                return target, f.read()
+        return target, None
+
+    def _build_into(self, source: str, target: str):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix='.build-', dir=self.cache_dir)
+        started = time.monotonic()
+        try:
+            source_path = os.path.join(staging, self.source_name)
+            with open(source_path, 'w', encoding='utf-8') as f:
+                f.write(source)
+            try:
+                error = self.build(source_path, staging)
+            except subprocess.TimeoutExpired:
+                error = "compilation timed out"
+            if error is not None:
+                with open(os.path.join(staging, COMPILE_ERROR_FILE), 'w', encoding='utf-8') as f:
+                    f.write(error.replace(staging + os.sep, '').strip() or 'compilation failed')
+            try:
+                os.replace(staging, target)
+            except OSError:  # Another process built the same source first
+                shutil.rmtree(staging, ignore_errors=True)
+        finally:
+            self._count('builds')
+            self._count('build_seconds', time.monotonic() - started)
+        self._prune()
+
+    def _prune(self):
+        """Drop the least recently used builds beyond max_entries"""
+        try:
+            entries = [e for e in os.scandir(self.cache_dir) if e.is_dir() and not e.name.startswith('.')]
+        except OSError:
+            return
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_entries + self.max_entries // 10]:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+    def run(self, code: str) -> str:
+        """Build (or reuse) and run a program; the output shown in the screenshot"""
+        if not code or code.startswith("Error"):
+            return f"Invalid code returned: {code}"
+        directory, error = self.artifact(code)
+        self._count('runs')
+        if error is not None:
+            self._count('compile_errors')
+            return f"Error compiling {self.display_name} code:\n{error}"
+        run_dir = self.area.new_run_dir()
+        started = time.monotonic()
+        try:
+            self.area.materialize(run_dir, any(token in code for token in self.file_tokens))
+            output, timed_out = run_limited(self.command(directory), run_dir, self.limits, self.address_space,
+                                            output_limits=self.output_limits)
+        finally:
+            self.area.discard(run_dir)
+            self._count('run_seconds', time.monotonic() - started)
+        if timed_out:
+            self._count('timeouts')
+        return output.replace(directory + os.sep, '')  # Stack traces name the cached script
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            counters = dict(self.counters)
+        return dict(counters, build_seconds=round(counters['build_seconds'], 2),
+                    run_seconds=round(counters['run_seconds'], 2), output_limits=self.output_limits.as_dict())
+
+
+def _first_line(argv: List[str]) -> str:
+    try:
+        completed = subprocess.run(argv, capture_output=True, text=True, timeout=30)
+        return ((completed.stdout or completed.stderr).strip().splitlines() or [''])[0]
+    except Exception:
+        return ''
+
+
+class NativeBackend(ExecBackend):
+    """gcc / g++: one binary per source"""
+
+    compiler = ''
+    flags: Tuple[str, ...] = ()
+    link_flags: Tuple[str, ...] = ('-lm',)
+
+    def available(self) -> bool:
+        return shutil.which(self.compiler) is not None
+
+    def toolchain(self) -> str:
+        return " ".join([_first_line([self.compiler, '--version']), *self.flags, *self.link_flags])
+
+    def build(self, source_path: str, directory: str) -> Optional[str]:
+        completed = subprocess.run(
+            [self.compiler, *self.flags, source_path, '-o', os.path.join(directory, 'program'), *self.link_flags],
+            cwd=directory, capture_output=True, text=True, timeout=60
+        )
+        return None if completed.returncode == 0 else (completed.stderr or completed.stdout)
+
+    def command(self, directory: str) -> List[str]:
+        return [os.path.join(directory, 'program')]
+
+
+class CBackend(NativeBackend):
+    languages = ('c',)
+    display_name = 'C'
+    source_name = 'main.c'
+    compiler = 'gcc'
+    flags = ('-O1', '-pipe', '-w', '-std=gnu11')
+    file_tokens = ('fopen', 'FILE', 'opendir')
+
+
+class CppBackend(NativeBackend):
+    languages = ('cpp', 'c++')
+    display_name = 'C++'
+    source_name = 'main.cpp'
+    compiler = 'g++'
+    flags = ('-O1', '-pipe', '-w', '-std=gnu++17')
+    file_tokens = ('fstream', 'fopen', 'filesystem')
+
+
+class NodeBackend(ExecBackend):
+    """node: no build step, the cached directory just holds the script"""
+
+    languages = ('javascript', 'js')
+    display_name = 'JavaScript'
+    source_name = 'main.js'
+    file_tokens = ("'fs'", '"fs"', "'path'", '"path"')
+    address_space = False
+
+    def available(self) -> bool:
+        return shutil.which('node') is not None
+
+    def toolchain(self) -> str:
+        return _first_line(['node', '--version'])
+
+    def command(self, directory: str) -> List[str]:
+        return ['node', f"--max-old-space-size={self.limits.get('memory_mb') or 256}",
+                os.path.join(directory, self.source_name)]
+
+
+# Warm javac: one request per stdin line ("<source dir>\t<class output dir>"),
+# one response per stdout line ("OK", or "ERROR " + base64 of the compiler messages)
+JAVA_DAEMON_SOURCE = r"""
+import javax.tools.JavaCompiler;
+import javax.tools.ToolProvider;
+import java.io.BufferedReader;
+import java.io.ByteArrayOutputStream;
+import java.io.InputStreamReader;
+import java.nio.charset.StandardCharsets;
+import java.nio.file.Files;
+import java.nio.file.Path;
+import java.nio.file.Paths;
+import java.util.ArrayList;
+import java.util.Base64;
+import java.util.List;
+import java.util.stream.Stream;
+
+public class CompileDaemon {
+    public static void main(String[] args) throws Exception {
+        JavaCompiler compiler = ToolProvider.getSystemJavaCompiler();
+        if (compiler == null) {
+            System.out.println("ERROR " + encode("no system Java compiler"));
+            return;
+        }
+        System.out.println("READY");
+        System.out.flush();
+        BufferedReader in = new BufferedReader(new InputStreamReader(System.in, StandardCharsets.UTF_8));
+        String line;
+        while ((line = in.readLine()) != null) {
+            String[] parts = line.split("\t");
+            try {
+                List<String> options = new ArrayList<>(List.of("-d", parts[1], "-encoding", "UTF-8", "-nowarn", "-proc:none"));
+                try (Stream<Path> files = Files.list(Paths.get(parts[0]))) {
+                    files.filter(path -> path.toString().endsWith(".java")).forEach(path -> options.add(path.toString()));
+                }
+                ByteArrayOutputStream messages = new ByteArrayOutputStream();
+                int status = compiler.run(null, messages, messages, options.toArray(new String[0]));
+                System.out.println(status == 0 ? "OK" : "ERROR " + encode(messages.toString(StandardCharsets.UTF_8)));
+            } catch (Exception e) {
+                System.out.println("ERROR " + encode("compile daemon: " + e));
+            }
+            System.out.flush();
+        }
+    }
+
+    static String encode(String text) {
+        return Base64.getEncoder().encodeToString(text.getBytes(StandardCharsets.UTF_8));
+    }
+}
+"""
+
+_JAVA_PACKAGE = re.compile(r'^\s*package\s+([\w.]+)\s*;', re.MULTILINE)
+# A type declaration (not a `Foo.class` literal) or a brace, in code with comments and literals blanked
+_JAVA_DECLARATION_OR_BRACE = re.compile(r'(?<![.\w])(?:class|interface|enum|record)\s+(\w+)|[{}]')
+_JAVA_COMMENTS_AND_LITERALS = re.compile(
+    r'//[^\n]*|/\*.*?\*/|"""(?:\\.|[^\\])*?"""|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'', re.DOTALL)
+_JAVA_PUBLIC_CLASS = re.compile(r'\bpublic\s+(?:final\s+|abstract\s+)*(?:class|interface|enum|record)\s+(\w+)')
+_JAVA_MAIN = re.compile(r'\bstatic\s+void\s+main\s*\(')
+
+
+def _java_code(source: str) -> str:
+    """Source with comments and string literals blanked (offsets kept), so braces and keywords in them do not count"""
+    return _JAVA_COMMENTS_AND_LITERALS.sub(lambda m: re.sub(r'[^\n]', ' ', m.group()), source)
+
+
+class JavaBackend(ExecBackend):
+    """javac (in the warm compile daemon when enabled) and one `java` process per run"""
+
+    languages = ('java',)
+    display_name = 'Java'
+    file_tokens = ('File', 'Files.', 'Paths.', 'Reader', 'Writer')
+    address_space = False
+    jvm_flags = ('-XX:+UseSerialGC', '-XX:TieredStopAtLevel=1', '-Xshare:auto')
+
+    def __init__(self, *args, daemon: bool = True, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.use_daemon = daemon
+        self.daemon: Optional[subprocess.Popen] = None
+        self.daemon_pid: Optional[int] = None
+        self.daemon_locks: Dict[int, threading.Lock] = {}
+
+    def available(self) -> bool:
+        return shutil.which('javac') is not None and shutil.which('java') is not None
+
+    def toolchain(self) -> str:
+        return _first_line(['javac', '-version'])
+
+    @staticmethod
+    def main_class(source: str) -> str:
+        """Binary name of the class whose body declares main (the public class when several do)"""
+        code = _java_code(source)
+        bodies: List[Tuple[str, int, int]] = []  # (binary name, body start, body end)
+        open_bodies: List[Tuple[Optional[str], int]] = []
+        pending = None
+        for token in _JAVA_DECLARATION_OR_BRACE.finditer(code):
+            if token.group(1):
+                pending = token.group(1)
+            elif token.group() == '{':
+                open_bodies.append((pending, token.start()))
+                pending = None
+            elif open_bodies:
+                name, start = open_bodies.pop()
+                if name:
+                    outer = [enclosing for enclosing, _ in open_bodies if enclosing]
+                    bodies.append(('$'.join(outer + [name]), start, token.start()))
+        owners = []
+        for main in _JAVA_MAIN.finditer(code):
+            enclosing = [body for body in bodies if body[1] < main.start() < body[2]]
+            if enclosing:
+                owners.append(max(enclosing, key=lambda body: body[1])[0])  # The innermost class
+        public = _JAVA_PUBLIC_CLASS.search(code)
+        name = public.group(1) if public and public.group(1) in owners else (owners[0] if owners else 'Main')
+        package = _JAVA_PACKAGE.search(code)
+        return f"{package.group(1)}.{name}" if package else name
+
+    def _start_daemon(self) -> subprocess.Popen:
+        digest = hashlib.sha256(f"{self.toolchain()}\0{JAVA_DAEMON_SOURCE}".encode('utf-8')).hexdigest()[:12]
+        daemon_dir = os.path.join(self.cache_dir, f'.daemon-{digest}')
+        if not os.path.isfile(os.path.join(daemon_dir, 'CompileDaemon.class')):
+            os.makedirs(daemon_dir, exist_ok=True)
+            with open(os.path.join(daemon_dir, 'CompileDaemon.java'), 'w', encoding='utf-8') as f:
+                f.write(JAVA_DAEMON_SOURCE)
+            subprocess.run(['javac', '-d', daemon_dir, os.path.join(daemon_dir, 'CompileDaemon.java')],
+                           check=True, capture_output=True, timeout=120)
+        process = subprocess.Popen(['java', '-XX:+UseSerialGC', '-cp', daemon_dir, 'CompileDaemon'],
+                                   stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                   text=True, encoding='utf-8', bufsize=1)
+        if process.stdout.readline().strip() != 'READY':
+            process.kill()
+            raise RuntimeError("Java compile daemon did not start")
+        return process
+
+    def _daemon_lock(self) -> threading.Lock:
+        # One lock per process: a lock held by a thread when the process forked (gunicorn --preload)
+        # stays held in the child, where nothing would ever release it
+        pid = os.getpid()
+        lock = self.daemon_locks.get(pid)
+        return lock if lock is not None else self.daemon_locks.setdefault(pid, threading.Lock())
+
+    def _live_daemon(self) -> subprocess.Popen:
+        """This process's compile daemon, started on first use (one inherited across fork is the parent's)"""
+        if self.daemon is None or self.daemon_pid != os.getpid() or self.daemon.poll() is not None:
+            self.daemon = self._start_daemon()
+            self.daemon_pid = os.getpid()
+        return self.daemon
+
+    def _stop_daemon(self):
+        if self.daemon is not None and self.daemon_pid == os.getpid():
+            self.daemon.kill()
+        self.daemon = None
+
+    def prepare(self):
+        if not self.use_daemon:
+            return
+        with self._daemon_lock():
+            self._live_daemon()
+        # Warm the compiler before the first real program
+        self.artifact('public class Main { public static void main(String[] args) { System.out.println(1); } }')
+
+    def _compile_in_daemon(self, source_dir: str, classes_dir: str) -> Optional[str]:
+        with self._daemon_lock():
+            for attempt in range(2):
+                try:
+                    daemon = self._live_daemon()
+                    daemon.stdin.write(f"{source_dir}\t{classes_dir}\n")
+                    daemon.stdin.flush()
+                    response = daemon.stdout.readline().strip()
+                    if not response:
+                        raise RuntimeError("Java compile daemon exited")
+                    return None if response == 'OK' else base64.b64decode(response[len('ERROR '):]).decode('utf-8')
+                except (OSError, RuntimeError, subprocess.SubprocessError) as e:
+                    logger.warning(f"Java compile daemon failed ({e}); restarting it")
+                    self._stop_daemon()
+                    if attempt:
+                        raise
+
+    def build(self, source_path: str, directory: str) -> Optional[str]:
+        with open(source_path, encoding='utf-8') as f:
+            source = f.read()
+        # javac wants a public class in a file of the same name
+        public = _JAVA_PUBLIC_CLASS.search(_java_code(source))
+        source_dir = os.path.join(directory, 'src')
+        os.makedirs(source_dir)
+        os.replace(source_path, os.path.join(source_dir, f"{public.group(1) if public else 'Main'}.java"))
+        classes_dir = os.path.join(directory, 'classes')
+        os.makedirs(classes_dir)
+        with open(os.path.join(directory, 'main-class'), 'w', encoding='utf-8') as f:
+            f.write(self.main_class(source))
+        if self.use_daemon:
+            try:
+                return self._compile_in_daemon(source_dir, classes_dir)
+            except Exception as e:
+                logger.warning(f"Java compile daemon unavailable ({e}); using javac")
+        files = [os.path.join(source_dir, name) for name in os.listdir(source_dir)]
+        completed = subprocess.run(['javac', '-d', classes_dir, '-encoding', 'UTF-8', '-nowarn', *files],
+                                   capture_output=True, text=True, timeout=120)
+        return None if completed.returncode == 0 else (completed.stderr or completed.stdout)
+
+    def command(self, directory: str) -> List[str]:
+        with open(os.path.join(directory, 'main-class'), encoding='utf-8') as f:
+            main_class = f.read().strip()
+        return ['java', *self.jvm_flags, f"-Xmx{self.limits.get('memory_mb') or 256}m",
+                '-cp', os.path.join(directory, 'classes'), main_class]
+
+    def shutdown(self):
+        with self._daemon_lock():
+            self._stop_daemon()
+
+
+class ExecBackends:
+    """
+    The available backends by language name (as used in uploads: 'c', 'cpp', 'java', 'javascript')
+    """
+
+    def __init__(self, backends: Sequence[ExecBackend], area: FixtureArea):
+        self.backends = list(backends)
+        self.area = area
+        self.by_language = {language: backend for backend in self.backends for language in backend.languages}
+        self.preparing: Set[Tuple[int, str]] = set()
+
+    def get(self, language: str) -> Optional[ExecBackend]:
+        return self.by_language.get((language or '').strip().lower())
+
+    def start_background_prepare(self, language: str):
+        """Start a language's toolchain daemon off the request path (e.g. while its questions are solved)
+
+        Called lazily and per process, never at import: a master process that
+        forks workers (gunicorn --preload) must not be starting daemons when it forks.
+        """
+        backend = self.get(language)
+        if backend is None or (os.getpid(), backend.languages[0]) in self.preparing:
+            return
+        self.preparing.add((os.getpid(), backend.languages[0]))
+
+        def prepare():
+            try:
+                backend.prepare()
+            except Exception as e:
+                logger.warning(f"{backend.display_name} backend preparation failed: {e}")
+
+        threading.Thread(target=prepare, name=f'exec-prepare-{backend.languages[0]}', daemon=True).start()
+
+    def shutdown(self):
+        for backend in self.backends:
+            backend.shutdown()
+        self.area.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {backend.languages[0]: backend.stats() for backend in self.backends}
+
+
+def create_exec_backends(limits: Optional[Dict[str, Any]] = None) -> Optional[ExecBackends]:
+    """Backends for the toolchains installed on this machine, configured by EXEC_* variables
+    (None when disabled or when no toolchain is installed)"""
+    if os.getenv('EXEC_BACKENDS_ENABLED', 'true').lower() != 'true':
+        return None
+    limits = dict(limits or limits_from_env())
+    cache_dir = os.getenv('EXEC_CACHE_DIR', os.path.join('cache', 'exec'))
+    max_entries = int(os.getenv('EXEC_CACHE_MAX_ENTRIES', '2000'))
+    area = FixtureArea(tmpfs_root())
+    candidates = [
+        CBackend(cache_dir, limits, area, max_entries),
+        CppBackend(cache_dir, limits, area, max_entries),
+        JavaBackend(cache_dir, limits, area, max_entries,
+                    daemon=os.getenv('JAVA_COMPILE_DAEMON', 'true').lower() == 'true'),
+        NodeBackend(cache_dir, limits, area, max_entries),
+    ]
+    backends = [backend for backend in candidates if backend.available()]
+    if not backends:
+        area.close()
+        return None
+    logger.info(f"Local execution backends: {', '.join(b.display_name for b in backends)}")
+    return ExecBackends(backends, area)
@@ -0,0 +1,179 @@
+"""
+Execution Cache - Outputs of programs that have already been run
+Running the same generated program again prints the same text for nearly
+every assignment question, yet every solution (cached ones included) was
+executed again for each upload. Outputs are cached by language, a hash of the
+exact code, the mock-file fixture version and the executor version, in the
+same stores as the solution cache (create_cache_store 'executions'
+namespace), so a repeated assignment skips both the LLM call and execution.
+Programs whose output depends on randomness, the clock or thread scheduling
+are never cached, and only results that say something about the program
+(successful output, compile errors) are stored: timeouts and sandbox
+failures depend on load and are always run again.
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from sandbox_fs import FIXTURE_VERSION
+from solution_cache import create_cache_store, normalize_language
+from solution_corpus import looks_successful
+
+logger = logging.getLogger(__name__)
+
+# Bump when an executor changes what programs print (wrappers, no-output messages, limits)
+EXECUTOR_VERSION = '2'
+
+# Code that prints something different on every run (random values, clock, scheduling order)
+_NONDETERMINISTIC = {
+    'python': r'\b(?:random|time|datetime|uuid|secrets|threading|multiprocessing|asyncio)\b|os\.urandom|\bid\(',
+    'c': r'\b(?:rand|srand|random|time|clock|gettimeofday|clock_gettime|pthread_create)\s*\(',
+    'c++': r'<(?:random|chrono|ctime|thread|future)>|\b(?:rand|srand|time|clock)\s*\(',
+    'java': r'\b(?:Random|ThreadLocalRandom|SecureRandom|UUID|Thread|ExecutorService|LocalDate|LocalDateTime|'
+            r'LocalTime|Instant|Date|Calendar)\b|Math\.random|System\.(?:currentTimeMillis|nanoTime)',
+    'javascript': r'Math\.random|\bDate\b|performance\.now|\bcrypto\b|setTimeout|setInterval|process\.hrtime',
+    'c#': r'\b(?:Random|Guid|DateTime|DateTimeOffset|Stopwatch|Thread|Task\.Run|Parallel)\b|Environment\.TickCount',
+}
+_NONDETERMINISTIC_PATTERNS = {language: re.compile(pattern) for language, pattern in _NONDETERMINISTIC.items()}
+
+
+def is_deterministic(code: str, language: str) -> bool:
+    """Whether a program can be expected to print the same text every run"""
+    pattern = _NONDETERMINISTIC_PATTERNS.get(normalize_language(language))
+    return pattern is None or not pattern.search(code or '')
+
+
+def result_status(code: str, output: Optional[str]) -> Optional[str]:
+    """'ok' or 'compile_error' for results worth caching, None for everything else"""
+    if output and output.startswith('Error compiling'):
+        return 'compile_error'
+    return 'ok' if looks_successful(code, output) else None
+
+
+class ExecutionCache:
+    """
+    Execution results keyed by (language, code hash, fixture version, executor version)
+    """
+
+    def __init__(self, store, fixture_version: str = FIXTURE_VERSION, executor_version: str = EXECUTOR_VERSION):
+        self.store = store
+        self.version = f"{fixture_version}:{executor_version}"
+
+    def key_for(self, language: str, code: str) -> str:
+        raw = f"{self.version}\x1f{normalize_language(language)}\x1f{code}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, language: str, code: str) -> Optional[Dict[str, Any]]:
+        """Cached {'output', 'status', 'seconds', 'created_at'} for a program, or None"""
+        try:
+            value = self.store.get(self.key_for(language, code))
+        except Exception as e:
+            logger.warning(f"Execution cache read failed: {e}")
+            return None
+        if value is None:
+            self._count('misses')
+            return None
+        try:
+            record = json.loads(value)
+        except ValueError:
+            return None
+        self._count('hits')
+        self._count('seconds_saved_ms', int(record.get('seconds', 0) * 1000))
+        return record
+
+    def set(self, language: str, code: str, output: str, seconds: float) -> bool:
+        """Store a result if it is worth caching; returns whether it was stored"""
+        status = result_status(code, output)
+        if status is None:
+            self._count('not_stored')
+            return False
+        record = {'output': output, 'status': status, 'seconds': round(seconds, 4), 'created_at': time.time()}
+        try:
+            self.store.set(self.key_for(language, code), json.dumps(record))
+            self._count('sets')
+            return True
+        except Exception as e:
+            logger.warning(f"Execution cache write failed: {e}")
+            return False
+
+    def run(self, language: str, code: str, execute: Callable[[str], str]) -> str:
+        """Output of code, from the cache or from execute(code) (stored when cacheable)"""
+        if not is_deterministic(code, language):
+            self._count('bypassed')
+            return execute(code)
+        cached = self.get(language, code)
+        if cached is not None:
+            return cached['output']
+        started = time.monotonic()
+        output = execute(code)
+        self.set(language, code, output, time.monotonic() - started)
+        return output
+
+    def run_many(self, language: str, codes: Sequence[str], execute_many: Callable[[List[str]], List[str]]) -> List[str]:
+        """Like run() for a batch: only the programs without a cached result go to execute_many"""
+        outputs: List[Optional[str]] = [None] * len(codes)
+        cacheable = [is_deterministic(code, language) for code in codes]
+        for index, code in enumerate(codes):
+            if not cacheable[index]:
+                self._count('bypassed')
+                continue
+            cached = self.get(language, code)
+            if cached is not None:
+                outputs[index] = cached['output']
+        missing = [index for index, output in enumerate(outputs) if output is None]
+        if missing:
+            started = time.monotonic()
+            results = execute_many([codes[index] for index in missing])
+            # A batch has no per-program timing: each program is charged an equal share
+            share = (time.monotonic() - started) / len(missing)
+            for index, output in zip(missing, results):
+                outputs[index] = output
+                if cacheable[index]:
+                    self.set(language, codes[index], output, share)
+        return outputs
+
+    def _count(self, counter: str, amount: int = 1):
+        try:
+            self.store.incr(counter, amount)
+        except Exception as e:
+            logger.debug(f"Execution cache counter update failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        try:
+            counters = self.store.counters_snapshot()
+            size = self.store.size()
+        except Exception as e:
+            return {'backend': type(self.store).__name__, 'error': str(e)}
+        hits = counters.get('hits', 0)
+        misses = counters.get('misses', 0)
+        return {
+            'backend': type(self.store).__name__,
+            'version': self.version,
+            'entries': size,
+            'hits': hits,
+            'misses': misses,
+            'sets': counters.get('sets', 0),
+            'not_stored': counters.get('not_stored', 0),
+            'bypassed_nondeterministic': counters.get('bypassed', 0),
+            'execution_seconds_saved': round(counters.get('seconds_saved_ms', 0) / 1000, 1),
+            'hit_rate': f"{(hits / max(hits + misses, 1) * 100):.1f}%"
+        }
+
+
+def create_execution_cache() -> Optional[ExecutionCache]:
+    """Create the execution cache configured by EXECUTION_CACHE_* environment variables (None if disabled)"""
+    if os.getenv('EXECUTION_CACHE_ENABLED', 'true').lower() != 'true':
+        return None
+    store = create_cache_store(
+        'executions',
+        backend=os.getenv('EXECUTION_CACHE_BACKEND'),
+        max_entries=int(os.getenv('EXECUTION_CACHE_MAX_ENTRIES', '20000')),
+        ttl_seconds=int(os.getenv('EXECUTION_CACHE_TTL_SECONDS', str(30 * 24 * 3600)))
+    )
+    logger.info(f"Execution cache initialized with {type(store).__name__}")
+    return ExecutionCache(store)
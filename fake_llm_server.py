@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+"""
+Fake LLM Server - Local stand-in for the Anthropic and DeepSeek APIs
+Speaks the Anthropic messages API (/v1/messages) and the OpenAI-compatible
+DeepSeek chat-completions API (/v1/chat/completions, /chat/completions),
+streamed (SSE) and non-streamed, so the whole app can be load-tested offline:
+
+    python fake_llm_server.py --port 8765 --latency lognormal:0.8,0.5 --rate-limit 0.05
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8765 DEEPSEEK_BASE_URL=http://127.0.0.1:8765/v1/chat/completions python app.py
+
+Latency is a time-to-first-token distribution plus a streaming rate. 429,
+5xx and 529 responses can be injected at configurable rates. Answers come
+from canned per-question responses, a replay cassette recorded from real
+traffic (--record proxies to the real APIs and saves what they returned),
+or a generated program in the requested language.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+ANTHROPIC_UPSTREAM = 'https://api.anthropic.com'
+DEEPSEEK_UPSTREAM = 'https://api.deepseek.com/v1/chat/completions'
+CHARS_PER_TOKEN = 4
+
+_QUESTION = re.compile(r'^start\s*\n(.*?)\n\s*end\s*$', re.MULTILINE | re.DOTALL)
+_LANGUAGE = re.compile(r'Write (?:only )?the ([\w#+]+) code', re.IGNORECASE)
+_BATCH = re.compile(r'===SOLUTION 1===')
+_BATCH_COUNT = re.compile(r'Solve each of the (\d+) problems')
+_DUAL = re.compile(r'===PYTHON===')
+
+_PROGRAMS = {
+    'python': 'print("{text}")',
+    'java': 'public class Main {{\n    public static void main(String[] args) {{\n        System.out.println("{text}");\n    }}\n}}',
+    'c#': 'using System;\n\nclass Program\n{{\n    static void Main()\n    {{\n        Console.WriteLine("{text}");\n    }}\n}}',
+    'c': '#include <stdio.h>\n\nint main() {{\n    printf("{text}\\n");\n    return 0;\n}}',
+    'c++': '#include <iostream>\n\nint main() {{\n    std::cout << "{text}" << std::endl;\n    return 0;\n}}',
+    'javascript': 'console.log("{text}");'
+}
+
+
+class LatencyModel:
+    """Time to first token drawn from a distribution, then a fixed streaming rate"""
+
+    def __init__(self, spec: str = 'fixed:0.2', tokens_per_second: float = 200.0):
+        kind, _, params = spec.partition(':')
+        self.kind = kind.lower()
+        self.params = [float(p) for p in params.split(',') if p.strip()] if params else []
+        self.tokens_per_second = tokens_per_second
+        if self.kind not in ('fixed', 'uniform', 'normal', 'lognormal'):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def first_token(self) -> float:
+        p = self.params
+        if self.kind == 'fixed':
+            return p[0] if p else 0.0
+        if self.kind == 'uniform':
+            return random.uniform(p[0], p[1])
+        if self.kind == 'normal':
+            return max(0.0, random.gauss(p[0], p[1]))
+        return random.lognormvariate(p[0], p[1])  # lognormal:mu,sigma (of the log of seconds)
+
+    def per_chunk(self, chars: int) -> float:
+        if self.tokens_per_second <= 0:
+            return 0.0
+        return chars / CHARS_PER_TOKEN / self.tokens_per_second
+
+
+class Cassette:
+    """Recorded responses keyed by provider and prompt (JSON lines file)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries[entry['key']] = entry
+
+    @staticmethod
+    def key_for(provider: str, prompt: str) -> str:
+        return hashlib.sha256(f"{provider}\x1f{prompt}".encode('utf-8')).hexdigest()
+
+    def get(self, provider: str, prompt: str) -> Optional[Dict[str, Any]]:
+        return self.entries.get(self.key_for(provider, prompt))
+
+    def add(self, provider: str, prompt: str, text: str, stop_reason: str, latency: float):
+        entry = {'key': self.key_for(provider, prompt), 'provider': provider, 'prompt': prompt,
+                 'text': text, 'stop_reason': stop_reason, 'latency': round(latency, 3)}
+        with self.lock:
+            self.entries[entry['key']] = entry
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + '\n')
+
+
+class FakeLLMConfig:
+    """Behaviour of the fake server (see --help for the matching command-line options)"""
+
+    def __init__(self, latency: str = 'fixed:0.2', tokens_per_second: float = 200.0,
+                 rate_limit_rate: float = 0.0, error_rate: float = 0.0, overload_rate: float = 0.0,
+                 retry_after: float = 1.0, responses: Optional[Dict[str, str]] = None,
+                 replay: Optional[str] = None, record: Optional[str] = None, replay_speed: float = 1.0):
+        self.latency = LatencyModel(latency, tokens_per_second)
+        self.rate_limit_rate = rate_limit_rate
+        self.error_rate = error_rate
+        self.overload_rate = overload_rate
+        self.retry_after = retry_after
+        self.responses = responses or {}
+        self.replay = Cassette(replay) if replay else None
+        self.record = Cassette(record) if record else None
+        self.replay_speed = replay_speed
+
+
+def _program(language: str, text: str) -> str:
+    template = _PROGRAMS.get(language, _PROGRAMS['python'])
+    return template.format(text=text.replace('\\', '\\\\').replace('"', '\\"'))
+
+
+def _language_of(prompt: str) -> str:
+    match = _LANGUAGE.search(prompt)
+    name = (match.group(1) if match else 'python').lower()
+    return {'cpp': 'c++', 'csharp': 'c#', 'js': 'javascript'}.get(name, name)
+
+
+def generate_answer(prompt: str) -> str:
+    """A plausible answer in the format the prompt asks for (single, batched or dual-language)"""
+    language = _language_of(prompt)
+    questions = [q.strip() for q in _QUESTION.findall(prompt)]
+    summary = (questions[0] if questions else 'Done').splitlines()[0][:60]
+    if _BATCH.search(prompt):
+        count = int((_BATCH_COUNT.search(prompt) or [None, 1])[1])
+        sections = [f"===SOLUTION {n}===\n```{language}\n{_program(language, f'Solution {n}')}\n```"
+                    for n in range(1, count + 1)]
+        return '\n'.join(sections) + '\n===END==='
+    if _DUAL.search(prompt):
+        return (f"===CODE===\n```{language}\n{_program(language, summary)}\n```\n"
+                f"===PYTHON===\n```python\n{_program('python', summary)}\n```\n"
+                f"===OUTPUT===\n{summary}\n===END===")
+    return f"```{language}\n{_program(language, summary)}\n```"
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like the real APIs, so client pooling is exercised
+    server: 'FakeLLMServer'
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    # ----- plumbing -----
+
+    def _json(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _start_stream(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+    def _chunk(self, data: str):
+        encoded = data.encode('utf-8')
+        self.wfile.write(f"{len(encoded):x}\r\n".encode('ascii') + encoded + b"\r\n")
+        self.wfile.flush()
+
+    def _end_stream(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    # ----- routing -----
+
+    def do_GET(self):
+        if self.path.rstrip('/') in ('/health', ''):
+            self._json(200, {'status': 'ok'})
+        elif self.path.rstrip('/') == '/stats':
+            self._json(200, self.server.stats())
+        else:
+            self._json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self._json(400, {'error': {'type': 'invalid_request_error', 'message': 'invalid JSON'}})
+            return
+        path = self.path.split('?')[0].rstrip('/')
+        if path == '/v1/messages':
+            self._handle('claude', body)
+        elif path in ('/v1/chat/completions', '/chat/completions'):
+            self._handle('deepseek', body)
+        else:
+            self._json(404, {'error': 'not found'})
+
+    def _inject_failure(self, provider: str) -> bool:
+        config = self.server.config
+        roll = random.random()
+        if roll < config.rate_limit_rate:
+            self.server.count('rate_limited')
+            self._json(429, {'type': 'error', 'error': {'type': 'rate_limit_error', 'message': 'Rate limited'}},
+                       {'retry-after': str(config.retry_after)})
+            return True
+        roll -= config.rate_limit_rate
+        if roll < config.overload_rate:
+            self.server.count('overloaded')
+            status = 529 if provider == 'claude' else 503
+            self._json(status, {'type': 'error', 'error': {'type': 'overloaded_error', 'message': 'Overloaded'}})
+            return True
+        roll -= config.overload_rate
+        if roll < config.error_rate:
+            self.server.count('errors')
+            self._json(500, {'type': 'error', 'error': {'type': 'api_error', 'message': 'Internal server error'}})
+            return True
+        return False
+
+    def _handle(self, provider: str, body: Dict[str, Any]):
+        self.server.count(f'{provider}_requests')
+        if self._inject_failure(provider):
+            return
+        prompt = ''.join(
+            m['content'] if isinstance(m.get('content'), str) else ''.join(part.get('text', '') for part in m['content'])
+            for m in body.get('messages', []) if m.get('role') == 'user'
+        )
+        text, stop_reason, first_token = self._answer(provider, prompt, body)
+        max_chars = int(body.get('max_tokens') or 4096) * CHARS_PER_TOKEN
+        if len(text) > max_chars:
+            text, stop_reason = text[:max_chars], 'max_tokens'
+        if provider == 'deepseek':
+            stop_reason = {'max_tokens': 'length', 'end_turn': 'stop'}.get(stop_reason, stop_reason)
+
+        time.sleep(first_token)
+        if body.get('stream'):
+            (self._stream_claude if provider == 'claude' else self._stream_deepseek)(text, stop_reason, body)
+        elif provider == 'claude':
+            time.sleep(self.server.config.latency.per_chunk(len(text)))
+            self._json(200, self._claude_message(text, stop_reason, body))
+        else:
+            time.sleep(self.server.config.latency.per_chunk(len(text)))
+            self._json(200, {
+                'id': 'chatcmpl-fake', 'object': 'chat.completion', 'created': int(time.time()),
+                'model': body.get('model', 'deepseek-chat'),
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text}, 'finish_reason': stop_reason}],
+                'usage': {'prompt_tokens': len(prompt) // CHARS_PER_TOKEN, 'completion_tokens': len(text) // CHARS_PER_TOKEN}
+            })
+
+    def _answer(self, provider: str, prompt: str, body: Dict[str, Any]) -> Tuple[str, str, float]:
+        """(text, stop_reason, seconds to first token)"""
+        config = self.server.config
+        for needle, text in config.responses.items():
+            if needle.lower() in prompt.lower():
+                self.server.count('canned')
+                return text, 'end_turn', config.latency.first_token()
+        if config.replay is not None:
+            entry = config.replay.get(provider, prompt)
+            if entry:
+                self.server.count('replayed')
+                return entry['text'], entry['stop_reason'], entry['latency'] / config.replay_speed
+        if config.record is not None:
+            self.server.count('recorded')
+            return self._record(provider, prompt, body)
+        self.server.count('generated')
+        return generate_answer(prompt), 'end_turn', config.latency.first_token()
+
+    def _record(self, provider: str, prompt: str, body: Dict[str, Any]) -> Tuple[str, str, float]:
+        """Forward to the real API (non-streamed), save the answer and serve it"""
+        upstream = dict(body, stream=False)
+        started = time.monotonic()
+        if provider == 'claude':
+            headers = {name: self.headers[name] for name in ('x-api-key', 'anthropic-version') if self.headers.get(name)}
+            response = httpx.post(f"{os.getenv('FAKE_LLM_ANTHROPIC_UPSTREAM', ANTHROPIC_UPSTREAM)}/v1/messages",
+                                  json=upstream, headers=headers, timeout=120)
+            response.raise_for_status()
+            data = response.json()
+            text = ''.join(block.get('text', '') for block in data.get('content', []))
+            stop_reason = data.get('stop_reason') or 'end_turn'
+        else:
+            headers = {'Authorization': self.headers.get('Authorization', '')}
+            response = httpx.post(os.getenv('FAKE_LLM_DEEPSEEK_UPSTREAM', DEEPSEEK_UPSTREAM),
+                                  json=upstream, headers=headers, timeout=120)
+            response.raise_for_status()
+            choice = response.json()['choices'][0]
+            text = choice['message']['content']
+            stop_reason = {'length': 'max_tokens', 'stop': 'end_turn'}.get(choice.get('finish_reason'), 'end_turn')
+        latency = time.monotonic() - started
+        self.server.config.record.add(provider, prompt, text, stop_reason, latency)
+        return text, stop_reason, 0.0  # The upstream call already took the real time
+
+    @staticmethod
+    def _claude_message(text: str, stop_reason: Optional[str], body: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'id': 'msg_fake', 'type': 'message', 'role': 'assistant', 'model': body.get('model', 'claude'),
+            'content': [{'type': 'text', 'text': text}] if text is not None else [],
+            'stop_reason': stop_reason, 'stop_sequence': None,
+            'usage': {'input_tokens': 1, 'output_tokens': len(text or '') // CHARS_PER_TOKEN}
+        }
+
+    def _pieces(self, text: str, size: int = 24) -> List[str]:
+        return [text[i:i + size] for i in range(0, len(text), size)] or ['']
+
+    def _stream_claude(self, text: str, stop_reason: str, body: Dict[str, Any]):
+        def event(name, data):
+            self._chunk(f"event: {name}\ndata: {json.dumps(data)}\n\n")
+
+        self._start_stream()
+        try:
+            message = self._claude_message(None, None, body)
+            message['usage']['output_tokens'] = 0
+            event('message_start', {'type': 'message_start', 'message': message})
+            event('content_block_start', {'type': 'content_block_start', 'index': 0,
+                                          'content_block': {'type': 'text', 'text': ''}})
+            for piece in self._pieces(text):
+                time.sleep(self.server.config.latency.per_chunk(len(piece)))
+                event('content_block_delta', {'type': 'content_block_delta', 'index': 0,
+                                              'delta': {'type': 'text_delta', 'text': piece}})
+            event('content_block_stop', {'type': 'content_block_stop', 'index': 0})
+            event('message_delta', {'type': 'message_delta', 'delta': {'stop_reason': stop_reason, 'stop_sequence': None},
+                                    'usage': {'output_tokens': len(text) // CHARS_PER_TOKEN}})
+            event('message_stop', {'type': 'message_stop'})
+            self._end_stream()
+        except (BrokenPipeError, ConnectionResetError):
+            self.server.count('client_disconnects')  # The app stops reading once the code is complete
+            self.close_connection = True
+
+    def _stream_deepseek(self, text: str, stop_reason: str, body: Dict[str, Any]):
+        def chunk(delta, finish_reason=None):
+            payload = {'id': 'chatcmpl-fake', 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                       'model': body.get('model', 'deepseek-chat'),
+                       'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]}
+            self._chunk(f"data: {json.dumps(payload)}\n\n")
+
+        self._start_stream()
+        try:
+            chunk({'role': 'assistant', 'content': ''})
+            for piece in self._pieces(text):
+                time.sleep(self.server.config.latency.per_chunk(len(piece)))
+                chunk({'content': piece})
+            chunk({}, stop_reason)
+            self._chunk("data: [DONE]\n\n")
+            self._end_stream()
+        except (BrokenPipeError, ConnectionResetError):
+            self.server.count('client_disconnects')
+            self.close_connection = True
+
+
+class FakeLLMServer(ThreadingHTTPServer):
+    """Threaded fake API server; start() serves in the background for tests and benchmarks"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, config: Optional[FakeLLMConfig] = None, host: str = '127.0.0.1', port: int = 8765):
+        super().__init__((host, port), FakeLLMHandler)
+        self.config = config or FakeLLMConfig()
+        self.counters: Dict[str, int] = {}
+        self.counters_lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, key: str):
+        with self.counters_lock:
+            self.counters[key] = self.counters.get(key, 0) + 1
+
+    def stats(self) -> Dict[str, int]:
+        with self.counters_lock:
+            return dict(self.counters)
+
+    def start(self) -> 'FakeLLMServer':
+        self.thread = threading.Thread(target=self.serve_forever, name='fake-llm-server', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local stand-in for the Anthropic and DeepSeek APIs")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', default='lognormal:-0.5,0.6',
+                        help="Time to first token: fixed:S, uniform:A,B, normal:MEAN,STD or lognormal:MU,SIGMA")
+    parser.add_argument('--tokens-per-second', type=float, default=80.0, help="Streaming rate (0 = instant)")
+    parser.add_argument('--rate-limit', type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument('--overload', type=float, default=0.0, help="Share answered with 529 (Claude) / 503 (DeepSeek)")
+    parser.add_argument('--errors', type=float, default=0.0, help="Share answered with 500")
+    parser.add_argument('--retry-after', type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    parser.add_argument('--responses', help="JSON file mapping question text (substring) to the answer to return")
+    parser.add_argument('--replay', help="Cassette (JSON lines) to answer recorded prompts from")
+    parser.add_argument('--replay-speed', type=float, default=1.0, help="Divide recorded latencies by this factor")
+    parser.add_argument('--record', help="Proxy unknown prompts to the real APIs and append them to this cassette")
+    args = parser.parse_args(argv)
+
+    responses = None
+    if args.responses:
+        with open(args.responses, encoding='utf-8') as f:
+            responses = json.load(f)
+    config = FakeLLMConfig(latency=args.latency, tokens_per_second=args.tokens_per_second,
+                           rate_limit_rate=args.rate_limit, error_rate=args.errors, overload_rate=args.overload,
+                           retry_after=args.retry_after, responses=responses, replay=args.replay,
+                           record=args.record, replay_speed=args.replay_speed)
+    server = FakeLLMServer(config, args.host, args.port)
+    print(f"🧪 Fake LLM server on {server.base_url}")
+    print(f"   ANTHROPIC_BASE_URL={server.base_url}")
+    print(f"   DEEPSEEK_BASE_URL={server.base_url}/v1/chat/completions")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"📊 {json.dumps(server.stats())}")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,202 @@
+"""
+Hedging - Race a secondary LLM provider when the primary is slow
+The primary request gets a head start equal to its recently observed tail
+latency (p90 by default). If it has not answered by then, the secondary is
+fired as well, the first successful answer wins and the other request is
+cancelled. A budget caps the share of requests that may be hedged so a slow
+provider cannot double the load on the other one.
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyWindow:
+    """Rolling window of recent successful request latencies (seconds)
+
+    max_age additionally drops samples older than that many seconds, so a
+    provider that recovered is not judged by latencies from long ago.
+    """
+
+    def __init__(self, size: int = 200, max_age: Optional[float] = None):
+        self.samples = deque(maxlen=size)  # (monotonic time, seconds)
+        self.max_age = max_age
+        self.lock = threading.Lock()
+
+    def _prune(self):
+        if self.max_age is not None:
+            cutoff = time.monotonic() - self.max_age
+            while self.samples and self.samples[0][0] < cutoff:
+                self.samples.popleft()
+
+    def record(self, seconds: float):
+        with self.lock:
+            self.samples.append((time.monotonic(), seconds))
+
+    def __len__(self):
+        with self.lock:
+            self._prune()
+            return len(self.samples)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        with self.lock:
+            self._prune()
+            ordered = sorted(seconds for _, seconds in self.samples)
+        if not ordered:
+            return None
+        index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+        return ordered[index]
+
+
+class RequestHedger:
+    """
+    Hedged execution of provider calls with a dynamic delay and a hedge budget
+    """
+
+    def __init__(self, percentile: float = 0.9, min_delay: float = 2.0, max_delay: float = 20.0,
+                 default_delay: float = 8.0, fixed_delay: Optional[float] = None,
+                 budget: float = 0.1, min_samples: int = 20, window: int = 200):
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.default_delay = default_delay
+        self.fixed_delay = fixed_delay
+        self.budget = budget
+        self.min_samples = min_samples
+        self.windows: Dict[str, LatencyWindow] = {}
+        self.window_size = window
+        self.recent = deque(maxlen=window)  # One [hedged] flag per recent request
+        self.lock = threading.Lock()
+        self.counters = {'requests': 0, 'hedges_fired': 0, 'secondary_wins': 0,
+                         'primary_wins_after_hedge': 0, 'budget_denied': 0, 'both_failed': 0}
+
+    @classmethod
+    def from_env(cls) -> Optional['RequestHedger']:
+        """Hedger configured by HEDGE_* variables, or None when hedging is disabled"""
+        if os.getenv('HEDGING_ENABLED', 'true').lower() != 'true':
+            return None
+        fixed_delay = os.getenv('HEDGE_DELAY_SECONDS')
+        return cls(
+            percentile=float(os.getenv('HEDGE_PERCENTILE', '0.9')),
+            min_delay=float(os.getenv('HEDGE_MIN_DELAY', '2')),
+            max_delay=float(os.getenv('HEDGE_MAX_DELAY', '20')),
+            default_delay=float(os.getenv('HEDGE_DEFAULT_DELAY', '8')),
+            fixed_delay=float(fixed_delay) if fixed_delay else None,
+            budget=float(os.getenv('HEDGE_BUDGET', '0.1'))
+        )
+
+    def latency(self, provider: str) -> LatencyWindow:
+        with self.lock:
+            window = self.windows.get(provider)
+            if window is None:
+                window = self.windows[provider] = LatencyWindow(self.window_size)
+            return window
+
+    def record(self, provider: str, seconds: float):
+        self.latency(provider).record(seconds)
+
+    def delay_for(self, provider: str) -> float:
+        """Head start given to the primary before the secondary is fired"""
+        if self.fixed_delay is not None:
+            return self.fixed_delay
+        window = self.latency(provider)
+        if len(window) < self.min_samples:
+            return self.default_delay
+        return min(self.max_delay, max(self.min_delay, window.percentile(self.percentile)))
+
+    def _admit_hedge(self, slot: list) -> bool:
+        with self.lock:
+            hedged = sum(1 for flag in self.recent if flag[0])
+            if hedged + 1 > max(1.0, self.budget * len(self.recent)):
+                self.counters['budget_denied'] += 1
+                return False
+            slot[0] = True
+            self.counters['hedges_fired'] += 1
+            return True
+
+    def _count(self, key: str):
+        with self.lock:
+            self.counters[key] += 1
+
+    async def run(self, primary_name: str, primary: Callable[[], Awaitable[Any]],
+                  secondary_name: Optional[str] = None,
+                  secondary: Optional[Callable[[], Awaitable[Any]]] = None) -> Any:
+        """
+        Run primary(); fire secondary() if primary is still pending after the hedge delay
+
+        Returns the first successful result. If the primary fails before the
+        delay its exception is raised (the caller's normal fallback applies);
+        once hedged, an exception is raised only if both requests fail.
+        """
+        slot = [False]
+        with self.lock:
+            self.counters['requests'] += 1
+            self.recent.append(slot)
+
+        started = time.monotonic()
+        primary_task = asyncio.ensure_future(primary())
+        tasks = [primary_task]
+        delay = self.delay_for(primary_name)
+        try:
+            done, _ = await asyncio.wait({primary_task}, timeout=delay)
+            if done or secondary is None or not self._admit_hedge(slot):
+                result = await primary_task
+                self.record(primary_name, time.monotonic() - started)
+                return result
+
+            logger.info(f"Hedging: {primary_name} pending after {delay:.1f}s, firing {secondary_name}")
+            hedge_started = time.monotonic()
+            secondary_task = asyncio.ensure_future(secondary())
+            tasks.append(secondary_task)
+            names = {primary_task: primary_name, secondary_task: secondary_name}
+            starts = {primary_task: started, secondary_task: hedge_started}
+            pending = {primary_task, secondary_task}
+            error = None
+
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        logger.warning(f"Hedging: {names[task]} failed: {error}")
+                        continue
+                    for loser in pending:
+                        loser.cancel()
+                    self.record(names[task], time.monotonic() - starts[task])
+                    self._count('secondary_wins' if task is secondary_task else 'primary_wins_after_hedge')
+                    logger.info(f"Hedging: {names[task]} answered first")
+                    return task.result()
+
+            self._count('both_failed')
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            counters = dict(self.counters)
+            providers = list(self.windows)
+        fired = counters['hedges_fired']
+
+        def seconds(value):
+            return round(value, 3) if value is not None else None
+
+        return dict(
+            counters,
+            hedge_rate=f"{(fired / max(counters['requests'], 1) * 100):.1f}%",
+            secondary_win_rate=f"{(counters['secondary_wins'] / max(fired, 1) * 100):.1f}%",
+            budget=self.budget,
+            percentile=self.percentile,
+            delays={provider: round(self.delay_for(provider), 2) for provider in providers},
+            latency_p50={provider: seconds(self.latency(provider).percentile(0.5)) for provider in providers},
+            latency_p90={provider: seconds(self.latency(provider).percentile(0.9)) for provider in providers}
+        )
@@ -0,0 +1,526 @@
+"""
+Key Scheduler - Fair, blocking scheduler for provider API keys
+Each key has token buckets for its request-rate limits, a per-key concurrency
+limit and a cooldown for rate-limit/auth/error responses. Callers that find no
+capacity join a FIFO wait queue with a deadline and are woken as soon as a
+lease is released or a bucket refills, instead of failing over immediately.
+Works for threads (acquire) and for the solve engine's event loop (acquire_async).
+
+Circuit breakers (see circuit_breaker.py) guard each key and the provider as
+a whole: while the provider breaker is open, acquire returns None at once.
+
+Buckets, leases and provider cooldowns are kept in a key-state backend
+(see key_state.py) so they can be shared by every process; the wait queue,
+circuit breakers and statistics are per process. With a shared backend every
+grant is a network round-trip: self.lock (local state) is never held across
+one, and on an event loop the round-trips run on the loop's executor so one
+slow Redis call does not stall every in-flight provider call.
+"""
+
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from key_state import KeyLimits, MemoryKeyStateBackend, WAIT_FOR_RELEASE, key_id
+from circuit_breaker import CircuitBreaker, HALF_OPEN, PROVIDER_FAILURES
+
+logger = logging.getLogger(__name__)
+
+# Longest a waiter sleeps before re-checking buckets and cooldowns
+_MAX_POLL_SECONDS = 1.0
+# Releases by other processes cannot wake local waiters, so poll shared state faster
+_SHARED_RELEASE_POLL_SECONDS = 0.25
+
+
+class KeyLease:
+    """Permission to send one request with a key; release() when the request is done"""
+
+    def __init__(self, scheduler: 'KeyScheduler', index: int, key: str, waited: float,
+                 lease_id: str = None, backend=None):
+        self.scheduler = scheduler
+        self.index = index
+        self.key = key
+        self.waited = waited
+        self.lease_id = lease_id
+        self.backend = backend
+        self.released = False
+        self.probes: List[CircuitBreaker] = []  # Half-open breakers this request is probing
+
+    def release(self):
+        self.scheduler.release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class _Waiter:
+    __slots__ = ('lease', 'event', 'loop', 'future', 'enqueued', 'abandoned')
+
+    def __init__(self, event=None, loop=None, future=None):
+        self.lease: Optional[KeyLease] = None
+        self.abandoned = False  # Gave up before an off-loop _enqueue ran
+        self.event = event
+        self.loop = loop
+        self.future = future
+        self.enqueued = time.monotonic()
+
+    def wake(self):
+        if self.event is not None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class KeyScheduler:
+    """
+    Scheduler for one provider's API keys.
+
+    key_stats keeps the per-key counters the stats endpoints report
+    (requests, failures, last_used, rate_limited_until, ...).
+    """
+
+    def __init__(self, name: str, keys: List[str],
+                 requests_per_minute: Optional[int] = None,
+                 requests_per_hour: Optional[int] = None,
+                 burst: Optional[int] = None,
+                 max_concurrent_per_key: Optional[int] = None,
+                 global_concurrent_limit: Optional[int] = None,
+                 max_consecutive_errors: int = 3,
+                 error_cooldown: float = 120,
+                 default_timeout: float = 15.0,
+                 backend=None,
+                 lease_ttl: float = 300,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.name = name
+        self.scope = name.lower()
+        self.keys = keys
+        self.key_ids = [key_id(key) for key in keys]
+        self.requests_per_minute = requests_per_minute
+        self.requests_per_hour = requests_per_hour
+        self.burst = burst or requests_per_minute
+        self.max_concurrent_per_key = max_concurrent_per_key
+        self.global_concurrent_limit = global_concurrent_limit
+        self.max_consecutive_errors = max_consecutive_errors
+        self.error_cooldown = error_cooldown
+        self.default_timeout = default_timeout
+        # Optional key_index -> cost (lower is better), e.g. a router's expected latency for the key
+        self.key_cost: Optional[Callable[[int], float]] = None
+        # Provider-wide breaker (opened by outages) and one per key (opened by repeated key failures)
+        self.breaker = breaker or CircuitBreaker(name)
+        self.key_breakers = [CircuitBreaker(f"{name} key {i + 1}", max_consecutive_errors, error_cooldown,
+                                            error_cooldown * 4) for i in range(len(keys))]
+        self.limits = KeyLimits(self._bucket_limits(), max_concurrent_per_key, global_concurrent_limit, lease_ttl)
+        self.backend = backend or MemoryKeyStateBackend()
+        # Used while a shared backend is unreachable, so an outage degrades to per-process limits
+        self.local_backend = self.backend if not self.backend.shared else MemoryKeyStateBackend()
+        self.backend_errors = 0
+        self.lock = threading.Lock()  # Local state only; never held across a backend call
+        self.dispatch_lock = threading.Lock()  # Serializes grants so waiters are served in arrival order
+        self.waiters = deque()
+        self.inflight = 0
+        self.retry_after = 0.0
+        self.key_stats = {i: self._fresh_stats() for i in range(len(keys))}
+        self.recent_grants = {i: deque() for i in range(len(keys))}
+        self.counters = {'granted': 0, 'granted_after_wait': 0, 'timeouts': 0, 'cancelled': 0,
+                         'breaker_rejected': 0, 'wait_seconds': 0.0, 'max_wait_seconds': 0.0, 'peak_queue': 0}
+
+    @staticmethod
+    def _fresh_stats() -> Dict[str, Any]:
+        return {
+            'requests': 0,
+            'failures': 0,
+            'last_used': 0,
+            'rate_limited_until': 0,
+            'consecutive_errors': 0,
+            'last_error_type': None,
+            'last_failure': 0,
+            'concurrent_connections': 0
+        }
+
+    def _bucket_limits(self) -> List[Tuple[float, float]]:
+        buckets = []
+        if self.requests_per_minute:
+            buckets.append((self.requests_per_minute / 60.0, self.burst))
+        if self.requests_per_hour:
+            buckets.append((self.requests_per_hour / 3600.0, self.requests_per_hour))
+        return buckets
+
+    def _backend_failed(self, operation: str, error: Exception):
+        self.backend_errors += 1
+        if self.backend_errors == 1 or self.backend_errors % 100 == 0:
+            logger.warning(f"{self.name} key-state backend {operation} failed ({error}); using local limits")
+
+    def _shared(self, operation: str, *args):
+        """Run a key-state operation on the backend, degrading to local state if it fails"""
+        try:
+            return getattr(self.backend, operation)(*args)
+        except Exception as e:
+            self._backend_failed(operation, e)
+            return getattr(self.local_backend, operation)(*args)
+
+    def _defer_if_on_loop(self, func: Callable, *args) -> bool:
+        """Hand a backend round-trip to the running event loop's executor instead of blocking the loop
+
+        Returns False, for the caller to run func itself, off an event loop or with an in-process backend.
+        """
+        if not self.backend.shared:
+            return False
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        loop.run_in_executor(None, func, *args)
+        return True
+
+    async def _run_off_loop(self, func: Callable, *args):
+        """Await func(*args), run on the loop's executor when it makes backend round-trips"""
+        if not self.backend.shared:
+            return func(*args)
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    # ----- capacity checks (dispatch_lock held, self.lock not held) -----
+
+    def _try_grant(self, enqueued: float) -> Tuple[Optional[KeyLease], float]:
+        """Lease the best key with capacity, or (None, seconds until worth retrying)"""
+        now, mono = time.time(), time.monotonic()
+        retry_after = WAIT_FOR_RELEASE
+        candidates = []
+        for i in range(len(self.keys)):
+            if self.key_breakers[i].available():
+                candidates.append(i)
+            else:
+                # Open: retry when it half-opens; half-open with a probe in flight: wait for the probe
+                retry_after = min(retry_after, self.key_breakers[i].remaining() or WAIT_FOR_RELEASE)
+
+        # Least loaded key first, then the cheapest by key_cost, then the one idle the longest
+        key_cost = self.key_cost
+        with self.lock:
+            order = {i: (self.key_stats[i]['concurrent_connections'], self.key_stats[i]['last_used']) for i in candidates}
+        candidates.sort(key=lambda i: (order[i][0], key_cost(i) if key_cost else 0, order[i][1]))
+        for index in candidates:
+            backend = self.backend
+            try:
+                lease_id, wait = backend.try_acquire(self.scope, self.key_ids[index], self.limits)
+            except Exception as e:
+                self._backend_failed('try_acquire', e)
+                backend = self.local_backend
+                lease_id, wait = backend.try_acquire(self.scope, self.key_ids[index], self.limits)
+            if lease_id is not None:
+                with self.lock:
+                    lease = self._grant(index, now, mono, enqueued, lease_id, backend)
+                key_breaker = self.key_breakers[index]
+                if key_breaker.state == HALF_OPEN and key_breaker.allow():
+                    lease.probes.append(key_breaker)
+                return lease, 0.0
+            retry_after = min(retry_after, wait)
+        return None, retry_after
+
+    def _grant(self, index: int, now: float, mono: float, enqueued: float, lease_id: str, backend) -> KeyLease:
+        stats = self.key_stats[index]
+        stats['requests'] += 1
+        stats['last_used'] = now
+        stats['concurrent_connections'] += 1
+        self.inflight += 1
+        grants = self.recent_grants[index]
+        grants.append(mono)
+        while mono - grants[0] > 60:
+            grants.popleft()
+        waited = mono - enqueued
+        self.counters['granted'] += 1
+        if waited > 0.001:
+            self.counters['granted_after_wait'] += 1
+            self.counters['wait_seconds'] += waited
+            self.counters['max_wait_seconds'] = max(self.counters['max_wait_seconds'], waited)
+        return KeyLease(self, index, self.keys[index], waited, lease_id, backend)
+
+    def _dispatch(self):
+        """Hand capacity to queued waiters strictly in arrival order (backend round-trips: never call with self.lock held)"""
+        with self.dispatch_lock:
+            while True:
+                with self.lock:
+                    if not self.waiters:
+                        return
+                    waiter = self.waiters[0]
+                lease, retry_after = self._try_grant(waiter.enqueued)
+                with self.lock:
+                    self.retry_after = retry_after
+                    if lease is None:
+                        return
+                    # Still the head: waiters only leave the queue here and in _give_up, which takes dispatch_lock
+                    self.waiters.popleft()
+                    waiter.lease = lease
+                waiter.wake()
+
+    def _poll_interval(self, remaining: float) -> float:
+        if self.retry_after == WAIT_FOR_RELEASE:
+            # Local releases wake waiters directly; other processes' releases are only seen by polling
+            wait = _SHARED_RELEASE_POLL_SECONDS if self.backend.shared else _MAX_POLL_SECONDS
+        else:
+            wait = max(0.01, min(self.retry_after, _MAX_POLL_SECONDS))
+        return min(remaining, wait)
+
+    def _enqueue(self, waiter: _Waiter):
+        with self.lock:
+            if waiter.abandoned:
+                return
+            self.waiters.append(waiter)
+            self.counters['peak_queue'] = max(self.counters['peak_queue'], len(self.waiters))
+        self._dispatch()
+
+    def _give_up(self, waiter: _Waiter, counter: str) -> Optional[KeyLease]:
+        """Leave the queue; returns the lease if it was granted in the meantime"""
+        with self.dispatch_lock, self.lock:
+            if waiter.lease is not None:
+                return waiter.lease
+            waiter.abandoned = True
+            try:
+                self.waiters.remove(waiter)
+            except ValueError:
+                pass
+            self.counters[counter] += 1
+        self._dispatch()
+        return None
+
+    def _abandon(self, waiter: _Waiter, counter: str):
+        lease = self._give_up(waiter, counter)
+        if lease is not None:
+            lease.release()
+
+    def _admit(self) -> Optional[bool]:
+        """Provider breaker check: None if it rejects the request, else whether the request is a probe"""
+        if not self.breaker.allow():
+            with self.lock:
+                self.counters['breaker_rejected'] += 1
+            return None
+        return self.breaker.state == HALF_OPEN
+
+    def _settle_probe(self, probing: bool, lease: Optional[KeyLease]):
+        if probing:
+            if lease is not None:
+                lease.probes.append(self.breaker)
+            else:
+                self.breaker.cancel_probe()
+
+    def _wait(self, timeout: Optional[float]) -> Optional[KeyLease]:
+        deadline = time.monotonic() + (self.default_timeout if timeout is None else timeout)
+        waiter = _Waiter(event=threading.Event())
+        self._enqueue(waiter)
+        while waiter.lease is None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                lease = self._give_up(waiter, 'timeouts')
+                if lease is None:
+                    logger.warning(f"{self.name}: no key capacity within {timeout if timeout is not None else self.default_timeout}s")
+                return lease
+            with self.lock:
+                interval = self._poll_interval(remaining)
+            waiter.event.wait(interval)
+            self._dispatch()
+        return waiter.lease
+
+    async def _wait_async(self, timeout: Optional[float]) -> Optional[KeyLease]:
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + (self.default_timeout if timeout is None else timeout)
+        waiter = _Waiter(loop=loop, future=loop.create_future())
+        try:
+            await self._run_off_loop(self._enqueue, waiter)
+            while waiter.lease is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    lease = await self._run_off_loop(self._give_up, waiter, 'timeouts')
+                    if lease is None:
+                        logger.warning(f"{self.name}: no key capacity within {timeout if timeout is not None else self.default_timeout}s")
+                    return lease
+                with self.lock:
+                    interval = self._poll_interval(remaining)
+                await asyncio.wait({waiter.future}, timeout=interval)
+                if waiter.lease is None:
+                    await self._run_off_loop(self._dispatch)
+            return waiter.lease
+        except asyncio.CancelledError:
+            # Leave the queue (releasing a lease granted meanwhile) even if the caller is cancelled again
+            if not self._defer_if_on_loop(self._abandon, waiter, 'cancelled'):
+                self._abandon(waiter, 'cancelled')
+            raise
+
+    # ----- public API -----
+
+    def acquire(self, timeout: Optional[float] = None) -> Optional[KeyLease]:
+        """Block until a key has capacity; None if the deadline passes first or the provider circuit is open"""
+        if not self.keys:
+            return None
+        probing = self._admit()
+        if probing is None:
+            return None
+        lease = None
+        try:
+            lease = self._wait(timeout)
+            return lease
+        finally:
+            self._settle_probe(probing, lease)
+
+    async def acquire_async(self, timeout: Optional[float] = None) -> Optional[KeyLease]:
+        """acquire() for coroutines: waits on the event loop instead of blocking it"""
+        if not self.keys:
+            return None
+        probing = self._admit()
+        if probing is None:
+            return None
+        lease = None
+        try:
+            lease = await self._wait_async(timeout)
+            return lease
+        finally:
+            self._settle_probe(probing, lease)
+
+    def release(self, lease: KeyLease):
+        """Return a lease's capacity (on an event loop, the backend round-trip runs on its executor)"""
+        if self._defer_if_on_loop(self.release, lease):
+            return
+        with self.lock:
+            if lease.released:
+                return
+            lease.released = True
+        try:
+            lease.backend.release(self.scope, self.key_ids[lease.index], lease.lease_id)
+        except Exception as e:
+            # The lease expires on its own after lease_ttl
+            logger.warning(f"{self.name} key-state release failed: {e}")
+        with self.lock:
+            stats = self.key_stats[lease.index]
+            stats['concurrent_connections'] = max(0, stats['concurrent_connections'] - 1)
+            self.inflight = max(0, self.inflight - 1)
+        for breaker in lease.probes:
+            breaker.cancel_probe()  # No-op if the probe's outcome was recorded
+        self._dispatch()
+
+    def mark_rate_limited(self, key_index: int, duration: float = 60):
+        """Cool a key down for duration seconds (in every process sharing the backend)"""
+        if not self._defer_if_on_loop(self._shared, 'set_cooldown', self.scope, self.key_ids[key_index], duration):
+            self._shared('set_cooldown', self.scope, self.key_ids[key_index], duration)
+        with self.lock:
+            stats = self.key_stats[key_index]
+            stats['rate_limited_until'] = time.time() + duration
+            stats['failures'] += 1
+        self.breaker.record_success()  # The provider answered; only this key is throttled
+        logger.warning(f"{self.name} API key {key_index + 1} marked as rate limited for {duration} seconds")
+
+    def mark_failure(self, key_index: int, error_type: Optional[str] = None):
+        """Count a non-rate-limit failure; repeated failures open the key's breaker
+
+        error_type is a circuit_breaker error kind; provider-level kinds
+        (timeouts, 5xx, overload, connection errors) also count toward the
+        provider breaker.
+        """
+        with self.lock:
+            stats = self.key_stats[key_index]
+            stats['failures'] += 1
+            stats['consecutive_errors'] += 1
+            stats['last_error_type'] = error_type
+            stats['last_failure'] = time.time()
+        self.key_breakers[key_index].record_failure()
+        if error_type in PROVIDER_FAILURES:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def mark_success(self, key_index: int):
+        self.key_breakers[key_index].record_success()
+        self.breaker.record_success()
+        with self.lock:
+            stats = self.key_stats[key_index]
+            stats['consecutive_errors'] = 0
+            stats['last_error_type'] = None
+        if not self._defer_if_on_loop(self._dispatch):
+            self._dispatch()
+
+    def _cooldown_remaining(self, key_index: int) -> float:
+        shared = self._shared('cooldown_remaining', self.scope, self.key_ids[key_index])
+        with self.lock:
+            local = max(self.key_stats[key_index]['rate_limited_until'] - time.time(), 0.0)
+        return max(shared, local, self.key_breakers[key_index].remaining())
+
+    def is_key_available(self, key_index: int) -> bool:
+        """Whether the key is out of cooldown and has local connection headroom"""
+        if self._cooldown_remaining(key_index) > 0:
+            return False
+        with self.lock:
+            concurrent = self.key_stats[key_index]['concurrent_connections']
+        return not self.max_concurrent_per_key or concurrent < self.max_concurrent_per_key
+
+    def get_available_keys_count(self) -> int:
+        """Keys that are not cooling down (busy keys count: callers queue for them); 0 while the provider circuit is open"""
+        if not self.breaker.available():
+            return 0
+        return sum(1 for i in range(len(self.keys)) if self._cooldown_remaining(i) == 0)
+
+    def seconds_until_available(self) -> float:
+        """Seconds until some key leaves its cooldown and the provider circuit admits requests"""
+        keys = min([self._cooldown_remaining(i) for i in range(len(self.keys))] or [0.0])
+        return max(keys, self.breaker.remaining())
+
+    def get_stats(self) -> Dict[int, Dict[str, Any]]:
+        """Per-key counters, including requests granted in the last minute"""
+        with self.lock:
+            mono = time.monotonic()
+            snapshot = {}
+            for i, stats in self.key_stats.items():
+                grants = self.recent_grants[i]
+                while grants and mono - grants[0] > 60:
+                    grants.popleft()
+                snapshot[i] = dict(stats, requests_this_minute=len(grants), circuit=self.key_breakers[i].state)
+            return snapshot
+
+    def reset_stats(self):
+        """Reset counters, buckets, cooldowns and breakers (in-flight leases keep their capacity)"""
+        for i in range(len(self.keys)):
+            self._shared('reset', self.scope, self.key_ids[i])
+            self.key_breakers[i].record_success()
+        self.breaker.record_success()
+        with self.lock:
+            for i in self.key_stats:
+                concurrent = self.key_stats[i]['concurrent_connections']
+                self.key_stats[i] = dict(self._fresh_stats(), concurrent_connections=concurrent)
+                self.recent_grants[i].clear()
+        self._dispatch()
+
+    def scheduler_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            counters = dict(self.counters)
+            queued = len(self.waiters)
+            inflight = self.inflight
+        waited = counters['granted_after_wait']
+        return {
+            'backend': type(self.backend).__name__,
+            'backend_errors': self.backend_errors,
+            'queued': queued,
+            'inflight': inflight,
+            'granted': counters['granted'],
+            'granted_after_wait': waited,
+            'timeouts': counters['timeouts'],
+            'cancelled': counters['cancelled'],
+            'breaker_rejected': counters['breaker_rejected'],
+            'circuit': self.breaker.stats(),
+            'average_wait_ms': round(counters['wait_seconds'] / waited * 1000) if waited else 0,
+            'max_wait_ms': round(counters['max_wait_seconds'] * 1000),
+            'peak_queue': counters['peak_queue'],
+            'limits': {
+                'requests_per_minute': self.requests_per_minute,
+                'requests_per_hour': self.requests_per_hour,
+                'burst': self.burst,
+                'max_concurrent_per_key': self.max_concurrent_per_key,
+                'global_concurrent_limit': self.global_concurrent_limit,
+                'default_timeout': self.default_timeout
+            }
+        }
@@ -0,0 +1,254 @@
+"""
+Key State - Shared rate-limit state for provider API keys
+Token buckets, concurrent-request leases and provider cooldowns for each key
+live in a pluggable backend so every gunicorn and Celery worker draws from the
+same quota. RedisKeyStateBackend makes each decision with one atomic Lua
+script; MemoryKeyStateBackend is the single-process equivalent.
+"""
+
+import os
+import time
+import uuid
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import redis
+except ImportError:  # Redis is optional - fall back to in-process key state
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# retry_after value meaning "no timed retry: capacity frees up when a lease is released"
+WAIT_FOR_RELEASE = float('inf')
+
+
+def key_id(api_key: str) -> str:
+    """Identifier a key's shared state is stored under (never the key itself)"""
+    return hashlib.sha256((api_key or '').encode('utf-8')).hexdigest()[:16]
+
+
+class KeyLimits:
+    """Limits enforced per key (buckets, concurrency) and per provider (global concurrency)"""
+
+    def __init__(self, buckets: List[Tuple[float, float]] = None, max_concurrent: int = 0,
+                 global_concurrent: int = 0, lease_ttl: float = 300):
+        self.buckets = buckets or []  # (refill tokens per second, capacity)
+        self.max_concurrent = max_concurrent or 0
+        self.global_concurrent = global_concurrent or 0
+        self.lease_ttl = lease_ttl
+
+
+class MemoryKeyStateBackend:
+    """Key state for a single process"""
+
+    shared = False
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tokens: Dict[Tuple[str, str], List[List[float]]] = {}
+        self.leases: Dict[Tuple[str, str], Dict[str, float]] = {}
+        self.cooldowns: Dict[Tuple[str, str], float] = {}
+
+    @staticmethod
+    def _expire(leases: Dict[str, float], now: float):
+        for lease_id in [lease_id for lease_id, expires in leases.items() if expires <= now]:
+            del leases[lease_id]
+
+    def try_acquire(self, scope: str, key: str, limits: KeyLimits) -> Tuple[Optional[str], float]:
+        """Returns (lease_id, 0) on success or (None, seconds until worth retrying)"""
+        with self.lock:
+            now = time.time()
+            remaining = self.cooldowns.get((scope, key), 0) - now
+            if remaining > 0:
+                return None, remaining
+            key_leases = self.leases.setdefault((scope, key), {})
+            global_leases = self.leases.setdefault((scope, '*'), {})
+            self._expire(key_leases, now)
+            self._expire(global_leases, now)
+            if limits.max_concurrent and len(key_leases) >= limits.max_concurrent:
+                return None, WAIT_FOR_RELEASE
+            if limits.global_concurrent and len(global_leases) >= limits.global_concurrent:
+                return None, WAIT_FOR_RELEASE
+
+            state = self.tokens.setdefault((scope, key), [[capacity, now] for _, capacity in limits.buckets])
+            wait = 0.0
+            for (rate, capacity), bucket in zip(limits.buckets, state):
+                bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+                if bucket[0] < 1:
+                    wait = max(wait, (1 - bucket[0]) / rate)
+            if wait > 0:
+                return None, wait
+            for bucket in state:
+                bucket[0] -= 1
+
+            lease_id = uuid.uuid4().hex
+            key_leases[lease_id] = now + limits.lease_ttl
+            global_leases[lease_id] = now + limits.lease_ttl
+            return lease_id, 0.0
+
+    def release(self, scope: str, key: str, lease_id: str):
+        with self.lock:
+            self.leases.get((scope, key), {}).pop(lease_id, None)
+            self.leases.get((scope, '*'), {}).pop(lease_id, None)
+
+    def set_cooldown(self, scope: str, key: str, seconds: float):
+        with self.lock:
+            self.cooldowns[(scope, key)] = time.time() + seconds
+
+    def clear_cooldown(self, scope: str, key: str):
+        with self.lock:
+            self.cooldowns.pop((scope, key), None)
+
+    def cooldown_remaining(self, scope: str, key: str) -> float:
+        with self.lock:
+            return max(0.0, self.cooldowns.get((scope, key), 0) - time.time())
+
+    def reset(self, scope: str, key: str):
+        """Refill the key's buckets and clear its cooldown (leases stay)"""
+        with self.lock:
+            self.tokens.pop((scope, key), None)
+            self.cooldowns.pop((scope, key), None)
+
+
+# KEYS: state hash, key lease zset, provider lease zset
+# ARGV: lease id, lease ttl, max per key, max global, then (rate, capacity) per bucket
+_ACQUIRE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local lease_ttl = tonumber(ARGV[2])
+local max_key = tonumber(ARGV[3])
+local max_global = tonumber(ARGV[4])
+
+local cooldown = tonumber(redis.call('HGET', KEYS[1], 'cooldown_until') or '0')
+if cooldown > now then
+    return {0, tostring(cooldown - now)}
+end
+
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now)
+redis.call('ZREMRANGEBYSCORE', KEYS[3], '-inf', now)
+if max_key > 0 and redis.call('ZCARD', KEYS[2]) >= max_key then
+    return {0, 'inf'}
+end
+if max_global > 0 and redis.call('ZCARD', KEYS[3]) >= max_global then
+    return {0, 'inf'}
+end
+
+local wait = 0
+local tokens = {}
+local buckets = (#ARGV - 4) / 2
+for i = 1, buckets do
+    local rate = tonumber(ARGV[3 + i * 2])
+    local capacity = tonumber(ARGV[4 + i * 2])
+    local level = tonumber(redis.call('HGET', KEYS[1], 'tokens' .. i) or capacity)
+    local updated = tonumber(redis.call('HGET', KEYS[1], 'updated' .. i) or now)
+    level = math.min(capacity, level + (now - updated) * rate)
+    tokens[i] = level
+    if level < 1 then
+        wait = math.max(wait, (1 - level) / rate)
+    end
+end
+if wait > 0 then
+    return {0, tostring(wait)}
+end
+
+for i = 1, buckets do
+    redis.call('HSET', KEYS[1], 'tokens' .. i, tostring(tokens[i] - 1), 'updated' .. i, tostring(now))
+end
+redis.call('EXPIRE', KEYS[1], 86400)
+redis.call('ZADD', KEYS[2], now + lease_ttl, ARGV[1])
+redis.call('ZADD', KEYS[3], now + lease_ttl, ARGV[1])
+redis.call('EXPIRE', KEYS[2], math.ceil(lease_ttl) + 60)
+redis.call('EXPIRE', KEYS[3], math.ceil(lease_ttl) + 60)
+return {1, '0'}
+"""
+
+# KEYS: state hash; ARGV: cooldown seconds
+_COOLDOWN_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+redis.call('HSET', KEYS[1], 'cooldown_until', tostring(now + tonumber(ARGV[1])))
+redis.call('EXPIRE', KEYS[1], 86400)
+return 1
+"""
+
+# KEYS: state hash
+_COOLDOWN_REMAINING_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local cooldown = tonumber(redis.call('HGET', KEYS[1], 'cooldown_until') or '0')
+return tostring(math.max(0, cooldown - now))
+"""
+
+
+class RedisKeyStateBackend:
+    """
+    Key state shared by every process on every node. All timing uses the
+    Redis server clock so nodes with skewed clocks agree.
+    """
+
+    shared = True
+
+    def __init__(self, url: str, namespace: str = 'keys', client=None):
+        self.client = client or redis.Redis.from_url(url)
+        self.prefix = f"codedebhai:{namespace}:"
+        self.acquire_script = self.client.register_script(_ACQUIRE_SCRIPT)
+        self.cooldown_script = self.client.register_script(_COOLDOWN_SCRIPT)
+        self.cooldown_remaining_script = self.client.register_script(_COOLDOWN_REMAINING_SCRIPT)
+
+    def _state(self, scope: str, key: str) -> str:
+        return f"{self.prefix}{scope}:{key}:state"
+
+    def _leases(self, scope: str, key: str) -> str:
+        return f"{self.prefix}{scope}:{key}:leases"
+
+    def try_acquire(self, scope: str, key: str, limits: KeyLimits) -> Tuple[Optional[str], float]:
+        lease_id = uuid.uuid4().hex
+        args = [lease_id, limits.lease_ttl, limits.max_concurrent, limits.global_concurrent]
+        for rate, capacity in limits.buckets:
+            args.extend([rate, capacity])
+        granted, retry_after = self.acquire_script(
+            keys=[self._state(scope, key), self._leases(scope, key), self._leases(scope, '*')],
+            args=args
+        )
+        if int(granted):
+            return lease_id, 0.0
+        return None, float(retry_after)
+
+    def release(self, scope: str, key: str, lease_id: str):
+        pipe = self.client.pipeline()
+        pipe.zrem(self._leases(scope, key), lease_id)
+        pipe.zrem(self._leases(scope, '*'), lease_id)
+        pipe.execute()
+
+    def set_cooldown(self, scope: str, key: str, seconds: float):
+        self.cooldown_script(keys=[self._state(scope, key)], args=[seconds])
+
+    def clear_cooldown(self, scope: str, key: str):
+        self.client.hdel(self._state(scope, key), 'cooldown_until')
+
+    def cooldown_remaining(self, scope: str, key: str) -> float:
+        return float(self.cooldown_remaining_script(keys=[self._state(scope, key)]))
+
+    def reset(self, scope: str, key: str):
+        self.client.delete(self._state(scope, key))
+
+
+def create_key_state_backend(backend: str = None):
+    """Key-state backend from KEY_STATE_BACKEND ('memory' or 'redis'), falling back to memory"""
+    backend = (backend or os.getenv('KEY_STATE_BACKEND', 'memory')).lower()
+    if backend == 'redis':
+        if redis is None:
+            logger.warning("KEY_STATE_BACKEND=redis but the redis package is not installed. Using in-process key state.")
+        else:
+            try:
+                state = RedisKeyStateBackend(os.getenv('REDIS_URL', 'redis://localhost:6379/0'))
+                state.client.ping()
+                logger.info("Provider key rate limits shared through Redis")
+                return state
+            except Exception as e:
+                logger.warning(f"Redis key state unavailable ({e}). Using in-process key state.")
+    return MemoryKeyStateBackend()
@@ -0,0 +1,169 @@
+"""
+LLM Client Registry - One long-lived, connection-pooled client per provider key
+Avoids a fresh TCP+TLS handshake for every question and reports how often
+pooled connections are reused. Clients are asyncio clients owned by the
+solve engine's event loop (see solve_engine.py).
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+from typing import AsyncIterator, Dict, Any, Optional
+
+import httpx
+import anthropic
+
+logger = logging.getLogger(__name__)
+
+
+def key_fingerprint(api_key: str) -> str:
+    """Short, non-reversible identifier for an API key (safe to log and expose)"""
+    return hashlib.sha256((api_key or '').encode('utf-8')).hexdigest()[:8]
+
+
+async def iter_chat_completion_deltas(response: httpx.Response,
+                                      meta: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+    """Yield content deltas from an OpenAI-compatible streamed chat completion (SSE)
+
+    meta, if given, receives the choice's finish_reason ("stop", "length", ...).
+    """
+    async for line in response.aiter_lines():
+        if not line.startswith('data:'):
+            continue
+        payload = line[5:].strip()
+        if payload == '[DONE]':
+            return
+        try:
+            chunk = json.loads(payload)
+        except ValueError:
+            logger.debug(f"Skipping malformed stream chunk: {payload[:80]}")
+            continue
+        for choice in chunk.get('choices') or []:
+            if meta is not None and choice.get('finish_reason'):
+                meta['finish_reason'] = choice['finish_reason']
+            content = (choice.get('delta') or {}).get('content')
+            if content:
+                yield content
+
+
+class ProviderClientRegistry:
+    """
+    Registry of pooled provider clients, created lazily and cached per API key
+    """
+
+    def __init__(self, pool_size: int = 10, connect_timeout: float = 10.0,
+                 read_timeout: float = 60.0, keepalive_expiry: float = 60.0,
+                 anthropic_base_url: Optional[str] = None):
+        self.pool_size = pool_size
+        self.anthropic_base_url = anthropic_base_url  # e.g. the local fake server (fake_llm_server.py)
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.keepalive_expiry = keepalive_expiry
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+        self.anthropic_clients: Dict[str, anthropic.AsyncAnthropic] = {}
+        self.deepseek_clients: Dict[str, httpx.AsyncClient] = {}
+        self.counters: Dict[str, Dict[str, Dict[str, int]]] = {'claude': {}, 'deepseek': {}}
+
+    @classmethod
+    def from_env(cls) -> 'ProviderClientRegistry':
+        return cls(
+            pool_size=int(os.getenv('LLM_POOL_SIZE', '10')),
+            connect_timeout=float(os.getenv('LLM_CONNECT_TIMEOUT', '10')),
+            read_timeout=float(os.getenv('LLM_READ_TIMEOUT', '60')),
+            keepalive_expiry=float(os.getenv('LLM_KEEPALIVE_EXPIRY', '60')),
+            anthropic_base_url=os.getenv('ANTHROPIC_BASE_URL') or None
+        )
+
+    def _check_fork(self):
+        # Pooled sockets must never be shared with a forked child (gunicorn --preload, Celery prefork)
+        if self.pid != os.getpid():
+            self.anthropic_clients = {}
+            self.deepseek_clients = {}
+            self.counters = {'claude': {}, 'deepseek': {}}
+            self.pid = os.getpid()
+
+    def _http_client(self, provider: str, fingerprint: str, **kwargs) -> httpx.AsyncClient:
+        counters = self.counters[provider].setdefault(fingerprint, {'requests': 0, 'connections_opened': 0})
+
+        async def trace(event_name, info):
+            # httpcore emits this once per new TCP connection; reused connections skip it
+            if event_name == 'connection.connect_tcp.complete':
+                counters['connections_opened'] += 1
+
+        async def on_request(request):
+            counters['requests'] += 1
+            request.extensions['trace'] = trace
+
+        return httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=self.pool_size,
+                max_keepalive_connections=self.pool_size,
+                keepalive_expiry=self.keepalive_expiry
+            ),
+            timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+            event_hooks={'request': [on_request]},
+            **kwargs
+        )
+
+    def anthropic(self, api_key: str) -> anthropic.AsyncAnthropic:
+        """Get the pooled Anthropic client for an API key"""
+        fingerprint = key_fingerprint(api_key)
+        with self.lock:
+            self._check_fork()
+            client = self.anthropic_clients.get(fingerprint)
+            if client is None:
+                options = {'base_url': self.anthropic_base_url} if self.anthropic_base_url else {}
+                client = anthropic.AsyncAnthropic(
+                    api_key=api_key,
+                    http_client=self._http_client('claude', fingerprint),
+                    **options
+                )
+                self.anthropic_clients[fingerprint] = client
+                logger.info(f"Created pooled Anthropic client for key {fingerprint} (pool size {self.pool_size})")
+            return client
+
+    def deepseek(self, api_key: str) -> httpx.AsyncClient:
+        """Get the pooled keep-alive client for a DeepSeek API key"""
+        fingerprint = key_fingerprint(api_key)
+        with self.lock:
+            self._check_fork()
+            client = self.deepseek_clients.get(fingerprint)
+            if client is None:
+                client = self._http_client('deepseek', fingerprint, headers={
+                    "Content-Type": "application/json",
+                    "Authorization": f"Bearer {api_key}"
+                })
+                self.deepseek_clients[fingerprint] = client
+                logger.info(f"Created pooled DeepSeek client for key {fingerprint} (pool size {self.pool_size})")
+            return client
+
+    def stats(self) -> Dict[str, Any]:
+        """Connection reuse statistics per provider and key"""
+        def summarize(counters):
+            requests_sent = counters['requests']
+            opened = counters['connections_opened']
+            reused = max(requests_sent - opened, 0)
+            return {
+                'requests': requests_sent,
+                'connections_opened': opened,
+                'reused_requests': reused,
+                'reuse_rate': f"{(reused / max(requests_sent, 1) * 100):.1f}%"
+            }
+
+        with self.lock:
+            snapshot = {provider: {fp: dict(c) for fp, c in keys.items()}
+                        for provider, keys in self.counters.items()}
+
+        return {
+            'settings': {
+                'pool_size': self.pool_size,
+                'connect_timeout': self.connect_timeout,
+                'read_timeout': self.read_timeout,
+                'keepalive_expiry': self.keepalive_expiry
+            },
+            'claude': {fp: summarize(c) for fp, c in snapshot['claude'].items()},
+            'deepseek': {fp: summarize(c) for fp, c in snapshot['deepseek'].items()}
+        }
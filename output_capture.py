@@ -0,0 +1,232 @@
+"""
+Output Capture - Bounded capture of what executed programs print
+Program output used to be collected whole (an io.StringIO, or communicate()
+on a subprocess pipe): a program printing in a tight loop could grow it to
+gigabytes, and the screenshot renderer sizes its image by line count. Output
+now goes through a ring buffer that keeps the first head_lines and the last
+tail_lines lines with an elision marker between them, cuts overlong lines,
+and stops the program (exception in the sandboxed Python child, process
+group kill for subprocesses) once it has printed more than max_bytes. The
+limits are configurable per language and the result says what was dropped.
+"""
+
+import os
+import io
+import time
+import codecs
+import signal
+import selectors
+from collections import deque
+from typing import Any, Dict, Optional
+
+# Defaults; OUTPUT_<SETTING> overrides for every language, OUTPUT_<SETTING>_<LANGUAGE> for one
+# (e.g. OUTPUT_MAX_BYTES_JAVA, OUTPUT_TAIL_LINES_CPP, OUTPUT_HEAD_LINES_CSHARP)
+DEFAULT_LIMITS = {'head_lines': 200, 'tail_lines': 50, 'max_bytes': 1024 * 1024, 'max_line_chars': 2000}
+_LANGUAGE_SUFFIXES = {'c++': 'CPP', 'cpp': 'CPP', 'c#': 'CSHARP', 'csharp': 'CSHARP', 'js': 'JAVASCRIPT'}
+
+
+class OutputLimitExceeded(BaseException):
+    """Raised inside a sandboxed program that printed more than max_bytes.
+    A BaseException so the program's own `except Exception` blocks do not swallow it."""
+
+
+def _format_size(size: int) -> str:
+    if size >= 1024 * 1024:
+        return f"{size / (1024 * 1024):.1f} MB"
+    if size >= 1024:
+        return f"{size / 1024:.0f} KB"
+    return f"{size} bytes"
+
+
+class OutputLimits:
+    """
+    How much of a program's output is kept (head/tail lines, line length) and the hard cap in bytes
+    """
+
+    def __init__(self, head_lines: int = 200, tail_lines: int = 50, max_bytes: int = 1024 * 1024,
+                 max_line_chars: int = 2000):
+        self.head_lines = head_lines
+        self.tail_lines = tail_lines
+        self.max_bytes = max_bytes
+        self.max_line_chars = max_line_chars
+
+    @classmethod
+    def for_language(cls, language: str = 'python') -> 'OutputLimits':
+        suffix = _LANGUAGE_SUFFIXES.get((language or 'python').strip().lower(), (language or 'python').upper())
+        settings = {}
+        for name, default in DEFAULT_LIMITS.items():
+            variable = f"OUTPUT_{name.upper()}"
+            settings[name] = int(os.getenv(f"{variable}_{suffix}", os.getenv(variable, str(default))))
+        return cls(**settings)
+
+    def as_dict(self) -> Dict[str, int]:
+        return {'head_lines': self.head_lines, 'tail_lines': self.tail_lines, 'max_bytes': self.max_bytes,
+                'max_line_chars': self.max_line_chars}
+
+
+class BoundedOutput(io.TextIOBase):
+    """
+    Text stream keeping the first and last lines of everything written to it
+
+    write() raises OutputLimitExceeded past max_bytes when raise_on_limit is
+    set (redirected stdout of a sandboxed program); otherwise it stops
+    storing and sets limit_exceeded for the caller to act on.
+    """
+
+    def __init__(self, limits: Optional[OutputLimits] = None, raise_on_limit: bool = True):
+        self.limits = limits or OutputLimits()
+        self.raise_on_limit = raise_on_limit
+        self.head = []
+        self.tail = deque(maxlen=max(self.limits.tail_lines, 0))
+        self.partial = []
+        self.partial_chars = 0
+        self.lines = 0
+        self.bytes = 0
+        self.cut_lines = 0
+        self.limit_exceeded = False
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        if self.limit_exceeded:
+            if self.raise_on_limit:
+                raise OutputLimitExceeded(self.limit_message())
+            return len(text)
+        size = len(text) if text.isascii() else len(text.encode('utf-8', errors='replace'))
+        if self.bytes + size > self.limits.max_bytes:
+            # Keep what still fits, then stop
+            text = text[:max(self.limits.max_bytes - self.bytes, 0)]
+            self.limit_exceeded = True
+        self.bytes += size
+        pieces = text.split('\n')
+        for piece in pieces[:-1]:
+            self._append_partial(piece)
+            self._end_line()
+        self._append_partial(pieces[-1])
+        if self.limit_exceeded and self.raise_on_limit:
+            raise OutputLimitExceeded(self.limit_message())
+        return len(text)
+
+    def _append_partial(self, piece: str):
+        room = self.limits.max_line_chars - self.partial_chars
+        if piece and room > 0:
+            self.partial.append(piece[:room])
+        self.partial_chars += len(piece)
+
+    def _end_line(self):
+        line = ''.join(self.partial)
+        if self.partial_chars > self.limits.max_line_chars:
+            line += f" ... [{self.partial_chars - self.limits.max_line_chars:,} more characters]"
+            self.cut_lines += 1
+        self.partial, self.partial_chars = [], 0
+        self.lines += 1
+        if len(self.head) < self.limits.head_lines:
+            self.head.append(line)
+        elif self.tail.maxlen:
+            self.tail.append(line)
+
+    @property
+    def omitted(self) -> int:
+        return self.lines - len(self.head) - len(self.tail)
+
+    @property
+    def truncated(self) -> bool:
+        return self.omitted > 0 or self.cut_lines > 0 or self.limit_exceeded
+
+    def limit_message(self) -> str:
+        return f"[Output limit reached: the program was stopped after printing {_format_size(self.limits.max_bytes)}]"
+
+    def getvalue(self) -> str:
+        """The kept output: head lines, an elision marker, tail lines and any unfinished line"""
+        lines = list(self.head)
+        if self.omitted > 0:
+            lines.append(f"... [{self.omitted:,} lines omitted] ...")
+        lines.extend(self.tail)
+        if self.partial_chars:
+            lines.append(''.join(self.partial) + (" ..." if self.partial_chars > self.limits.max_line_chars else ''))
+        return "\n".join(lines)
+
+    def info(self) -> Dict[str, Any]:
+        return {'lines': self.lines, 'bytes': self.bytes, 'omitted_lines': max(self.omitted, 0),
+                'cut_lines': self.cut_lines, 'truncated': self.truncated, 'limit_exceeded': self.limit_exceeded}
+
+
+class CapturedRun:
+    """Output of a subprocess read through bounded buffers"""
+
+    def __init__(self, stdout: BoundedOutput, stderr: BoundedOutput, returncode: Optional[int], timed_out: bool):
+        self.stdout = stdout
+        self.stderr = stderr
+        self.returncode = returncode
+        self.timed_out = timed_out
+
+    @property
+    def limit_exceeded(self) -> bool:
+        return self.stdout.limit_exceeded or self.stderr.limit_exceeded
+
+    @property
+    def truncated(self) -> bool:
+        return self.stdout.truncated or self.stderr.truncated
+
+    def output(self) -> str:
+        """stdout then stderr (the executors' long-standing format), plus the limit notice"""
+        parts = [self.stdout.getvalue().strip(), self.stderr.getvalue().strip()]
+        if self.limit_exceeded:
+            parts.append(self.stdout.limit_message())
+        return "\n".join(part for part in parts if part).strip()
+
+
+def capture_process(process, limits: OutputLimits, timeout: Optional[float]) -> CapturedRun:
+    """
+    Read a started process's stdout/stderr pipes (binary) into bounded buffers
+
+    The process group is killed when the wall-clock timeout passes or the
+    combined output exceeds limits.max_bytes; the process is reaped either way.
+    """
+    stdout = BoundedOutput(limits, raise_on_limit=False)
+    stderr = BoundedOutput(limits, raise_on_limit=False)
+    streams = {}
+    selector = selectors.DefaultSelector()
+    for pipe, sink in ((process.stdout, stdout), (process.stderr, stderr)):
+        if pipe is not None:
+            streams[pipe.fileno()] = (sink, codecs.getincrementaldecoder('utf-8')(errors='replace'))
+            selector.register(pipe.fileno(), selectors.EVENT_READ)
+    deadline = time.monotonic() + timeout if timeout else None
+    timed_out = False
+    try:
+        while streams:
+            wait = None if deadline is None else deadline - time.monotonic()
+            if wait is not None and wait <= 0:
+                timed_out = True
+                break
+            for key, _ in selector.select(wait):
+                sink, decoder = streams[key.fd]
+                data = os.read(key.fd, 65536)
+                if not data:
+                    sink.write(decoder.decode(b'', final=True))
+                    selector.unregister(key.fd)
+                    del streams[key.fd]
+                    continue
+                sink.write(decoder.decode(data))
+                # The cap covers both streams together
+                if stdout.bytes + stderr.bytes > limits.max_bytes:
+                    stdout.limit_exceeded = True
+            if stdout.limit_exceeded or stderr.limit_exceeded:
+                break
+    finally:
+        selector.close()
+    if streams:
+        _kill_group(process)
+    for pipe in (process.stdout, process.stderr):
+        if pipe is not None:
+            pipe.close()
+    returncode = process.wait()
+    return CapturedRun(stdout, stderr, None if timed_out else returncode, timed_out)
+
+
+def _kill_group(process):
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (OSError, AttributeError):  # AttributeError: no process groups (Windows)
+        process.kill()
@@ -0,0 +1,199 @@
+"""
+Provider Router - Latency- and error-aware choice of LLM provider and key
+Keeps a sliding window of latencies and outcomes per provider and per API key
+and ranks providers by expected completion time: a blend of the EWMA and p95
+latency, inflated by the recent error rate (each failure costs a retry),
+plus the time until a key leaves cooldown, scaled by a per-provider cost
+weight. Providers without samples use a prior, so a fresh process keeps the
+configured provider order until real measurements arrive.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from hedging import LatencyWindow
+
+logger = logging.getLogger(__name__)
+
+
+class OutcomeStats:
+    """Latency and error rate of one provider or one key over a sliding window"""
+
+    def __init__(self, window: int = 200, max_age: float = 300, alpha: float = 0.2):
+        self.latencies = LatencyWindow(window, max_age=max_age)
+        self.outcomes = deque(maxlen=window)  # (monotonic time, ok, error type)
+        self.max_age = max_age
+        self.alpha = alpha
+        self.ewma: Optional[float] = None
+        self.ewma_updated = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, seconds: Optional[float], ok: bool, error_type: Optional[str] = None):
+        now = time.monotonic()
+        with self.lock:
+            self.outcomes.append((now, ok, error_type))
+            if ok and seconds is not None:
+                stale = self.ewma is None or now - self.ewma_updated > self.max_age
+                self.ewma = seconds if stale else self.alpha * seconds + (1 - self.alpha) * self.ewma
+                self.ewma_updated = now
+        if ok and seconds is not None:
+            self.latencies.record(seconds)
+
+    def _recent(self) -> List[Tuple[float, bool, Optional[str]]]:
+        cutoff = time.monotonic() - self.max_age
+        with self.lock:
+            return [outcome for outcome in self.outcomes if outcome[0] >= cutoff]
+
+    def error_rate(self) -> Optional[float]:
+        recent = self._recent()
+        if not recent:
+            return None
+        return sum(1 for _, ok, _ in recent if not ok) / len(recent)
+
+    def latency_ewma(self) -> Optional[float]:
+        with self.lock:
+            if self.ewma is None or time.monotonic() - self.ewma_updated > self.max_age:
+                return None
+            return self.ewma
+
+    def snapshot(self) -> Dict[str, Any]:
+        recent = self._recent()
+        errors: Dict[str, int] = {}
+        for _, ok, error_type in recent:
+            if not ok:
+                errors[error_type or 'error'] = errors.get(error_type or 'error', 0) + 1
+        ewma, p95, error_rate = self.latency_ewma(), self.latencies.percentile(0.95), self.error_rate()
+        return {
+            'samples': len(recent),
+            'latency_ewma': round(ewma, 3) if ewma is not None else None,
+            'latency_p50': self.latencies.percentile(0.5),
+            'latency_p95': p95,
+            'error_rate': round(error_rate, 3) if error_rate is not None else None,
+            'errors': errors
+        }
+
+
+class ProviderRouter:
+    """
+    Ranks providers (and their keys) by expected completion time
+    """
+
+    def __init__(self, cost_weights: Optional[Dict[str, float]] = None, tail_weight: float = 0.5,
+                 prior_latency: float = 8.0, min_samples: int = 5, max_error_rate: float = 0.9,
+                 window: int = 200, max_age: float = 300, alpha: float = 0.2):
+        self.cost_weights = cost_weights or {}
+        self.tail_weight = tail_weight
+        self.prior_latency = prior_latency
+        self.min_samples = min_samples
+        self.max_error_rate = max_error_rate
+        self.window = window
+        self.max_age = max_age
+        self.alpha = alpha
+        self.providers: Dict[str, OutcomeStats] = {}
+        self.keys: Dict[Tuple[str, int], OutcomeStats] = {}
+        self.lock = threading.Lock()
+        self.decisions: Dict[str, int] = {}
+
+    @classmethod
+    def from_env(cls) -> 'ProviderRouter':
+        """Router configured by ROUTER_* variables; ROUTER_COST_WEIGHTS looks like 'claude=1.0,deepseek=0.8'"""
+        cost_weights = {}
+        for item in os.getenv('ROUTER_COST_WEIGHTS', '').split(','):
+            name, _, weight = item.partition('=')
+            if name.strip() and weight.strip():
+                try:
+                    cost_weights[name.strip().lower()] = float(weight)
+                except ValueError:
+                    logger.warning(f"Ignoring invalid ROUTER_COST_WEIGHTS entry: {item}")
+        return cls(
+            cost_weights=cost_weights,
+            tail_weight=float(os.getenv('ROUTER_TAIL_WEIGHT', '0.5')),
+            prior_latency=float(os.getenv('ROUTER_PRIOR_LATENCY', '8')),
+            max_age=float(os.getenv('ROUTER_WINDOW_SECONDS', '300'))
+        )
+
+    def _stats(self, table: Dict, key) -> OutcomeStats:
+        with self.lock:
+            stats = table.get(key)
+            if stats is None:
+                stats = table[key] = OutcomeStats(self.window, self.max_age, self.alpha)
+            return stats
+
+    def record(self, provider: str, key_index: Optional[int], seconds: Optional[float],
+               ok: bool = True, error_type: Optional[str] = None):
+        """Record one finished provider request (seconds is ignored for failures)"""
+        self._stats(self.providers, provider).record(seconds, ok, error_type)
+        if key_index is not None:
+            self._stats(self.keys, (provider, key_index)).record(seconds, ok, error_type)
+
+    def _expected(self, stats: OutcomeStats) -> float:
+        ewma = stats.latency_ewma()
+        if ewma is None or len(stats.latencies) < self.min_samples:
+            latency = self.prior_latency
+        else:
+            p95 = stats.latencies.percentile(0.95)
+            latency = (1 - self.tail_weight) * ewma + self.tail_weight * p95
+        error_rate = min(stats.error_rate() or 0.0, self.max_error_rate)
+        return latency / (1 - error_rate)  # Expected attempts until one succeeds
+
+    def expected_seconds(self, provider: str, scheduler=None) -> float:
+        """Expected completion time, including the wait for a key to leave cooldown"""
+        expected = self._expected(self._stats(self.providers, provider))
+        if scheduler is not None:
+            if not scheduler.keys:
+                return float('inf')
+            if scheduler.get_available_keys_count() == 0:
+                expected += scheduler.seconds_until_available()
+        return expected
+
+    def score(self, provider: str, scheduler=None) -> float:
+        return self.expected_seconds(provider, scheduler) * self.cost_weights.get(provider, 1.0)
+
+    def key_cost(self, provider: str, key_index: int) -> float:
+        """Expected latency of one key; used by KeyScheduler to prefer fast keys"""
+        return self._expected(self._stats(self.keys, (provider, key_index)))
+
+    def _order(self, schedulers: Dict[str, Any]) -> List[str]:
+        return sorted(schedulers, key=lambda name: self.score(name, schedulers[name]))
+
+    def rank(self, schedulers: Dict[str, Any]) -> List[str]:
+        """Providers ordered best first; ties keep the order of `schedulers`"""
+        order = self._order(schedulers)
+        with self.lock:
+            self.decisions[order[0]] = self.decisions.get(order[0], 0) + 1
+        return order
+
+    def stats(self, schedulers: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """The router's current view of every provider and key"""
+        schedulers = schedulers or {}
+
+        def seconds(value):
+            return round(value, 3) if value != float('inf') else None
+
+        with self.lock:
+            names = list(dict.fromkeys(list(schedulers) + list(self.providers)))
+            keys = list(self.keys.items())
+            decisions = dict(self.decisions)
+        view = {}
+        for name in names:
+            view[name] = dict(
+                self._stats(self.providers, name).snapshot(),
+                expected_seconds=seconds(self.expected_seconds(name, schedulers.get(name))),
+                cost_weight=self.cost_weights.get(name, 1.0),
+                score=seconds(self.score(name, schedulers.get(name))),
+                keys={}
+            )
+        for (name, index), stats in keys:
+            view[name]['keys'][index + 1] = dict(stats.snapshot(), expected_seconds=seconds(self._expected(stats)))
+        return {
+            'ranking': self._order({name: schedulers.get(name) for name in names}),
+            'first_choice_counts': decisions,
+            'tail_weight': self.tail_weight,
+            'prior_latency': self.prior_latency,
+            'window_seconds': self.max_age,
+            'providers': view
+        }
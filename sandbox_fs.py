@@ -0,0 +1,111 @@
+"""
+Sandbox FS - Per-run working directories with prebuilt mock files
+File-I/O questions (open, os.listdir, glob, ...) need files to read. A fixture
+template with the mock files is built once per sandbox worker; every run gets
+a fresh directory on tmpfs that becomes its cwd, with the fixture files copied
+in when the program touches the filesystem. Programs run unmodified, relative
+paths land in the run directory, and the directory is removed when the run
+ends. Fixture files are copied rather than hardlinked: a hardlink shares the
+inode, so a program opening "data.csv" for writing or appending would change
+the template for every later run. The files are a few hundred bytes on tmpfs,
+so copying costs well under a millisecond.
+"""
+
+import os
+import shutil
+import hashlib
+import logging
+import tempfile
+import itertools
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Relative path -> content of the mock files every file-I/O program can use
+FIXTURE_FILES = {
+    'document1.txt': 'This is a sample text document with some content.',
+    'data.csv': 'name,age,city\nJohn,25,New York\nJane,30,London\nBob,35,Paris',
+    'config.json': '{"database": "localhost", "port": 5432, "debug": true}',
+    'script.py': 'print("Hello from Python script")\nresult = 42\nprint(f"Result: {result}")',
+    'readme.md': '# Project Title\nThis is a sample markdown file.\n## Features\n- Feature 1\n- Feature 2',
+    'log.txt': 'INFO: Application started\nWARNING: Connection timeout\nERROR: Database connection failed',
+    'numbers.txt': '1\n2\n3\n4\n5\n6\n7\n8\n9\n10',
+    'words.txt': 'apple\nbanana\ncherry\ndate\nelderberry\nfig\ngrape',
+    os.path.join('subfolder', 'nested.txt'): 'This is a nested file in subfolder.',
+    os.path.join('data', 'dataset.csv'): 'id,value\n1,100\n2,200\n3,300',
+}
+
+# Changes whenever the mock files do (part of the execution cache key)
+FIXTURE_VERSION = hashlib.sha256(repr(sorted(FIXTURE_FILES.items())).encode('utf-8')).hexdigest()[:12]
+
+FILE_OPERATIONS = ('open(', 'os.listdir', 'os.walk', 'glob.glob', 'pathlib', 'os.path.exists', 'os.path.isfile',
+                   'os.path.isdir', 'with open', 'os.scandir', 'shutil.', 'Path(')
+
+
+def needs_fixtures(code: str) -> bool:
+    """Whether a program touches the filesystem and should find the mock files"""
+    return any(op in (code or '') for op in FILE_OPERATIONS)
+
+
+def tmpfs_root() -> str:
+    """Base directory for run directories: SANDBOX_TMPFS, else /dev/shm (RAM-backed) when available"""
+    configured = os.getenv('SANDBOX_TMPFS')
+    if configured:
+        return configured
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        return '/dev/shm'
+    return tempfile.gettempdir()
+
+
+class FixtureArea:
+    """
+    A sandbox worker's area on tmpfs: the fixture template plus one directory per run
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.path = tempfile.mkdtemp(prefix=f'codedebhai-sandbox-{os.getpid()}-', dir=root or tmpfs_root())
+        self.template = os.path.join(self.path, 'template')
+        self.runs = itertools.count(1)  # next() is atomic, so threads can share an area
+        for relative, content in FIXTURE_FILES.items():
+            target = os.path.join(self.template, relative)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'w', encoding='utf-8') as f:
+                f.write(content)
+
+    def new_run_dir(self) -> str:
+        """Path for the next run's directory (created by materialize in the run's process)"""
+        return os.path.join(self.path, f'run-{next(self.runs)}')
+
+    def materialize(self, run_dir: str, with_fixtures: bool):
+        """Create a run directory, copying the fixture files in when requested"""
+        if with_fixtures:
+            shutil.copytree(self.template, run_dir, copy_function=shutil.copyfile)
+        else:
+            os.mkdir(run_dir)
+
+    def discard(self, run_dir: str):
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+    def close(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def remove_stale_areas(root: Optional[str] = None):
+    """Delete areas left behind by sandbox workers that no longer exist (killed, crashed)"""
+    root = root or tmpfs_root()
+    try:
+        names = os.listdir(root)
+    except OSError:
+        return
+    for name in names:
+        if not name.startswith('codedebhai-sandbox-'):
+            continue
+        try:
+            pid = int(name.split('-')[2])
+            os.kill(pid, 0)
+        except (ValueError, IndexError):
+            continue
+        except ProcessLookupError:
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+        except PermissionError:
+            pass  # Alive, owned by another user
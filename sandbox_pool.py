@@ -0,0 +1,596 @@
+"""
+Sandbox Pool - Pre-forked, resource-limited execution of generated Python code
+Generated programs used to run with exec() inside the web process: the
+stdout redirect was process-wide (concurrent runs captured each other's
+output), nothing stopped an endless loop and CPU-heavy code held the GIL
+against request threads. Programs now run in a pool of sandbox worker
+processes. Each worker is a clean interpreter running this module (not the
+app) that acts as a fork server: it forks one child per program, the child applies wall-clock, CPU and memory limits and
+captures its own stdout/stderr, and the result string follows the old
+execute_code contract. Each run's cwd is a fresh tmpfs directory holding
+the mock files file-I/O questions expect (sandbox_fs), removed afterwards.
+Workers import the modules generated programs commonly
+use before they start forking, so every run begins from a warm interpreter
+instead of paying for interpreter start-up and cold imports. Programs submitted together (a document's questions
+finishing at about the same time) travel to a worker in one round-trip.
+"""
+
+import gc
+import atexit
+import os
+import sys
+import builtins
+import importlib
+import json
+import time
+import queue
+import signal
+import logging
+import socket
+import selectors
+import threading
+import contextlib
+import subprocess
+import concurrent.futures
+from collections import Counter
+from multiprocessing.connection import Connection
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from code_preflight import add_final_print
+from hedging import LatencyWindow
+from output_capture import BoundedOutput, OutputLimitExceeded, OutputLimits
+from sandbox_fs import FixtureArea, needs_fixtures, remove_stale_areas
+
+try:
+    import resource
+except ImportError:  # Windows - no rlimits or fork; execution stays in-process
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+NO_OUTPUT_MESSAGE = ("Code executed successfully but produced no visible output. "
+                     "This is normal for some programs that don't print results.")
+# Extra wall-clock time before a child that ignored its own timer is killed
+_KILL_GRACE = 1.0
+_MAX_RESULT_CHARS = 1_000_000
+# Imported by each worker before it forks runs (SANDBOX_PRELOAD_MODULES overrides)
+DEFAULT_PRELOAD_MODULES = ('math', 'random', 'collections', 'datetime', 'json', 're', 'itertools',
+                           'os', 'pathlib', 'csv', 'string', 'functools', 'statistics', 'time',
+                           'glob', 'tempfile', 'shutil')  # The last three are used by run_program's file setup
+
+
+class ExecutionTimeout(BaseException):
+    """Raised inside a sandboxed program when it runs out of wall-clock or CPU time.
+    A BaseException so the program's own `except Exception` blocks do not swallow it."""
+
+
+def run_program(code: str, output: Optional[BoundedOutput] = None) -> str:
+    """Execute generated Python code and return its output (the execute_code contract)
+
+    Output is kept by a BoundedOutput (head and tail lines); a program printing
+    past its byte cap is stopped and the result ends with the limit notice.
+    """
+    output = output if output is not None else BoundedOutput(OutputLimits.for_language('python'))
+    try:
+        if code.startswith("Error") or not code:
+            return f"Invalid code returned: {code}"
+        logger.debug(f"Executing code:\n{code}")
+        context = {'__name__': '__main__', '__file__': 'task.py'}
+        
+        # Programs touching the filesystem run in a directory holding the mock files (see sandbox_fs)
+        if needs_fixtures(code):
+            context.update({
+                'os': __import__('os'),
+                'glob': __import__('glob'),
+                'pathlib': __import__('pathlib'),
+                'tempfile': __import__('tempfile'),
+            })
+        # A program without print() that ends on a value (expression or assignment) prints it;
+        # failures are reported as they are, for code_preflight's repair loop to fix
+        modified_code = add_final_print(code)
+        
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+            exec(modified_code, context, context)
+        
+        result = output.getvalue().strip()
+        
+        # If still no output, try to find and print meaningful variables
+        if not result:
+            # Look for variables that might contain results
+            meaningful_vars = []
+            for var_name, var_value in context.items():
+                if not var_name.startswith('__') and var_name not in ['io', 'contextlib', 'sys']:
+                    # Skip functions and modules
+                    if not callable(var_value) and not str(type(var_value)).startswith('<class \'module'):
+                        meaningful_vars.append(f"{var_name} = {var_value}")
+            
+            if meaningful_vars:
+                result = "\n".join(meaningful_vars[:5])  # Limit to first 5 variables
+            else:
+                # Last resort: try to execute and capture any return value
+                try:
+                    # Check if the code is a single expression that returns a value
+                    if '\n' not in code.strip() and not any(keyword in code.lower() for keyword in ['def ', 'class ', 'import ', 'for ', 'while ', 'if ']):
+                        try:
+                            result_value = eval(code, context)
+                            if result_value is not None:
+                                result = str(result_value)
+                        except:
+                            pass
+                except:
+                    pass
+        
+        return result if result else NO_OUTPUT_MESSAGE
+    except OutputLimitExceeded:
+        return "\n".join(part for part in (output.getvalue().strip(), output.limit_message()) if part)
+    except MemoryError:
+        raise  # Reported by the sandbox as the memory limit
+    except Exception as e:
+        logger.exception(f"Error executing code: {e}")
+        return f"Error executing code: {e}"
+
+
+def _apply_limits(limits: Dict[str, Any]):
+    """Resource limits for one sandboxed run (called in the forked child)"""
+    cpu = limits.get('cpu_seconds')
+    if cpu:
+        # SIGXCPU at the soft limit (handled below), SIGKILL one second later
+        resource.setrlimit(resource.RLIMIT_CPU, (int(cpu), int(cpu) + 1))
+    memory = limits.get('memory_mb')
+    if memory:
+        # Headroom above what the warm worker already maps, so the limit means "memory the program may add"
+        with open('/proc/self/statm') as f:
+            mapped = int(f.read().split()[0]) * resource.getpagesize()
+        resource.setrlimit(resource.RLIMIT_AS, (mapped + memory * 1024 * 1024,) * 2)
+    file_size = limits.get('file_size_mb')
+    if file_size:
+        resource.setrlimit(resource.RLIMIT_FSIZE, (file_size * 1024 * 1024,) * 2)
+
+
+def _timed_imports(totals: List[float]):
+    """__import__ replacement adding the time spent in outermost imports to totals[0]"""
+    real_import = builtins.__import__
+    depth = [0]
+
+    def timed_import(*args, **kwargs):
+        depth[0] += 1
+        started = time.perf_counter()
+        try:
+            return real_import(*args, **kwargs)
+        finally:
+            depth[0] -= 1
+            if not depth[0]:
+                totals[0] += time.perf_counter() - started
+
+    return timed_import
+
+
+def _enter_run_dir(run_dir: str):
+    """Make run_dir the program's cwd and temp directory"""
+    os.chdir(run_dir)
+    os.environ['TMPDIR'] = run_dir
+    import tempfile
+    tempfile.tempdir = run_dir
+
+
+def _child_main(code: str, limits: Dict[str, Any], result_fd: int, forked_at: float,
+                area: Optional[FixtureArea] = None, run_dir: Optional[str] = None):
+    """Run one program in a forked child and write the result to result_fd; never returns"""
+    status = 0
+    try:
+        os.setpgid(0, 0)  # Own process group: a timeout kills anything the program spawned too
+        if area is not None:
+            area.materialize(run_dir, needs_fixtures(code))
+            _enter_run_dir(run_dir)
+        timeout = limits.get('timeout')
+
+        def on_timeout(signum, frame):
+            raise ExecutionTimeout(f"Execution timed out after {timeout:g}s")
+
+        def on_cpu_limit(signum, frame):
+            raise ExecutionTimeout(f"CPU time limit of {limits.get('cpu_seconds')}s exceeded")
+
+        signal.signal(signal.SIGALRM, on_timeout)
+        signal.signal(signal.SIGXCPU, on_cpu_limit)
+        _apply_limits(limits)
+        output = BoundedOutput(OutputLimits(**limits['output']) if limits.get('output') else None)
+        loaded = set(sys.modules)
+        import_seconds = [0.0]
+        builtins.__import__ = _timed_imports(import_seconds)
+        # Fork to ready-to-run, measured on the shared CLOCK_MONOTONIC
+        startup = time.monotonic() - forked_at
+        if timeout:
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+        try:
+            result, kind = run_program(code, output), 'ok'
+        except ExecutionTimeout as e:
+            result, kind = f"Error executing code: {e}", 'timeout'
+        except MemoryError:
+            result, kind = "Error executing code: memory limit exceeded", 'memory'
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        if kind == 'ok' and output.limit_exceeded:
+            kind = 'output_limit'
+        cold = sorted({name.split('.')[0] for name in set(sys.modules) - loaded if not name.startswith('_')})
+        payload = json.dumps({'output': result[:_MAX_RESULT_CHARS], 'kind': kind, 'startup': startup,
+                              'truncated': output.truncated, 'import_seconds': import_seconds[0],
+                              'cold_imports': cold}).encode('utf-8')
+        view = memoryview(payload)
+        while view:
+            view = view[os.write(result_fd, view):]
+    except BaseException:
+        status = 1
+    finally:
+        os._exit(status)
+
+
+def _run_batch(jobs: List[Tuple[str, Dict[str, Any]]], max_parallel: int, close_fd: int = -1,
+               area: Optional[FixtureArea] = None) -> List[Dict[str, Any]]:
+    """Fork a child per program (at most max_parallel at once) and collect results in order"""
+    results: List[Optional[Dict[str, Any]]] = [None] * len(jobs)
+    pending = list(enumerate(jobs))
+    running: Dict[int, list] = {}  # read fd -> [index, pid, deadline, chunks, run_dir]
+    selector = selectors.DefaultSelector()
+
+    def finish(fd, result):
+        index, pid, _, _, run_dir = running.pop(fd)
+        selector.unregister(fd)
+        os.close(fd)
+        os.waitpid(pid, 0)
+        if run_dir:
+            area.discard(run_dir)
+        results[index] = result
+
+    while pending or running:
+        while pending and len(running) < max_parallel:
+            index, (code, limits) = pending.pop(0)
+            read_fd, write_fd = os.pipe()
+            run_dir = area.new_run_dir() if area is not None else None
+            forked_at = time.monotonic()
+            pid = os.fork()
+            if pid == 0:
+                os.close(read_fd)
+                if close_fd >= 0:
+                    os.close(close_fd)  # The program must not reach the worker's control connection
+                _child_main(code, limits, write_fd, forked_at, area, run_dir)
+            os.close(write_fd)
+            deadline = time.monotonic() + (limits.get('timeout') or 3600) + _KILL_GRACE
+            running[read_fd] = [index, pid, deadline, [], run_dir]
+            selector.register(read_fd, selectors.EVENT_READ)
+
+        now = time.monotonic()
+        wait = max(0.0, min(entry[2] for entry in running.values()) - now)
+        for key, _ in selector.select(wait):
+            entry = running[key.fd]
+            data = os.read(key.fd, 65536)
+            if data:
+                entry[3].append(data)
+                continue
+            try:
+                result = json.loads(b''.join(entry[3]).decode('utf-8'))
+            except ValueError:
+                # No result: killed by a signal (CPU hard limit, OOM killer) or crashed the interpreter
+                result = {'output': "Error executing code: the program was terminated", 'kind': 'killed'}
+            finish(key.fd, result)
+
+        now = time.monotonic()
+        for fd, entry in list(running.items()):
+            if now >= entry[2]:
+                try:
+                    os.killpg(entry[1], signal.SIGKILL)
+                except OSError:
+                    os.kill(entry[1], signal.SIGKILL)
+                timeout = jobs[entry[0]][1].get('timeout')
+                finish(fd, {'output': f"Error executing code: Execution timed out after {timeout:g}s", 'kind': 'timeout'})
+
+    selector.close()
+    return results
+
+
+def _preload(modules: Sequence[str]) -> Dict[str, Any]:
+    """Import modules into the worker so forked runs find them already loaded"""
+    started = time.perf_counter()
+    loaded, failed = [], []
+    for name in modules:
+        try:
+            importlib.import_module(name)
+            loaded.append(name)
+        except Exception:
+            failed.append(name)
+    gc.collect()
+    if hasattr(gc, 'freeze'):
+        gc.freeze()  # Keep the collector from touching (and so copying) the warm heap in every fork
+    return {'preloaded': loaded, 'failed': failed, 'preload_seconds': time.perf_counter() - started}
+
+
+def _worker_main(conn, max_parallel: int, preload: Sequence[str] = ()):
+    """Sandbox worker: preloads modules, then receives batches of (code, limits) and answers with their results"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Shut down by the pool, not by Ctrl+C in the parent
+    remove_stale_areas()
+    area = FixtureArea()
+    conn.send(_preload(preload))
+    try:
+        while True:
+            try:
+                jobs = conn.recv()
+            except (EOFError, OSError):
+                return
+            if jobs is None:
+                return
+            conn.send(_run_batch(jobs, max_parallel, conn.fileno(), area))
+    finally:
+        area.close()
+
+
+class _Worker:
+    """A sandbox worker process and its control connection"""
+
+    def __init__(self, max_parallel: int, preload: Sequence[str] = ()):
+        # A fresh interpreter rather than multiprocessing's forkserver/spawn, which would re-import
+        # the app's __main__ (Flask, database clients, ...) in every worker
+        parent_sock, child_sock = socket.socketpair()
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), '--worker', str(child_sock.fileno()), str(max_parallel),
+             ','.join(preload)],
+            pass_fds=[child_sock.fileno()], stdin=subprocess.DEVNULL, close_fds=True
+        )
+        child_sock.close()
+        self.conn = Connection(parent_sock.detach())
+        self.info: Dict[str, Any] = {}
+        if self.conn.poll(30):
+            self.info = self.conn.recv()  # Preload report, sent once the worker is warm
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except Exception:
+            pass
+        try:
+            self.process.wait(1)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.conn.close()
+
+
+class SandboxPool:
+    """
+    Pool of forkserver sandbox workers with per-run limits and round-trip batching
+
+    execute(code) has the execute_code contract. Calls arriving within
+    batch_window seconds of each other are sent to one worker together (up to
+    max_batch programs); execute_many(codes) sends a known batch directly.
+    """
+
+    def __init__(self, workers: int = 2, timeout: float = 10.0, cpu_seconds: int = 5, memory_mb: int = 256,
+                 file_size_mb: int = 16, max_parallel: int = None, max_batch: int = 32, batch_window: float = 0.02,
+                 preload: Sequence[str] = DEFAULT_PRELOAD_MODULES, output_limits: Optional[OutputLimits] = None):
+        self.workers_count = workers
+        self.preload = tuple(preload)
+        self.limits = {'timeout': timeout, 'cpu_seconds': cpu_seconds, 'memory_mb': memory_mb,
+                       'file_size_mb': file_size_mb,
+                       'output': (output_limits or OutputLimits.for_language('python')).as_dict()}
+        self.max_parallel = max_parallel or os.cpu_count() or 2
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.idle: 'queue.Queue[_Worker]' = queue.Queue()
+        self.workers: List[_Worker] = []
+        self.lock = threading.Lock()
+        self.pid = None
+        self.pending: List[Tuple[str, concurrent.futures.Future]] = []
+        self.timer: Optional[threading.Timer] = None
+        self.stats_lock = threading.Lock()
+        self.counters = {'runs': 0, 'round_trips': 0, 'timeouts': 0, 'memory_errors': 0, 'killed': 0,
+                         'output_limit_stops': 0, 'truncated_outputs': 0, 'worker_restarts': 0,
+                         'run_seconds': 0.0, 'import_seconds': 0.0}
+        self.startup_window = LatencyWindow(500)
+        self.cold_imports: Counter = Counter()
+
+    @classmethod
+    def from_env(cls) -> 'SandboxPool':
+        return cls(
+            workers=int(os.getenv('SANDBOX_WORKERS', '2')),
+            timeout=float(os.getenv('SANDBOX_TIMEOUT_SECONDS', '10')),
+            cpu_seconds=int(os.getenv('SANDBOX_CPU_SECONDS', '5')),
+            memory_mb=int(os.getenv('SANDBOX_MEMORY_MB', '256')),
+            max_batch=int(os.getenv('SANDBOX_MAX_BATCH', '32')),
+            batch_window=int(os.getenv('SANDBOX_BATCH_WINDOW_MS', '20')) / 1000,
+            preload=[m.strip() for m in os.getenv('SANDBOX_PRELOAD_MODULES', ','.join(DEFAULT_PRELOAD_MODULES)).split(',')
+                     if m.strip()]
+        )
+
+    def _ensure_started(self):
+        # Started lazily and per process so workers are never inherited across fork (gunicorn --preload)
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.idle = queue.Queue()
+            self.workers = [_Worker(self.max_parallel, self.preload) for _ in range(self.workers_count)]
+            for worker in self.workers:
+                self.idle.put(worker)
+            self.pid = os.getpid()
+            logger.info(f"Sandbox pool started: {self.workers_count} workers, limits {self.limits}")
+
+    def _replace(self, worker: _Worker) -> _Worker:
+        worker.process.kill()
+        worker.conn.close()
+        with self.lock:
+            fresh = _Worker(self.max_parallel, self.preload)
+            self.workers = [fresh if w is worker else w for w in self.workers]
+        self._count('worker_restarts')
+        return fresh
+
+    def _count(self, key: str, amount=1):
+        with self.stats_lock:
+            self.counters[key] += amount
+
+    def execute_many(self, codes: List[str], timeout: float = None) -> List[str]:
+        """Run several programs in one worker round-trip; outputs in input order"""
+        if not codes:
+            return []
+        self._ensure_started()
+        limits = dict(self.limits, timeout=timeout or self.limits['timeout'])
+        jobs, outputs = [], [None] * len(codes)
+        for index, code in enumerate(codes):
+            if not code or code.startswith("Error"):
+                outputs[index] = f"Invalid code returned: {code}"
+            else:
+                jobs.append((index, (code, limits)))
+        if not jobs:
+            return outputs
+
+        # Longest the worker can take: every wave of max_parallel programs hitting its timeout
+        waves = -(-len(jobs) // self.max_parallel)
+        deadline = waves * (limits['timeout'] + _KILL_GRACE) + 5
+        started = time.monotonic()
+        worker = self.idle.get()
+        try:
+            worker.conn.send([job for _, job in jobs])
+            if not worker.conn.poll(deadline):
+                raise TimeoutError("sandbox worker did not answer")
+            results = worker.conn.recv()
+        except (EOFError, OSError, TimeoutError) as e:
+            logger.error(f"Sandbox worker failed ({e}); restarting it")
+            worker = self._replace(worker)
+            results = [{'output': f"Error executing code: sandbox worker failed ({e})", 'kind': 'killed'}] * len(jobs)
+        finally:
+            self.idle.put(worker)
+
+        kinds = {'timeout': 'timeouts', 'memory': 'memory_errors', 'killed': 'killed',
+                 'output_limit': 'output_limit_stops'}
+        for (index, _), result in zip(jobs, results):
+            outputs[index] = result['output']
+            if result['kind'] in kinds:
+                self._count(kinds[result['kind']])
+            if result.get('truncated'):
+                self._count('truncated_outputs')
+            if 'startup' in result:
+                self.startup_window.record(result['startup'])
+                self._count('import_seconds', result['import_seconds'])
+                with self.stats_lock:
+                    self.cold_imports.update(result['cold_imports'])
+        self._count('runs', len(jobs))
+        self._count('round_trips')
+        self._count('run_seconds', time.monotonic() - started)
+        return outputs
+
+    def execute(self, code: str) -> str:
+        """Run one program; concurrent calls are batched into shared round-trips"""
+        future = concurrent.futures.Future()
+        batch = None
+        with self.lock:
+            self.pending.append((code, future))
+            if len(self.pending) >= self.max_batch:
+                batch = self._take_batch()
+            elif len(self.pending) == 1:
+                self.timer = threading.Timer(self.batch_window, self._flush)
+                self.timer.daemon = True
+                self.timer.start()
+        if batch:
+            self._send(batch)
+        return future.result()
+
+    def _take_batch(self) -> List[Tuple[str, concurrent.futures.Future]]:
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.pending = self.pending, []
+        return batch
+
+    def _flush(self):
+        with self.lock:
+            batch = self._take_batch()
+        if batch:
+            self._send(batch)
+
+    def _send(self, batch: List[Tuple[str, concurrent.futures.Future]]):
+        try:
+            outputs = self.execute_many([code for code, _ in batch])
+        except Exception as e:
+            outputs = [f"Error executing code: {e}"] * len(batch)
+        for (_, future), output in zip(batch, outputs):
+            future.set_result(output)
+
+    def shutdown(self):
+        with self.lock:
+            workers, self.workers, self.pid = self.workers, [], None
+        for worker in workers:
+            worker.stop()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.stats_lock:
+            counters = dict(self.counters)
+            cold_imports = dict(self.cold_imports.most_common(10))
+        round_trips = max(counters['round_trips'], 1)
+        startup_p50, startup_p95 = self.startup_window.percentile(0.5), self.startup_window.percentile(0.95)
+        workers = list(self.workers)
+        return dict(
+            counters,
+            run_seconds=round(counters['run_seconds'], 2),
+            import_seconds=round(counters['import_seconds'], 3),
+            programs_per_round_trip=round(counters['runs'] / round_trips, 2),
+            workers=len(workers),
+            idle_workers=self.idle.qsize(),
+            limits=self.limits,
+            # Per-run start-up cost (fork to ready-to-run) and what warm workers saved
+            startup_ms_p50=round(startup_p50 * 1000, 2) if startup_p50 is not None else None,
+            startup_ms_p95=round(startup_p95 * 1000, 2) if startup_p95 is not None else None,
+            import_ms_per_run=round(counters['import_seconds'] * 1000 / max(counters['runs'], 1), 2),
+            preloaded=list(self.preload),
+            preload_ms=[round(w.info.get('preload_seconds', 0) * 1000, 1) for w in workers],
+            # Modules runs still imported cold; candidates for SANDBOX_PRELOAD_MODULES
+            cold_imports=cold_imports
+        )
+
+
+_fallback_area: Optional[FixtureArea] = None
+_fallback_lock = threading.Lock()
+
+
+def run_isolated(code: str, timeout: float = None) -> str:
+    """
+    Run one program in a fresh interpreter (execute_code contract)
+
+    Used where the sandbox pool is unavailable (Windows, SANDBOX_ENABLED=false):
+    no rlimits or warm start, but the run still gets its own cwd with the
+    mock files, a timeout, and output that cannot mix with other runs.
+    """
+    global _fallback_area
+    if not code or code.startswith("Error"):
+        return f"Invalid code returned: {code}"
+    timeout = timeout or float(os.getenv('SANDBOX_TIMEOUT_SECONDS', '10'))
+    with _fallback_lock:
+        if _fallback_area is None:
+            _fallback_area = FixtureArea()
+            atexit.register(_fallback_area.close)
+        area = _fallback_area
+    run_dir = area.new_run_dir()
+    try:
+        area.materialize(run_dir, needs_fixtures(code))
+        env = dict(os.environ, TMPDIR=run_dir, TEMP=run_dir, TMP=run_dir, PYTHONIOENCODING='utf-8')
+        completed = subprocess.run([sys.executable, os.path.abspath(__file__), '--run'], input=code.encode('utf-8'),
+                                   stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, cwd=run_dir, env=env,
+                                   timeout=timeout)
+        return completed.stdout.decode('utf-8', errors='replace') or "Error executing code: the program was terminated"
+    except subprocess.TimeoutExpired:
+        return f"Error executing code: Execution timed out after {timeout:g}s"
+    except Exception as e:
+        logger.exception(f"Error executing code: {e}")
+        return f"Error executing code: {e}"
+    finally:
+        area.discard(run_dir)
+
+
+def create_sandbox_pool() -> Optional[SandboxPool]:
+    """Sandbox pool configured by SANDBOX_* variables, or None to use run_isolated
+    (disabled, or a platform without fork/rlimits such as Windows)"""
+    if os.getenv('SANDBOX_ENABLED', 'true').lower() != 'true':
+        return None
+    if resource is None or not hasattr(os, 'fork'):
+        logger.warning("Sandbox pool needs fork and rlimits; running each program in its own interpreter")
+        return None
+    return SandboxPool.from_env()
+
+
+if __name__ == '__main__' and len(sys.argv) == 5 and sys.argv[1] == '--worker':
+    _worker_main(Connection(int(sys.argv[2])), int(sys.argv[3]), [m for m in sys.argv[4].split(',') if m])
+elif __name__ == '__main__' and sys.argv[1:] == ['--run']:
+    sys.stdout.write(run_program(sys.stdin.read()))
@@ -0,0 +1,250 @@
+"""
+Similarity Index - Near-duplicate lookup of previously solved questions
+Uses character-shingle MinHash signatures with LSH banding so re-uploaded
+assignments (different numbering, spacing or PDF extraction noise) can reuse
+a stored solution without an LLM call. Runs fully locally. A MinHash match
+is only used when the two questions also have the same numbers and the same
+words apart from filler words, since "ascending" vs "descending" or "before"
+vs "after" changes the answer but barely changes the shingles.
+"""
+
+import os
+import re
+import time
+import struct
+import random
+import sqlite3
+import difflib
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple, Any
+
+from solution_cache import normalize_question, normalize_language
+
+logger = logging.getLogger(__name__)
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 64) - 1
+_NUMBER_PATTERN = re.compile(r'\d+(?:\.\d+)?')
+_WORD_PATTERN = re.compile(r'[a-z0-9]+')
+# Words two near-duplicate questions may differ in without changing what is asked
+_FILLER_WORDS = frozenset({'a', 'an', 'the', 'please', 'write', 'program', 'code', 'script', 'following',
+                           'given', 'that', 'which', 'this', 'is', 'are', 'will', 'should', 'can'})
+
+
+def _shingles(text: str, size: int) -> set:
+    """Character shingles of the normalized text with whitespace removed"""
+    compact = re.sub(r'[^a-z0-9]', '', text)
+    if len(compact) <= size:
+        return {compact} if compact else set()
+    return {compact[i:i + size] for i in range(len(compact) - size + 1)}
+
+
+def _numbers(text: str) -> Tuple[str, ...]:
+    """Numeric literals of a question - "first 10 primes" must not match "first 20 primes" """
+    return tuple(sorted(_NUMBER_PATTERN.findall(text)))
+
+
+def _same_words(a: str, b: str) -> bool:
+    """Whether two normalized questions say the same thing word for word, ignoring filler words
+
+    A run of words that differs only in its spacing ("progr am" for "program",
+    PDF extraction noise) counts as the same.
+    """
+    words_a, words_b = _WORD_PATTERN.findall(a), _WORD_PATTERN.findall(b)
+    matcher = difflib.SequenceMatcher(None, words_a, words_b, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal' or ''.join(words_a[i1:i2]) == ''.join(words_b[j1:j2]):
+            continue
+        if any(word not in _FILLER_WORDS for word in words_a[i1:i2] + words_b[j1:j2]):
+            return False
+    return True
+
+
+def jaccard(a: set, b: set) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / max(len(a | b), 1)
+
+
+class MinHasher:
+    """Deterministic MinHash signature generator"""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.params = [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME)) for _ in range(num_perm)]
+
+    def signature(self, shingles: set) -> List[int]:
+        hashes = [int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest(), 'little')
+                  for s in shingles]
+        if not hashes:
+            return [_MAX_HASH] * self.num_perm
+        return [min(((a * h + b) % _MERSENNE_PRIME) for h in hashes) for a, b in self.params]
+
+
+class SimilarityIndex:
+    """
+    MinHash/LSH index over solved questions, persisted to SQLite so it
+    survives restarts and is shared by every process on the node.
+    """
+
+    def __init__(self, path: str, prompt_version: str, threshold: float = 0.85,
+                 num_perm: int = 64, bands: int = 16, shingle_size: int = 5):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.path = path
+        self.prompt_version = prompt_version
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.hasher = MinHasher(num_perm)
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.buckets: Dict[Tuple[str, int, int], List[int]] = {}
+        self.entries: Dict[int, Dict[str, Any]] = {}
+        self.last_loaded_id = 0
+        self.stats_counters = {'lookups': 0, 'hits': 0, 'misses': 0, 'candidates_checked': 0,
+                               'rejected_numbers': 0, 'rejected_words': 0, 'added': 0, 'similarity_sum': 0.0}
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().execute("""
+            CREATE TABLE IF NOT EXISTS similarity_entries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                prompt_version TEXT NOT NULL,
+                language TEXT NOT NULL,
+                question TEXT NOT NULL,
+                signature BLOB NOT NULL,
+                solution TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self.local, 'conn', None)
+        if conn is None or getattr(self.local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+        return conn
+
+    def _band_keys(self, language: str, signature: List[int]):
+        for band in range(self.bands):
+            chunk = signature[band * self.rows:(band + 1) * self.rows]
+            yield (language, band, hash(tuple(chunk)))
+
+    def _refresh(self):
+        """Load entries written by this or other processes since the last refresh"""
+        rows = self._connection().execute(
+            "SELECT id, language, question, signature, solution FROM similarity_entries "
+            "WHERE id > ? AND prompt_version = ? ORDER BY id",
+            (self.last_loaded_id, self.prompt_version)
+        ).fetchall()
+        for entry_id, language, question, blob, solution in rows:
+            signature = list(struct.unpack(f"<{len(blob) // 8}Q", blob))
+            self.entries[entry_id] = {'language': language, 'question': question, 'solution': solution}
+            for key in self._band_keys(language, signature):
+                self.buckets.setdefault(key, []).append(entry_id)
+        if rows:
+            self.last_loaded_id = rows[-1][0]
+
+    def add(self, question: str, language: str, solution: str):
+        """Index a solved question"""
+        if not solution or solution.startswith("Error"):
+            return
+        normalized = normalize_question(question)
+        signature = self.hasher.signature(_shingles(normalized, self.shingle_size))
+        blob = struct.pack(f"<{len(signature)}Q", *signature)
+        with self.lock:
+            self._connection().execute(
+                "INSERT INTO similarity_entries (prompt_version, language, question, signature, solution, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (self.prompt_version, normalize_language(language), normalized, blob, solution, time.time())
+            )
+            self.stats_counters['added'] += 1
+            self._refresh()
+
+    def lookup(self, question: str, language: str) -> Optional[Dict[str, Any]]:
+        """
+        Find a stored solution for a near-duplicate question
+
+        Returns:
+            Dict with 'solution', 'similarity' and 'matched_question', or None
+        """
+        normalized = normalize_question(question)
+        language = normalize_language(language)
+        shingles = _shingles(normalized, self.shingle_size)
+        signature = self.hasher.signature(shingles)
+        numbers = _numbers(normalized)
+
+        with self.lock:
+            self.stats_counters['lookups'] += 1
+            self._refresh()
+            candidate_ids = set()
+            for key in self._band_keys(language, signature):
+                candidate_ids.update(self.buckets.get(key, ()))
+
+            best = None
+            for entry_id in candidate_ids:
+                entry = self.entries[entry_id]
+                self.stats_counters['candidates_checked'] += 1
+                if _numbers(entry['question']) != numbers:
+                    self.stats_counters['rejected_numbers'] += 1
+                    continue
+                score = jaccard(shingles, _shingles(entry['question'], self.shingle_size))
+                if score < self.threshold or (best is not None and score <= best['similarity']):
+                    continue
+                if not _same_words(normalized, entry['question']):
+                    self.stats_counters['rejected_words'] += 1
+                    continue
+                best = {'solution': entry['solution'], 'similarity': score, 'matched_question': entry['question']}
+
+            if best:
+                self.stats_counters['hits'] += 1
+                self.stats_counters['similarity_sum'] += best['similarity']
+            else:
+                self.stats_counters['misses'] += 1
+            return best
+
+    def size(self) -> int:
+        row = self._connection().execute(
+            "SELECT COUNT(*) FROM similarity_entries WHERE prompt_version = ?", (self.prompt_version,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            counters = dict(self.stats_counters)
+        hits = counters['hits']
+        return {
+            'entries': self.size(),
+            'threshold': self.threshold,
+            'lookups': counters['lookups'],
+            'hits': hits,
+            'misses': counters['misses'],
+            'hit_rate': f"{(hits / max(counters['lookups'], 1) * 100):.1f}%",
+            'average_similarity': round(counters['similarity_sum'] / hits, 3) if hits else None,
+            'candidates_checked': counters['candidates_checked'],
+            'rejected_numeric_mismatch': counters['rejected_numbers'],
+            'rejected_word_mismatch': counters['rejected_words'],
+            'added_by_this_process': counters['added']
+        }
+
+
+def create_similarity_index(prompt_version: str) -> Optional[SimilarityIndex]:
+    """Create the similarity index configured by SIMILARITY_* environment variables"""
+    if os.getenv('SIMILARITY_INDEX_ENABLED', 'true').lower() != 'true':
+        return None
+    path = os.getenv('SIMILARITY_INDEX_PATH', os.getenv('CACHE_PATH', os.path.join('cache', 'codedebhai_cache.sqlite3')))
+    threshold = float(os.getenv('SIMILARITY_THRESHOLD', '0.85'))
+    try:
+        index = SimilarityIndex(path, prompt_version, threshold=threshold)
+        logger.info(f"Similarity index initialized at {path} (threshold {threshold})")
+        return index
+    except Exception as e:
+        logger.warning(f"Similarity index unavailable: {e}")
+        return None
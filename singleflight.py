@@ -0,0 +1,182 @@
+"""
+Single Flight - Coalesce identical in-flight solve requests
+When a whole class uploads the same document, the same question is solved
+many times at once. The first caller for a key makes the LLM call and every
+concurrent caller in the process awaits the same future. With a shared
+backend (Redis SET NX lock) callers in other processes wait for the leader's
+result to land in the shared solution cache instead of calling the provider.
+Lock calls and result-store polls are blocking round-trips, so they run on
+the loop's executor rather than on the solve engine's event loop.
+"""
+
+import os
+import time
+import uuid
+import asyncio
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+try:
+    import redis
+except ImportError:  # Redis is optional - coalesce within the process only
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# KEYS: lock key; ARGV: owner token. Deletes the lock only if this caller still owns it
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisFlightLock:
+    """Cross-process leader election for a key: SET NX with an expiry"""
+
+    def __init__(self, url: str, namespace: str = 'inflight', client=None):
+        self.client = client or redis.Redis.from_url(url)
+        self.prefix = f"codedebhai:{namespace}:"
+        self.release_script = self.client.register_script(_RELEASE_SCRIPT)
+
+    def acquire(self, key: str, token: str, ttl: float) -> bool:
+        return bool(self.client.set(self.prefix + key, token, nx=True, px=int(ttl * 1000)))
+
+    def release(self, key: str, token: str):
+        self.release_script(keys=[self.prefix + key], args=[token])
+
+    def held(self, key: str) -> bool:
+        return bool(self.client.exists(self.prefix + key))
+
+
+class SingleFlight:
+    """
+    In-flight request deduplication on the solve engine's event loop
+    """
+
+    def __init__(self, lock=None, lock_ttl: float = 120.0, wait_timeout: float = 90.0,
+                 poll_interval: float = 0.25):
+        self.lock = lock
+        self.lock_ttl = lock_ttl
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self.inflight: Dict[str, asyncio.Future] = {}
+        self.stats_lock = threading.Lock()
+        self.counters = {'leaders': 0, 'coalesced': 0, 'remote_waits': 0, 'remote_hits': 0,
+                         'remote_timeouts': 0, 'lock_errors': 0}
+
+    def _count(self, key: str):
+        with self.stats_lock:
+            self.counters[key] += 1
+
+    @staticmethod
+    async def _off_loop(func: Callable, *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    def _release(self, key: str, token: str):
+        try:
+            self.lock.release(key, token)
+        except Exception as e:
+            logger.warning(f"Single-flight lock release failed ({e}); it expires after {self.lock_ttl}s")
+
+    async def run(self, key: str, compute: Callable[[], Awaitable[Any]],
+                  lookup: Optional[Callable[[], Any]] = None) -> Any:
+        """
+        Result of compute() for key, shared with every concurrent caller
+
+        lookup() reads the shared result store (e.g. the solution cache); it
+        lets callers in other processes pick up the leader's result.
+        """
+        while True:
+            existing = self.inflight.get(key)
+            if existing is None:
+                break
+            self._count('coalesced')
+            await asyncio.wait({existing})
+            if not existing.cancelled():
+                return existing.result()
+            # The leader was cancelled: try again, possibly as the new leader
+
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())  # Never "exception was never retrieved"
+        self.inflight[key] = future
+        self._count('leaders')
+        try:
+            result = await self._lead(key, compute, lookup)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            if self.inflight.get(key) is future:
+                del self.inflight[key]
+
+    async def _lead(self, key: str, compute: Callable[[], Awaitable[Any]],
+                    lookup: Optional[Callable[[], Any]]) -> Any:
+        if self.lock is None:
+            return await compute()
+
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            try:
+                acquired = await self._off_loop(self.lock.acquire, key, token, self.lock_ttl)
+            except Exception as e:
+                self._count('lock_errors')
+                logger.warning(f"Single-flight lock unavailable ({e}); solving without coalescing")
+                return await compute()
+            if acquired:
+                try:
+                    return await compute()
+                finally:
+                    # Shielded: the release still runs if the leader is cancelled while waiting for it
+                    await asyncio.shield(self._off_loop(self._release, key, token))
+
+            # Another process is solving this key: wait for its result to reach the shared store
+            self._count('remote_waits')
+            while True:
+                await asyncio.sleep(self.poll_interval)
+                value = await self._off_loop(lookup) if lookup else None
+                if value is not None:
+                    self._count('remote_hits')
+                    return value
+                if time.monotonic() >= deadline:
+                    self._count('remote_timeouts')
+                    return await compute()
+                try:
+                    if not await self._off_loop(self.lock.held, key):
+                        break  # The leader gave up without a result; try to take over
+                except Exception:
+                    return await compute()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.stats_lock:
+            counters = dict(self.counters)
+        return dict(counters, inflight=len(self.inflight),
+                    shared=self.lock is not None, backend=type(self.lock).__name__ if self.lock else 'memory')
+
+
+def create_singleflight(backend: str = None) -> SingleFlight:
+    """SingleFlight configured by SINGLEFLIGHT_* variables ('memory' or 'redis' backend)"""
+    backend = (backend or os.getenv('SINGLEFLIGHT_BACKEND', 'memory')).lower()
+    options = dict(
+        lock_ttl=float(os.getenv('SINGLEFLIGHT_LOCK_TTL', '120')),
+        wait_timeout=float(os.getenv('SINGLEFLIGHT_WAIT_SECONDS', '90'))
+    )
+    if backend == 'redis':
+        if redis is None:
+            logger.warning("SINGLEFLIGHT_BACKEND=redis but the redis package is not installed. Coalescing in-process only.")
+        else:
+            try:
+                lock = RedisFlightLock(os.getenv('REDIS_URL', 'redis://localhost:6379/0'))
+                lock.client.ping()
+                return SingleFlight(lock, **options)
+            except Exception as e:
+                logger.warning(f"Redis single-flight lock unavailable ({e}). Coalescing in-process only.")
+    return SingleFlight(None, **options)
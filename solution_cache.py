@@ -0,0 +1,402 @@
+"""
+Solution Cache - Persistent, shared cache for generated solutions
+Solutions are keyed by normalized question text, language and prompt version so
+that the gunicorn process and every Celery worker reuse the same answers.
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Any
+
+try:
+    import redis
+except ImportError:  # Redis is optional - fall back to the disk store
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# Leading question numbering such as "1.", "Q2)", "Q3 -" or "Question 4:". The delimiter is required:
+# "2 numbers are read" is a different question from "3 numbers are read", and "2.5" is not numbering
+_NUMBERING_PATTERN = re.compile(r'^\s*(?:q(?:uestion)?\s*\d+\s*[\.\):\-]|\d+\s*[\.\):](?!\d))\s*', re.IGNORECASE)
+# Quoted text usually ends up in a string literal of the program, so its case is kept
+_QUOTED_PATTERN = re.compile(r'"[^"\n]*"|\u201c[^\u201d\n]*\u201d|`[^`\n]*`|(?<!\w)\'[^\'\n]*\'(?!\w)')
+
+
+def _lowercase_unquoted(text: str) -> str:
+    pieces, position = [], 0
+    for match in _QUOTED_PATTERN.finditer(text):
+        pieces.append(text[position:match.start()].lower())
+        pieces.append(match.group())
+        position = match.end()
+    pieces.append(text[position:].lower())
+    return ''.join(pieces)
+
+
+def normalize_question(question: str) -> str:
+    """Normalize question text so trivially different uploads share a cache key"""
+    text = (question or "").strip()
+    text = _NUMBERING_PATTERN.sub('', text, count=1)
+    text = _lowercase_unquoted(re.sub(r'\s+', ' ', text).strip())
+    return text.rstrip(' .?!:;')
+
+
+def normalize_language(language: str) -> str:
+    """Map language aliases onto one canonical name"""
+    lang = (language or "python").strip().lower()
+    return {'cpp': 'c++', 'csharp': 'c#', 'js': 'javascript'}.get(lang, lang)
+
+
+class MemoryCacheStore:
+    """
+    In-process LRU store with TTL. Only useful for a single process.
+    """
+
+    def __init__(self, max_entries: int = 5000, ttl_seconds: int = 0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None:
+                return None
+            value, created_at = item
+            if self.ttl_seconds and time.time() - created_at > self.ttl_seconds:
+                del self.entries[key]
+                self.counters['expired'] = self.counters.get('expired', 0) + 1
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str):
+        with self.lock:
+            self.entries[key] = (value, time.time())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.counters['evictions'] = self.counters.get('evictions', 0) + 1
+
+    def delete(self, key: str):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def incr(self, counter: str, amount: int = 1):
+        with self.lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def counters_snapshot(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(self.counters)
+
+    def size(self) -> int:
+        with self.lock:
+            return len(self.entries)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.counters.clear()
+
+
+class SQLiteCacheStore:
+    """
+    On-disk LRU store with TTL backed by SQLite (WAL mode).
+    Shared by every process on the same node.
+    """
+
+    def __init__(self, path: str, namespace: str = 'default', max_entries: int = 5000, ttl_seconds: int = 0):
+        self.path = path
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_lru ON cache_entries (namespace, last_access)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_counters (
+                namespace TEXT NOT NULL,
+                name TEXT NOT NULL,
+                value INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (namespace, name)
+            )
+        """)
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread and per process (connections must not cross a fork)
+        conn = getattr(self.local, 'conn', None)
+        if conn is None or getattr(self.local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT value, created_at FROM cache_entries WHERE namespace = ? AND key = ?",
+            (self.namespace, key)
+        ).fetchone()
+        if row is None:
+            return None
+        value, created_at = row
+        now = time.time()
+        if self.ttl_seconds and now - created_at > self.ttl_seconds:
+            self.delete(key)
+            self.incr('expired')
+            return None
+        conn.execute(
+            "UPDATE cache_entries SET last_access = ? WHERE namespace = ? AND key = ?",
+            (now, self.namespace, key)
+        )
+        return value
+
+    def set(self, key: str, value: str):
+        conn = self._connection()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache_entries (namespace, key, value, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+            (self.namespace, key, value, now, now)
+        )
+        overflow = self.size() - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                """DELETE FROM cache_entries WHERE namespace = ? AND key IN (
+                       SELECT key FROM cache_entries WHERE namespace = ? ORDER BY last_access ASC LIMIT ?
+                   )""",
+                (self.namespace, self.namespace, overflow)
+            )
+            self.incr('evictions', overflow)
+
+    def delete(self, key: str):
+        self._connection().execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND key = ?",
+            (self.namespace, key)
+        )
+
+    def incr(self, counter: str, amount: int = 1):
+        self._connection().execute(
+            """INSERT INTO cache_counters (namespace, name, value) VALUES (?, ?, ?)
+               ON CONFLICT(namespace, name) DO UPDATE SET value = value + excluded.value""",
+            (self.namespace, counter, amount)
+        )
+
+    def counters_snapshot(self) -> Dict[str, int]:
+        rows = self._connection().execute(
+            "SELECT name, value FROM cache_counters WHERE namespace = ?", (self.namespace,)
+        ).fetchall()
+        return {name: value for name, value in rows}
+
+    def size(self) -> int:
+        row = self._connection().execute(
+            "SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (self.namespace,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def clear(self):
+        conn = self._connection()
+        conn.execute("DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,))
+        conn.execute("DELETE FROM cache_counters WHERE namespace = ?", (self.namespace,))
+
+
+class RedisCacheStore:
+    """
+    Redis store shared by every process on every node.
+    TTL is enforced per key; LRU eviction relies on the server's
+    maxmemory-policy (allkeys-lru / volatile-lru).
+    """
+
+    def __init__(self, url: str, namespace: str = 'default', ttl_seconds: int = 0, client=None):
+        self.client = client or redis.Redis.from_url(url)
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.prefix = f"codedebhai:{namespace}:"
+        self.index_key = f"{self.prefix}__index__"
+        self.counters_key = f"{self.prefix}__counters__"
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.client.get(self.prefix + key)
+        if value is None:
+            return None
+        return value.decode('utf-8') if isinstance(value, bytes) else value
+
+    def set(self, key: str, value: str):
+        pipe = self.client.pipeline()
+        if self.ttl_seconds:
+            pipe.set(self.prefix + key, value, ex=self.ttl_seconds)
+        else:
+            pipe.set(self.prefix + key, value)
+        pipe.sadd(self.index_key, key)
+        pipe.execute()
+
+    def delete(self, key: str):
+        pipe = self.client.pipeline()
+        pipe.delete(self.prefix + key)
+        pipe.srem(self.index_key, key)
+        pipe.execute()
+
+    def incr(self, counter: str, amount: int = 1):
+        self.client.hincrby(self.counters_key, counter, amount)
+
+    def counters_snapshot(self) -> Dict[str, int]:
+        raw = self.client.hgetall(self.counters_key) or {}
+        return {
+            (k.decode('utf-8') if isinstance(k, bytes) else k): int(v)
+            for k, v in raw.items()
+        }
+
+    def size(self) -> int:
+        # Index may contain keys that already expired - report the upper bound
+        return int(self.client.scard(self.index_key) or 0)
+
+    def clear(self):
+        keys = [self.prefix + (k.decode('utf-8') if isinstance(k, bytes) else k)
+                for k in (self.client.smembers(self.index_key) or [])]
+        if keys:
+            self.client.delete(*keys)
+        self.client.delete(self.index_key, self.counters_key)
+
+
+def create_cache_store(namespace: str, backend: str = None, max_entries: int = None, ttl_seconds: int = None):
+    """
+    Build a cache store from environment configuration
+
+    Args:
+        namespace: Logical cache name (solutions, executions, ...)
+        backend: 'memory', 'disk' or 'redis' (defaults to CACHE_BACKEND)
+        max_entries: LRU capacity for memory/disk stores
+        ttl_seconds: Entry lifetime, 0 disables expiry
+    """
+    backend = (backend or os.getenv('CACHE_BACKEND', 'disk')).lower()
+    max_entries = max_entries if max_entries is not None else int(os.getenv('CACHE_MAX_ENTRIES', '5000'))
+    ttl_seconds = ttl_seconds if ttl_seconds is not None else int(os.getenv('CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+
+    if backend == 'redis':
+        if redis is None:
+            logger.warning("CACHE_BACKEND=redis but the redis package is not installed. Falling back to disk cache.")
+            backend = 'disk'
+        else:
+            try:
+                store = RedisCacheStore(os.getenv('REDIS_URL', 'redis://localhost:6379/0'), namespace, ttl_seconds)
+                store.client.ping()
+                return store
+            except Exception as e:
+                logger.warning(f"Redis cache unavailable ({e}). Falling back to disk cache.")
+                backend = 'disk'
+
+    if backend == 'disk':
+        path = os.getenv('CACHE_PATH', os.path.join('cache', 'codedebhai_cache.sqlite3'))
+        try:
+            return SQLiteCacheStore(path, namespace, max_entries, ttl_seconds)
+        except Exception as e:
+            logger.warning(f"Disk cache unavailable ({e}). Falling back to in-memory cache.")
+
+    return MemoryCacheStore(max_entries, ttl_seconds)
+
+
+class SolutionCache:
+    """
+    Cache of generated solutions keyed by (normalized question, language, prompt version)
+    """
+
+    def __init__(self, store, prompt_version: str):
+        self.store = store
+        self.prompt_version = prompt_version
+
+    def key_for(self, question: str, language: str) -> str:
+        raw = f"{self.prompt_version}\x1f{normalize_language(language)}\x1f{normalize_question(question)}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, question: str, language: str) -> Optional[str]:
+        try:
+            value = self.store.get(self.key_for(question, language))
+        except Exception as e:
+            logger.warning(f"Solution cache read failed: {e}")
+            return None
+        if value is None:
+            self._count('misses')
+            return None
+        self._count('hits')
+        try:
+            return json.loads(value).get('solution')
+        except (ValueError, AttributeError):
+            return None
+
+    def set(self, question: str, language: str, solution: str, **extra: Any):
+        if not solution or solution.startswith("Error"):
+            return
+        record = {
+            'solution': solution,
+            'language': normalize_language(language),
+            'prompt_version': self.prompt_version,
+            'created_at': time.time()
+        }
+        record.update(extra)
+        try:
+            self.store.set(self.key_for(question, language), json.dumps(record))
+            self._count('sets')
+        except Exception as e:
+            logger.warning(f"Solution cache write failed: {e}")
+
+    def _count(self, counter: str):
+        try:
+            self.store.incr(counter)
+        except Exception as e:
+            logger.debug(f"Solution cache counter update failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        try:
+            counters = self.store.counters_snapshot()
+            size = self.store.size()
+        except Exception as e:
+            return {'backend': type(self.store).__name__, 'error': str(e)}
+        hits = counters.get('hits', 0)
+        misses = counters.get('misses', 0)
+        return {
+            'backend': type(self.store).__name__,
+            'prompt_version': self.prompt_version,
+            'entries': size,
+            'hits': hits,
+            'misses': misses,
+            'sets': counters.get('sets', 0),
+            'evictions': counters.get('evictions', 0),
+            'expired': counters.get('expired', 0),
+            'hit_rate': f"{(hits / max(hits + misses, 1) * 100):.1f}%"
+        }
+
+
+def create_solution_cache(prompt_version: str) -> SolutionCache:
+    """Create the solution cache configured by SOLUTION_CACHE_* environment variables"""
+    store = create_cache_store(
+        'solutions',
+        backend=os.getenv('SOLUTION_CACHE_BACKEND'),
+        max_entries=int(os.getenv('SOLUTION_CACHE_MAX_ENTRIES', '5000')),
+        ttl_seconds=int(os.getenv('SOLUTION_CACHE_TTL_SECONDS', str(14 * 24 * 3600)))
+    )
+    logger.info(f"Solution cache initialized with {type(store).__name__} (prompt version {prompt_version})")
+    return SolutionCache(store, prompt_version)
@@ -0,0 +1,261 @@
+"""
+Solution Corpus - Long-lived record of solved questions for pre-warming
+Every uploaded question is recorded (normalized text, language, how often and
+when it was asked) together with the code that solved it and the output it
+produced when executed. The same textbook questions come back every semester,
+so a nightly job (prewarm) solves and validates the most frequently asked
+questions that have no validated solution for the current prompt version and
+loads them into the solution cache before the first student asks again.
+Persisted to SQLite so it outlives cache TTLs and is shared by every process
+on the node.
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from solution_cache import normalize_language, normalize_question
+
+logger = logging.getLogger(__name__)
+
+# Output prefixes the executors write when a program did not run. Only these: a program's own
+# "Error: Cannot divide by zero" is the output an exception-handling question asks for
+FAILED_OUTPUT_MARKERS = (
+    'Error executing code', 'Error compiling', 'Invalid code returned', 'Traceback (most recent call last)',
+    # The legacy dotnet paths in app.py
+    'Error creating temp project directory', 'Error invoking ', 'Error writing ', 'Error running compiled program',
+    'Error: .NET SDK',
+)
+
+
+def is_failed_output(output: Optional[str]) -> bool:
+    """Whether an executor reported that the program did not run (rather than the program's own output)"""
+    text = (output or '').lstrip()
+    return text.startswith(FAILED_OUTPUT_MARKERS) or 'Error executing code' in text
+
+
+def looks_successful(code: Optional[str], output: Optional[str]) -> bool:
+    """Whether a solution ran and printed something (the bar for a validated corpus entry)"""
+    if not code or code.startswith('Error') or not output or not output.strip():
+        return False
+    return not is_failed_output(output)
+
+
+class SolutionCorpus:
+    """
+    Persisted corpus of questions, their solutions and captured outputs
+    """
+
+    def __init__(self, path: str, prompt_version: str):
+        self.path = path
+        self.prompt_version = prompt_version
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.counters = {'lookups': 0, 'hits': 0, 'questions_recorded': 0, 'solutions_recorded': 0}
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS corpus_entries (
+                key TEXT PRIMARY KEY,
+                language TEXT NOT NULL,
+                question TEXT NOT NULL,
+                question_text TEXT NOT NULL,
+                ask_count INTEGER NOT NULL DEFAULT 0,
+                first_seen REAL NOT NULL,
+                last_seen REAL NOT NULL,
+                code TEXT,
+                output TEXT,
+                validated INTEGER NOT NULL DEFAULT 0,
+                prompt_version TEXT,
+                solved_at REAL
+            )
+        """)
+        # One row per uploaded question, to report how much of recent traffic the corpus covers
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS corpus_sightings (
+                key TEXT NOT NULL,
+                seen_at REAL NOT NULL,
+                covered INTEGER NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS corpus_sightings_seen_at ON corpus_sightings (seen_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS corpus_entries_ask_count ON corpus_entries (ask_count)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self.local, 'conn', None)
+        if conn is None or getattr(self.local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+        return conn
+
+    def _count(self, key: str, amount: int = 1):
+        with self.lock:
+            self.counters[key] += amount
+
+    @staticmethod
+    def key_for(question: str, language: str) -> str:
+        raw = f"{normalize_language(language)}\x1f{normalize_question(question)}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _is_covered(self, key: str) -> bool:
+        row = self._connection().execute(
+            "SELECT 1 FROM corpus_entries WHERE key = ? AND validated = 1 AND prompt_version = ?",
+            (key, self.prompt_version)
+        ).fetchone()
+        return row is not None
+
+    def record_questions(self, questions: Iterable[str], language: str, now: float = None):
+        """Count uploaded questions, noting whether the corpus already had a validated answer"""
+        now = time.time() if now is None else now
+        language = normalize_language(language)
+        conn = self._connection()
+        recorded = 0
+        for question in questions:
+            normalized = normalize_question(question)
+            if not normalized:
+                continue
+            key = self.key_for(question, language)
+            covered = self._is_covered(key)
+            conn.execute(
+                "INSERT INTO corpus_entries (key, language, question, question_text, ask_count, first_seen, last_seen) "
+                "VALUES (?, ?, ?, ?, 1, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET ask_count = ask_count + 1, last_seen = excluded.last_seen",
+                (key, language, normalized, question.strip(), now, now)
+            )
+            conn.execute("INSERT INTO corpus_sightings (key, seen_at, covered) VALUES (?, ?, ?)",
+                         (key, now, int(covered)))
+            recorded += 1
+        self._count('questions_recorded', recorded)
+
+    def record_solution(self, question: str, language: str, code: str, output: Optional[str] = None,
+                        validated: bool = False):
+        """Store the solution for a question and the output it printed; a validated entry is never
+        replaced by an unvalidated one for the same prompt version"""
+        if not code or code.startswith('Error') or not normalize_question(question):
+            return
+        now = time.time()
+        language = normalize_language(language)
+        self._connection().execute(
+            "INSERT INTO corpus_entries (key, language, question, question_text, ask_count, first_seen, last_seen, "
+            "code, output, validated, prompt_version, solved_at) VALUES (?, ?, ?, ?, 0, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET code = excluded.code, output = excluded.output, "
+            "validated = excluded.validated, prompt_version = excluded.prompt_version, solved_at = excluded.solved_at "
+            "WHERE NOT (corpus_entries.validated = 1 AND corpus_entries.prompt_version = excluded.prompt_version "
+            "AND excluded.validated = 0)",
+            (self.key_for(question, language), language, normalize_question(question), question.strip(),
+             now, now, code, output, int(validated), self.prompt_version, now)
+        )
+        self._count('solutions_recorded')
+
+    def get(self, question: str, language: str) -> Optional[Dict[str, Any]]:
+        """Validated solution for the current prompt version: {'code', 'output', 'solved_at'} or None"""
+        self._count('lookups')
+        row = self._connection().execute(
+            "SELECT code, output, solved_at FROM corpus_entries WHERE key = ? AND validated = 1 AND prompt_version = ?",
+            (self.key_for(question, language), self.prompt_version)
+        ).fetchone()
+        if row is None:
+            return None
+        self._count('hits')
+        return {'code': row[0], 'output': row[1], 'solved_at': row[2]}
+
+    def frequent_unsolved(self, limit: int = 50, min_count: int = 2) -> List[Tuple[str, str, int]]:
+        """Most asked (question_text, language, ask_count) without a validated current solution"""
+        return self._connection().execute(
+            "SELECT question_text, language, ask_count FROM corpus_entries "
+            "WHERE ask_count >= ? AND NOT (validated = 1 AND prompt_version = ?) "
+            "ORDER BY ask_count DESC, last_seen DESC LIMIT ?",
+            (min_count, self.prompt_version, limit)
+        ).fetchall()
+
+    def prune_sightings(self, max_age_days: float = 180):
+        self._connection().execute("DELETE FROM corpus_sightings WHERE seen_at < ?",
+                                   (time.time() - max_age_days * 86400,))
+
+    def stats(self, recent_days: float = 30) -> Dict[str, Any]:
+        conn = self._connection()
+        since = time.time() - recent_days * 86400
+        entries, solved, validated = conn.execute(
+            "SELECT COUNT(*), COUNT(code), COALESCE(SUM(validated = 1 AND prompt_version = ?), 0) FROM corpus_entries",
+            (self.prompt_version,)
+        ).fetchone()
+        languages = dict(conn.execute(
+            "SELECT language, COUNT(*) FROM corpus_entries WHERE validated = 1 AND prompt_version = ? GROUP BY language",
+            (self.prompt_version,)
+        ).fetchall())
+        uploads, covered_at_upload = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(covered), 0) FROM corpus_sightings WHERE seen_at >= ?", (since,)
+        ).fetchone()
+        distinct, covered_now = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(e.validated = 1 AND e.prompt_version = ?), 0) FROM corpus_entries e "
+            "WHERE e.key IN (SELECT DISTINCT key FROM corpus_sightings WHERE seen_at >= ?)",
+            (self.prompt_version, since)
+        ).fetchone()
+        with self.lock:
+            counters = dict(self.counters)
+        return dict(
+            counters,
+            enabled=True,
+            prompt_version=self.prompt_version,
+            entries=entries,
+            solved=solved,
+            validated=validated,
+            validated_by_language=languages,
+            recent_days=recent_days,
+            recent_uploads=uploads,
+            recent_distinct_questions=distinct,
+            # Share of recent uploads that had a validated answer when they arrived, and would have now
+            recent_coverage=f"{(covered_at_upload / max(uploads, 1) * 100):.1f}%",
+            recent_coverage_now=f"{(covered_now / max(distinct, 1) * 100):.1f}%"
+        )
+
+
+def prewarm(corpus: SolutionCorpus, solve: Callable[[str, str], Optional[Tuple[str, str]]],
+            limit: int = 50, min_count: int = 2) -> Dict[str, Any]:
+    """
+    Solve and validate the most frequent questions the corpus has no answer for
+
+    solve(question, language) returns (code, output) after executing the
+    solution (and is expected to fill the solution cache); a result counts as
+    validated when looks_successful() accepts it.
+    """
+    started = time.monotonic()
+    report = {'candidates': 0, 'validated': 0, 'failed': 0, 'errors': 0}
+    for question, language, ask_count in corpus.frequent_unsolved(limit, min_count):
+        report['candidates'] += 1
+        try:
+            result = solve(question, language)
+        except Exception as e:
+            report['errors'] += 1
+            logger.warning(f"Pre-warm failed for ({language}) {question[:50]}...: {e}")
+            continue
+        code, output = result if result else (None, None)
+        if looks_successful(code, output):
+            corpus.record_solution(question, language, code, output, validated=True)
+            report['validated'] += 1
+        else:
+            report['failed'] += 1
+            logger.info(f"Pre-warm solution did not validate ({language}, asked {ask_count}x): {question[:50]}...")
+    report['seconds'] = round(time.monotonic() - started, 2)
+    logger.info(f"Corpus pre-warm finished: {report}")
+    return report
+
+
+def create_solution_corpus(prompt_version: str) -> Optional[SolutionCorpus]:
+    """Create the corpus configured by SOLUTION_CORPUS_* environment variables (None if disabled)"""
+    if os.getenv('SOLUTION_CORPUS_ENABLED', 'true').lower() != 'true':
+        return None
+    path = os.getenv('SOLUTION_CORPUS_PATH', os.path.join('cache', 'solution_corpus.sqlite3'))
+    try:
+        return SolutionCorpus(path, prompt_version)
+    except Exception as e:
+        logger.warning(f"Solution corpus unavailable ({e}). Pre-warming disabled.")
+        return None
@@ -0,0 +1,153 @@
+"""
+Solve Engine - asyncio fan-out for solving every question of a document
+Provider calls for all questions run concurrently on one background event
+loop, so in-flight LLM requests do not each hold an OS thread. Code execution
+and screenshots (CPU bound) still run on a regular thread pool.
+"""
+
+import os
+import asyncio
+import logging
+import threading
+from typing import Any, Awaitable, Callable, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+def _os_threading():
+    """Real OS threads even when eventlet has monkey-patched threading (gunicorn eventlet worker)"""
+    try:
+        import eventlet.patcher
+        if eventlet.patcher.is_monkey_patched('thread'):
+            return eventlet.patcher.original('threading')
+    except ImportError:
+        pass
+    return threading
+
+
+class SolveEngine:
+    """
+    Owns a background asyncio event loop for provider I/O.
+
+    Sync callers (Flask views, Celery tasks, thread pool workers) hand
+    coroutines to run(); document-level callers use solve_all() which fans
+    every question out concurrently and returns results in input order.
+    """
+
+    def __init__(self, max_inflight: int = 32):
+        self.max_inflight = max_inflight
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread = None
+        self.thread_ident = None
+        self.pid = None
+        self.lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.counters = {'documents': 0, 'questions': 0, 'inflight': 0, 'peak_inflight': 0, 'failed': 0}
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        # Started lazily so a loop thread is never inherited across fork (gunicorn --preload, Celery prefork)
+        with self.lock:
+            if self.loop is not None and self.pid == os.getpid() and self.thread.is_alive():
+                return self.loop
+
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run_loop():
+                asyncio.set_event_loop(loop)
+                self.thread_ident = threading.get_ident()
+                ready.set()
+                loop.run_forever()
+
+            thread = _os_threading().Thread(target=run_loop, name='SolveEngine-Loop', daemon=True)
+            thread.start()
+            ready.wait()
+            self.loop, self.thread, self.pid = loop, thread, os.getpid()
+            logger.info(f"Solve engine event loop started (max in-flight provider calls: {self.max_inflight})")
+            return loop
+
+    def run(self, coro: Awaitable, timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the engine loop and block the calling thread for its result"""
+        loop = self._ensure_loop()
+        if threading.get_ident() == self.thread_ident:
+            coro.close()
+            raise RuntimeError("SolveEngine.run() called from the engine loop; await the coroutine instead")
+        return asyncio.run_coroutine_threadsafe(coro, loop).result(timeout)
+
+    def submit(self, coro: Awaitable):
+        """Schedule a coroutine on the engine loop and return a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    def _track(self, key: str, delta: int = 1):
+        with self.stats_lock:
+            self.counters[key] += delta
+            if key == 'inflight':
+                self.counters['peak_inflight'] = max(self.counters['peak_inflight'], self.counters['inflight'])
+
+    def solve_all(self, items: Sequence[Any],
+                  solve: Callable[[Any], Awaitable[Any]],
+                  finish: Callable[[Any, Any], Any],
+                  executor,
+                  on_result: Optional[Callable[[int, int, Any], None]] = None,
+                  on_error: Optional[Callable[[Any, Exception], Any]] = None) -> List[Any]:
+        """
+        Solve every item concurrently and return the finished results in input order
+
+        Args:
+            items: Questions (or any work items)
+            solve: Coroutine function doing the provider I/O for one item
+            finish: Blocking post-processing (execution, screenshot) run on executor
+            executor: Thread pool for finish()
+            on_result: Called as on_result(completed_count, index, result) after each item
+            on_error: Maps (item, exception) to a fallback result; re-raises when omitted
+        """
+        self._track('documents')
+        return self.run(self._solve_all(list(items), solve, finish, executor, on_result, on_error))
+
+    async def _solve_all(self, items, solve, finish, executor, on_result, on_error):
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.max_inflight)
+        results: List[Any] = [None] * len(items)
+        report_lock = threading.Lock()
+        completed = [0]
+
+        def finish_and_report(index, item, solved):
+            result = finish(item, solved)
+            report(index, result)
+            return result
+
+        def report(index, result):
+            if on_result is None:
+                return
+            with report_lock:
+                completed[0] += 1
+                try:
+                    on_result(completed[0], index, result)
+                except Exception as e:
+                    logger.warning(f"Progress callback failed: {e}")
+
+        async def one(index, item):
+            try:
+                async with semaphore:
+                    self._track('inflight')
+                    try:
+                        solved = await solve(item)
+                    finally:
+                        self._track('inflight', -1)
+                results[index] = await loop.run_in_executor(executor, finish_and_report, index, item, solved)
+            except Exception as e:
+                self._track('failed')
+                if on_error is None:
+                    raise
+                logger.error(f"Error processing question {index + 1}: {e}")
+                results[index] = on_error(item, e)
+                await loop.run_in_executor(executor, report, index, results[index])
+            finally:
+                self._track('questions')
+
+        await asyncio.gather(*(one(i, item) for i, item in enumerate(items)))
+        return results
+
+    def stats(self):
+        with self.stats_lock:
+            return dict(self.counters, max_inflight=self.max_inflight)
@@ -5,7 +5,6 @@ import logging
 from celery import current_task
 from celery_config import celery_app
 from db_helper import DatabaseHelper
-import concurrent.futures
 from datetime import datetime
 
 # Import functions from app.py
@@ -28,6 +27,10 @@ def process_pdf_async(self, pdf_path, name, reg_number, language, phone_number,
     """
     Asynchronous PDF processing task with status tracking
     """
+    # Imported here to avoid a circular import with app.py; process_questions
+    # goes through the shared solution cache
+    from app import extract_text_from_pdf, split_questions, process_questions, generate_word_doc
+
     task_id = self.request.id
     start_time = time.time()
     
@@ -119,22 +122,24 @@ def process_pdf_async(self, pdf_path, name, reg_number, language, phone_number,
         solutions_display = []
         screenshots = []
         
-        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
-            futures = [executor.submit(process_question, q, language) for q in questions]
-            
-            for i, future in enumerate(concurrent.futures.as_completed(futures)):
-                sol, scr = future.result()
-                solutions_display.append(sol)
-                screenshots.append(scr)
-                
-                # Update progress
-                progress = 25 + (i + 1) * 50 // len(questions)
-                db_helper.update_task_status(task_id, 'PROCESSING',
-                    progress=progress,
-                    current_stage='question_processing',
-                    stage_details=f'Processed {i + 1}/{len(questions)} questions',
-                    questions_solved=len([sol for sol in solutions_display if sol and not sol.startswith("Error")])
-                )
+        solved_count = [0]
+        
+        def on_question_done(completed, question_index, sol):
+            if sol and not sol.startswith("Error"):
+                solved_count[0] += 1
+            # Update progress
+            progress = 25 + completed * 50 // len(questions)
+            db_helper.update_task_status(task_id, 'PROCESSING',
+                progress=progress,
+                current_stage='question_processing',
+                stage_details=f'Processed {completed}/{len(questions)} questions',
+                questions_solved=solved_count[0]
+            )
+        
+        # Provider calls for all questions run concurrently on the solve engine; results stay in order
+        for sol, scr in process_questions(questions, language, on_progress=on_question_done):
+            solutions_display.append(sol)
+            screenshots.append(scr)
         
         # Update status for document generation
         db_helper.update_task_status(task_id, 'PROCESSING',
@@ -256,6 +261,8 @@ def process_manual_questions_async(self, questions_text, name, reg_number, langu
     """
     Asynchronous manual questions processing task with status tracking
     """
+    from app import split_questions, process_questions, generate_word_doc
+
     task_id = self.request.id
     start_time = time.time()
     
@@ -344,22 +351,24 @@ def process_manual_questions_async(self, questions_text, name, reg_number, langu
         solutions_display = []
         screenshots = []
         
-        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
-            futures = [executor.submit(process_question, q, language) for q in questions]
-            
-            for i, future in enumerate(concurrent.futures.as_completed(futures)):
-                sol, scr = future.result()
-                solutions_display.append(sol)
-                screenshots.append(scr)
-                
-                # Update progress
-                progress = 25 + (i + 1) * 50 // len(questions)
-                db_helper.update_task_status(task_id, 'PROCESSING',
-                    progress=progress,
-                    current_stage='question_solving',
-                    stage_details=f'Solved {i + 1}/{len(questions)} questions',
-                    questions_solved=len([sol for sol in solutions_display if sol and not sol.startswith("Error")])
-                )
+        solved_count = [0]
+        
+        def on_question_done(completed, question_index, sol):
+            if sol and not sol.startswith("Error"):
+                solved_count[0] += 1
+            # Update progress
+            progress = 25 + completed * 50 // len(questions)
+            db_helper.update_task_status(task_id, 'PROCESSING',
+                progress=progress,
+                current_stage='question_solving',
+                stage_details=f'Solved {completed}/{len(questions)} questions',
+                questions_solved=solved_count[0]
+            )
+        
+        # Provider calls for all questions run concurrently on the solve engine; results stay in order
+        for sol, scr in process_questions(questions, language, on_progress=on_question_done):
+            solutions_display.append(sol)
+            screenshots.append(scr)
         
         # Update status for document generation
         db_helper.update_task_status(task_id, 'PROCESSING',
@@ -480,6 +489,8 @@ def process_single_question(self, question, language='python'):
     """
     Fast processing for single questions
     """
+    from app import process_question
+
     task_id = self.request.id
     start_time = time.time()
     
@@ -543,6 +554,17 @@ def cleanup_temp_files():
                     logger.error(f"Failed to clean up {file_path}: {str(e)}")
 
 
+@celery_app.task(name='tasks.prewarm_solution_corpus')
+def prewarm_solution_corpus(limit=50, min_count=2):
+    """
+    Solve and validate the most frequently asked questions that have no
+    validated solution yet, so the next upload of them hits the cache
+    """
+    from app import prewarm_solution_corpus as run_prewarm
+
+    return run_prewarm(limit=limit, min_count=min_count)
+
+
 # Periodic task to clean up temp files
 from celery.schedules import crontab
 
@@ -551,4 +573,9 @@ celery_app.conf.beat_schedule = {
         'task': 'tasks.cleanup_temp_files',
         'schedule': crontab(minute=0),  # Run every hour
     },
+    'prewarm-solution-corpus': {
+        'task': 'tasks.prewarm_solution_corpus',
+        'schedule': crontab(hour=int(os.getenv('CORPUS_PREWARM_HOUR', '3')), minute=30),  # Nightly
+        'kwargs': {'limit': int(os.getenv('CORPUS_PREWARM_LIMIT', '50'))},
+    },
 }
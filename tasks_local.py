@@ -5,13 +5,11 @@ import logging
 from celery import current_task
 from celery_config_local import celery_app
 from db_helper import DatabaseHelper
-import concurrent.futures
 from datetime import datetime
 
 # Import functions from app.py
 from app import (
-    extract_text_from_pdf, split_questions, solve_coding_problem,
-    execute_code, create_screenshot, generate_word_doc, process_question
+    extract_text_from_pdf, split_questions, generate_word_doc, process_question, process_questions
 )
 
 # Initialize database helper
@@ -104,24 +102,21 @@ def process_pdf_async(self, pdf_path, name, reg_number, language, phone_number,
         solutions_display = []
         screenshots = []
         
-        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:  # Reduced for local testing
-            futures = [executor.submit(process_question, q, language) for q in questions]
-            
-            for i, future in enumerate(concurrent.futures.as_completed(futures)):
-                sol, scr = future.result()
-                solutions_display.append(sol)
-                screenshots.append(scr)
-                
-                # Update progress
-                progress = 25 + (i + 1) * 50 // len(questions)
-                current_task.update_state(
-                    state='PROCESSING',
-                    meta={
-                        'status': f'Processed {i + 1}/{len(questions)} questions',
-                        'progress': progress,
-                        'stage': 'question_processing'
-                    }
-                )
+        def on_question_done(completed, question_index, sol):
+            # Update progress (called from worker threads, so use the bound task)
+            progress = 25 + completed * 50 // len(questions)
+            self.update_state(
+                state='PROCESSING',
+                meta={
+                    'status': f'Processed {completed}/{len(questions)} questions',
+                    'progress': progress,
+                    'stage': 'question_processing'
+                }
+            )
+        
+        for sol, scr in process_questions(questions, language, on_progress=on_question_done):
+            solutions_display.append(sol)
+            screenshots.append(scr)
         
         current_task.update_state(
             state='PROCESSING',
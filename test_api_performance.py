@@ -25,9 +25,8 @@ def test_api_performance():
     print('\n🧠 Testing Claude API directly...')
     start_time = time.time()
     try:
-        key_index, claude_key = claude_manager.get_best_available_key()
-        if claude_key:
-            result = try_claude_api(f"Write only the Python code to solve: {test_question}", claude_key, key_index)
+        if claude_manager.get_available_keys_count():
+            result = try_claude_api(f"Write only the Python code to solve: {test_question}")
             claude_time = time.time() - start_time
             print(f'✅ Claude Response Time: {claude_time:.2f} seconds')
             print(f'📝 Claude Result: {result[:100]}...' if len(result) > 100 else f'📝 Claude Result: {result}')
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Tests for batched prompting of short questions
+"""
+import asyncio
+
+from batch_prompting import PromptBatcher, parse_batch_response
+
+
+def test_parse_well_formed_response():
+    text = ("===SOLUTION 1===\nprint('olleh')\n"
+            "===SOLUTION 2===\n```python\nfor i in range(1, 11):\n    print(5 * i)\n```\n"
+            "===END===\n")
+    assert parse_batch_response(text, 2) == ["print('olleh')", "for i in range(1, 11):\n    print(5 * i)"]
+
+
+def test_parse_rejects_missing_invalid_and_truncated_answers():
+    text = "===SOLUTION 1===\ndef broken(:\n===SOLUTION 3===\nprint(3)\n===SOLUTION 2===\nprint(2"
+    # 1 does not parse, 2 is cut off (no end marker), 3 is valid
+    assert parse_batch_response(text, 3) == [None, None, "print(3)"]
+    assert parse_batch_response("Sorry, I cannot help with that.", 2) == [None, None]
+
+
+def test_parse_rejects_duplicate_answers():
+    text = "===SOLUTION 1===\nprint(1)\n===SOLUTION 1===\nprint(2)\n===SOLUTION 2===\nprint(3)\n===END==="
+    assert parse_batch_response(text, 2) == [None, "print(3)"]
+
+
+def test_batcher_packs_concurrent_questions_and_falls_back():
+    sent = []
+
+    async def send_batch(questions, language):
+        sent.append((list(questions), language))
+        return [f"print({i})" if i % 2 == 0 else None for i in range(len(questions))]
+
+    async def run():
+        batcher = PromptBatcher(send_batch, max_batch=3, window=0.01)
+        python = [batcher.solve(f"question {i}", "python") for i in range(4)]
+        lone_java = batcher.solve("question java", "java")
+        return batcher, await asyncio.gather(*python, lone_java)
+
+    batcher, results = asyncio.run(run())
+    # First three fill a batch; the fourth and the lone Java question are left to per-question calls
+    assert sent == [(["question 0", "question 1", "question 2"], "python")]
+    assert results == ["print(0)", None, "print(2)", None, None]
+    stats = batcher.stats()
+    assert stats['batches'] == 1 and stats['answered'] == 2 and stats['fallbacks'] == 1
+
+
+def test_batcher_failure_falls_back_for_every_question():
+    async def send_batch(questions, language):
+        raise RuntimeError("provider down")
+
+    async def run():
+        batcher = PromptBatcher(send_batch, max_batch=2, window=0.01)
+        return batcher, await asyncio.gather(batcher.solve("a", "python"), batcher.solve("b", "python"))
+
+    batcher, results = asyncio.run(run())
+    assert results == [None, None]
+    assert batcher.stats()['failed_batches'] == 1
+
+
+def test_long_questions_are_not_batched():
+    batcher = PromptBatcher(None, max_chars=20)
+    assert batcher.eligible("reverse a string")
+    assert not batcher.eligible("Write a program that reads a matrix and prints its transpose")
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✅ {name}")
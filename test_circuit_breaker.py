@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Tests for provider circuit breakers and the retry budget
+"""
+import time
+
+import httpx
+import anthropic
+
+from circuit_breaker import (CircuitBreaker, RetryBudget, classify_error, classify_status, retry_after_seconds,
+                             CLOSED, OPEN, HALF_OPEN, RATE_LIMITED, OVERLOADED, TIMEOUT, CONNECTION,
+                             BAD_REQUEST, UNKNOWN)
+from key_scheduler import KeyScheduler
+
+
+def test_errors_are_classified_by_type_and_status():
+    request = httpx.Request('POST', 'https://api.example.com')
+    response = httpx.Response(429, headers={'retry-after': '7'}, request=request)
+    assert classify_error(httpx.HTTPStatusError('slow down', request=request, response=response)) == RATE_LIMITED
+    assert retry_after_seconds(response) == 7
+    assert classify_error(anthropic.APIStatusError('x', response=httpx.Response(529, request=request), body=None)) == OVERLOADED
+    assert classify_error(anthropic.APITimeoutError(request=request)) == TIMEOUT
+    assert classify_error(httpx.ConnectError('refused')) == CONNECTION
+    assert classify_error(Exception('rate limit connection 429')) == UNKNOWN  # Message text is ignored
+    assert classify_status(400) == BAD_REQUEST and classify_status(200) is None
+
+
+def test_breaker_opens_probes_and_closes():
+    breaker = CircuitBreaker('test', failure_threshold=2, recovery_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()  # The single half-open probe
+    assert breaker.state == HALF_OPEN and not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow()
+
+
+def test_failed_probe_reopens_with_longer_timeout():
+    breaker = CircuitBreaker('test', failure_threshold=1, recovery_timeout=0.05, max_recovery_timeout=1)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN and breaker.current_timeout == 0.1
+    assert breaker.remaining() > 0.05
+
+
+def test_retry_budget_caps_retries():
+    budget = RetryBudget(ratio=0.5, min_per_second=0, backoff_base=0.1, backoff_cap=0.3)
+    for _ in range(4):
+        budget.record_request()
+    assert [budget.try_spend() for _ in range(3)] == [True, True, False]
+    assert budget.stats()['denied'] == 1
+    assert all(0 <= budget.backoff(attempt) <= 0.3 for attempt in range(1, 10))
+
+
+def test_open_provider_circuit_fails_fast():
+    scheduler = KeyScheduler('test', ['k1', 'k2'], breaker=CircuitBreaker('test', failure_threshold=2))
+    for _ in range(2):
+        scheduler.acquire(timeout=0).release()
+        scheduler.mark_failure(0, TIMEOUT)
+    assert scheduler.get_available_keys_count() == 0
+    assert scheduler.seconds_until_available() > 0
+    started = time.monotonic()
+    assert scheduler.acquire(timeout=5) is None
+    assert time.monotonic() - started < 0.05
+    assert scheduler.scheduler_stats()['breaker_rejected'] == 1
+
+
+def test_half_open_provider_admits_one_probe():
+    scheduler = KeyScheduler('test', ['k1'], breaker=CircuitBreaker('test', failure_threshold=1, recovery_timeout=0.05))
+    scheduler.mark_failure(0, OVERLOADED)
+    time.sleep(0.06)
+    probe = scheduler.acquire(timeout=0)
+    assert probe is not None and scheduler.acquire(timeout=1) is None
+    probe.release()  # Ended without an outcome: the probe slot is handed back
+    probe = scheduler.acquire(timeout=0)
+    scheduler.mark_success(probe.index)
+    probe.release()
+    assert scheduler.breaker.state == CLOSED
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✅ {name}")
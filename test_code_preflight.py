@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Tests for the Python pre-flight checks and repair budget
+"""
+from code_preflight import RepairBudget, add_final_print, execution_error, preflight
+from sandbox_pool import run_program
+
+
+def kinds(code):
+    return [issue.kind for issue in preflight(code)]
+
+
+def test_clean_programs_pass():
+    assert kinds('def area(r):\n    return 3.14 * r * r\n\nprint(area(2))') == []
+    assert kinds('import math\nfor x in [1, 2]:\n    print(math.sqrt(x))') == []
+    assert kinds('def main():\n    print("hi")\n\nif __name__ == "__main__":\n    main()') == []
+    assert kinds('total = 2 + 3') == []  # Ends on a value, which run_program prints
+    assert kinds('try:\n    import numpy as np\nexcept ImportError as e:\n    print(e)') == []
+
+
+def test_unusable_programs_are_flagged_with_lines():
+    syntax = preflight('print("a"\nx = 1')
+    assert [issue.kind for issue in syntax] == ['syntax'] and syntax[0].line
+    assert kinds('n = int(input("Number: "))\nprint(n * 2)') == ['input']
+    assert kinds('import sys\nfor line in sys.stdin:\n    print(line)') == ['input']
+    undefined = preflight('print(total + 1)')
+    assert [(issue.kind, issue.line) for issue in undefined] == [('undefined_name', 1)]
+    assert "name 'total'" in str(undefined[0])
+    assert kinds('def report():\n    print("never called")') == ['no_output']
+    assert kinds('') == ['empty']
+
+
+def test_final_value_is_printed_without_retries():
+    assert add_final_print('x = 6 * 7') == 'x = 6 * 7\nprint(x)'
+    assert add_final_print('print(1)\nx = 2') == 'print(1)\nx = 2'
+    assert run_program('values = [3, 1, 2]\nsorted(values)') == '[1, 2, 3]'
+    # No more "<name> = 0" guesses: the error is reported for the repair loop
+    assert run_program('print(missing + 1)') == "Error executing code: name 'missing' is not defined"
+
+
+def test_execution_errors_and_budget():
+    assert execution_error('Error executing code: division by zero').startswith('Error executing code')
+    assert execution_error('Code executed successfully but produced no visible output.') is not None
+    assert execution_error('') is not None
+    assert execution_error('Area: 12.56') is None
+    # A program printing its own error message ran fine (exception-handling questions ask for exactly that)
+    assert execution_error('Error: Cannot divide by zero') is None
+    assert execution_error('Error compiling C code:\nmain.c:1: error') is not None
+
+    now = [0.0]
+    budget = RepairBudget(max_attempts=2, seconds=10, clock=lambda: now[0])
+    assert budget.allows_repair()
+    budget.spend()
+    now[0] = 11.0
+    assert not budget.allows_repair()  # Out of time with attempts left
+    assert not RepairBudget(max_attempts=0).allows_repair()
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Tests for streamed response handling and early code extraction
+"""
+import asyncio
+
+import httpx
+
+from code_stream import CodeStreamAccumulator, StreamStats, extract_code, brackets_balanced
+from llm_clients import iter_chat_completion_deltas
+
+
+def _feed_all(accumulator, deltas):
+    """Feed deltas until the accumulator reports completion; returns how many were consumed"""
+    for count, delta in enumerate(deltas, 1):
+        if accumulator.feed(delta):
+            return count
+    return len(deltas)
+
+
+def test_fenced_python_completes_before_trailing_explanation():
+    deltas = ["```py", "thon\nfor i in range(3):\n", "    print(i)\n", "``", "`\n",
+              "This loop prints ", "the numbers 0 to 2."]
+    stats = StreamStats()
+    accumulator = CodeStreamAccumulator('python', stats=stats)
+    consumed = _feed_all(accumulator, deltas)
+    assert consumed == 5
+    assert accumulator.finish() == "for i in range(3):\n    print(i)"
+    assert stats.snapshot()['early_completions'] == 1
+
+
+def test_unfenced_response_completes_at_end_of_stream():
+    accumulator = CodeStreamAccumulator('python')
+    assert _feed_all(accumulator, ["x = 1\n", "print(x)"]) == 2
+    assert accumulator.code is None
+    assert accumulator.finish() == "x = 1\nprint(x)"
+
+
+def test_invalid_python_block_keeps_reading():
+    accumulator = CodeStreamAccumulator('python')
+    assert not accumulator.feed("```python\ndef f(:\n```\n")
+    assert accumulator.finish() == "def f(:"
+
+
+def test_csharp_block_requires_balanced_braces():
+    assert brackets_balanced('class P { static void Main() { Console.WriteLine("}"); } }')
+    assert not brackets_balanced('class P { static void Main() { ')
+    text = "```csharp\nclass P { static void Main() { } }\n```\nDone."
+    assert extract_code(text, 'c#') == "class P { static void Main() { } }"
+
+
+def test_progress_is_reported_on_completion():
+    reported = []
+    accumulator = CodeStreamAccumulator('python', on_progress=reported.append, progress_interval=60)
+    _feed_all(accumulator, ["```\n", "print(1)\n", "```"])
+    assert reported[-1] == accumulator.chars
+
+
+def test_chat_completion_sse_deltas():
+    body = (
+        'data: {"choices":[{"delta":{"role":"assistant"}}]}\n\n'
+        'data: {"choices":[{"delta":{"content":"print("}}]}\n\n'
+        ': keep-alive\n\n'
+        'data: {"choices":[{"delta":{"content":"42)"}}]}\n\n'
+        'data: {"choices":[{"delta":{},"finish_reason":"length"}]}\n\n'
+        'data: [DONE]\n\n'
+        'data: {"choices":[{"delta":{"content":"ignored"}}]}\n\n'
+    )
+
+    async def collect():
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, text=body))
+        async with httpx.AsyncClient(transport=transport) as client:
+            async with client.stream("POST", "http://llm.test/chat/completions") as response:
+                return [delta async for delta in iter_chat_completion_deltas(response, meta)]
+
+    meta = {}
+    assert asyncio.run(collect()) == ["print(", "42)"]
+    assert meta == {'finish_reason': 'length'}
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Tests for truncation detection and code continuation
+"""
+from continuation import estimate_max_tokens, is_truncated, merge_continuation, partial_code
+
+
+def test_truncation_from_stop_reason_and_open_block():
+    cut = "```csharp\nclass Bank {\n    static void Main() {\n        Console.Write"
+    assert is_truncated(cut, 'csharp')
+    assert is_truncated("```python\nprint(1\n```", 'python', stop_reason='max_tokens')
+    assert not is_truncated("```python\nprint(1)\n```\nThe code prints", 'python', stop_reason='max_tokens')
+    assert not is_truncated("```python\nprint(1)\n```", 'python', stop_reason='stop')
+    assert not is_truncated(cut, None)  # Raw (non-code) responses are never continued
+
+
+def test_partial_code_is_the_open_block():
+    assert partial_code("Here:\n```java\nclass A {\n  int x;") == "class A {\n  int x;"
+
+
+def test_merge_drops_repeated_overlap():
+    partial = "def area(r):\n    return 3.14 * r"
+    assert merge_continuation(partial, "```python\n    return 3.14 * r * r\n\nprint(area(2))\n```") == \
+        "def area(r):\n    return 3.14 * r * r\n\nprint(area(2))"
+
+
+def test_merge_continues_mid_line_and_new_lines():
+    assert merge_continuation("int main() {\n  printf(\"hi", "```c\n\");\n  return 0;\n}\n```") == \
+        "int main() {\n  printf(\"hi\");\n  return 0;\n}"
+    assert merge_continuation("if x:\n    y = 1", "```python\n    z = 2\n```") == "if x:\n    y = 1\n    z = 2"
+
+
+def test_token_budget_grows_with_question_size():
+    short = estimate_max_tokens("Add two numbers", 'python')
+    long = estimate_max_tokens("Write a menu-driven banking system with deposit, withdraw and balance "
+                               "options using classes and inheritance", 'csharp')
+    assert short == 800
+    assert long > 1500
+    assert estimate_max_tokens("x" * 10000, 'java', cap=1200) == 1200
+
+
+def test_token_budget_base_depends_on_language():
+    question = "Reverse a string"  # Short, so the base decides (floor 0 to see it)
+    extra = len(question) // 2
+    for language, base in (('python', 600), ('c', 800), ('cpp', 900), ('c++', 900), ('java', 1000),
+                           ('csharp', 1000), ('C#', 1000), ('javascript', 700), ('js', 700)):
+        assert estimate_max_tokens(question, language, floor=0) == base + extra, language
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Tests for the C# compile host runner (needs the .NET SDK on PATH)
+"""
+import os
+import time
+import signal
+import shutil
+import tempfile
+import threading
+
+from csharp_runner import CSharpRunner, prepare_csharp_source
+
+CACHE_DIR = os.path.join(tempfile.gettempdir(), 'codedebhai-test-csharp')
+
+
+def make_runner(**options) -> CSharpRunner:
+    return CSharpRunner(shutil.which('dotnet'), CACHE_DIR, timeout=3, **options)
+
+
+def test_snippets_are_wrapped_with_usings_outside_main():
+    source = prepare_csharp_source('using System.Text;\nvar sb = new StringBuilder("x");\nConsole.WriteLine(sb);')
+    assert source.index('using System.Text;') < source.index('class Program')
+    assert 'static void Main' in source
+    assert 'Program started...' in prepare_csharp_source('class Program { static void Main() { } }')
+
+
+def test_compile_host_runs_programs_and_reports_errors():
+    runner = make_runner()
+    try:
+        assert runner.run('var items = new List<int> { 3, 4 };\nConsole.WriteLine(items.Sum());') == '7'
+        assert runner.run('int x = ;').startswith('Error compiling C# code:\nProgram.cs(')
+        assert 'System.Exception: boom' in runner.run('Console.WriteLine(1);\nthrow new Exception("boom");')
+        assert runner.run('while (true) { }') == 'Error executing code: Execution timed out after 3s'
+        stats = runner.stats()
+        assert stats['mode'] == 'compile host'
+        assert (stats['runs'], stats['compile_errors'], stats['timeouts']) == (4, 1, 1)
+    finally:
+        runner.shutdown()
+
+
+def test_forked_child_prepares_its_own_runner_while_the_parent_holds_the_lock():
+    runner = make_runner()
+    runner.prepare()
+    release = threading.Event()
+    holder = threading.Thread(target=lambda: runner._lock().acquire() and release.wait())
+    holder.start()  # e.g. a background preparation still building when gunicorn --preload forks
+    try:
+        pid = os.fork()
+        if pid == 0:
+            ok = not runner.prepared and runner.run('Console.WriteLine(6 * 7);') == '42'
+            runner.shutdown()
+            os._exit(0 if ok else 1)
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            finished, status = os.waitpid(pid, os.WNOHANG)
+            if finished:
+                break
+            time.sleep(0.1)
+        else:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+            raise AssertionError("forked child blocked on the parent's lock")
+        assert os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0
+        assert runner.run('Console.WriteLine(1);') == '1'  # The parent's host is untouched
+    finally:
+        release.set()
+        holder.join()
+        runner._lock().release()
+        runner.shutdown()
+
+
+def test_programs_run_in_a_private_directory_with_fixtures():
+    cwd_before = sorted(os.listdir('.'))
+    runner = make_runner()
+    program = ('File.AppendAllText("data.csv", "\\nEve,22,Rome");\n'
+               'Console.WriteLine(File.ReadAllLines("data.csv").Length);')
+    try:
+        assert [runner.run(program), runner.run(program)] == ['5', '5']
+    finally:
+        runner.shutdown()
+    assert sorted(os.listdir('.')) == cwd_before
+
+
+def test_batch_compiles_once_and_rejects_only_broken_programs():
+    runner = make_runner()
+    programs = [
+        'Console.WriteLine("first");',
+        'int x = ;',
+        'class Program { static async Task Main() { await Task.Delay(1); Console.WriteLine("second"); } }',
+        'namespace Shapes;\nclass Program { static void Main() { Console.WriteLine("file-scoped"); } }',
+        'class Program { static void Main() { throw new InvalidOperationException("boom"); } }',
+        'while (true) { }',
+    ]
+    try:
+        outputs = runner.run_many(programs)
+        assert outputs[0] == 'first' and outputs[2] == 'second'
+        assert outputs[1].startswith('Error compiling C# code:')
+        assert outputs[3] == 'file-scoped'  # Cannot be nested in a namespace: run on its own
+        assert outputs[4].startswith('Program started...\nUnhandled exception. System.InvalidOperationException: boom')
+        assert 'CodeDebHai' not in outputs[4]
+        assert outputs[5] == 'Error executing code: Execution timed out after 3s'
+        stats = runner.stats()
+        assert (stats['batches'], stats['batched_programs'], stats['batch_rejects']) == (1, 4, 2)
+    finally:
+        runner.shutdown()
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Tests for single-request dual-language generation
+"""
+from dual_language import DualSolution, is_consistent, outputs_match, parse_dual_response
+
+JAVA = '''public class Main {
+    public static void main(String[] args) {
+        System.out.println("Total marks: " + 90);
+    }
+}'''
+
+RESPONSE = f"""===CODE===
+```java
+{JAVA}
+```
+===PYTHON===
+```python
+print("Total marks:", 90)
+```
+===OUTPUT===
+Total marks: 90
+===END===
+"""
+
+
+def test_parses_code_twin_and_output():
+    solution = parse_dual_response(RESPONSE, 'java')
+    assert solution.code == JAVA
+    assert solution.python == 'print("Total marks:", 90)'
+    assert solution.expected_output == 'Total marks: 90'
+    assert is_consistent(solution)
+
+
+def test_truncated_or_incomplete_response_is_rejected():
+    assert parse_dual_response(RESPONSE.split('===OUTPUT===')[0], 'java') is None  # No end marker
+    assert parse_dual_response(RESPONSE.replace('print("Total marks:", 90)', 'print("Total'), 'java') is None
+    assert parse_dual_response("```java\n" + JAVA + "\n```", 'java') is None
+
+
+def test_programs_printing_different_text_are_inconsistent():
+    twin = 'print("Average temperature:", 21)'
+    assert not is_consistent(DualSolution(JAVA, twin, None))
+    assert is_consistent(DualSolution(JAVA, 'print(90)', None))  # Nothing textual to compare
+
+
+def test_output_comparison_ignores_trailing_whitespace():
+    assert outputs_match("Total marks: 90\n", "Total marks: 90  \n\n")
+    assert not outputs_match("Total marks: 90", "Total marks: 91")
+    assert not outputs_match(None, "Total marks: 90")
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✅ {name}")
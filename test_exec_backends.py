@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Tests for the C/C++/Java/JavaScript execution backends (need gcc, g++ and node on PATH)
+"""
+import os
+import tempfile
+
+from exec_backends import JavaBackend, create_exec_backends
+from sandbox_fs import FixtureArea
+
+LIMITS = {'timeout': 3, 'cpu_seconds': 1, 'memory_mb': 64, 'file_size_mb': 1}
+
+
+def make_backends(cache_dir):
+    os.environ['EXEC_CACHE_DIR'] = cache_dir
+    try:
+        return create_exec_backends(LIMITS)
+    finally:
+        del os.environ['EXEC_CACHE_DIR']
+
+
+def test_native_programs_are_built_once_and_limited():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        backends = make_backends(cache_dir)
+        try:
+            c = backends.get('c')
+            hello = '#include <stdio.h>\nint main() { printf("sum %d\\n", 2 + 3); return 0; }'
+            assert c.run(hello) == 'sum 5'
+            assert c.run(hello) == 'sum 5'
+            assert (c.stats()['builds'], c.stats()['cache_hits']) == (1, 1)
+            assert c.run('int main() { return x; }').startswith('Error compiling C code:\nmain.c:')
+            assert c.run('int main() { for (;;); }') == 'Error executing code: CPU time limit exceeded'
+            hungry = ('#include <stdio.h>\n#include <stdlib.h>\n'
+                      'int main() { puts(malloc(512 << 20) ? "allocated" : "refused"); return 0; }')
+            assert c.run(hungry) == 'refused'
+            assert backends.get('c++').run(
+                '#include <iostream>\n#include <vector>\n'
+                'int main() { std::vector<int> v{1, 2, 3}; std::cout << v.size() << std::endl; }') == '3'
+        finally:
+            backends.shutdown()
+
+
+def test_javascript_runs_in_a_directory_with_the_mock_files():
+    cwd_before = sorted(os.listdir('.'))
+    with tempfile.TemporaryDirectory() as cache_dir:
+        backends = make_backends(cache_dir)
+        try:
+            node = backends.get('javascript')
+            program = 'const fs = require("fs");\nconsole.log(fs.readFileSync("words.txt", "utf8").split("\\n").length);'
+            assert node.run(program) == '7'
+            failure = node.run('throw new Error("boom");')
+            assert 'Error: boom' in failure and cache_dir not in failure
+        finally:
+            backends.shutdown()
+    assert sorted(os.listdir('.')) == cwd_before
+
+
+def test_java_main_class_detection():
+    source = ('package school;\nimport java.util.*;\nclass Helper { }\n'
+              'public class Grades {\n    public static void main(String[] args) { }\n}\nclass After { }')
+    assert JavaBackend.main_class(source) == 'school.Grades'
+    assert JavaBackend.main_class('class Solution { static void main(String[] a) {} }') == 'Solution'
+
+    # A nested class declared before main is not the main class; words in comments and strings are not classes
+    nested = ('// class Helper is below\npublic class Main {\n    static class Node { int value; Node next; }\n'
+              '    /* class Fake { */\n    public static void main(String[] args) {\n'
+              '        System.out.println("class Text {" + Node.class.getName());\n    }\n}')
+    assert JavaBackend.main_class(nested) == 'Main'
+    assert JavaBackend.main_class('class Outer {\n  static class Runner {\n    public static void main(String[] a) {}\n'
+                                  '  }\n}') == 'Outer$Runner'
+    # Several classes with main: the public one runs
+    assert JavaBackend.main_class('class Demo { public static void main(String[] a) {} }\n'
+                                  'public class App { public static void main(String[] a) {} }') == 'App'
+
+
+def test_java_daemon_lock_is_not_inherited_across_fork():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        area = FixtureArea(cache_dir)
+        backend = JavaBackend(cache_dir, LIMITS, area)
+        lock = backend._daemon_lock()
+        lock.acquire()  # Held by a thread starting the daemon when gunicorn --preload forks
+        try:
+            pid = os.fork()
+            if pid == 0:
+                os._exit(0 if backend._daemon_lock().acquire(timeout=5) else 1)
+            _, status = os.waitpid(pid, 0)
+            assert os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0
+        finally:
+            lock.release()
+            area.close()
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✅ {name}")
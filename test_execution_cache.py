@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Tests for the execution result cache
+"""
+import os
+import tempfile
+
+from execution_cache import ExecutionCache, is_deterministic
+from solution_cache import MemoryCacheStore, SQLiteCacheStore
+
+
+class CountingExecutor:
+    def __init__(self, output='42'):
+        self.output = output
+        self.calls = []
+
+    def __call__(self, code):
+        self.calls.append(code)
+        return self.output
+
+    def many(self, codes):
+        self.calls.extend(codes)
+        return [f"out {code}" for code in codes]
+
+
+def test_repeated_programs_run_once():
+    cache = ExecutionCache(MemoryCacheStore())
+    execute = CountingExecutor()
+    assert cache.run('python', 'print(6 * 7)', execute) == '42'
+    assert cache.run('python', 'print(6 * 7)', execute) == '42'
+    assert cache.run('c#', 'print(6 * 7)', execute) == '42'  # Language is part of the key
+    assert len(execute.calls) == 2
+    assert cache.stats()['hits'] == 1
+    assert cache.get('python', 'print(6 * 7)')['status'] == 'ok'
+
+
+def test_nondeterministic_programs_and_failures_are_not_cached():
+    cache = ExecutionCache(MemoryCacheStore())
+    execute = CountingExecutor()
+    for _ in range(2):
+        cache.run('python', 'import random\nprint(random.randint(1, 6))', execute)
+        cache.run('java', 'System.out.println(System.currentTimeMillis());', execute)
+    assert len(execute.calls) == 4
+    assert not is_deterministic('Console.WriteLine(DateTime.Now);', 'csharp')
+    assert is_deterministic('#include <stdio.h>\nint main() { puts("hi"); }', 'c')
+
+    timeout = CountingExecutor("Error executing code: Execution timed out after 10s")
+    cache.run('python', 'while True: pass', timeout)
+    cache.run('python', 'while True: pass', timeout)
+    assert len(timeout.calls) == 2
+    compile_error = CountingExecutor("Error compiling C code:\nmain.c:1: error")
+    cache.run('c', 'int main() { return x; }', compile_error)
+    cache.run('c', 'int main() { return x; }', compile_error)
+    assert len(compile_error.calls) == 1
+
+
+def test_batches_only_run_missing_programs_and_fixture_changes_invalidate():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'cache.sqlite3')
+        cache = ExecutionCache(SQLiteCacheStore(path, 'executions'))
+        execute = CountingExecutor()
+        cache.run('c#', 'A', execute)
+        assert cache.run_many('c#', ['A', 'B', 'var r = new Random();'], execute.many) == \
+            ['42', 'out B', 'out var r = new Random();']
+        assert execute.calls == ['A', 'B', 'var r = new Random();']
+
+        # Shared through the disk store, and keyed by the mock-file version
+        assert ExecutionCache(SQLiteCacheStore(path, 'executions')).get('c#', 'B')['output'] == 'out B'
+        assert ExecutionCache(SQLiteCacheStore(path, 'executions'), fixture_version='other').get('c#', 'B') is None
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✅ {name}")
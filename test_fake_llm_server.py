@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Tests for the local fake LLM server
+"""
+import os
+import asyncio
+import tempfile
+
+import httpx
+
+from fake_llm_server import FakeLLMConfig, FakeLLMServer, Cassette, generate_answer
+from llm_clients import ProviderClientRegistry, iter_chat_completion_deltas
+
+PROMPT = "\nWrite only the Java code to solve the following problem:\nstart\nPrint a greeting\nend\n"
+
+
+def serve(**options):
+    return FakeLLMServer(FakeLLMConfig(latency='fixed:0', tokens_per_second=0, **options), port=0).start()
+
+
+def test_anthropic_client_streams_from_fake_server():
+    server = serve()
+    try:
+        registry = ProviderClientRegistry(anthropic_base_url=server.base_url)
+
+        async def call():
+            client = registry.anthropic('sk-test')
+            async with client.messages.stream(model='claude-test', max_tokens=5,
+                                              messages=[{'role': 'user', 'content': PROMPT}]) as stream:
+                text = ''.join([chunk async for chunk in stream.text_stream])
+                return text, (await stream.get_final_message()).stop_reason
+
+        text, stop_reason = asyncio.run(call())
+        assert text.startswith('```java') and stop_reason == 'max_tokens'  # 5 tokens cut the program off
+        assert server.stats()['claude_requests'] == 1
+    finally:
+        server.stop()
+
+
+def test_deepseek_stream_and_json():
+    server = serve()
+    try:
+        body = {'model': 'deepseek-chat', 'messages': [{'role': 'user', 'content': PROMPT}]}
+        data = httpx.post(f"{server.base_url}/v1/chat/completions", json=body).json()
+        assert 'System.out.println("Print a greeting")' in data['choices'][0]['message']['content']
+
+        async def stream():
+            meta = {}
+            async with httpx.AsyncClient() as client:
+                async with client.stream('POST', f"{server.base_url}/v1/chat/completions",
+                                         json=dict(body, stream=True)) as response:
+                    text = ''.join([delta async for delta in iter_chat_completion_deltas(response, meta)])
+            return text, meta
+
+        text, meta = asyncio.run(stream())
+        assert text == data['choices'][0]['message']['content'] and meta['finish_reason'] == 'stop'
+    finally:
+        server.stop()
+
+
+def test_rate_limit_injection_and_canned_answers():
+    server = serve(rate_limit_rate=1.0, retry_after=3)
+    try:
+        response = httpx.post(f"{server.base_url}/v1/messages", json={'messages': []})
+        assert response.status_code == 429 and response.headers['retry-after'] == '3'
+        server.config.rate_limit_rate = 0
+        server.config.responses = {'greeting': 'print("hi")'}
+        response = httpx.post(f"{server.base_url}/v1/messages",
+                              json={'max_tokens': 100, 'messages': [{'role': 'user', 'content': PROMPT}]})
+        assert response.json()['content'][0]['text'] == 'print("hi")'
+    finally:
+        server.stop()
+
+
+def test_cassette_replay():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'cassette.jsonl')
+        Cassette(path).add('deepseek', PROMPT, 'recorded answer', 'end_turn', 0.01)
+        server = serve(replay=path)
+        try:
+            data = httpx.post(f"{server.base_url}/chat/completions",
+                              json={'messages': [{'role': 'user', 'content': PROMPT}]}).json()
+            assert data['choices'][0]['message']['content'] == 'recorded answer'
+            assert server.stats()['replayed'] == 1
+        finally:
+            server.stop()
+
+
+def test_generated_answers_follow_prompt_format():
+    assert generate_answer("Solve each of the 2 problems\n===SOLUTION 1===\n").count('===SOLUTION') == 2
+    assert '===PYTHON===' in generate_answer(PROMPT + "===PYTHON===\n")
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Tests for hedged provider requests
+"""
+import asyncio
+
+from hedging import LatencyWindow, RequestHedger
+
+
+def _call(result, delay, log, name):
+    async def call():
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            log.append(f"{name} cancelled")
+            raise
+        if isinstance(result, Exception):
+            raise result
+        return result
+    return call
+
+
+def test_fast_primary_never_hedges():
+    log = []
+    hedger = RequestHedger(fixed_delay=0.2)
+    result = asyncio.run(hedger.run('claude', _call('a', 0.01, log, 'claude'),
+                                    'deepseek', _call('b', 0.01, log, 'deepseek')))
+    assert result == 'a'
+    assert hedger.stats()['hedges_fired'] == 0
+
+
+def test_slow_primary_is_hedged_and_cancelled():
+    log = []
+    hedger = RequestHedger(fixed_delay=0.05)
+    result = asyncio.run(hedger.run('claude', _call('a', 5, log, 'claude'),
+                                    'deepseek', _call('b', 0.01, log, 'deepseek')))
+    assert result == 'b'
+    assert log == ['claude cancelled']
+    stats = hedger.stats()
+    assert stats['hedges_fired'] == 1 and stats['secondary_wins'] == 1
+
+
+def test_hedged_secondary_failure_waits_for_primary():
+    log = []
+    hedger = RequestHedger(fixed_delay=0.02)
+    result = asyncio.run(hedger.run('claude', _call('a', 0.1, log, 'claude'),
+                                    'deepseek', _call(RuntimeError("429"), 0.01, log, 'deepseek')))
+    assert result == 'a'
+    assert hedger.stats()['primary_wins_after_hedge'] == 1
+
+
+def test_budget_limits_hedging():
+    log = []
+    hedger = RequestHedger(fixed_delay=0.01, budget=0.1)
+
+    async def run():
+        return [await hedger.run('claude', _call('a', 0.05, log, 'claude'),
+                                 'deepseek', _call('b', 0.01, log, 'deepseek')) for _ in range(3)]
+
+    assert asyncio.run(run()) == ['b', 'a', 'a']
+    assert hedger.stats()['budget_denied'] == 2
+
+
+def test_delay_follows_observed_percentile():
+    hedger = RequestHedger(min_samples=5, min_delay=1, max_delay=10)
+    assert hedger.delay_for('claude') == hedger.default_delay
+    for seconds in [2, 3, 3, 4, 30]:
+        hedger.record('claude', seconds)
+    assert hedger.delay_for('claude') == 10
+    window = LatencyWindow()
+    for seconds in range(1, 11):
+        window.record(seconds)
+    assert window.percentile(0.9) == 9
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Tests for the provider key scheduler
+"""
+import time
+import asyncio
+import threading
+
+from key_scheduler import KeyScheduler
+
+
+def test_waiters_are_served_in_arrival_order():
+    scheduler = KeyScheduler('test', ['k1'], max_concurrent_per_key=1)
+    first = scheduler.acquire(timeout=0)
+    order = []
+
+    def worker(name):
+        lease = scheduler.acquire(timeout=5)
+        order.append(name)
+        time.sleep(0.01)
+        lease.release()
+
+    threads = []
+    for name in ['a', 'b', 'c']:
+        thread = threading.Thread(target=worker, args=(name,))
+        thread.start()
+        threads.append(thread)
+        time.sleep(0.05)  # Make arrival order deterministic
+    first.release()
+    for thread in threads:
+        thread.join()
+    assert order == ['a', 'b', 'c']
+    assert scheduler.scheduler_stats()['granted_after_wait'] == 3
+
+
+def test_deadline_expires_without_capacity():
+    scheduler = KeyScheduler('test', ['k1'], global_concurrent_limit=1)
+    held = scheduler.acquire(timeout=0)
+    started = time.monotonic()
+    assert scheduler.acquire(timeout=0.1) is None
+    assert 0.1 <= time.monotonic() - started < 1
+    assert scheduler.scheduler_stats()['timeouts'] == 1
+    held.release()
+    assert scheduler.acquire(timeout=0) is not None
+
+
+def test_token_bucket_paces_requests():
+    scheduler = KeyScheduler('test', ['k1'], requests_per_minute=600, burst=2)  # 10 per second
+    for _ in range(2):
+        scheduler.acquire(timeout=0).release()
+    started = time.monotonic()
+    assert scheduler.acquire(timeout=1) is not None
+    assert 0.05 <= time.monotonic() - started < 0.5
+
+
+def test_cooldown_routes_to_other_key_and_recovers():
+    scheduler = KeyScheduler('test', ['k1', 'k2'], max_consecutive_errors=2, error_cooldown=60)
+    scheduler.mark_rate_limited(0, duration=0.2)
+    assert scheduler.acquire(timeout=0).index == 1
+    scheduler.mark_failure(1)
+    scheduler.mark_failure(1)
+    assert scheduler.get_available_keys_count() == 0
+    assert scheduler.acquire(timeout=1).index == 0  # Woken when key 1's cooldown ends
+    assert scheduler.get_stats()[1]['consecutive_errors'] == 2
+
+
+def test_async_waiter_is_woken_by_release_from_another_thread():
+    scheduler = KeyScheduler('test', ['k1'], max_concurrent_per_key=1)
+    held = scheduler.acquire(timeout=0)
+
+    async def run():
+        threading.Timer(0.05, held.release).start()
+        lease = await scheduler.acquire_async(timeout=2)
+        lease.release()
+        return lease.waited
+
+    waited = asyncio.run(run())
+    assert 0.03 <= waited < 0.9  # Woken by the release, not by polling
+    assert scheduler.scheduler_stats()['inflight'] == 0
+
+
+def test_cancelled_async_waiter_leaves_queue():
+    scheduler = KeyScheduler('test', ['k1'], max_concurrent_per_key=1)
+    held = scheduler.acquire(timeout=0)
+
+    async def run():
+        task = asyncio.ensure_future(scheduler.acquire_async(timeout=5))
+        await asyncio.sleep(0.02)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(run())
+    assert scheduler.scheduler_stats()['queued'] == 0
+    held.release()
+    assert scheduler.acquire(timeout=0) is not None
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✅ {name}")
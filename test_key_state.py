@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Tests for shared provider key state
+"""
+import time
+import asyncio
+
+import pytest
+
+from key_scheduler import KeyScheduler
+from key_state import (KeyLimits, MemoryKeyStateBackend, RedisKeyStateBackend, WAIT_FOR_RELEASE,
+                       create_key_state_backend)
+
+try:
+    import fakeredis
+except ImportError:  # The Redis backend tests need fakeredis[lua] to run the Lua scripts
+    fakeredis = None
+
+needs_fakeredis = pytest.mark.skipif(fakeredis is None, reason="fakeredis[lua] is not installed")
+
+
+class SlowRedisBackend(RedisKeyStateBackend):
+    """Redis backend whose every round-trip takes `delay` seconds"""
+
+    def __init__(self, delay: float):
+        super().__init__('redis://unused', client=fakeredis.FakeRedis())
+        self.delay = delay
+
+    def try_acquire(self, *args):
+        time.sleep(self.delay)
+        return super().try_acquire(*args)
+
+    def release(self, *args):
+        time.sleep(self.delay)
+        super().release(*args)
+
+
+def test_memory_backend_enforces_buckets_and_leases():
+    backend = MemoryKeyStateBackend()
+    limits = KeyLimits(buckets=[(1.0, 2)], max_concurrent=1)
+    lease, _ = backend.try_acquire('test', 'k1', limits)
+    assert lease is not None
+    assert backend.try_acquire('test', 'k1', limits) == (None, WAIT_FOR_RELEASE)
+    backend.release('test', 'k1', lease)
+    assert backend.try_acquire('test', 'k1', limits)[0] is not None
+    lease, retry_after = backend.try_acquire('test', 'k2', KeyLimits(buckets=[(1.0, 0)]))
+    assert lease is None and 0 < retry_after <= 1
+
+
+def test_expired_lease_frees_capacity():
+    backend = MemoryKeyStateBackend()
+    limits = KeyLimits(global_concurrent=1, lease_ttl=0.05)
+    assert backend.try_acquire('test', 'k1', limits)[0] is not None  # Holder "crashes" without releasing
+    assert backend.try_acquire('test', 'k2', limits) == (None, WAIT_FOR_RELEASE)
+    time.sleep(0.06)
+    assert backend.try_acquire('test', 'k2', limits)[0] is not None
+
+
+def test_schedulers_sharing_a_backend_share_limits():
+    backend = MemoryKeyStateBackend()
+    first = KeyScheduler('claude', ['k1'], global_concurrent_limit=1, backend=backend)
+    second = KeyScheduler('claude', ['k1'], global_concurrent_limit=1, backend=backend)
+    held = first.acquire(timeout=0)
+    assert second.acquire(timeout=0) is None
+    held.release()
+    second.acquire(timeout=0).release()
+
+    first.mark_rate_limited(0, duration=30)
+    assert second.seconds_until_available() > 25
+    assert second.get_available_keys_count() == 0
+
+
+def test_unavailable_redis_falls_back_to_memory(monkeypatch):
+    monkeypatch.setenv('REDIS_URL', 'redis://127.0.0.1:1/0')
+    assert isinstance(create_key_state_backend('redis'), MemoryKeyStateBackend)
+    assert isinstance(create_key_state_backend('memory'), MemoryKeyStateBackend)
+
+
+@needs_fakeredis
+def test_redis_acquire_script_enforces_buckets_and_leases():
+    backend = RedisKeyStateBackend('redis://unused', client=fakeredis.FakeRedis())
+    limits = KeyLimits(buckets=[(1.0, 2)], max_concurrent=1)
+    lease, _ = backend.try_acquire('test', 'k1', limits)
+    assert lease is not None
+    assert backend.try_acquire('test', 'k1', limits) == (None, WAIT_FOR_RELEASE)
+    backend.release('test', 'k1', lease)
+    lease, _ = backend.try_acquire('test', 'k1', limits)
+    assert lease is not None
+    backend.release('test', 'k1', lease)
+    lease, retry_after = backend.try_acquire('test', 'k1', limits)  # Bucket of 2 is empty
+    assert lease is None and 0 < retry_after <= 1
+    lease, retry_after = backend.try_acquire('test', 'k2', KeyLimits(buckets=[(1.0, 0)]))
+    assert lease is None and 0 < retry_after <= 1
+
+
+@needs_fakeredis
+def test_redis_acquire_script_enforces_global_concurrency_and_lease_expiry():
+    backend = RedisKeyStateBackend('redis://unused', client=fakeredis.FakeRedis())
+    limits = KeyLimits(global_concurrent=1, lease_ttl=0.2)
+    assert backend.try_acquire('test', 'k1', limits)[0] is not None  # Holder "crashes" without releasing
+    assert backend.try_acquire('test', 'k2', limits) == (None, WAIT_FOR_RELEASE)
+    assert backend.try_acquire('other', 'k2', limits)[0] is not None  # Scopes do not share leases
+    time.sleep(0.25)
+    assert backend.try_acquire('test', 'k2', limits)[0] is not None
+
+
+@needs_fakeredis
+def test_redis_cooldown_scripts():
+    backend = RedisKeyStateBackend('redis://unused', client=fakeredis.FakeRedis())
+    limits = KeyLimits(buckets=[(1.0, 1)])
+    assert backend.cooldown_remaining('test', 'k1') == 0
+    backend.set_cooldown('test', 'k1', 30)
+    assert 25 < backend.cooldown_remaining('test', 'k1') <= 30
+    lease, retry_after = backend.try_acquire('test', 'k1', limits)
+    assert lease is None and 25 < retry_after <= 30
+    backend.clear_cooldown('test', 'k1')
+    assert backend.cooldown_remaining('test', 'k1') == 0
+    assert backend.try_acquire('test', 'k1', limits)[0] is not None
+    backend.set_cooldown('test', 'k1', 30)
+    backend.reset('test', 'k1')  # Refills the bucket and clears the cooldown
+    assert backend.cooldown_remaining('test', 'k1') == 0
+    assert backend.try_acquire('test', 'k1', limits)[0] is not None
+
+
+@needs_fakeredis
+def test_schedulers_sharing_redis_share_cooldowns():
+    client = fakeredis.FakeRedis()
+    first = KeyScheduler('claude', ['k1', 'k2'], backend=RedisKeyStateBackend('redis://unused', client=client))
+    second = KeyScheduler('claude', ['k1', 'k2'], backend=RedisKeyStateBackend('redis://unused', client=client))
+    first.mark_rate_limited(0, duration=30)
+    assert second.get_available_keys_count() == 1
+    lease = second.acquire(timeout=0)
+    assert lease.index == 1
+    lease.release()
+
+
+@needs_fakeredis
+def test_redis_round_trips_do_not_block_the_event_loop():
+    scheduler = KeyScheduler('claude', ['k1'], max_concurrent_per_key=1, backend=SlowRedisBackend(0.2))
+    ticks = []
+
+    async def heartbeat(stop):
+        while not stop.is_set():
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.01)
+
+    async def main():
+        stop = asyncio.Event()
+        beat = asyncio.ensure_future(heartbeat(stop))
+        held = await scheduler.acquire_async(timeout=5)
+        waiting = asyncio.ensure_future(scheduler.acquire_async(timeout=5))
+        await asyncio.sleep(0.05)
+        held.release()  # Returns at once; the backend release runs on the executor
+        lease = await waiting
+        lease.release()
+        await asyncio.sleep(0.3)
+        stop.set()
+        await beat
+        return lease
+
+    assert asyncio.run(main()) is not None
+    # Each Redis call takes 0.2s; a loop blocked by one would miss heartbeats for that long
+    assert max(b - a for a, b in zip(ticks, ticks[1:])) < 0.15
+    assert scheduler.scheduler_stats()['inflight'] == 0
+
+
+@needs_fakeredis
+def test_cancelled_waiter_leaves_the_redis_backed_queue():
+    scheduler = KeyScheduler('claude', ['k1'], max_concurrent_per_key=1, backend=SlowRedisBackend(0.05))
+
+    async def main():
+        held = await scheduler.acquire_async(timeout=5)
+        waiting = asyncio.ensure_future(scheduler.acquire_async(timeout=5))
+        await asyncio.sleep(0.02)  # Cancelled while its enqueue is still on the executor
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        held.release()
+        await asyncio.sleep(0.3)
+
+    asyncio.run(main())
+    stats = scheduler.scheduler_stats()
+    assert stats['queued'] == 0 and stats['inflight'] == 0
+    lease = scheduler.acquire(timeout=1)
+    assert lease is not None
+    lease.release()
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func) and func.__code__.co_argcount == 0:
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Tests for the pooled LLM client registry
+"""
+import asyncio
+
+import httpx
+
+from fake_llm_server import FakeLLMConfig, FakeLLMServer
+from llm_clients import ProviderClientRegistry, iter_chat_completion_deltas, key_fingerprint
+
+BODY = {'model': 'deepseek-chat', 'messages': [{'role': 'user', 'content': "Write only the Python code"}]}
+
+
+def sse(*lines):
+    return httpx.Response(200, content='\n'.join(lines).encode('utf-8'))
+
+
+def deltas(response, meta=None):
+    async def collect():
+        return [delta async for delta in iter_chat_completion_deltas(response, meta)]
+    return asyncio.run(collect())
+
+
+def test_one_client_per_key_fingerprint():
+    registry = ProviderClientRegistry()
+    first = registry.deepseek('sk-one')
+    assert registry.deepseek('sk-one') is first
+    assert registry.deepseek('sk-two') is not first
+    assert set(registry.deepseek_clients) == {key_fingerprint('sk-one'), key_fingerprint('sk-two')}
+    assert first.headers['Authorization'] == 'Bearer sk-one'
+
+    claude = registry.anthropic('sk-one')
+    assert registry.anthropic('sk-one') is claude
+    assert registry.anthropic('sk-two') is not claude
+    assert set(registry.anthropic_clients) == {key_fingerprint('sk-one'), key_fingerprint('sk-two')}
+
+
+def test_clients_are_recreated_after_a_fork():
+    registry = ProviderClientRegistry()
+    deepseek, claude = registry.deepseek('sk-one'), registry.anthropic('sk-one')
+    registry.counters['deepseek'][key_fingerprint('sk-one')]['requests'] = 5
+    registry.pid = -1  # As seen from a forked child: the registry was built by another process
+
+    assert registry.deepseek('sk-one') is not deepseek
+    assert registry.anthropic('sk-one') is not claude
+    assert registry.stats()['deepseek'][key_fingerprint('sk-one')]['requests'] == 0
+    assert registry.deepseek('sk-one') is registry.deepseek('sk-one')  # Cached again in the new process
+
+
+def test_connection_reuse_counters():
+    server = FakeLLMServer(FakeLLMConfig(latency='fixed:0', tokens_per_second=0), port=0).start()
+    try:
+        registry = ProviderClientRegistry()
+
+        async def send(count):
+            client = registry.deepseek('sk-one')
+            for _ in range(count):
+                response = await client.post(f"{server.base_url}/v1/chat/completions", json=BODY)
+                assert response.status_code == 200
+            await client.aclose()
+
+        asyncio.run(send(3))
+        stats = registry.stats()
+        assert stats['deepseek'][key_fingerprint('sk-one')] == {
+            'requests': 3, 'connections_opened': 1, 'reused_requests': 2, 'reuse_rate': '66.7%'
+        }
+        assert stats['claude'] == {} and stats['settings']['pool_size'] == 10
+    finally:
+        server.stop()
+
+
+def test_chat_completion_deltas_stop_at_done():
+    meta = {}
+    response = sse(
+        'data: {"choices": [{"delta": {"role": "assistant"}}]}',
+        '',
+        'data: {"choices": [{"delta": {"content": "print("}}]}',
+        '',
+        'data: {"choices": [{"delta": {"content": "1)"}, "finish_reason": "stop"}]}',
+        'data: [DONE]',
+        'data: {"choices": [{"delta": {"content": "after done"}}]}',
+    )
+    assert deltas(response, meta) == ['print(', '1)']
+    assert meta == {'finish_reason': 'stop'}
+
+
+def test_chat_completion_deltas_skip_keep_alives_and_malformed_chunks():
+    response = sse(
+        ': keep-alive',
+        '',
+        '',
+        'data: {"choices": [{"delta": {"content": "a"}}]}',
+        'data: {not json',
+        'event: ping',
+        'data:{"choices": [{"delta": {"content": "b"}, "finish_reason": "length"}]}',
+    )
+    meta = {}
+    assert deltas(response, meta) == ['a', 'b']  # The stream may also end without [DONE]
+    assert meta['finish_reason'] == 'length'
+    assert deltas(sse('', 'data: [DONE]')) == []
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func) and func.__code__.co_argcount == 0:
+            func()
+            print(f"✅ {name}")
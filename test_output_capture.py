@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Tests for bounded output capture
+"""
+import os
+import subprocess
+import sys
+
+from output_capture import BoundedOutput, OutputLimitExceeded, OutputLimits, capture_process
+from sandbox_pool import SandboxPool, run_program
+
+SMALL = OutputLimits(head_lines=3, tail_lines=2, max_bytes=10_000, max_line_chars=20)
+
+
+def test_ring_buffer_keeps_head_and_tail_lines():
+    output = BoundedOutput(SMALL)
+    for i in range(100):
+        print(i, file=output)
+    assert output.getvalue() == "0\n1\n2\n... [95 lines omitted] ...\n98\n99"
+    assert output.info()['lines'] == 100 and output.truncated
+    output = BoundedOutput(SMALL)
+    output.write("x" * 50 + "\nshort")
+    assert output.getvalue() == "x" * 20 + " ... [30 more characters]\nshort"
+
+
+def test_hard_cap_stops_the_program():
+    output = BoundedOutput(OutputLimits(max_bytes=100))
+    try:
+        while True:
+            output.write("0123456789\n")
+    except OutputLimitExceeded:
+        pass
+    assert output.limit_exceeded and output.bytes <= 110
+    result = run_program('i = 0\nwhile True:\n    print(i)\n    i += 1', BoundedOutput(SMALL))
+    assert result.startswith("0\n1\n2\n... [") and result.endswith("[Output limit reached: the program was "
+                                                                   "stopped after printing 10 KB]")
+
+
+def test_subprocess_output_is_bounded_and_the_run_is_killed():
+    process = subprocess.Popen([sys.executable, '-c', 'import sys\nwhile True: sys.stdout.write("spam\\n")'],
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True)
+    captured = capture_process(process, SMALL, timeout=10)
+    assert captured.limit_exceeded and not captured.timed_out
+    lines = captured.output().splitlines()
+    assert lines[:3] == ['spam'] * 3 and lines[3].endswith('lines omitted] ...')
+    assert lines[-1].startswith('[Output limit reached')
+    assert process.poll() is not None
+
+
+def test_sandbox_pool_reports_output_limits():
+    os.environ['OUTPUT_MAX_BYTES_PYTHON'] = '5000'
+    try:
+        pool = SandboxPool(workers=1, timeout=5)
+    finally:
+        del os.environ['OUTPUT_MAX_BYTES_PYTHON']
+    try:
+        output = pool.execute('while True:\n    print("flood")')
+        assert output.endswith("[Output limit reached: the program was stopped after printing 5 KB]")
+        assert len(output.splitlines()) <= 200 + 50 + 3  # Marker, unfinished line, limit notice
+        stats = pool.stats()
+        assert stats['output_limit_stops'] == 1 and stats['limits']['output']['max_bytes'] == 5000
+    finally:
+        pool.shutdown()
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✅ {name}")
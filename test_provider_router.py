@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Tests for the latency- and error-aware provider router
+"""
+from key_scheduler import KeyScheduler
+from provider_router import ProviderRouter
+
+
+def _schedulers():
+    return {'claude': KeyScheduler('claude', ['c1']), 'deepseek': KeyScheduler('deepseek', ['d1'])}
+
+
+def test_cold_start_keeps_configured_order():
+    router = ProviderRouter()
+    assert router.rank(_schedulers()) == ['claude', 'deepseek']
+
+
+def test_slow_provider_is_ranked_last():
+    router = ProviderRouter(min_samples=3)
+    for _ in range(5):
+        router.record('claude', 0, 12.0)
+        router.record('deepseek', 0, 3.0)
+    assert router.rank(_schedulers()) == ['deepseek', 'claude']
+    assert router.stats(_schedulers())['first_choice_counts'] == {'deepseek': 1}
+
+
+def test_errors_and_cost_weights_inflate_expected_time():
+    router = ProviderRouter(min_samples=3, cost_weights={'deepseek': 3.0})
+    for _ in range(4):
+        router.record('claude', 0, 4.0)
+        router.record('deepseek', 0, 2.0)
+    assert router.rank(_schedulers()) == ['claude', 'deepseek']  # 4s vs 2s * 3
+    router.record('claude', 0, None, ok=False, error_type='RateLimitError')
+    assert router.expected_seconds('claude') == 4.0 / (1 - 1 / 5)
+    assert router.stats()['providers']['claude']['errors'] == {'RateLimitError': 1}
+
+
+def test_cooldown_and_missing_keys_push_provider_back():
+    router = ProviderRouter()
+    schedulers = _schedulers()
+    schedulers['claude'].mark_rate_limited(0, duration=60)
+    assert router.rank(schedulers) == ['deepseek', 'claude']
+    schedulers = {'claude': KeyScheduler('claude', []), 'deepseek': KeyScheduler('deepseek', ['d1'])}
+    assert router.rank(schedulers) == ['deepseek', 'claude']
+    assert router.stats(schedulers)['providers']['claude']['score'] is None
+
+
+def test_scheduler_prefers_faster_key():
+    router = ProviderRouter(min_samples=3)
+    scheduler = KeyScheduler('deepseek', ['d1', 'd2'])
+    scheduler.key_cost = lambda index: router.key_cost('deepseek', index)
+    for _ in range(3):
+        router.record('deepseek', 0, 9.0)
+        router.record('deepseek', 1, 1.0)
+    lease = scheduler.acquire(timeout=0)
+    assert lease.index == 1
+    lease.release()
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Tests for per-run sandbox directories and the mock file fixtures
+"""
+import os
+import tempfile
+
+from sandbox_fs import FixtureArea, needs_fixtures, remove_stale_areas
+from sandbox_pool import SandboxPool, run_isolated
+
+FILE_PROGRAM = ('with open("data.csv", "a") as f:\n    f.write("\\nEve,22,Rome")\n'
+                'with open("notes.txt", "w") as f:\n    f.write("scratch")\n'
+                'print(len(open("data.csv").read().splitlines()))')
+
+
+def test_runs_get_private_copies_of_the_fixtures():
+    with tempfile.TemporaryDirectory() as root:
+        area = FixtureArea(root)
+        first, second = area.new_run_dir(), area.new_run_dir()
+        area.materialize(first, with_fixtures=True)
+        area.materialize(second, with_fixtures=False)
+        with open(os.path.join(first, 'data.csv'), 'a') as f:
+            f.write('changed')
+        assert 'changed' not in open(os.path.join(area.template, 'data.csv')).read()
+        assert os.listdir(second) == []
+        area.discard(first)
+        assert not os.path.exists(first)
+        area.close()
+        assert os.listdir(root) == []
+    assert needs_fixtures('open("x.txt")') and not needs_fixtures('print(1)')
+
+
+def test_stale_areas_of_dead_workers_are_removed():
+    with tempfile.TemporaryDirectory() as root:
+        os.mkdir(os.path.join(root, 'codedebhai-sandbox-999999999-abc'))
+        live = FixtureArea(root)
+        remove_stale_areas(root)
+        assert os.listdir(root) == [os.path.basename(live.path)]
+
+
+def test_programs_write_into_their_run_directory():
+    cwd_before = sorted(os.listdir('.'))
+    pool = SandboxPool(workers=1, timeout=2)
+    try:
+        # Appending to the fixture in one run must not leak into the next
+        assert pool.execute_many([FILE_PROGRAM, FILE_PROGRAM]) == ['5', '5']
+    finally:
+        pool.shutdown()
+    assert run_isolated(FILE_PROGRAM) == '5'
+    assert sorted(os.listdir('.')) == cwd_before
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✅ {name}")
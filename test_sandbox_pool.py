@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Tests for the sandboxed Python execution pool
+"""
+import time
+import threading
+
+from sandbox_pool import SandboxPool, run_program
+
+
+def make_pool(**options):
+    return SandboxPool(**dict(dict(workers=1, timeout=1, cpu_seconds=1, memory_mb=64), **options))
+
+
+def test_outputs_follow_execute_code_contract():
+    pool = make_pool()
+    try:
+        outputs = pool.execute_many(['print("hello")', 'total = 2 + 3', 'Error: no code', 'raise ValueError("boom")'])
+        assert outputs[0] == 'hello'
+        assert outputs[1] == run_program('total = 2 + 3') == '5'
+        assert outputs[2].startswith('Invalid code returned')
+        assert outputs[3].startswith('Error executing code')
+    finally:
+        pool.shutdown()
+
+
+def test_limits_stop_runaway_programs():
+    pool = make_pool()
+    try:
+        started = time.monotonic()
+        outputs = pool.execute_many(['while True: pass', 'import time\ntime.sleep(30)',
+                                     'x = bytearray(512 * 1024 * 1024)\nprint("allocated")'])
+        assert time.monotonic() - started < 5
+        assert all(output.startswith('Error executing code') for output in outputs)
+        assert 'timed out' in outputs[1] and 'memory' in outputs[2]
+        assert pool.execute_many(['print("still works")']) == ['still works']
+    finally:
+        pool.shutdown()
+
+
+def test_concurrent_runs_capture_their_own_output_in_one_round_trip():
+    pool = make_pool(batch_window=0.2)
+    outputs = [None] * 8
+    try:
+        def run(index):
+            outputs[index] = pool.execute(f'import sys\nprint("out {index}")\nprint("err {index}", file=sys.stderr)')
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert outputs == [f"out {i}\nerr {i}" for i in range(8)]
+        assert pool.stats()['round_trips'] == 1
+    finally:
+        pool.shutdown()
+
+
+
+def test_preloaded_modules_are_warm_and_startup_is_reported():
+    code = 'import math, csv, decimal\nprint(math.factorial(5))'
+    pool = make_pool(preload=('math', 'csv'))
+    try:
+        assert pool.execute_many([code, code]) == ['120', '120']
+        stats = pool.stats()
+        assert stats['cold_imports'].get('decimal') == 2 and 'csv' not in stats['cold_imports']
+        assert stats['preloaded'] == ['math', 'csv'] and stats['startup_ms_p50'] is not None
+    finally:
+        pool.shutdown()
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Tests for the near-duplicate question index
+"""
+import os
+import tempfile
+
+from similarity_index import SimilarityIndex
+
+
+def _index(tmp, **kwargs):
+    return SimilarityIndex(os.path.join(tmp, 'index.sqlite3'), 'v1', **kwargs)
+
+
+def test_reuses_solution_for_renumbered_noisy_question():
+    with tempfile.TemporaryDirectory() as tmp:
+        index = _index(tmp)
+        index.add("1. Write a Python program to find the factorial of a number using recursion.",
+                  "python", "def fact(n): ...")
+        match = index.lookup("Q4)  Write a python progr am to find the factorial of a number using recursion",
+                             "python")
+        assert match is not None
+        assert match['solution'] == "def fact(n): ..."
+        assert match['similarity'] >= 0.85
+
+
+def test_different_language_or_numbers_do_not_match():
+    with tempfile.TemporaryDirectory() as tmp:
+        index = _index(tmp)
+        index.add("Print the first 10 prime numbers", "python", "primes_10")
+        assert index.lookup("Print the first 10 prime numbers", "java") is None
+        assert index.lookup("Print the first 20 prime numbers", "python") is None
+        assert index.stats()['rejected_numeric_mismatch'] == 1
+
+
+def test_questions_differing_in_a_key_word_do_not_match():
+    with tempfile.TemporaryDirectory() as tmp:
+        index = _index(tmp)
+        index.add("Write a program that reads a list of integers and sorts them in ascending order "
+                  "using bubble sort and prints the sorted list", "python", "ascending")
+        index.add("Write a program to convert a temperature from celsius to fahrenheit and print it "
+                  "rounded to two decimal places", "python", "c_to_f")
+        assert index.lookup("Write a program that reads a list of integers and sorts them in descending order "
+                            "using bubble sort and prints the sorted list", "python") is None
+        assert index.stats()['rejected_word_mismatch'] == 1  # Scored above the threshold
+        assert index.lookup("Write a program to convert a temperature from fahrenheit to celsius and print it "
+                            "rounded to two decimal places", "python") is None
+        # Filler words and split-up words (PDF extraction noise) still match
+        match = index.lookup("2) Write the program that reads a list of inte gers and sorts them in ascending order "
+                             "using bubble sort and prints the sorted list.", "python")
+        assert match['solution'] == "ascending"
+
+
+def test_unrelated_question_misses():
+    with tempfile.TemporaryDirectory() as tmp:
+        index = _index(tmp)
+        index.add("Reverse a string without using slicing", "python", "rev")
+        assert index.lookup("Read a CSV file and print the average age column", "python") is None
+        stats = index.stats()
+        assert stats['lookups'] == 1 and stats['misses'] == 1
+
+
+def test_entries_are_shared_between_instances():
+    with tempfile.TemporaryDirectory() as tmp:
+        _index(tmp).add("Check whether a number is a palindrome", "python", "pal")
+        assert _index(tmp).lookup("3. CHECK whether a number is a palindrome?", "python")['solution'] == "pal"
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✅ {name}")
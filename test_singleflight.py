@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Tests for in-flight request coalescing
+"""
+import time
+import asyncio
+import threading
+
+from singleflight import SingleFlight
+
+
+class _SharedLock:
+    """In-memory stand-in for RedisFlightLock shared by two SingleFlight instances ("processes")"""
+
+    def __init__(self):
+        self.owners = {}
+        self.mutex = threading.Lock()
+
+    def acquire(self, key, token, ttl):
+        with self.mutex:
+            return self.owners.setdefault(key, token) == token
+
+    def release(self, key, token):
+        with self.mutex:
+            if self.owners.get(key) == token:
+                del self.owners[key]
+
+    def held(self, key):
+        return key in self.owners
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return 'solution'
+
+    async def run():
+        return await asyncio.gather(*[flight.run('q', compute) for _ in range(5)])
+
+    assert asyncio.run(run()) == ['solution'] * 5
+    assert len(calls) == 1
+    assert flight.stats()['coalesced'] == 4 and flight.stats()['inflight'] == 0
+
+
+def test_failure_is_shared_and_not_remembered():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("provider down")
+
+    async def run():
+        results = await asyncio.gather(flight.run('q', fail), flight.run('q', fail), return_exceptions=True)
+        later = await flight.run('q', lambda: asyncio.sleep(0, result='ok'))
+        return results, later
+
+    results, later = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert later == 'ok'
+
+
+def test_follower_takes_over_when_leader_is_cancelled():
+    flight = SingleFlight()
+
+    async def slow():
+        await asyncio.sleep(5)
+
+    async def run():
+        leader = asyncio.ensure_future(flight.run('q', slow))
+        await asyncio.sleep(0.01)
+        follower = asyncio.ensure_future(flight.run('q', lambda: asyncio.sleep(0, result='follower')))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(run()) == 'follower'
+
+
+def test_other_process_waits_for_shared_result():
+    lock, store = _SharedLock(), {}
+    first = SingleFlight(lock, poll_interval=0.01)
+    second = SingleFlight(lock, poll_interval=0.01)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        store['q'] = 'solution'
+        return 'solution'
+
+    async def run():
+        return await asyncio.gather(first.run('q', compute, lambda: store.get('q')),
+                                    second.run('q', compute, lambda: store.get('q')))
+
+    assert asyncio.run(run()) == ['solution', 'solution']
+    assert len(calls) == 1
+    assert second.stats()['remote_hits'] == 1
+
+
+class _SlowLock(_SharedLock):
+    """Shared lock whose every call is a slow network round-trip"""
+
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+
+    def acquire(self, key, token, ttl):
+        time.sleep(self.delay)
+        return super().acquire(key, token, ttl)
+
+    def release(self, key, token):
+        time.sleep(self.delay)
+        super().release(key, token)
+
+    def held(self, key):
+        time.sleep(self.delay)
+        return super().held(key)
+
+
+def test_lock_round_trips_do_not_block_the_event_loop():
+    lock, store = _SlowLock(0.2), {}
+    first = SingleFlight(lock, poll_interval=0.01)
+    second = SingleFlight(lock, poll_interval=0.01)
+    ticks = []
+
+    def slow_lookup():
+        time.sleep(0.2)
+        return store.get('q')
+
+    async def compute():
+        store['q'] = 'solution'
+        return 'solution'
+
+    async def heartbeat(stop):
+        while not stop.is_set():
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.01)
+
+    async def run():
+        stop = asyncio.Event()
+        beat = asyncio.ensure_future(heartbeat(stop))
+        results = await asyncio.gather(first.run('q', compute, slow_lookup), second.run('q', compute, slow_lookup))
+        stop.set()
+        await beat
+        return results
+
+    assert asyncio.run(run()) == ['solution', 'solution']
+    assert not lock.owners  # The leader released the lock
+    # Each lock call and lookup takes 0.2s; a loop blocked by one would miss heartbeats for that long
+    assert max(b - a for a, b in zip(ticks, ticks[1:])) < 0.15
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared solution cache (memory and disk stores)
+"""
+import os
+import tempfile
+import time
+
+from solution_cache import (
+    MemoryCacheStore, SQLiteCacheStore, SolutionCache, normalize_question
+)
+
+
+def test_normalize_question_ignores_numbering_and_spacing():
+    assert normalize_question("1.  Write a program to   reverse a string.") == \
+        normalize_question("Q3) write a program to reverse a string")
+    assert normalize_question("Question 4: Print the sum") == normalize_question("2) print the sum")
+
+
+def test_normalize_question_keeps_numbers_and_quoted_text():
+    # A number without a delimiter is part of the question, not its numbering
+    assert normalize_question("2 numbers are read; print their sum") != \
+        normalize_question("3 numbers are read; print their sum")
+    assert normalize_question("2.5 times the radius is printed").startswith("2.5 ")
+    # Quoted text keeps its case (it is printed verbatim); the rest is still case-insensitive
+    assert normalize_question('Print "Hello World"') != normalize_question('Print "hello world"')
+    assert normalize_question('PRINT "Hello World" five times') == normalize_question('print "Hello World" five times')
+    assert normalize_question("Show the user's name as 'Admin'") == "show the user's name as 'Admin'"
+
+
+def test_memory_store_lru_eviction():
+    store = MemoryCacheStore(max_entries=2)
+    store.set('a', '1')
+    store.set('b', '2')
+    store.get('a')
+    store.set('c', '3')
+    assert store.get('b') is None
+    assert store.get('a') == '1'
+    assert store.counters_snapshot()['evictions'] == 1
+
+
+def test_memory_store_ttl():
+    store = MemoryCacheStore(ttl_seconds=1)
+    store.set('a', '1')
+    store.entries['a'] = ('1', time.time() - 5)
+    assert store.get('a') is None
+
+
+def test_solution_cache_hits_across_disk_store_instances():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'cache.sqlite3')
+        writer = SolutionCache(SQLiteCacheStore(path, 'solutions'), 'v1')
+        writer.set("1. Print hello world", "python", "print('hello world')")
+
+        reader = SolutionCache(SQLiteCacheStore(path, 'solutions'), 'v1')
+        assert reader.get("2. print hello world.", "python") == "print('hello world')"
+        assert reader.get("2. print hello world.", "java") is None
+        stats = reader.stats()
+        assert stats['hits'] == 1 and stats['misses'] == 1
+
+
+def test_solution_cache_prompt_version_and_errors():
+    cache = SolutionCache(MemoryCacheStore(), 'v1')
+    cache.set("reverse a string", "python", "Error: All API attempts failed.")
+    assert cache.get("reverse a string", "python") is None
+    cache.set("reverse a string", "python", "print('cba')")
+    assert SolutionCache(cache.store, 'v2').get("reverse a string", "python") is None
+
+
+def test_disk_store_lru_eviction():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteCacheStore(os.path.join(tmp, 'c.sqlite3'), 'ns', max_entries=2)
+        store.set('a', '1')
+        time.sleep(0.01)
+        store.set('b', '2')
+        time.sleep(0.01)
+        store.get('a')
+        store.set('c', '3')
+        assert store.get('b') is None
+        assert store.size() == 2
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✅ {name}")
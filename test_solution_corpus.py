@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Tests for the solved-question corpus and nightly pre-warming
+"""
+import os
+import time
+import tempfile
+
+from solution_corpus import SolutionCorpus, looks_successful, prewarm
+
+
+def make_corpus(tmp, prompt_version='v1'):
+    return SolutionCorpus(os.path.join(tmp, 'corpus.sqlite3'), prompt_version)
+
+
+def test_questions_are_counted_across_numbering():
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = make_corpus(tmp)
+        corpus.record_questions(["1. Factorial using recursion", "Q2) Word count of a file"], 'python')
+        corpus.record_questions(["3) factorial using recursion."], 'python')
+        corpus.record_questions(["Factorial using recursion"], 'java')
+        frequent = corpus.frequent_unsolved(min_count=2)
+        assert frequent == [("1. Factorial using recursion", 'python', 2)]
+
+
+def test_only_validated_solutions_are_served():
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = make_corpus(tmp)
+        corpus.record_solution("Factorial", 'python', 'print(1/0)', 'Error executing code: division by zero',
+                               validated=looks_successful('print(1/0)', 'Error executing code: division by zero'))
+        assert corpus.get("Factorial", 'python') is None
+        corpus.record_solution("Factorial", 'python', 'print(120)', '120', validated=True)
+        corpus.record_solution("Factorial", 'python', 'print(x)', '', validated=False)  # Never downgrades
+        assert corpus.get("factorial.", 'python')['code'] == 'print(120)'
+        assert make_corpus(tmp, 'v2').get("Factorial", 'python') is None  # New prompt version: re-solve
+
+
+def test_programs_printing_their_own_error_messages_are_successful():
+    handled = 'try:\n    print(1 / 0)\nexcept ZeroDivisionError:\n    print("Error: Cannot divide by zero")'
+    assert looks_successful(handled, 'Error: Cannot divide by zero')
+    assert not looks_successful('print(x)', "Traceback (most recent call last):\n  NameError")
+    assert not looks_successful('int main() {}', 'Error compiling C code:\nmain.c:1: error')
+    assert not looks_successful('print(1)', '1\nError executing code: CPU time limit exceeded')
+
+
+def test_prewarm_solves_frequent_questions_and_coverage_follows():
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = make_corpus(tmp)
+        corpus.record_questions(["ArrayList of students"] * 3 + ["Rare question"], 'java', now=time.time() - 60)
+        solved = []
+
+        def solve(question, language):
+            solved.append(question)
+            return 'class Main {}', 'Alice\nBob'
+
+        report = prewarm(corpus, solve, limit=10, min_count=2)
+        assert solved == ["ArrayList of students"] and report['validated'] == 1
+        assert corpus.frequent_unsolved(min_count=2) == []
+        corpus.record_questions(["ArrayList of students"], 'java')
+        stats = corpus.stats()
+        assert stats['recent_uploads'] == 5 and stats['validated'] == 1
+        assert stats['recent_coverage'] == '20.0%'  # Only the upload after pre-warming was covered
+        assert stats['recent_coverage_now'] == '50.0%'
+
+
+def test_failed_prewarm_is_not_validated():
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = make_corpus(tmp)
+        corpus.record_questions(["Broken question"] * 2, 'python')
+
+        def solve(question, language):
+            raise RuntimeError("provider down")
+
+        assert prewarm(corpus, solve)['errors'] == 1
+        assert prewarm(corpus, lambda q, l: ('print(x)', 'Traceback (most recent call last): ...'))['failed'] == 1
+        assert corpus.get("Broken question", 'python') is None
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Tests for the asyncio solve engine fan-out
+"""
+import asyncio
+import concurrent.futures
+import threading
+import time
+
+import pytest
+
+from solve_engine import SolveEngine
+
+
+def test_solve_all_runs_concurrently_and_keeps_order():
+    engine = SolveEngine(max_inflight=10)
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+
+    async def solve(q):
+        await asyncio.sleep(0.2 if q % 2 else 0.05)
+        return q * 10
+
+    start = time.time()
+    results = engine.solve_all(list(range(10)), solve, lambda q, s: (q, s), executor)
+    assert results == [(q, q * 10) for q in range(10)]
+    assert time.time() - start < 1.0  # 10 x 0.2s sequentially would take ~1.25s
+    assert engine.stats()['peak_inflight'] == 10
+
+
+def test_inflight_cap_and_thread_usage():
+    engine = SolveEngine(max_inflight=3)
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+    threads_before = threading.active_count()
+
+    async def solve(q):
+        await asyncio.sleep(0.01)
+        return q
+
+    engine.solve_all(list(range(50)), solve, lambda q, s: s, executor)
+    assert engine.stats()['peak_inflight'] == 3
+    # One loop thread plus the executor workers - not one thread per question
+    assert threading.active_count() - threads_before <= 3
+
+
+def test_errors_map_to_fallback_and_progress_is_reported():
+    engine = SolveEngine()
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+    progress = []
+
+    async def solve(q):
+        if q == 1:
+            raise RuntimeError("provider down")
+        return q
+
+    results = engine.solve_all(
+        [0, 1, 2], solve, lambda q, s: f"ok {s}", executor,
+        on_result=lambda completed, index, result: progress.append(completed),
+        on_error=lambda q, e: f"Error: {e}"
+    )
+    assert results == ["ok 0", "Error: provider down", "ok 2"]
+    assert sorted(progress) == [1, 2, 3]
+
+
+def test_run_from_engine_loop_is_rejected():
+    engine = SolveEngine()
+
+    async def nested():
+        return engine.run(asyncio.sleep(0))
+
+    with pytest.raises(RuntimeError):
+        engine.run(nested())
+
+
+if __name__ == '__main__':
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✅ {name}")